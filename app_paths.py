@@ -0,0 +1,61 @@
+# app_paths.py
+"""Rutas de la aplicación, iguales en desarrollo y en los dos tipos de ejecutable.
+
+- Recursos incluidos en el ejecutable (.ui, logo): `get_base_path()`. En el ejecutable
+  único es el temporal que PyInstaller descomprime en cada arranque; en la carpeta
+  (onedir) es el subdirectorio de librerías junto al .exe (ambos en sys._MEIPASS).
+- Datos escribibles (base de datos, imágenes, copias, caché): `get_writable_data_path()`,
+  junto al .exe o al script, o en INVENTARIO_DATA_DIR.
+- `resource_path()`: un recurso que se puede sustituir dejando un fichero con el mismo
+  nombre junto al .exe (p. ej. el logo de los informes); si no, el incluido.
+"""
+import os
+import sys
+
+
+def is_frozen():
+    """ Devuelve True si la aplicación está 'congelada' (es un EXE) """
+    return getattr(sys, 'frozen', False)
+
+
+def build_mode():
+    """'script', 'onefile' (se descomprime en un temporal en cada arranque) u 'onedir'."""
+    if not is_frozen():
+        return 'script'
+    # En onedir los recursos están dentro de la carpeta del ejecutable
+    install = os.path.normcase(os.path.abspath(install_path()))
+    bundle = os.path.normcase(os.path.abspath(sys._MEIPASS))
+    return 'onedir' if bundle == install or bundle.startswith(install + os.sep) else 'onefile'
+
+
+def install_path():
+    """Directorio del .exe o, en desarrollo, el de los scripts."""
+    if is_frozen():
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def get_base_path():
+    """ Obtiene la ruta base para leer recursos (funciona en dev y EXE) """
+    if is_frozen():
+        # Ruta al directorio _MEIPASS creado por PyInstaller (temporal en onefile, _internal en onedir)
+        return sys._MEIPASS
+    return install_path()
+
+
+def get_writable_data_path(relative_path=''):
+    """ Obtiene una ruta en un directorio donde se puede escribir, al lado del EXE o script """
+    if os.environ.get('INVENTARIO_DATA_DIR'):
+        # Directorio de datos alternativo (benchmarks, pruebas con bases de datos generadas...)
+        base_path = os.environ['INVENTARIO_DATA_DIR']
+    else:
+        base_path = install_path()
+    return os.path.join(base_path, relative_path)
+
+
+def resource_path(relative_path):
+    """Recurso incluido en la aplicación, o el fichero del mismo nombre junto al .exe si existe."""
+    override = os.path.join(install_path(), relative_path)
+    if os.path.exists(override):
+        return override
+    return os.path.join(get_base_path(), relative_path)
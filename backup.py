@@ -0,0 +1,453 @@
+# backup.py
+"""Copias de seguridad en caliente y archivo portable de un centro.
+
+Uso sin interfaz:
+    python backup.py copia [--db inventario.db] [--destino DIR]
+    python backup.py exportar-centro CLIENTE FICHERO.invcentro [--db inventario.db]
+    python backup.py importar-centro FICHERO.invcentro [--db inventario.db]
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+import zipfile
+from datetime import datetime, timezone
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from database import DatabaseManager, EQUIPMENT_TABLES, SHARD_DIR
+
+# Páginas copiadas por paso de la API de backup; entre pasos la base de datos queda libre para la interfaz
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.005
+# Copias completas que se conservan en el directorio de copias (las más antiguas se borran)
+MAX_SNAPSHOTS = 10
+SNAPSHOT_PREFIX = 'inventario_'
+
+ARCHIVE_FORMAT = 1
+ARCHIVE_EXTENSION = '.invcentro'
+# Filas leídas de cada consulta a la vez al exportar
+FETCH_SIZE = 500
+# Las fotos ya están comprimidas: se guardan tal cual en el zip
+_STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+
+# --- Copia de seguridad en caliente ---
+def backup_database(source_path, destination_path, pages=BACKUP_PAGES, progress=None, should_stop=None):
+    """Copia la base de datos con `sqlite3.Connection.backup` en pasos de `pages` páginas.
+
+    Usa su propia conexión, así que la interfaz puede seguir leyendo y escribiendo:
+    si otra conexión modifica la base de datos durante la copia, SQLite la reinicia
+    y el resultado es siempre una instantánea coherente. `progress(copiadas, total)`."""
+    tmp_path = destination_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(tmp_path)
+    try:
+        def step(status, remaining, total):
+            if should_stop and should_stop():
+                raise InterruptedError("Copia cancelada")
+            if progress:
+                progress(total - remaining, total)
+        source.backup(target, pages=pages, progress=step, sleep=BACKUP_SLEEP)
+    except BaseException:
+        target.close()
+        os.remove(tmp_path)
+        raise
+    finally:
+        source.close()
+    target.close()
+    os.replace(tmp_path, destination_path)
+
+
+def _same_file(a, b):
+    return a.st_size == b.st_size and int(a.st_mtime) == int(b.st_mtime)
+
+
+def _link_or_copy(source, destination, previous=None):
+    """Las imágenes no se reescriben nunca: si la copia anterior ya tiene el mismo fichero
+    se enlaza (hard link) en lugar de copiarlo, y cada copia ocupa solo lo nuevo."""
+    if previous is not None:
+        try:
+            if _same_file(os.stat(source), os.stat(previous)):
+                os.link(previous, destination)
+                return False
+        except OSError:
+            pass
+    shutil.copy2(source, destination)
+    return True
+
+
+def list_snapshots(backup_dir):
+    """Copias existentes, la más reciente primero."""
+    if not os.path.isdir(backup_dir):
+        return []
+    names = [name for name in os.listdir(backup_dir)
+             if name.startswith(SNAPSHOT_PREFIX) and os.path.exists(os.path.join(backup_dir, name, 'inventario.db'))]
+    return [os.path.join(backup_dir, name) for name in sorted(names, reverse=True)]
+
+
+def create_snapshot(db_path, data_dir, backup_dir, progress=None, should_stop=None, keep=MAX_SNAPSHOTS):
+    """Copia completa en `backup_dir/inventario_<fecha>`: la base de datos (en caliente, con
+    los ficheros de los centros si está dividida, ver shards.py), data/images (incremental respecto a la copia anterior) y los planos de los centros.
+    Devuelve un resumen con la ruta y los contadores."""
+    previous = next(iter(list_snapshots(backup_dir)), None)
+    snapshot = os.path.join(backup_dir, SNAPSHOT_PREFIX + datetime.now().strftime('%Y%m%d_%H%M%S'))
+    base, number = snapshot, 1
+    while os.path.exists(snapshot):
+        number += 1
+        snapshot = f"{base}_{number}"
+    work_dir = snapshot + '.tmp'
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(os.path.join(work_dir, 'data', 'images'))
+    report = {'ruta': snapshot, 'imagenes_copiadas': 0, 'imagenes_enlazadas': 0, 'planos': 0, 'centros': 0}
+    try:
+        backup_database(db_path, os.path.join(work_dir, 'inventario.db'), progress=progress, should_stop=should_stop)
+        for shard_path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(db_path)), SHARD_DIR, 'centro_*.db'))):
+            os.makedirs(os.path.join(work_dir, SHARD_DIR), exist_ok=True)
+            backup_database(shard_path, os.path.join(work_dir, SHARD_DIR, os.path.basename(shard_path)), should_stop=should_stop)
+            report['centros'] += 1
+
+        images_dir = os.path.join(data_dir, 'data', 'images')
+        if os.path.isdir(images_dir):
+            with os.scandir(images_dir) as entries:
+                for entry in entries:
+                    if should_stop and should_stop():
+                        raise InterruptedError("Copia cancelada")
+                    if not entry.is_file():
+                        continue
+                    old = os.path.join(previous, 'data', 'images', entry.name) if previous else None
+                    copied = _link_or_copy(entry.path, os.path.join(work_dir, 'data', 'images', entry.name),
+                                           old if old and os.path.exists(old) else None)
+                    report['imagenes_copiadas' if copied else 'imagenes_enlazadas'] += 1
+
+        # Los planos se eligen desde cualquier carpeta: se guardan aparte con el id del centro
+        snapshot_db = sqlite3.connect(os.path.join(work_dir, 'inventario.db'))
+        try:
+            plans = snapshot_db.execute("SELECT id, plano_path FROM inventarios WHERE plano_path IS NOT NULL AND plano_path != ''").fetchall()
+        finally:
+            snapshot_db.close()
+        for inventory_id, plan_path in plans:
+            if os.path.exists(plan_path):
+                os.makedirs(os.path.join(work_dir, 'planos'), exist_ok=True)
+                shutil.copy2(plan_path, os.path.join(work_dir, 'planos', f"{inventory_id}_{os.path.basename(plan_path)}"))
+                report['planos'] += 1
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+    os.replace(work_dir, snapshot)
+
+    for old_snapshot in list_snapshots(backup_dir)[keep:]:
+        shutil.rmtree(old_snapshot, ignore_errors=True)
+    return report
+
+
+class BackupWorker(QThread):
+    """Hace `create_snapshot` en segundo plano avisando del progreso de la base de datos."""
+    progress = pyqtSignal(int, int)
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db_path, data_dir, backup_dir, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.data_dir = data_dir
+        self.backup_dir = backup_dir
+
+    def run(self):
+        try:
+            report = create_snapshot(self.db_path, self.data_dir, self.backup_dir,
+                                     self.progress.emit, self.isInterruptionRequested)
+            self.done.emit(report)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+# --- Archivo portable de un centro ---
+def _columns(db, table):
+    return [c[1] for c in db.fetch_all(f"PRAGMA table_info({table})")]
+
+
+def _stream(db, query, params=()):
+    # Cursor propio leído por bloques: la memoria no depende del tamaño del centro
+    cursor = db.conn.cursor()
+    cursor.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        yield from rows
+
+
+def _archive_sections():
+    """(tabla, consulta) en el orden en que se importan: primero a lo que apuntan las demás."""
+    sections = [('inventarios', "SELECT * FROM inventarios WHERE id = ?")]
+    sections += [(table, f"SELECT * FROM {table} WHERE inventario_id = ? ORDER BY id") for table in EQUIPMENT_TABLES]
+    owned = " UNION ALL ".join(f"SELECT '{table}', id FROM {table} WHERE inventario_id = ?" for table in EQUIPMENT_TABLES)
+    sections.append(('images', f"SELECT * FROM images WHERE (item_type, item_id) IN ({owned}) ORDER BY id"))
+    # Solo las conexiones con los dos extremos en el centro
+    sections.append(('connections', f"SELECT * FROM connections WHERE (parent_item_type, parent_item_id) IN ({owned}) "
+                                    f"AND (child_item_type, child_item_id) IN ({owned}) ORDER BY id"))
+    sections.append(('plan_positions', "SELECT * FROM plan_positions WHERE inventario_id = ?"))
+    return sections
+
+
+def _params_for(table, inventory_id):
+    count = len(EQUIPMENT_TABLES)
+    return {'images': (inventory_id,) * count, 'connections': (inventory_id,) * (2 * count)}.get(table, (inventory_id,))
+
+
+def export_centro(db, data_dir, inventory_id, path):
+    """Escribe un centro completo (filas, imágenes y plano) en un único zip.
+
+    Las filas se escriben línea a línea en rows.jsonl y las imágenes se copian del
+    disco al zip por bloques, así que la memoria no crece con el número de fotos.
+    Devuelve los contadores exportados."""
+    report = {'filas': 0, 'imagenes': 0, 'plano': 0}
+    inventory = db.fetch_one("SELECT cliente, plano_path FROM inventarios WHERE id = ?", (inventory_id,))
+    if inventory is None:
+        raise ValueError("El centro no existe.")
+    cliente, plan_path = inventory
+    has_positions = db.fetch_one("SELECT 1 FROM sqlite_master WHERE type='table' AND name='plan_positions'") is not None
+
+    tmp_path = path + '.tmp'
+    try:
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            images = []
+            with zf.open('rows.jsonl', 'w') as out:
+                for table, query in _archive_sections():
+                    if table == 'plan_positions' and not has_positions:
+                        continue
+                    columns = _columns(db, table)
+                    for row in _stream(db, query, _params_for(table, inventory_id)):
+                        data = dict(zip(columns, row))
+                        if table == 'images':
+                            images.append(data['image_path'])
+                        out.write((json.dumps({'t': table, 'row': data}, ensure_ascii=False) + '\n').encode('utf-8'))
+                        report['filas'] += 1
+
+            # Varias filas pueden compartir imagen: cada fichero entra una sola vez en el archivo
+            written = set()
+            for relative_path in images:
+                full_path = os.path.join(data_dir, relative_path)
+                name = os.path.basename(relative_path)
+                if name not in written and os.path.exists(full_path):
+                    written.add(name)
+                    compression = zipfile.ZIP_STORED if os.path.splitext(name)[1].lower() in _STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                    zf.write(full_path, f"images/{name}", compress_type=compression)
+                    report['imagenes'] += 1
+
+            plan_name = None
+            if plan_path and os.path.exists(plan_path):
+                plan_name = os.path.basename(plan_path)
+                zf.write(plan_path, f"plano/{plan_name}", compress_type=zipfile.ZIP_STORED)
+                report['plano'] = 1
+
+            # `plano` lleva el nombre del fichero, no el contador de `report`
+            manifest = {**report, 'format': ARCHIVE_FORMAT, 'cliente': cliente, 'plano': plan_name,
+                        'created': datetime.now(timezone.utc).isoformat()}
+            zf.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return report
+
+
+def read_manifest(path):
+    with zipfile.ZipFile(path) as zf:
+        manifest = json.loads(zf.read('manifest.json'))
+    if manifest.get('format') != ARCHIVE_FORMAT:
+        raise ValueError("Formato de archivo de centro no soportado.")
+    return manifest
+
+
+def _free_name(db, cliente):
+    # `cliente` es único: un centro que ya existe se importa como copia
+    name, number = cliente, 1
+    while db.fetch_one("SELECT 1 FROM inventarios WHERE cliente = ?", (name,)):
+        number += 1
+        name = f"{cliente} (importado {number})" if number > 2 else f"{cliente} (importado)"
+    return name
+
+
+def _extract(zf, member, destination):
+    with zf.open(member) as src, open(destination, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+
+
+def _unique_path(directory, name):
+    base, extension = os.path.splitext(name)
+    candidate, number = name, 1
+    while os.path.exists(os.path.join(directory, candidate)):
+        number += 1
+        candidate = f"{base}_{number}{extension}"
+    return candidate
+
+
+def _safe_target(directory, name):
+    """Destino dentro de `directory` para un nombre que viene del archivo, o None si
+    no es un nombre de fichero simple (el manifiesto no es de fiar)."""
+    name = os.path.basename(name or '')
+    if not name or name in ('.', '..') or '/' in name or '\\' in name:
+        return None
+    root = os.path.realpath(directory)
+    target = os.path.join(root, _unique_path(root, name))
+    if os.path.commonpath([root, os.path.realpath(target)]) != root:
+        return None
+    return target
+
+
+def import_centro(db, data_dir, path, plans_dir=None):
+    """Crea un centro nuevo a partir de un archivo de `export_centro`.
+
+    Los ids se reasignan (el archivo puede venir de otra base de datos) y todo se
+    inserta en una única transacción; si falla, se borran también los ficheros ya
+    extraídos. Devuelve (id del centro nuevo, contadores)."""
+    manifest = read_manifest(path)
+    images_dir = os.path.join(data_dir, 'data', 'images')
+    plans_dir = plans_dir or os.path.join(data_dir, 'data', 'planos')
+    os.makedirs(images_dir, exist_ok=True)
+    report = {'filas': 0, 'imagenes': 0, 'plano': 0, 'cliente': None}
+    id_map = {}
+    extracted = []
+    # Nombre en el archivo -> ruta local, para que las filas que comparten imagen apunten al mismo fichero
+    image_paths = {}
+    columns_cache = {}
+
+    def columns(table):
+        if table not in columns_cache:
+            columns_cache[table] = _columns(db, table)
+        return columns_cache[table]
+
+    def insert(table, data):
+        names = [c for c in columns(table) if c in data and c != 'id']
+        cursor = db.execute_query(f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                                  tuple(data[c] for c in names))
+        return cursor.lastrowid
+
+    has_positions = db.fetch_one("SELECT 1 FROM sqlite_master WHERE type='table' AND name='plan_positions'") is not None
+
+    try:
+        with zipfile.ZipFile(path) as zf, db.transaction():
+            with zf.open('rows.jsonl') as source:
+                for line in source:
+                    record = json.loads(line)
+                    table, data = record['t'], record['row']
+                    old_id = data.get('id')
+                    if table == 'inventarios':
+                        data['cliente'] = report['cliente'] = _free_name(db, data['cliente'])
+                        data['plano_path'] = None
+                    elif table in EQUIPMENT_TABLES:
+                        data['inventario_id'] = id_map[('inventarios', data['inventario_id'])]
+                    elif table == 'images':
+                        data['item_id'] = id_map.get((data['item_type'], data['item_id']))
+                        name = os.path.basename(data['image_path'])
+                        if data['item_id'] is None or f"images/{name}" not in zf.NameToInfo:
+                            continue
+                        if name not in image_paths:
+                            local_image = _safe_target(images_dir, name)
+                            if local_image is None:
+                                continue
+                            _extract(zf, f"images/{name}", local_image)
+                            extracted.append(local_image)
+                            image_paths[name] = f"data/images/{os.path.basename(local_image)}"
+                            report['imagenes'] += 1
+                        data['image_path'] = image_paths[name]
+                    elif table == 'connections':
+                        data['parent_item_id'] = id_map.get((data['parent_item_type'], data['parent_item_id']))
+                        data['child_item_id'] = id_map.get((data['child_item_type'], data['child_item_id']))
+                        if data['parent_item_id'] is None or data['child_item_id'] is None:
+                            continue
+                    elif table == 'plan_positions':
+                        if not has_positions:
+                            continue
+                        data['item_id'] = id_map.get((data['item_type'], data['item_id']))
+                        data['inventario_id'] = id_map[('inventarios', data['inventario_id'])]
+                        if data['item_id'] is None:
+                            continue
+                        db.execute_query("INSERT OR REPLACE INTO plan_positions (item_type, item_id, inventario_id, x, y) "
+                                         "VALUES (?, ?, ?, ?, ?)",
+                                         (data['item_type'], data['item_id'], data['inventario_id'], data['x'], data['y']))
+                        report['filas'] += 1
+                        continue
+                    else:
+                        continue
+                    id_map[(table, old_id)] = insert(table, data)
+                    report['filas'] += 1
+
+            inventory_id = next(new_id for (table, _), new_id in id_map.items() if table == 'inventarios')
+            plan_name = manifest.get('plano')
+            if plan_name and f"plano/{plan_name}" in zf.NameToInfo:
+                os.makedirs(plans_dir, exist_ok=True)
+                local_plan = _safe_target(plans_dir, plan_name)
+                if local_plan is None:
+                    raise ValueError(f"Nombre de plano no válido en el archivo: {plan_name!r}")
+                _extract(zf, f"plano/{plan_name}", local_plan)
+                extracted.append(local_plan)
+                db.execute_query("UPDATE inventarios SET plano_path = ? WHERE id = ?", (local_plan, inventory_id))
+                report['plano'] = 1
+    except BaseException:
+        for file_path in extracted:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        raise
+    return inventory_id, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copias de seguridad y archivo portable de centros.")
+    parser.add_argument('--db', default='inventario.db', help="base de datos (por defecto inventario.db)")
+    parser.add_argument('--data-dir', help="directorio que contiene data/images (por defecto, el de la base de datos)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    copy_parser = commands.add_parser('copia', help="copia completa en caliente")
+    copy_parser.add_argument('--destino', help="directorio de copias (por defecto backups junto a la base de datos)")
+    export_parser = commands.add_parser('exportar-centro', help="exporta un centro a un archivo portable")
+    export_parser.add_argument('cliente')
+    export_parser.add_argument('fichero')
+    import_parser = commands.add_parser('importar-centro', help="importa un centro desde un archivo portable")
+    import_parser.add_argument('fichero')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No existe la base de datos {args.db}")
+        return 2
+    data_dir = args.data_dir or os.path.dirname(os.path.abspath(args.db))
+
+    if args.command == 'copia':
+        start = time.perf_counter()
+        report = create_snapshot(args.db, data_dir, args.destino or os.path.join(data_dir, 'backups'))
+        print(f"Copia creada en {report['ruta']} ({time.perf_counter() - start:.1f} s): "
+              f"{report['imagenes_copiadas']} imágenes copiadas, {report['imagenes_enlazadas']} sin cambios, {report['planos']} planos")
+        return 0
+
+    db = DatabaseManager(args.db)
+    try:
+        if args.command == 'exportar-centro':
+            row = db.fetch_one("SELECT id FROM inventarios WHERE cliente = ?", (args.cliente,))
+            if row is None:
+                print(f"No existe el centro {args.cliente}")
+                return 2
+            db.use_centro(row[0])
+            report = export_centro(db, data_dir, row[0], args.fichero)
+            print(f"Exportadas {report['filas']} filas y {report['imagenes']} imágenes en {args.fichero}")
+        else:
+            inventory_id, report = import_centro(db, data_dir, args.fichero)
+            # Con la base de datos dividida, el centro importado pasa del catálogo a su fichero
+            db.use_centro(inventory_id)
+            print(f"Importado el centro '{report['cliente']}' (id {inventory_id}): {report['filas']} filas, {report['imagenes']} imágenes")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+# benchmark.py
+"""Benchmarks de las rutas críticas sobre bases de datos sintéticas, sin pantalla.
+
+Uso:
+    python benchmark.py                         # escalas por defecto, compara con la línea base si existe
+    python benchmark.py --scales small,large --repeat 5
+    python benchmark.py --save-baseline         # guarda los resultados como nueva línea base
+    python benchmark.py --scales large --only generate_pdf --pdf-workers 2,4   # aceleración del PDF en paralelo
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BASE_DIR, 'bench_baseline.json')
+
+# Escalas: (centros, equipos por centro)
+SCALES = {
+    'small': (5, 100),
+    'medium': (20, 500),
+    'large': (50, 2000),
+}
+
+# Una ejecución se considera regresión si es más lenta que la línea base en este factor
+REGRESSION_FACTOR = 1.25
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def measure(func, repeat):
+    """Ejecuta `func` `repeat` veces y devuelve los tiempos en ms."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+class BenchmarkEnvironment:
+    """Base de datos sintética en un directorio temporal con la aplicación apuntando a ella."""
+
+    def __init__(self, centros, equipos, seed=1234, image_files=False):
+        self.tmp = tempfile.TemporaryDirectory(prefix='inventario_bench_')
+        self.previous_cwd = os.getcwd()
+        os.environ['INVENTARIO_DATA_DIR'] = self.tmp.name
+        os.chdir(self.tmp.name)
+
+        from synthetic_data import generate
+        self.inventory_ids = generate(os.path.join(self.tmp.name, 'inventario.db'), centros, equipos, seed,
+                                      data_dir=self.tmp.name, image_files=image_files)
+
+    def path(self, *parts):
+        return os.path.join(self.tmp.name, *parts)
+
+    def close(self):
+        os.chdir(self.previous_cwd)
+        os.environ.pop('INVENTARIO_DATA_DIR', None)
+        self.tmp.cleanup()
+
+
+def backend_benchmarks(env, window, pdf_workers=()):
+    """Rutas críticas a medir: nombre -> función sin argumentos."""
+    from main import SearchDialog
+    from pdf_generator import generate_pdf
+    from excel_generator import generate_excel
+
+    search = SearchDialog(window.db, window.current_inventory_id, window)
+    export_data = window._get_full_data_for_export()
+
+    def until_delivered(func, shown=None):
+        # Las lecturas de la interfaz van al hilo de base de datos: se mide hasta que llega el resultado.
+        # Tablas y dashboard solo se pintan con su pestaña a la vista: `shown` es el widget a mostrar antes
+        def run():
+            if shown is not None:
+                tabs = window.tabs_main
+                tabs.setCurrentIndex(next(i for i in range(tabs.count()) if tabs.widget(i).isAncestorOf(shown)))
+            func()
+            window.db_worker.wait_idle()
+        return run
+    return {
+        'refresh_table_pcs': until_delivered(lambda: window.refresh_table('pcs'), window.table_pcs),
+        'refresh_all_tables': until_delivered(window.refresh_all_tables, window.table_pcs),
+        'search_load_all_items': until_delivered(search.load_all_items),
+        'update_dashboard': until_delivered(window.update_dashboard, window.label_kpi_pcs_value),
+        'export_data_fetch': window._get_full_data_for_export,
+        'generate_pdf': lambda: generate_pdf(env.path('bench.pdf'), export_data, workers=1),
+        **{f'generate_pdf_x{n}': (lambda n=n: generate_pdf(env.path(f'bench_x{n}.pdf'), export_data, workers=n))
+           for n in pdf_workers},
+        'generate_excel': lambda: generate_excel(env.path('bench.xlsx'), export_data),
+        # Centro sin cambios: la caché de informes copia el PDF ya generado (el calentamiento lo guarda)
+        'export_pdf_unchanged': lambda: window._export_report('pdf', env.path('bench_cached.pdf'), generate_pdf),
+    }
+
+
+def run_scale(scale, repeat, only=None, pdf_workers=()):
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    centros, equipos = SCALES[scale]
+    env = BenchmarkEnvironment(centros, equipos)
+    results = {}
+    try:
+        from main import MainWindow
+        window = MainWindow(env.inventory_ids[0])
+        for name, func in backend_benchmarks(env, window, pdf_workers).items():
+            if only and name not in only and not (name.startswith('generate_pdf_x') and 'generate_pdf' in only):
+                continue
+            func()  # calentamiento (cachés de SQLite, fuentes de ReportLab...)
+            times = measure(func, repeat)
+            results[name] = {'median_ms': statistics.median(times), 'min_ms': min(times)}
+            app.processEvents()
+        window.close()
+        window.db.close()
+    finally:
+        env.close()
+    return results
+
+
+def load_baseline(path):
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return None
+
+
+def report(results, baseline, factor=REGRESSION_FACTOR, label='benchmark', columns=(('mediana ms', 'median_ms'), ('mín. ms', 'min_ms'))):
+    """Imprime la tabla de resultados y devuelve el número de regresiones respecto a la línea base.
+
+    `columns`: (cabecera, clave del resultado) de las columnas medidas; la regresión se calcula siempre sobre la mediana."""
+    regressions = 0
+    base_results = (baseline or {}).get('results', {})
+    print(f"{'escala':<8} {label:<24} " + " ".join(f"{title:>11}" for title, _ in columns) + f" {'base ms':>9} {'ratio':>7}")
+    for scale, benches in results.items():
+        for name, r in benches.items():
+            base = base_results.get(scale, {}).get(name)
+            ratio = r['median_ms'] / base['median_ms'] if base and base['median_ms'] else None
+            flag = ''
+            if ratio is not None and ratio > factor:
+                flag = '  << REGRESIÓN'
+                regressions += 1
+            print(f"{scale:<8} {name:<24} " + " ".join(f"{r[key]:>11.1f}" for _, key in columns) +
+                  f" {(base['median_ms'] if base else float('nan')):>9.1f} {(ratio or float('nan')):>7.2f}{flag}")
+    speedups = [(scale, name, benches['generate_pdf']['median_ms'] / r['median_ms'])
+                for scale, benches in results.items() if 'generate_pdf' in benches
+                for name, r in benches.items() if name.startswith('generate_pdf_x')]
+    if speedups:
+        print(f"\nPDF en paralelo ({os.cpu_count()} núcleos), aceleración sobre generate_pdf en serie:")
+        for scale, name, speedup in speedups:
+            print(f"  {scale:<8} {name[len('generate_pdf_'):]:<4} {speedup:>5.2f}x")
+    if baseline:
+        print(f"\nLínea base: commit {baseline.get('commit')} en {baseline.get('machine')} ({baseline.get('date')})")
+    return regressions
+
+
+def argument_parser(description, default_baseline=DEFAULT_BASELINE):
+    """Opciones comunes de los benchmarks (escalas, repeticiones, línea base); cada script añade las suyas."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--scales', default='small,medium', help=f"escalas separadas por comas ({', '.join(SCALES)})")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', help="benchmarks concretos separados por comas")
+    parser.add_argument('--baseline', default=default_baseline, help="fichero JSON de línea base")
+    parser.add_argument('--save-baseline', action='store_true', help="guardar los resultados como línea base")
+    parser.add_argument('--output', help="guardar también los resultados en este fichero JSON")
+    parser.add_argument('--factor', type=float, default=REGRESSION_FACTOR, help="factor de regresión tolerado")
+    return parser
+
+
+def publish(args, results, **report_options):
+    """Compara con la línea base, imprime la tabla y guarda los resultados según las opciones.
+
+    Devuelve el código de salida: 1 si hay regresiones."""
+    document = {'commit': git_commit(), 'machine': platform.node(), 'python': platform.python_version(),
+                'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'repeat': args.repeat, 'results': results}
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    regressions = report(results, baseline, args.factor, **report_options)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+        print(f"\nLínea base guardada en {args.baseline}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argument_parser("Benchmarks de inventario sobre datos sintéticos.")
+    parser.add_argument('--pdf-workers', default='', help="procesos para medir el PDF en paralelo, separados por comas (p. ej. 2,4)")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, BASE_DIR)
+    only = set(args.only.split(',')) if args.only else None
+    pdf_workers = [int(n) for n in args.pdf_workers.split(',') if n]
+    results = {scale: run_scale(scale, args.repeat, only, pdf_workers) for scale in args.scales.split(',')}
+    return publish(args, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# bulk_operations.py
+import json
+import os
+import threading
+
+# Lista de ids pasada como un único parámetro JSON (sin límite de variables de SQLite)
+_IN_IDS = "(SELECT value FROM json_each(?))"
+
+# Columnas que nunca se editan ni se copian tal cual
+_PROTECTED_COLUMNS = ('id', 'inventario_id')
+
+
+def _ids_json(ids):
+    return json.dumps([int(i) for i in ids])
+
+
+def _columns(db, table):
+    return [c[1] for c in db.fetch_all(f"PRAGMA table_info({table})")]
+
+
+def delete_items(db, table, ids):
+    """Elimina los elementos con sus imágenes y conexiones en una sola transacción.
+
+    Devuelve las rutas relativas de las imágenes borradas de la base de datos,
+    para eliminar los ficheros después (ver `remove_files_in_background`)."""
+    ids_json = _ids_json(ids)
+    with db.transaction():
+        images = db.fetch_all(f"SELECT image_path FROM images WHERE item_type=? AND item_id IN {_IN_IDS}", (table, ids_json))
+        db.execute_query(f"DELETE FROM images WHERE item_type=? AND item_id IN {_IN_IDS}", (table, ids_json))
+        db.execute_query(f"DELETE FROM connections WHERE (parent_item_type=? AND parent_item_id IN {_IN_IDS}) "
+                         f"OR (child_item_type=? AND child_item_id IN {_IN_IDS})", (table, ids_json, table, ids_json))
+        db.execute_query(f"DELETE FROM {table} WHERE id IN {_IN_IDS}", (ids_json,))
+    return [path for (path,) in images]
+
+
+def update_field(db, table, ids, column, value):
+    """Asigna `value` a `column` en todos los elementos indicados. Devuelve el número de filas cambiadas."""
+    if column not in _columns(db, table) or column in _PROTECTED_COLUMNS:
+        raise ValueError(f"Columna no editable: {column}")
+    with db.transaction():
+        cursor = db.execute_query(f"UPDATE {table} SET {column}=? WHERE id IN {_IN_IDS}", (value, _ids_json(ids)))
+    return cursor.rowcount
+
+
+def duplicate_items(db, table, ids, suffix=" (copia)"):
+    """Crea una copia de cada elemento (sin imágenes ni conexiones). Al código se le añade `suffix`.
+    Devuelve el número de copias creadas."""
+    columns = [c for c in _columns(db, table) if c != 'id']
+    select = [f"{c} || ?" if c == 'codigo' else c for c in columns]
+    params = (suffix, _ids_json(ids)) if 'codigo' in columns else (_ids_json(ids),)
+    with db.transaction():
+        cursor = db.execute_query(
+            f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(select)} FROM {table} WHERE id IN {_IN_IDS} ORDER BY id",
+            params)
+    return cursor.rowcount
+
+
+def distinct_values(db, table, column):
+    """Valores ya usados en una columna (para sugerirlos en la edición en bloque)."""
+    rows = db.fetch_all(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL AND {column} != '' ORDER BY {column}")
+    return [str(row[0]) for row in rows]
+
+
+def remove_files_in_background(paths):
+    """Borra los ficheros en un hilo aparte para no bloquear la interfaz con discos lentos o unidades de red."""
+    def remove():
+        for path in paths:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except Exception as e:
+                print(f"No se pudo borrar el archivo de imagen {path}: {e}")
+
+    if paths:
+        thread = threading.Thread(target=remove, name='BorradoImagenes', daemon=True)
+        thread.start()
+        return thread
+    return None
@@ -0,0 +1,105 @@
+# centro_sessions.py
+import json
+from collections import OrderedDict
+
+from change_log import TRACKED_TABLES
+
+# Centros cuyo estado se mantiene cargado en la ventana principal
+MAX_SESSIONS = 4
+# Centros recordados como recientes en el selector de centro
+MAX_RECENT = 10
+_RECENT_KEY = 'centros_recientes'
+
+
+def table_version(db, inventory_id, table):
+    """Último cambio registrado (change_log.seq) de una tabla del centro; 0 si no hay ninguno."""
+    row = db.fetch_one("SELECT MAX(seq) FROM change_log WHERE inventario_id=? AND item_type=?", (inventory_id, table))
+    return (row[0] if row else None) or 0
+
+
+def data_versions(db, inventory_id):
+    """Versión de cada tabla del centro. Si no ha cambiado, los datos cargados con ella siguen siendo válidos."""
+    return {table: table_version(db, inventory_id, table) for table in TRACKED_TABLES}
+
+
+class CentroSession:
+    """Estado ya cargado de un centro en la ventana principal: filas de cada tabla,
+    datos del dashboard y posición de la vista. Cada dato guarda la versión con la
+    que se leyó (ver `data_versions`) y solo se reutiliza si sigue siendo la actual."""
+
+    def __init__(self, inventory_id):
+        self.inventory_id = inventory_id
+        self.tables = {}        # tabla -> (versión, filas)
+        self.dashboard = None   # (versiones, resultado)
+        self.locations = {}     # ubicación -> (versiones, filas)
+        self.scroll = {}        # tabla -> posición de la barra vertical
+        self.tab_index = None   # None: se mantiene la pestaña actual
+        # Gráficos del dashboard de este centro y resultado que muestran (no se redibujan al volver)
+        self.charts = None
+        self.charts_data = None
+
+    def set_table(self, table, version, rows):
+        self.tables[table] = (version, rows)
+
+    def table_rows(self, table, versions):
+        entry = self.tables.get(table)
+        return entry[1] if entry is not None and entry[0] == versions.get(table) else None
+
+    def set_dashboard(self, versions, result):
+        self.dashboard = (versions, result)
+        # Las listas por ubicación se calcularon con datos anteriores
+        self.locations = {location: entry for location, entry in self.locations.items() if entry[0] == versions}
+
+    def dashboard_result(self, versions):
+        return self.dashboard[1] if self.dashboard is not None and self.dashboard[0] == versions else None
+
+    def set_location_rows(self, location, versions, rows):
+        self.locations[location] = (versions, rows)
+
+    def location_rows(self, location, versions):
+        entry = self.locations.get(location)
+        return entry[1] if entry is not None and entry[0] == versions else None
+
+
+class SessionCache:
+    """Las últimas `max_sessions` sesiones de centro usadas (LRU). `on_evict(sesión)`
+    permite liberar los widgets propios de una sesión descartada."""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, on_evict=None):
+        self.max_sessions = max_sessions
+        self.on_evict = on_evict
+        self._sessions = OrderedDict()
+
+    def get(self, inventory_id):
+        session = self._sessions.get(inventory_id)
+        if session is not None:
+            self._sessions.move_to_end(inventory_id)
+        return session
+
+    def peek(self, inventory_id):
+        """Como `get` pero sin marcarla como usada (resultados en segundo plano de otro centro)."""
+        return self._sessions.get(inventory_id)
+
+    def session(self, inventory_id):
+        """Sesión del centro, creándola (y descartando la más antigua) si no existe."""
+        session = self.get(inventory_id)
+        if session is None:
+            session = self._sessions[inventory_id] = CentroSession(inventory_id)
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                if self.on_evict:
+                    self.on_evict(evicted)
+        return session
+
+
+def recent_centros(db):
+    """Ids de los centros abiertos recientemente, el más reciente primero."""
+    try:
+        return [int(i) for i in json.loads(db.get_meta(_RECENT_KEY) or '[]')]
+    except (ValueError, TypeError):
+        return []
+
+
+def remember_centro(db, inventory_id):
+    recent = [inventory_id] + [i for i in recent_centros(db) if i != inventory_id]
+    db.set_meta(_RECENT_KEY, json.dumps(recent[:MAX_RECENT]))
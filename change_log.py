@@ -0,0 +1,223 @@
+# change_log.py
+import hashlib
+import json
+import zlib
+
+from database import EQUIPMENT_TABLES
+
+# Tablas con histórico: la información general del centro y todos los equipos
+TRACKED_TABLES = ['inventarios'] + list(EQUIPMENT_TABLES)
+
+# Cada cuántos cambios de un centro se toma automáticamente una instantánea compacta
+SNAPSHOT_INTERVAL = 500
+
+_TS = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+
+class ChangeLog:
+    """Registro de cambios fila a fila (solo se añade) alimentado por triggers.
+
+    Operaciones registradas en `change_log.op`: 'B' (línea base al instalar),
+    'I' (alta), 'U' (modificación) y 'D' (baja). `row_data` guarda la fila
+    completa en JSON tras el cambio, de modo que el estado de un centro en
+    cualquier fecha se reconstruye con la última instantánea previa más los
+    cambios posteriores."""
+
+    def __init__(self, db):
+        self.db = db
+        self.ensure_schema()
+
+    def _columns(self, table):
+        return [c[1] for c in self.db.cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+
+    def _json_row(self, table, ref):
+        return "json_object(" + ", ".join(f"'{col}', {ref}.{col}" for col in self._columns(table)) + ")"
+
+    def _inventory_ref(self, table, ref):
+        return f"{ref}.id" if table == 'inventarios' else f"{ref}.inventario_id"
+
+    def _signature(self):
+        schema = {table: self._columns(table) for table in TRACKED_TABLES}
+        return hashlib.sha1(json.dumps(schema).encode('utf-8')).hexdigest()
+
+    def ensure_schema(self):
+        cursor = self.db.cursor
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts TEXT NOT NULL DEFAULT ({_TS}),
+                inventario_id INTEGER,
+                item_type TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                op TEXT NOT NULL,
+                row_data TEXT
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_inv ON change_log (inventario_id, seq)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_item ON change_log (item_type, item_id, seq)")
+        # Último cambio de cada tabla de un centro (validez de los datos ya cargados, ver centro_sessions.py)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_inv_type ON change_log (inventario_id, item_type, seq)")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS audit_snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                inventario_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                ts TEXT NOT NULL,
+                etiqueta TEXT,
+                datos BLOB NOT NULL
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_snapshots_inv ON audit_snapshots (inventario_id, seq)")
+
+        if self.db.get_meta('change_log_signature') != self._signature():
+            self._install()
+
+    def _install(self):
+        cursor = self.db.cursor
+        try:
+            for (name,) in cursor.execute("SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE 'trg_log_%'").fetchall():
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+            for table in TRACKED_TABLES:
+                insert = "INSERT INTO change_log (inventario_id, item_type, item_id, op, row_data) VALUES"
+                changed = " OR ".join(f"OLD.{col} IS NOT NEW.{col}" for col in self._columns(table))
+                cursor.execute(f'''
+                    CREATE TRIGGER trg_log_{table}_ins AFTER INSERT ON {table} BEGIN
+                        {insert} ({self._inventory_ref(table, 'NEW')}, '{table}', NEW.id, 'I', {self._json_row(table, 'NEW')});
+                    END''')
+                cursor.execute(f'''
+                    CREATE TRIGGER trg_log_{table}_upd AFTER UPDATE ON {table} WHEN {changed} BEGIN
+                        INSERT INTO change_log (inventario_id, item_type, item_id, op, row_data)
+                            SELECT {self._inventory_ref(table, 'OLD')}, '{table}', OLD.id, 'D', NULL
+                            WHERE {self._inventory_ref(table, 'OLD')} IS NOT {self._inventory_ref(table, 'NEW')};
+                        {insert} ({self._inventory_ref(table, 'NEW')}, '{table}', NEW.id, 'U', {self._json_row(table, 'NEW')});
+                    END''')
+                cursor.execute(f'''
+                    CREATE TRIGGER trg_log_{table}_del AFTER DELETE ON {table} BEGIN
+                        {insert} ({self._inventory_ref(table, 'OLD')}, '{table}', OLD.id, 'D', NULL);
+                    END''')
+
+            # Primera instalación: línea base con las filas existentes para que todo
+            # elemento tenga un estado conocido en el registro
+            if self.db.get_meta('change_log_signature') is None:
+                for table in TRACKED_TABLES:
+                    cursor.execute(f'''
+                        INSERT INTO change_log (inventario_id, item_type, item_id, op, row_data)
+                        SELECT {self._inventory_ref(table, 't')}, '{table}', t.id, 'B', {self._json_row(table, 't')} FROM {table} t
+                    ''')
+
+            cursor.execute("INSERT INTO app_meta (key, value) VALUES ('change_log_signature', ?) "
+                           "ON CONFLICT(key) DO UPDATE SET value=excluded.value", (self._signature(),))
+            self.db.conn.commit()
+        except Exception:
+            self.db.conn.rollback()
+            raise
+
+    # --- Instantáneas ---
+    def take_snapshot(self, inventory_id, etiqueta=None):
+        """Guarda el estado actual del centro comprimido y devuelve el id de la instantánea."""
+        seq = self.db.fetch_one("SELECT COALESCE(MAX(seq), 0) FROM change_log")[0]
+        state = {}
+        for table in TRACKED_TABLES:
+            columns = self._columns(table)
+            where = "id=?" if table == 'inventarios' else "inventario_id=?"
+            rows = self.db.fetch_all(f"SELECT * FROM {table} WHERE {where}", (inventory_id,))
+            if rows:
+                state[table] = {str(row[0]): dict(zip(columns, row)) for row in rows}
+        datos = zlib.compress(json.dumps(state, ensure_ascii=False).encode('utf-8'))
+        cursor = self.db.execute_query(
+            f"INSERT INTO audit_snapshots (inventario_id, seq, ts, etiqueta, datos) VALUES (?, ?, {_TS}, ?, ?)",
+            (inventory_id, seq, etiqueta, datos))
+        return cursor.lastrowid if cursor else None
+
+    def maybe_snapshot(self, inventory_id):
+        """Toma una instantánea automática si el centro acumula SNAPSHOT_INTERVAL cambios desde la última."""
+        last = self.db.fetch_one("SELECT COALESCE(MAX(seq), 0) FROM audit_snapshots WHERE inventario_id=?", (inventory_id,))[0]
+        pending = self.db.fetch_one(
+            "SELECT COUNT(*) FROM (SELECT 1 FROM change_log WHERE inventario_id=? AND seq>? LIMIT ?)",
+            (inventory_id, last, SNAPSHOT_INTERVAL))[0]
+        if pending >= SNAPSHOT_INTERVAL:
+            return self.take_snapshot(inventory_id)
+        return None
+
+    def list_snapshots(self, inventory_id):
+        """Devuelve [(id, ts, etiqueta, seq)] de las instantáneas del centro, de la más reciente a la más antigua."""
+        return self.db.fetch_all(
+            "SELECT id, ts, etiqueta, seq FROM audit_snapshots WHERE inventario_id=? ORDER BY seq DESC, id DESC",
+            (inventory_id,))
+
+    def current_seq(self):
+        return self.db.fetch_one("SELECT COALESCE(MAX(seq), 0) FROM change_log")[0]
+
+    def snapshot_seq(self, snapshot_id):
+        row = self.db.fetch_one("SELECT seq FROM audit_snapshots WHERE id=?", (snapshot_id,))
+        return row[0] if row else None
+
+    # --- Reconstrucción y comparación ---
+    def state_at(self, inventory_id, ts):
+        """Reconstruye el centro tal como estaba en la fecha `ts` ('YYYY-MM-DD HH:MM:SS').
+
+        Devuelve {tabla: {id: fila_dict}} partiendo de la última instantánea
+        anterior a la fecha y aplicando solo los cambios posteriores a ella."""
+        snapshot = self.db.fetch_one(
+            "SELECT seq, datos FROM audit_snapshots WHERE inventario_id=? AND ts<=? ORDER BY seq DESC LIMIT 1",
+            (inventory_id, ts))
+        if snapshot:
+            base_seq = snapshot[0]
+            raw = json.loads(zlib.decompress(snapshot[1]).decode('utf-8'))
+            state = {table: {int(k): v for k, v in rows.items()} for table, rows in raw.items()}
+        else:
+            base_seq, state = 0, {}
+
+        deltas = self.db.fetch_all(
+            "SELECT item_type, item_id, op, row_data FROM change_log WHERE inventario_id=? AND seq>? AND ts<=? ORDER BY seq",
+            (inventory_id, base_seq, ts))
+        for item_type, item_id, op, row_data in deltas:
+            rows = state.setdefault(item_type, {})
+            if op == 'D':
+                rows.pop(item_id, None)
+            else:
+                rows[item_id] = json.loads(row_data)
+        return state
+
+    def _row_at(self, item_type, item_id, inventory_id, seq):
+        """Fila de un elemento en el punto `seq` del registro (None si no existía en el centro)."""
+        row = self.db.fetch_one(
+            "SELECT op, row_data FROM change_log WHERE item_type=? AND item_id=? AND seq<=? ORDER BY seq DESC LIMIT 1",
+            (item_type, item_id, seq))
+        if not row or row[0] == 'D':
+            return None
+        data = json.loads(row[1])
+        owner = data.get('id') if item_type == 'inventarios' else data.get('inventario_id')
+        return data if owner == inventory_id else None
+
+    def diff(self, inventory_id, seq_a, seq_b):
+        """Compara el centro entre dos puntos del registro (p. ej. dos instantáneas de auditoría).
+
+        Solo se leen los cambios entre ambos puntos, por lo que el coste depende
+        del número de cambios y no del tamaño del inventario. Devuelve un dict con
+        'added' y 'removed' [(tabla, id, fila)] y 'modified' [(tabla, id, antes, después, campos)]."""
+        if seq_a > seq_b:
+            seq_a, seq_b = seq_b, seq_a
+        deltas = self.db.fetch_all(
+            "SELECT item_type, item_id, op, row_data FROM change_log WHERE inventario_id=? AND seq>? AND seq<=? ORDER BY seq",
+            (inventory_id, seq_a, seq_b))
+
+        final = {}
+        for item_type, item_id, op, row_data in deltas:
+            final[(item_type, item_id)] = None if op == 'D' else json.loads(row_data)
+
+        result = {'added': [], 'removed': [], 'modified': []}
+        for (item_type, item_id), after in final.items():
+            if after is not None and after.get('id' if item_type == 'inventarios' else 'inventario_id') != inventory_id:
+                after = None
+            before = self._row_at(item_type, item_id, inventory_id, seq_a)
+            if before is None and after is not None:
+                result['added'].append((item_type, item_id, after))
+            elif before is not None and after is None:
+                result['removed'].append((item_type, item_id, before))
+            elif before is not None and after is not None:
+                fields = [col for col in after if before.get(col) != after.get(col)]
+                if fields:
+                    result['modified'].append((item_type, item_id, before, after, fields))
+        return result
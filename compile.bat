@@ -1 +1,5 @@
-pyinstaller --onefile --windowed --icon="appicon.ico" --add-data "logo.png;." --add-data "ui_login.ui;." --add-data "detail_view_dialog.ui;." --add-data "search_dialog.ui;." --add-data "dashboard_widgets.py;." --add-data "excel_generator.py;." --add-data "pdf_generator.py;." --add-data "database.py;." main.py
\ No newline at end of file
+rem Carpeta dist\main con main.exe (arranque rápido, sin descomprimir nada): compile.bat
+rem Ejecutable único dist\main.exe (más lento al arrancar): compile.bat onefile
+rem Los ficheros incluidos y los módulos excluidos están en main.spec
+if /I "%1"=="onefile" (set INVENTARIO_ONEFILE=1) else (set INVENTARIO_ONEFILE=)
+pyinstaller --noconfirm main.spec
@@ -0,0 +1,202 @@
+# compliance.py
+import hashlib
+import json
+
+from database import merge_totals
+
+# Severidades (de mayor a menor) y su texto
+ALTA, MEDIA, BAJA = 3, 2, 1
+SEVERITY_LABELS = {ALTA: 'Alta', MEDIA: 'Media', BAJA: 'Baja'}
+
+# Versiones de Windows sin soporte del fabricante (según so_version de pcs_attrs)
+EOL_WINDOWS = ['XP', 'Vista', '7', '8', '8.1', '10', 'Server 2003', 'Server 2008', 'Server 2008 R2', 'Server 2012', 'Server 2012 R2']
+
+# PCs por debajo de esta RAM no cumplen el mínimo para un sistema actual
+MIN_RAM_GB = 4
+
+# Alertas mostradas en el dashboard (el resto en Herramientas > Alertas de Cumplimiento)
+DASHBOARD_LIMIT = 200
+
+
+def _linked(table, other):
+    # Existe una conexión (en cualquier sentido) entre la fila r de `table` y algún elemento de `other`
+    return (f"EXISTS (SELECT 1 FROM connections c WHERE "
+            f"(c.parent_item_type = '{table}' AND c.parent_item_id = r.id AND c.child_item_type = '{other}') OR "
+            f"(c.child_item_type = '{table}' AND c.child_item_id = r.id AND c.parent_item_type = '{other}'))")
+
+
+_EOL_LIST = ", ".join(f"'{version}'" for version in EOL_WINDOWS)
+
+# Reglas: cada una se compila a un INSERT ... SELECT sobre su tabla (alias r).
+# `condicion` selecciona las filas que incumplen; `detalle` es la expresión SQL mostrada;
+# `depende_de` son otras tablas cuyos cambios pueden alterar el resultado de la regla.
+RULES = [
+    {'codigo': 'so_sin_soporte', 'tabla': 'pcs', 'severidad': ALTA,
+     'titulo': 'Sistema operativo sin soporte',
+     'condicion': f"EXISTS (SELECT 1 FROM pcs_attrs a WHERE a.pc_id = r.id AND a.so_familia = 'Windows' AND a.so_version IN ({_EOL_LIST}))",
+     'detalle': "r.so", 'depende_de': []},
+    {'codigo': 'sin_antivirus', 'tabla': 'pcs', 'severidad': MEDIA,
+     'titulo': 'PC sin antivirus',
+     'condicion': "TRIM(COALESCE(r.antivirus, '')) = ''",
+     'detalle': "COALESCE(NULLIF(r.ubicacion_equipo, ''), 'Sin ubicación')", 'depende_de': []},
+    {'codigo': 'ram_insuficiente', 'tabla': 'pcs', 'severidad': BAJA,
+     'titulo': f'PC con menos de {MIN_RAM_GB} GB de RAM',
+     'condicion': f"EXISTS (SELECT 1 FROM pcs_attrs a WHERE a.pc_id = r.id AND a.ram_gb < {MIN_RAM_GB})",
+     'detalle': "r.ram", 'depende_de': []},
+    {'codigo': 'camara_sin_grabador', 'tabla': 'cctv_cameras', 'severidad': MEDIA,
+     'titulo': 'Cámara sin grabador conectado',
+     'condicion': f"NOT {_linked('cctv_cameras', 'cctv_recorders')}",
+     'detalle': "TRIM(COALESCE(r.marca, '') || ' ' || COALESCE(r.modelo, '') || ' - ' || COALESCE(r.ubicacion, ''))",
+     'depende_de': ['cctv_recorders']},
+    {'codigo': 'credencial_sin_clave', 'tabla': 'credenciales', 'severidad': ALTA,
+     'titulo': 'Credencial con contraseña vacía',
+     'condicion': "TRIM(COALESCE(r.clave, '')) = ''",
+     'detalle': "COALESCE(r.elemento, '') || ' / ' || COALESCE(r.usuario, '')", 'depende_de': []},
+]
+
+RULE_TITLES = {rule['codigo']: rule['titulo'] for rule in RULES}
+
+# Columna con la que se identifica cada tipo de elemento en los listados de alertas
+_ITEM_LABELS = {'cctv_cameras': "COALESCE(r.marca, '') || ' ' || COALESCE(r.modelo, '')",
+                'credenciales': "r.elemento"}
+
+
+def _label(table):
+    return _ITEM_LABELS.get(table, "r.codigo")
+
+
+class ComplianceEngine:
+    """Reglas de cumplimiento evaluadas como SQL sobre conjuntos.
+
+    Los resultados se guardan en `compliance_findings` (una fila por elemento y
+    regla incumplida). `evaluate_all` recalcula todo en una pasada (una sentencia
+    por regla); `evaluate_items` solo las filas tocadas al guardar o eliminar,
+    más las reglas de otras tablas que dependen de ellas en ese centro."""
+
+    def __init__(self, db, hardware=None):
+        self.db = db
+        # Las reglas de PCs leen pcs_attrs: se actualiza antes de evaluar
+        self.hardware = hardware
+        self.ensure_schema()
+
+    def _signature(self):
+        return hashlib.sha1(json.dumps(RULES, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def ensure_schema(self):
+        cursor = self.db.cursor
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS compliance_findings (
+                regla TEXT NOT NULL,
+                item_type TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                inventario_id INTEGER,
+                severidad INTEGER NOT NULL,
+                etiqueta TEXT,
+                detalle TEXT,
+                PRIMARY KEY (item_type, item_id, regla)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_findings_inv ON compliance_findings (inventario_id, severidad)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_findings_regla ON compliance_findings (regla, inventario_id)")
+        # Las reglas de conexiones buscan por cada extremo
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_connections_parent ON connections (parent_item_type, parent_item_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_connections_child ON connections (child_item_type, child_item_id)")
+        self.db.conn.commit()
+
+        if self.db.get_meta('compliance_signature') != self._signature():
+            self.evaluate_all()
+
+    def _insert(self, rule, where="", params=()):
+        self.db.execute_query(f'''
+            INSERT INTO compliance_findings (regla, item_type, item_id, inventario_id, severidad, etiqueta, detalle)
+            SELECT '{rule['codigo']}', '{rule['tabla']}', r.id, r.inventario_id, {rule['severidad']},
+                   {_label(rule['tabla'])}, {rule['detalle']}
+            FROM {rule['tabla']} r WHERE ({rule['condicion']}) {where}
+        ''', params)
+
+    def evaluate_all(self):
+        """Recalcula todas las alertas de todos los centros."""
+        if self.hardware is not None:
+            self.hardware.refresh()
+        with self.db.transaction():
+            self.db.execute_query("DELETE FROM compliance_findings")
+            for rule in RULES:
+                self._insert(rule)
+            self.db.execute_query("INSERT INTO app_meta (key, value) VALUES ('compliance_signature', ?) "
+                                  "ON CONFLICT(key) DO UPDATE SET value=excluded.value", (self._signature(),))
+
+    def evaluate_items(self, table, ids, inventory_id=None):
+        """Reevalúa los elementos indicados de `table` (recién guardados o eliminados) y,
+        en su centro, las reglas de otras tablas que dependen de `table`."""
+        ids_json = json.dumps([int(i) for i in ids])
+        own = [rule for rule in RULES if rule['tabla'] == table]
+        dependent = [rule for rule in RULES if table in rule['depende_de']]
+        if not own and not dependent:
+            return
+        if inventory_id is None:
+            rows = self.db.fetch_all(f"SELECT DISTINCT inventario_id FROM {table} WHERE id IN (SELECT value FROM json_each(?))", (ids_json,))
+            inventories = [inv for (inv,) in rows]
+        else:
+            inventories = [inventory_id]
+        if self.hardware is not None and table == 'pcs':
+            for inv in inventories:
+                self.hardware.refresh(inv)
+
+        with self.db.transaction():
+            self.db.execute_query("DELETE FROM compliance_findings WHERE item_type = ? AND item_id IN (SELECT value FROM json_each(?))",
+                                  (table, ids_json))
+            for rule in own:
+                self._insert(rule, "AND r.id IN (SELECT value FROM json_each(?))", (ids_json,))
+            self._evaluate_dependents(table, inventories)
+
+    def evaluate_table(self, table, inventory_id):
+        """Reevalúa todos los elementos de `table` en un centro (operaciones en bloque)."""
+        if self.hardware is not None and table == 'pcs':
+            self.hardware.refresh(inventory_id)
+        with self.db.transaction():
+            self.db.execute_query("DELETE FROM compliance_findings WHERE item_type = ? AND inventario_id = ?", (table, inventory_id))
+            for rule in RULES:
+                if rule['tabla'] == table:
+                    self._insert(rule, "AND r.inventario_id = ?", (inventory_id,))
+            self._evaluate_dependents(table, [inventory_id])
+
+    def _evaluate_dependents(self, table, inventories):
+        inventories_json = json.dumps(inventories)
+        for rule in RULES:
+            if table in rule['depende_de']:
+                self.db.execute_query("DELETE FROM compliance_findings WHERE regla = ? AND inventario_id IN (SELECT value FROM json_each(?))",
+                                      (rule['codigo'], inventories_json))
+                self._insert(rule, "AND r.inventario_id IN (SELECT value FROM json_each(?))", (inventories_json,))
+
+
+# --- Consultas (reciben la conexión para poder ejecutarse en el hilo de base de datos) ---
+def findings(db, inventory_id=None, limit=None):
+    """[(severidad, regla, item_type, item_id, etiqueta, detalle, cliente)] de mayor a menor severidad."""
+    where, params = ("WHERE f.inventario_id = ?", (inventory_id,)) if inventory_id is not None else ("", ())
+    query = f'''
+        SELECT f.severidad, f.regla, f.item_type, f.item_id, f.etiqueta, f.detalle, i.cliente
+        FROM {{db}}compliance_findings f LEFT JOIN {{db}}inventarios i ON i.id = f.inventario_id
+        {where} ORDER BY f.severidad DESC, f.regla, i.cliente, f.etiqueta
+    '''
+    if limit is not None:
+        query += f" LIMIT {int(limit)}"
+    rows = db.fleet_query(query, params, inventory_id)
+    if inventory_id is None and db.sharded:
+        # Cada centro llega ya ordenado; falta el orden del conjunto (con los NULL primero, como SQLite)
+        rows.sort(key=lambda f: (-f[0], f[1], f[6] is not None, f[6] or '', f[4] is not None, f[4] or ''))
+        rows = rows[:limit]
+    return rows
+
+
+def counts(db, inventory_id=None):
+    """{severidad: número de alertas} de un centro o de toda la flota."""
+    where, params = ("WHERE inventario_id = ?", (inventory_id,)) if inventory_id is not None else ("", ())
+    return dict(merge_totals(db.fleet_query(f"SELECT severidad, COUNT(*) FROM {{db}}compliance_findings {where} GROUP BY severidad",
+                                            params, inventory_id)))
+
+
+def describe(finding):
+    """Texto de una alerta para listas e informes."""
+    severidad, regla, _, _, etiqueta, detalle, _ = finding
+    text = f"[{SEVERITY_LABELS[severidad]}] {RULE_TITLES.get(regla, regla)}: {etiqueta or ''}".rstrip(': ')
+    return f"{text} ({detalle})" if detalle else text
@@ -31,10 +31,10 @@ class BarChartWidget(QWidget):
         layout.addWidget(self.canvas)
         self.setLayout(layout)
 
-    def update_chart(self, labels, values):
+    def update_chart(self, labels, values, title='Total de Equipos por Categoría'):
         self.canvas.axes.cla() # Limpiar el gráfico anterior
         bars = self.canvas.axes.bar(labels, values, color=['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b'])
-        self.canvas.axes.set_title('Total de Equipos por Categoría', color='black')
+        self.canvas.axes.set_title(title, color='black')
         self.canvas.axes.tick_params(axis='x', rotation=15, labelsize='small')
         
         # Añadir etiquetas de valor encima de las barras
@@ -52,11 +52,11 @@ class PieChartWidget(QWidget):
         layout.addWidget(self.canvas)
         self.setLayout(layout)
 
-    def update_chart(self, labels, sizes):
+    def update_chart(self, labels, sizes, title='Distribución de Sistemas Operativos', empty_text='Sin datos de S.O.', legend_title="Sistemas"):
         self.canvas.axes.cla() # Limpiar el gráfico anterior
         if not sizes or sum(sizes) == 0:
-            self.canvas.axes.text(0.5, 0.5, 'Sin datos de S.O.', ha='center', va='center', size=12, color='grey')
-            self.canvas.axes.set_title('Distribución de Sistemas Operativos', color='black')
+            self.canvas.axes.text(0.5, 0.5, empty_text, ha='center', va='center', size=12, color='grey')
+            self.canvas.axes.set_title(title, color='black')
         else:
             wedges, texts, autotexts = self.canvas.axes.pie(
                 sizes, 
@@ -72,8 +72,8 @@ class PieChartWidget(QWidget):
             # Mejorar legibilidad de las etiquetas
             plt.setp(autotexts, size=8, weight="bold", color="black")
             
-            self.canvas.axes.set_title('Distribución de Sistemas Operativos', color='black')
-            self.canvas.axes.legend(wedges, labels, title="Sistemas", loc="center left", bbox_to_anchor=(0.9, 0, 0.5, 1), fontsize='small')
+            self.canvas.axes.set_title(title, color='black')
+            self.canvas.axes.legend(wedges, labels, title=legend_title, loc="center left", bbox_to_anchor=(0.9, 0, 0.5, 1), fontsize='small')
         
         self.canvas.axes.axis('equal')  # Asegura que el gráfico de tarta sea un círculo.
         self.canvas.fig.tight_layout()
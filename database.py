@@ -1,11 +1,205 @@
 # database.py
+import json
+import logging
+import os
+import re
 import sqlite3
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+# Tablas de equipos de un inventario y su columna de ubicación (None si no tiene)
+EQUIPMENT_TABLES = {
+    'pcs': 'ubicacion_equipo',
+    'proyectores': 'ubicacion_equipo',
+    'impresoras': 'ubicacion_equipo',
+    'servidores': 'ubicacion_equipo',
+    'red': 'ubicacion_equipo',
+    'cctv_recorders': 'ubicacion',
+    'cctv_cameras': 'ubicacion',
+    'accesos': 'ubicacion',
+    'software': None,
+    'credenciales': None,
+}
+
+# Color de cada tipo de equipo en el plano, el esquema de red y los informes
+PIN_COLORS = {
+    'pcs': '#1f77b4', 'proyectores': '#9467bd', 'impresoras': '#8c564b', 'servidores': '#d62728',
+    'red': '#2ca02c', 'cctv_recorders': '#ff7f0e', 'cctv_cameras': '#e377c2', 'accesos': '#17becf',
+}
+
+# Equipos con etiqueta propia (hojas de etiquetas, esquema de red): tabla -> expresión SQL del texto principal
+LABEL_TABLES = {
+    'pcs': "t.codigo",
+    'proyectores': "t.codigo",
+    'impresoras': "t.codigo",
+    'servidores': "t.codigo",
+    'red': "t.codigo",
+    'cctv_recorders': "TRIM(COALESCE(t.marca, '') || ' ' || COALESCE(t.modelo, ''))",
+    'cctv_cameras': "TRIM(COALESCE(t.marca, '') || ' ' || COALESCE(t.modelo, ''))",
+    'accesos': "TRIM(COALESCE(t.marca, '') || ' ' || COALESCE(t.modelo, ''))",
+}
+
+# Base de datos dividida por centros (opcional, ver shards.py): el fichero principal queda como
+# catálogo de centros y cada centro va en centros/centro_<id>.db
+STORAGE_LAYOUT_KEY = 'storage_layout'
+SHARD_DIR = 'centros'
+# Ficheros adjuntados a la vez en las consultas de toda la flota (SQLite admite 10 por defecto)
+ATTACH_BATCH = 8
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+class QueryStats:
+    """Estadísticas de ejecución SQL: tiempos y filas por forma de consulta, registro
+    de consultas lentas (con su EXPLAIN QUERY PLAN opcional) y contadores por acción de la UI."""
+    def __init__(self, slow_ms=50.0, capture_plans=False, slow_log_size=200):
+        self.slow_ms = slow_ms
+        self.capture_plans = capture_plans
+        self.shapes = {}
+        self.actions = {}
+        self.slow_log = deque(maxlen=slow_log_size)
+        self._active_actions = []
+        self._shape_cache = {}
+
+    def shape_of(self, query):
+        """Normaliza una consulta (espacios, literales y listas IN) para agrupar las que solo difieren en valores."""
+        shape = self._shape_cache.get(query)
+        if shape is None:
+            shape = _IN_LISTS.sub("(?, ...)", _LITERALS.sub("?", " ".join(query.split())))
+            if len(self._shape_cache) < 5000:
+                self._shape_cache[query] = shape
+        return shape
+
+    def record(self, query, params, elapsed_ms, rows, plan_func=None):
+        shape = self.shape_of(query)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            entry = self.shapes[shape] = {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0}
+        entry['calls'] += 1
+        entry['total_ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+        entry['rows'] += max(rows, 0)
+
+        for action in self._active_actions:
+            action['queries'] += 1
+            action['db_ms'] += elapsed_ms
+
+        if elapsed_ms >= self.slow_ms:
+            slow = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'ms': round(elapsed_ms, 3), 'rows': rows,
+                    'sql': " ".join(query.split()), 'params': [repr(p)[:80] for p in params],
+                    'action': self._active_actions[-1]['name'] if self._active_actions else None}
+            if self.capture_plans and plan_func:
+                slow['plan'] = plan_func()
+            self.slow_log.append(slow)
+
+    @contextmanager
+    def action(self, name):
+        current = {'name': name, 'queries': 0, 'db_ms': 0.0, 'start': time.perf_counter()}
+        self._active_actions.append(current)
+        try:
+            yield current
+        finally:
+            self._active_actions.remove(current)
+            wall_ms = (time.perf_counter() - current['start']) * 1000
+            entry = self.actions.get(name)
+            if entry is None:
+                entry = self.actions[name] = {'calls': 0, 'queries': 0, 'db_ms': 0.0, 'wall_ms': 0.0, 'max_wall_ms': 0.0, 'last': ''}
+            entry['calls'] += 1
+            entry['queries'] += current['queries']
+            entry['db_ms'] += current['db_ms']
+            entry['wall_ms'] += wall_ms
+            entry['max_wall_ms'] = max(entry['max_wall_ms'], wall_ms)
+            entry['last'] = f"{name} lanzó {current['queries']} consultas en {current['db_ms']:.0f} ms (total {wall_ms:.0f} ms)"
+
+    def reset(self):
+        self.shapes.clear()
+        self.actions.clear()
+        self.slow_log.clear()
+
+    def to_dict(self):
+        return {
+            'slow_ms': self.slow_ms,
+            'shapes': sorted(({'sql': k, **v} for k, v in self.shapes.items()), key=lambda e: -e['total_ms']),
+            'actions': sorted(({'name': k, **v} for k, v in self.actions.items()), key=lambda e: -e['wall_ms']),
+            'slow_log': list(self.slow_log),
+        }
+
+    def dump_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+class _NoAction:
+    """Contexto vacío usado por DatabaseManager.action cuando la instrumentación está desactivada."""
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_ACTION = _NoAction()
+
+
+def _enable_wal(conn):
+    # El modo queda guardado en el fichero; en memoria no aplica
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.Error as e:
+        log.warning("No se pudo activar el modo WAL: %s", e)
+
 
 class DatabaseManager:
-    def __init__(self, db_name="inventario.db"):
+    def __init__(self, db_name="inventario.db", create_tables=True):
+        self.db_name = db_name
         self.conn = sqlite3.connect(db_name)
         self.cursor = self.conn.cursor()
-        self.setup_tables()
+        self._tx_depth = 0
+        self.stats = None
+        # Instrumentación opcional desde el entorno: INVENTARIO_SQL_STATS=1 [INVENTARIO_SLOW_QUERY_MS=50] [INVENTARIO_SQL_PLANS=1]
+        if os.environ.get('INVENTARIO_SQL_STATS'):
+            self.enable_instrumentation(float(os.environ.get('INVENTARIO_SLOW_QUERY_MS', 50)),
+                                        bool(os.environ.get('INVENTARIO_SQL_PLANS')))
+        # Las conexiones auxiliares (hilos de lectura) no tocan el esquema
+        if create_tables:
+            # WAL: el hilo de base de datos (db_worker.py) lee mientras la interfaz escribe
+            _enable_wal(self.conn)
+            self.setup_tables()
+        # Con la base de datos dividida, db_name es el catálogo y conn la del centro en uso (use_centro)
+        self.catalog_conn = self.conn
+        self.centro_id = None
+        self._shards = {}
+        self._catalog_pending = set()
+        self.sharded = self._storage_layout() == 'shards'
+
+    # --- Instrumentación ---
+    def enable_instrumentation(self, slow_ms=50.0, capture_plans=False):
+        if self.stats is None:
+            self.stats = QueryStats(slow_ms, capture_plans)
+        else:
+            self.stats.slow_ms, self.stats.capture_plans = slow_ms, capture_plans
+        return self.stats
+
+    def disable_instrumentation(self):
+        self.stats = None
+
+    def action(self, name):
+        """Agrupa las consultas lanzadas dentro del bloque bajo una acción de la UI (no-op sin instrumentación)."""
+        if self.stats is None:
+            return _NO_ACTION
+        return self.stats.action(name)
+
+    def _explain(self, query, params):
+        try:
+            return [row[-1] for row in self.conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()]
+        except sqlite3.Error as e:
+            return [f"(sin plan: {e})"]
+
+    def _record(self, query, params, start, rows):
+        self.stats.record(query, params, (time.perf_counter() - start) * 1000, rows,
+                          lambda: self._explain(query, params))
 
     def setup_tables(self):
         # Tabla principal para cada inventario/auditoría
@@ -127,32 +321,222 @@ class DatabaseManager:
             )
         ''')
 
+        # Pares clave/valor internos (versiones de esquema, marcas de sincronización...)
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS app_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+
         self.conn.commit()
 
+    def get_meta(self, key, default=None):
+        row = self.fetch_one("SELECT value FROM app_meta WHERE key=?", (key,))
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.execute_query("INSERT INTO app_meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                           (key, value))
+
+    @contextmanager
+    def transaction(self):
+        """Agrupa varias sentencias en una sola transacción: commit al salir, rollback si hay error.
+
+        Dentro de la transacción `execute_query` no hace commit y relanza los errores."""
+        self._tx_depth += 1
+        try:
+            yield self
+        except Exception:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self.conn.rollback()
+                self._catalog_pending.clear()
+            raise
+        self._tx_depth -= 1
+        if self._tx_depth == 0:
+            self.conn.commit()
+            if self._catalog_pending:
+                self._update_catalog()
+
     def execute_query(self, query, params=()):
+        start = time.perf_counter()
         try:
             self.cursor.execute(query, params)
-            self.conn.commit()
+            if not self._tx_depth:
+                self.conn.commit()
+                if self._catalog_pending:
+                    self._update_catalog()
+            if self.stats is not None:
+                self._record(query, params, start, self.cursor.rowcount)
             return self.cursor
         except sqlite3.Error as e:
-            print(f"Database error: {e}")
+            if self._tx_depth:
+                raise
+            log.error("Database error: %s [%s]", e, " ".join(query.split()))
             return None
 
     def fetch_all(self, query, params=()):
+        start = time.perf_counter()
         try:
             self.cursor.execute(query, params)
-            return self.cursor.fetchall()
+            rows = self.cursor.fetchall()
+            if self.stats is not None:
+                self._record(query, params, start, len(rows))
+            return rows
         except sqlite3.Error as e:
-            print(f"Database error: {e}")
+            log.error("Database error: %s [%s]", e, " ".join(query.split()))
             return []
             
     def fetch_one(self, query, params=()):
+        start = time.perf_counter()
         try:
             self.cursor.execute(query, params)
-            return self.cursor.fetchone()
+            row = self.cursor.fetchone()
+            if self.stats is not None:
+                self._record(query, params, start, 1 if row else 0)
+            return row
         except sqlite3.Error as e:
-            print(f"Database error: {e}")
+            log.error("Database error: %s [%s]", e, " ".join(query.split()))
             return None
 
+    # --- Base de datos dividida por centros ---
+    def _storage_layout(self):
+        try:
+            row = self.catalog_conn.execute("SELECT value FROM app_meta WHERE key=?", (STORAGE_LAYOUT_KEY,)).fetchone()
+        except sqlite3.Error:
+            # Base de datos nueva abierta sin crear las tablas
+            return None
+        return row[0] if row else None
+
+    def shard_path(self, inventory_id):
+        return os.path.join(os.path.dirname(os.path.abspath(self.db_name)), SHARD_DIR, f"centro_{int(inventory_id)}.db")
+
+    def centro_ids(self):
+        """Ids de todos los centros (del catálogo si la base de datos está dividida)."""
+        return [inventory_id for (inventory_id,) in self.catalog_conn.execute("SELECT id FROM inventarios ORDER BY id")]
+
+    def use_centro(self, inventory_id):
+        """Dirige las consultas siguientes al fichero del centro (None: al catálogo). Sin efecto
+        con una sola base de datos, donde todos los centros comparten la conexión."""
+        self.centro_id = inventory_id
+        if not self.sharded:
+            return
+        if self._tx_depth:
+            raise RuntimeError("No se puede cambiar de centro dentro de una transacción")
+        if inventory_id is None:
+            conn = self.catalog_conn
+        else:
+            conn = self._shards.get(inventory_id)
+            if conn is None:
+                conn = self._shards[inventory_id] = self._open_shard(inventory_id)
+        self.conn = conn
+        self.cursor = conn.cursor()
+
+    @contextmanager
+    def on_centro(self, inventory_id):
+        """Ejecuta un bloque sobre otro centro (None: el catálogo) y vuelve después al actual."""
+        previous = self.centro_id
+        self.use_centro(inventory_id)
+        try:
+            yield self
+        finally:
+            self.use_centro(previous)
+
+    def on_catalog(self):
+        """Bloque sobre el catálogo: lista de centros y ajustes generales."""
+        return self.on_centro(None)
+
+    def each_centro(self):
+        """Recorre los ficheros de centro con las consultas dirigidas a cada uno y vuelve después
+        al actual. Con una sola base de datos hay una única vuelta (todos los centros comparten la
+        conexión) y se obtiene None. Los ficheros que no estaban abiertos se cierran al acabar con ellos."""
+        if not self.sharded:
+            yield None
+            return
+        for inventory_id in self.centro_ids():
+            was_open = inventory_id in self._shards
+            with self.on_centro(inventory_id):
+                yield inventory_id
+            if not was_open and inventory_id != self.centro_id:
+                self._shards.pop(inventory_id).close()
+
+    def _open_shard(self, inventory_id):
+        path = self.shard_path(inventory_id)
+        if not os.path.exists(path):
+            # Centro nuevo: se crea su fichero con el esquema de los demás
+            import shards
+            shards.create_shard(self, inventory_id)
+        conn = sqlite3.connect(path)
+        _enable_wal(conn)
+        # La ficha del centro (cliente, plano...) se edita en su fichero; al confirmar se copia al
+        # catálogo (los disparadores no pueden escribir en otra base de datos adjuntada)
+        conn.create_function('catalogo_pendiente', 1, self._catalog_pending.add)
+        conn.execute('''
+            CREATE TEMP TRIGGER IF NOT EXISTS catalogo_inventarios_update AFTER UPDATE ON main.inventarios BEGIN
+                SELECT catalogo_pendiente(NEW.id);
+            END
+        ''')
+        return conn
+
+    def _update_catalog(self):
+        # El mismo conjunto sigue registrado en catalogo_pendiente de cada centro: se vacía, no se sustituye
+        pending = set(self._catalog_pending)
+        self._catalog_pending.clear()
+        catalog_columns = {row[1] for row in self.catalog_conn.execute("PRAGMA table_info(inventarios)")}
+        for inventory_id in pending:
+            cursor = self._shards[inventory_id].execute("SELECT * FROM inventarios WHERE id=?", (inventory_id,))
+            row = cursor.fetchone()
+            if row is None:
+                continue
+            data = {d[0]: value for d, value in zip(cursor.description, row) if d[0] in catalog_columns and d[0] != 'id'}
+            self.catalog_conn.execute(f"UPDATE inventarios SET {', '.join(f'{col}=?' for col in data)} WHERE id=?",
+                                      (*data.values(), inventory_id))
+        self.catalog_conn.commit()
+
+    def fleet_query(self, query, params=(), inventory_id=None):
+        """Filas de `query` en todos los centros, o solo en `inventory_id` (en la conexión actual).
+
+        `{db}` delante de cada tabla es el esquema de cada fichero: con la base de datos dividida
+        los ficheros se adjuntan de solo lectura por lotes de ATTACH_BATCH y las consultas se unen
+        con UNION ALL; con una sola base de datos se quita y la consulta se ejecuta una vez. Los
+        parámetros se repiten para cada centro; sumar u ordenar entre centros es cosa de quien
+        llama (ver merge_totals)."""
+        if inventory_id is not None or not self.sharded:
+            return self.fetch_all(query.replace('{db}', ''), params)
+        start = time.perf_counter()
+        paths = [path for path in map(self.shard_path, self.centro_ids()) if os.path.exists(path)]
+        rows = []
+        conn = sqlite3.connect(':memory:', uri=True)
+        try:
+            for first in range(0, len(paths), ATTACH_BATCH):
+                batch = paths[first:first + ATTACH_BATCH]
+                for number, path in enumerate(batch):
+                    conn.execute(f"ATTACH DATABASE ? AS centro{number}", (Path(path).resolve().as_uri() + '?mode=ro',))
+                union = " UNION ALL ".join(f"SELECT * FROM ({query.replace('{db}', f'centro{number}.')})"
+                                           for number in range(len(batch)))
+                rows.extend(conn.execute(union, tuple(params) * len(batch)).fetchall())
+                for number in range(len(batch)):
+                    conn.execute(f"DETACH DATABASE centro{number}")
+        except sqlite3.Error as e:
+            log.error("Database error: %s [%s]", e, " ".join(query.split()))
+            return []
+        finally:
+            conn.close()
+        if self.stats is not None:
+            self._record(query.replace('{db}', ''), params, start, len(rows))
+        return rows
+
     def close(self):
-        self.conn.close()
\ No newline at end of file
+        for conn in self._shards.values():
+            conn.close()
+        self.catalog_conn.close()
+
+
+def merge_totals(rows):
+    """Junta los subtotales de varios centros: suma la última columna de las filas con el mismo
+    resto y ordena de mayor a menor total (y por el resto de columnas en caso de empate)."""
+    totals = {}
+    for *key, total in rows:
+        totals[tuple(key)] = totals.get(tuple(key), 0) + (total or 0)
+    return sorted(((*key, total) for key, total in totals.items()), key=lambda row: (-row[-1], row[:-1]))
@@ -0,0 +1,173 @@
+# db_worker.py
+import logging
+import queue
+import time
+
+from PyQt6 import sip
+from PyQt6.QtCore import QThread, QCoreApplication, QEventLoop, pyqtSignal
+
+from database import DatabaseManager
+import tracing
+
+log = logging.getLogger(__name__)
+
+# Marca interna para los trabajos descartados por haber sido sustituidos por uno más reciente
+_SUPERSEDED = object()
+
+
+class DbJob:
+    """Trabajo pendiente del hilo de base de datos. `done` pasa a True al entregarse el resultado."""
+
+    def __init__(self, key, generation, work, callback, owner, on_error, centro=None):
+        self.key = key
+        self.generation = generation
+        self.work = work
+        self.callback = callback
+        self.owner = owner
+        self.on_error = on_error
+        self.centro = centro
+        self.done = False
+        self.result = None
+
+
+def _as_work(work, params):
+    """Convierte una consulta SQL en un trabajo `work(db)` que devuelve fetch_all."""
+    if isinstance(work, str):
+        query = work
+        return lambda db: db.fetch_all(query, params)
+    return work
+
+
+class DatabaseWorker(QThread):
+    """Hilo con su propia conexión SQLite para las lecturas de la interfaz.
+
+    `submit(trabajo, callback, key=...)` encola una consulta SQL o una función
+    `trabajo(db)` y llama a `callback(resultado)` en el hilo de la GUI. Los
+    trabajos con la misma `key` se agrupan: si llega uno nuevo antes de que el
+    anterior se ejecute o entregue, el anterior se descarta (p. ej. varios
+    refrescos seguidos de la misma tabla). Las escrituras siguen haciéndose en
+    la conexión principal; este hilo solo lee datos ya confirmados."""
+
+    _finished = pyqtSignal(object, object, object)
+
+    def __init__(self, db_name, parent=None):
+        super().__init__(parent)
+        self.db_name = db_name
+        # Centro abierto en la ventana: con la base de datos dividida, los trabajos se ejecutan en su fichero
+        self.centro_id = None
+        self._queue = queue.Queue()
+        self._generations = {}
+        self._pending = 0
+        self._finished.connect(self._deliver)
+
+    def submit(self, work, callback=None, params=(), key=None, owner=None, on_error=None):
+        """Encola `work` (SQL o función db -> resultado). `owner` es el widget destinatario:
+        si se ha destruido cuando llega el resultado, el callback no se llama."""
+        generation = None
+        if key is not None:
+            generation = self._generations[key] = self._generations.get(key, 0) + 1
+        job = DbJob(key, generation, _as_work(work, params), callback, owner, on_error, self.centro_id)
+        self._pending += 1
+        self._queue.put(job)
+        if not self.isRunning():
+            self.start()
+        return job
+
+    def cancel(self, key):
+        """Descarta los trabajos pendientes con esa clave."""
+        if key in self._generations:
+            self._generations[key] += 1
+
+    def _is_current(self, job):
+        return job.key is None or self._generations.get(job.key) == job.generation
+
+    def run(self):
+        db = DatabaseManager(self.db_name, create_tables=False)
+        try:
+            while True:
+                job = self._queue.get()
+                if job is None:
+                    break
+                if not self._is_current(job):
+                    self._finished.emit(job, None, _SUPERSEDED)
+                    continue
+                try:
+                    db.use_centro(job.centro)
+                    with tracing.span(str(job.key or 'consulta'), 'db'):
+                        result = job.work(db)
+                    self._finished.emit(job, result, None)
+                except Exception as e:
+                    self._finished.emit(job, None, e)
+        finally:
+            db.close()
+
+    def _deliver(self, job, result, error):
+        self._pending -= 1
+        job.done = True
+        if error is _SUPERSEDED or not self._is_current(job):
+            return
+        if job.owner is not None and sip.isdeleted(job.owner):
+            return
+        if error is not None:
+            log.error("Database error: %s", error, exc_info=error)
+            if job.on_error:
+                job.on_error(error)
+            return
+        job.result = result
+        if job.callback:
+            job.callback(result)
+
+    def idle(self):
+        """True si no queda ningún trabajo pendiente de ejecutar o de entregar."""
+        return self._pending == 0
+
+    def wait_idle(self, timeout_ms=30000):
+        """Procesa eventos hasta que se hayan entregado todos los resultados (pruebas y benchmarks)."""
+        deadline = time.monotonic() + timeout_ms / 1000
+        while not self.idle() and time.monotonic() < deadline:
+            QCoreApplication.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, 10)
+            time.sleep(0.001)
+        return self.idle()
+
+    def stop(self):
+        if self.isRunning():
+            self._queue.put(None)
+            self.wait()
+
+
+class InlineExecutor:
+    """Misma interfaz que DatabaseWorker pero ejecutando en el acto sobre `db`
+    (diálogos abiertos sin ventana principal que aporte un hilo de base de datos)."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def submit(self, work, callback=None, params=(), key=None, owner=None, on_error=None):
+        job = DbJob(key, None, _as_work(work, params), callback, owner, on_error)
+        try:
+            job.result = job.work(self.db)
+        except Exception as e:
+            log.error("Database error: %s", e, exc_info=e)
+            if on_error:
+                on_error(e)
+            return job
+        finally:
+            job.done = True
+        if callback:
+            callback(job.result)
+        return job
+
+    def cancel(self, key):
+        pass
+
+    def idle(self):
+        return True
+
+    def wait_idle(self, timeout_ms=None):
+        return True
+
+
+def executor_for(parent, db):
+    """Hilo de base de datos de la ventana principal si existe; si no, ejecución directa sobre `db`."""
+    worker = getattr(parent, 'db_worker', None)
+    return worker if worker is not None else InlineExecutor(db)
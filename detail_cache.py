@@ -0,0 +1,173 @@
+# detail_cache.py
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from PyQt6.QtCore import Qt, QSize
+from PyQt6.QtGui import QImageReader
+
+# Memoria máxima aproximada de la caché (datos + miniaturas ya decodificadas)
+CACHE_BYTES = 64 * 1024 * 1024
+THUMBNAIL_SIZE = QSize(128, 128)
+# Filas vecinas de la seleccionada que se precargan a cada lado
+PREFETCH_NEIGHBOURS = 2
+
+# Coste fijo estimado de cada registro, imagen y conexión (objetos Python, cabeceras...)
+_RECORD_OVERHEAD = 1024
+_ENTRY_OVERHEAD = 256
+
+# Columna con la que se muestra cada tabla en la lista de conexiones
+_LABEL_COLUMNS = {}
+
+
+class DetailRecord:
+    """Todo lo que muestra la ventana de detalles de un elemento, cargado de una vez."""
+
+    def __init__(self, item_type, item_id, headers, row, images, connections):
+        self.item_type = item_type
+        self.item_id = item_id
+        self.headers = headers
+        self.row = row
+        # [(img_id, ruta_completa, ruta_relativa, QImage miniatura)]
+        self.images = images
+        # [(conn_id, tipo_hijo, id_hijo, notas, código_hijo o None)]
+        self.connections = connections
+        self.size = self._estimate_size()
+
+    def _estimate_size(self):
+        size = _RECORD_OVERHEAD + sum(len(str(value)) for value in (self.row or ()))
+        for _, full_path, _, image in self.images:
+            size += _ENTRY_OVERHEAD + len(full_path) + (image.sizeInBytes() if image is not None else 0)
+        size += _ENTRY_OVERHEAD * len(self.connections)
+        return size
+
+    def references(self, item_type, item_id=None):
+        """True si alguna conexión del registro apunta a ese elemento (o a cualquiera de ese tipo)."""
+        return any(child_type == item_type and (item_id is None or child_id == item_id)
+                   for _, child_type, child_id, _, _ in self.connections)
+
+
+def _label_column(db, table):
+    # Las tablas de CCTV y accesos no tienen código; para ellas se muestra el id
+    if table not in _LABEL_COLUMNS:
+        columns = [c[1] for c in db.fetch_all(f"PRAGMA table_info({table})")]
+        _LABEL_COLUMNS[table] = 'codigo' if 'codigo' in columns else None
+    return _LABEL_COLUMNS[table]
+
+
+def load_record(db, item_type, item_id, resolve_path, icon_size=THUMBNAIL_SIZE):
+    """Carga el registro completo de un elemento. Pensado para ejecutarse en el hilo de
+    base de datos: una consulta por tabla implicada en lugar de una por conexión, y las
+    miniaturas se decodifican ya escaladas (QImage es seguro fuera de la GUI)."""
+    item_id = int(item_id)
+    cursor = db.execute_query(f"SELECT * FROM {item_type} WHERE id=?", (item_id,))
+    if cursor is None:
+        return None
+    headers = [desc[0] for desc in cursor.description]
+    row = cursor.fetchone()
+    if row is None:
+        return DetailRecord(item_type, item_id, headers, None, [], [])
+
+    images = []
+    for img_id, relative_img_path in db.fetch_all("SELECT id, image_path FROM images WHERE item_type=? AND item_id=? ORDER BY id",
+                                                  (item_type, item_id)):
+        full_path = resolve_path(relative_img_path)
+        if os.path.exists(full_path):
+            reader = QImageReader(full_path)
+            reader.setAutoTransform(True)
+            size = reader.size()
+            if size.isValid():
+                reader.setScaledSize(size.scaled(icon_size, Qt.AspectRatioMode.KeepAspectRatio))
+            images.append((img_id, full_path, relative_img_path, reader.read()))
+
+    connections = db.fetch_all(
+        "SELECT id, child_item_type, child_item_id, notes FROM connections WHERE parent_item_type=? AND parent_item_id=? ORDER BY id",
+        (item_type, item_id))
+    codes = {}
+    child_ids = {}
+    for _, child_type, child_id, _ in connections:
+        child_ids.setdefault(child_type, set()).add(child_id)
+    for child_type, ids in child_ids.items():
+        column = _label_column(db, child_type)
+        if column:
+            rows = db.fetch_all(f"SELECT id, {column} FROM {child_type} WHERE id IN (SELECT value FROM json_each(?))",
+                                (json.dumps(sorted(ids)),))
+            codes.update(((child_type, child_id), code) for child_id, code in rows)
+    connections = [(conn_id, child_type, child_id, notes, codes.get((child_type, child_id)))
+                   for conn_id, child_type, child_id, notes in connections]
+    return DetailRecord(item_type, item_id, headers, row, images, connections)
+
+
+class DetailCache:
+    """Caché LRU de registros de detalle por (tipo, id), limitada por memoria.
+
+    Cada invalidación incrementa `version`: una carga lanzada antes de una
+    modificación no se guarda al terminar (`put` con la versión de inicio),
+    así una precarga lenta nunca deja en la caché datos ya cambiados."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._records = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, item_type, item_id):
+        key = (item_type, int(item_id))
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                self.misses += 1
+                return None
+            self._records.move_to_end(key)
+            self.hits += 1
+            return record
+
+    def contains(self, item_type, item_id):
+        with self._lock:
+            return (item_type, int(item_id)) in self._records
+
+    def put(self, record, version=None):
+        """Guarda el registro si no ha habido invalidaciones desde `version`. Devuelve True si se guardó."""
+        if record is None or record.row is None:
+            return False
+        key = (record.item_type, record.item_id)
+        with self._lock:
+            if version is not None and version != self.version:
+                return False
+            old = self._records.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            if record.size > self.max_bytes:
+                return False
+            self._records[key] = record
+            self._bytes += record.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._records.popitem(last=False)
+                self._bytes -= evicted.size
+            return True
+
+    def _drop(self, predicate):
+        with self._lock:
+            self.version += 1
+            for key in [key for key, record in self._records.items() if predicate(key, record)]:
+                self._bytes -= self._records.pop(key).size
+
+    def invalidate(self, item_type, item_id):
+        """Descarta un elemento y los registros cuyas conexiones lo muestran (su código puede haber cambiado)."""
+        item_id = int(item_id)
+        self._drop(lambda key, record: key == (item_type, item_id) or record.references(item_type, item_id))
+
+    def invalidate_table(self, item_type):
+        """Descarta todos los elementos de una tabla y los registros conectados a ellos (operaciones en bloque)."""
+        self._drop(lambda key, record: key[0] == item_type or record.references(item_type))
+
+    def clear(self):
+        self._drop(lambda key, record: True)
+
+    def stats(self):
+        with self._lock:
+            return {'registros': len(self._records), 'bytes': self._bytes, 'aciertos': self.hits, 'fallos': self.misses}
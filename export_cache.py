@@ -0,0 +1,215 @@
+# export_cache.py
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from database import EQUIPMENT_TABLES
+
+# Espacio máximo de los informes guardados (se descartan los usados hace más tiempo)
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+# Se incrementa cuando cambia lo que genera cada formato, para no servir informes antiguos
+FORMAT_VERSIONS = {'pdf': 2, 'xlsx': 1}
+
+
+def _centro_of(type_column, id_column):
+    # Centro de un elemento referenciado por (tipo, id), como en images y connections
+    cases = " ".join(f"WHEN '{table}' THEN (SELECT inventario_id FROM {table} WHERE id = {id_column})" for table in EQUIPMENT_TABLES)
+    return f"(CASE {type_column} {cases} END)"
+
+
+def _bump(expression):
+    # Sin centro (elemento ya borrado) no hay nada que marcar; NULL en la clave crearía una fila nueva
+    return (f"INSERT INTO centro_versions (inventario_id, version) SELECT v, 1 FROM (SELECT {expression} AS v) "
+            f"WHERE v IS NOT NULL ON CONFLICT(inventario_id) DO UPDATE SET version = version + 1;")
+
+
+class ExportCache:
+    """Informes PDF/Excel ya generados, reutilizados mientras el centro no cambie.
+
+    Cada centro tiene en `centro_versions` un número de versión que los triggers
+    incrementan con cualquier cambio en sus equipos, imágenes, conexiones, plano,
+    esquema de red o datos generales. Un informe se guarda con la clave (centro, versión, formato,
+    opciones); si se vuelve a pedir sin cambios, exportar es copiar el fichero."""
+
+    def __init__(self, db, cache_dir, max_bytes=MAX_CACHE_BYTES):
+        self.db = db
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.ensure_schema()
+
+    def _columns(self, table):
+        return [c[1] for c in self.db.fetch_all(f"PRAGMA table_info({table})")]
+
+    def _tracked(self):
+        """Tabla -> [(evento, sentencias)] de los triggers que marcan cambios de centro."""
+        triggers = {}
+        for table in EQUIPMENT_TABLES:
+            changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in self._columns(table))
+            triggers[table] = [
+                ('INSERT', _bump('NEW.inventario_id')),
+                (f'UPDATE WHEN {changed}', _bump('NEW.inventario_id') + " "
+                 + _bump('CASE WHEN OLD.inventario_id IS NOT NEW.inventario_id THEN OLD.inventario_id END')),
+                ('DELETE', _bump('OLD.inventario_id')),
+            ]
+        changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in self._columns('inventarios'))
+        triggers['inventarios'] = [
+            ('INSERT', _bump('NEW.id')),
+            (f'UPDATE WHEN {changed}', _bump('NEW.id')),
+            ('DELETE', "DELETE FROM centro_versions WHERE inventario_id = OLD.id;"),
+        ]
+        # Las imágenes y conexiones se borran antes que su equipo: su centro aún se puede resolver
+        triggers['images'] = [
+            ('INSERT', _bump(_centro_of('NEW.item_type', 'NEW.item_id'))),
+            ('UPDATE', _bump(_centro_of('NEW.item_type', 'NEW.item_id'))),
+            ('DELETE', _bump(_centro_of('OLD.item_type', 'OLD.item_id'))),
+        ]
+        triggers['connections'] = [
+            (event, _bump(_centro_of(f'{row}.parent_item_type', f'{row}.parent_item_id')) + " "
+             + _bump(_centro_of(f'{row}.child_item_type', f'{row}.child_item_id')))
+            for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD'))
+        ]
+        # Posiciones del plano y del esquema de red, si sus tablas ya existen
+        for table in ('plan_positions', 'topology_positions'):
+            if self.db.fetch_one("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)):
+                triggers[table] = [
+                    ('INSERT', _bump('NEW.inventario_id')),
+                    ('UPDATE', _bump('NEW.inventario_id')),
+                    ('DELETE', _bump('OLD.inventario_id')),
+                ]
+        return triggers
+
+    def _signature(self, triggers):
+        return hashlib.sha1(json.dumps(triggers, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def ensure_schema(self):
+        cursor = self.db.cursor
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS centro_versions (
+                inventario_id INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS export_cache (
+                clave TEXT PRIMARY KEY,
+                inventario_id INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                formato TEXT NOT NULL,
+                opciones TEXT NOT NULL,
+                fichero TEXT NOT NULL,
+                bytes INTEGER NOT NULL,
+                usado REAL NOT NULL
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_export_cache_usado ON export_cache (usado)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_export_cache_centro ON export_cache (inventario_id, formato)")
+        self.db.conn.commit()
+
+        triggers = self._tracked()
+        if self.db.get_meta('centro_versions_signature') != self._signature(triggers):
+            self._install(triggers)
+
+    def _install(self, triggers):
+        cursor = self.db.cursor
+        events = {'INSERT': 'ins', 'UPDATE': 'upd', 'DELETE': 'del'}
+        try:
+            for table, entries in triggers.items():
+                for event, body in entries:
+                    name = f"trg_version_{table}_{events[event.split()[0]]}"
+                    when = event.split(' ', 1)[1] if ' ' in event else ''
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                    cursor.execute(f"CREATE TRIGGER {name} AFTER {event.split()[0]} ON {table} {when} BEGIN {body} END")
+            # Los centros existentes parten de la versión 1; los informes guardados con otros triggers no valen
+            cursor.execute("INSERT INTO centro_versions (inventario_id, version) SELECT id, 1 FROM inventarios WHERE true "
+                           "ON CONFLICT(inventario_id) DO UPDATE SET version = version + 1")
+            cursor.execute("INSERT INTO app_meta (key, value) VALUES ('centro_versions_signature', ?) "
+                           "ON CONFLICT(key) DO UPDATE SET value=excluded.value", (self._signature(triggers),))
+            self.db.conn.commit()
+        except Exception:
+            self.db.conn.rollback()
+            raise
+
+    # --- Versiones ---
+    def version(self, inventory_id):
+        row = self.db.fetch_one("SELECT version FROM centro_versions WHERE inventario_id = ?", (inventory_id,))
+        return row[0] if row else 0
+
+    # --- Caché de informes ---
+    def _key(self, inventory_id, version, formato, options):
+        options = json.dumps(dict(options or {}, formato_version=FORMAT_VERSIONS.get(formato)), sort_keys=True, default=str)
+        key = hashlib.sha1(json.dumps([inventory_id, version, formato, options]).encode('utf-8')).hexdigest()
+        return key, options
+
+    def get(self, inventory_id, formato, options=None):
+        """Ruta del informe guardado para la versión actual del centro, o None."""
+        key, _ = self._key(inventory_id, self.version(inventory_id), formato, options)
+        row = self.db.fetch_one("SELECT fichero FROM export_cache WHERE clave = ?", (key,))
+        if row is None or not os.path.exists(os.path.join(self.cache_dir, row[0])):
+            return None
+        self.db.execute_query("UPDATE export_cache SET usado = ? WHERE clave = ?", (time.time(), key))
+        return os.path.join(self.cache_dir, row[0])
+
+    def put(self, inventory_id, version, formato, options, source_path):
+        """Guarda una copia de `source_path` como informe de esa versión del centro."""
+        key, options_json = self._key(inventory_id, version, formato, options)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        name = f"{key}.{formato}"
+        shutil.copyfile(source_path, os.path.join(self.cache_dir, name))
+        # Las versiones anteriores del mismo informe ya no se pueden volver a pedir
+        stale = self.db.fetch_all("SELECT clave, fichero FROM export_cache WHERE inventario_id = ? AND formato = ? "
+                                  "AND opciones = ? AND version < ?", (inventory_id, formato, options_json, version))
+        with self.db.transaction():
+            for stale_key, _ in stale:
+                self.db.execute_query("DELETE FROM export_cache WHERE clave = ?", (stale_key,))
+            self.db.execute_query(
+                "INSERT OR REPLACE INTO export_cache (clave, inventario_id, version, formato, opciones, fichero, bytes, usado) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, inventory_id, version, formato, options_json, name, os.path.getsize(source_path), time.time()))
+        self._remove([name for _, name in stale])
+        self.evict()
+
+    def _remove(self, names):
+        for name in names:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def evict(self):
+        """Descarta los informes usados hace más tiempo hasta quedar por debajo de `max_bytes`."""
+        total = self.db.fetch_one("SELECT COALESCE(SUM(bytes), 0) FROM export_cache")[0]
+        if total <= self.max_bytes:
+            return
+        removed = []
+        for key, name, size in self.db.fetch_all("SELECT clave, fichero, bytes FROM export_cache ORDER BY usado"):
+            if total <= self.max_bytes:
+                break
+            removed.append((key, name))
+            total -= size
+        with self.db.transaction():
+            for key, _ in removed:
+                self.db.execute_query("DELETE FROM export_cache WHERE clave = ?", (key,))
+        self._remove([name for _, name in removed])
+
+    def export(self, inventory_id, formato, destination, build, options=None):
+        """Escribe el informe en `destination`: copia el guardado si el centro no ha cambiado
+        o lo genera con `build(ruta)` y lo guarda. Devuelve True si se reutilizó."""
+        cached = self.get(inventory_id, formato, options)
+        if cached is not None:
+            self.hits += 1
+            shutil.copyfile(cached, destination)
+            return True
+        self.misses += 1
+        # La versión se lee antes de generar: si el centro cambia mientras tanto, el informe queda con la antigua
+        version = self.version(inventory_id)
+        build(destination)
+        try:
+            self.put(inventory_id, version, formato, options, destination)
+        except OSError as e:
+            print(f"No se pudo guardar el informe en la caché: {e}")
+        return False
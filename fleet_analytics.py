@@ -0,0 +1,141 @@
+# fleet_analytics.py
+import hashlib
+import json
+
+from database import EQUIPMENT_TABLES, merge_totals
+
+# Dimensiones resumidas para toda la flota: (dimensión, tabla, expresión SQL).
+# En la expresión, {r} se sustituye por NEW, OLD o el alias de la tabla.
+DIMENSIONS = [('equipos', table, f"'{table}'") for table in EQUIPMENT_TABLES] + [
+    ('so', 'pcs', "COALESCE(NULLIF(TRIM({r}.so), ''), 'Sin especificar')"),
+    ('antivirus', 'pcs', "CASE WHEN TRIM(COALESCE({r}.antivirus, '')) = '' THEN 'Sin antivirus' ELSE 'Con antivirus' END"),
+    ('modelo_impresora', 'impresoras', "COALESCE(NULLIF(TRIM({r}.modelo), ''), 'Sin especificar')"),
+    ('modelo_camara', 'cctv_cameras', "COALESCE(NULLIF(TRIM({r}.modelo), ''), 'Sin especificar')"),
+    ('tipo_red', 'red', "COALESCE(NULLIF(TRIM({r}.tipo), ''), 'Sin especificar')"),
+]
+
+DIMENSION_LABELS = {
+    'so': 'Sistemas Operativos',
+    'antivirus': 'Cobertura Antivirus',
+    'modelo_impresora': 'Modelos de Impresora',
+    'modelo_camara': 'Modelos de Cámara',
+    'tipo_red': 'Tipos de Equipo de Red',
+}
+
+# Columnas que, al cambiar, afectan a alguna dimensión de cada tabla
+_DIMENSION_COLUMNS = {'so': ['so'], 'antivirus': ['antivirus'], 'modelo_impresora': ['modelo'],
+                      'modelo_camara': ['modelo'], 'tipo_red': ['tipo'], 'equipos': []}
+
+# Versión de los triggers: forma parte de la firma, así que al cambiarla se reinstalan
+_TRIGGER_VERSION = 2
+
+
+class FleetAnalytics:
+    """Totales de todos los centros a partir de la tabla resumen `stats_resumen`,
+    que los triggers mantienen al día en cada alta, baja o modificación de equipos."""
+
+    def __init__(self, db):
+        self.db = db
+        self.ensure_schema()
+
+    def _signature(self):
+        return hashlib.sha1(json.dumps([_TRIGGER_VERSION, DIMENSIONS]).encode('utf-8')).hexdigest()
+
+    def ensure_schema(self):
+        cursor = self.db.cursor
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stats_resumen (
+                inventario_id INTEGER NOT NULL,
+                dimension TEXT NOT NULL,
+                valor TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                PRIMARY KEY (inventario_id, dimension, valor)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_stats_resumen_dim ON stats_resumen (dimension, valor, total)")
+
+        # Si las dimensiones han cambiado (o es la primera vez) se regeneran triggers y datos
+        if self.db.get_meta('stats_signature') != self._signature():
+            self.rebuild()
+
+    def _create_triggers(self):
+        cursor = self.db.cursor
+        for (name,) in cursor.execute("SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE 'trg_stats_%'").fetchall():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+        for table in EQUIPMENT_TABLES:
+            dims = [(dim, expr) for dim, dim_table, expr in DIMENSIONS if dim_table == table]
+            if not dims:
+                continue
+
+            def upsert(ref, delta):
+                values = ", ".join(f"({ref}.inventario_id, '{dim}', {expr.format(r=ref)}, {delta})" for dim, expr in dims)
+                return (f"INSERT INTO stats_resumen (inventario_id, dimension, valor, total) VALUES {values} "
+                        f"ON CONFLICT (inventario_id, dimension, valor) DO UPDATE SET total = total + excluded.total;")
+
+            purge = "DELETE FROM stats_resumen WHERE inventario_id = {ref}.inventario_id AND total <= 0;"
+            watched = ['inventario_id'] + sorted({col for dim, _ in dims for col in _DIMENSION_COLUMNS[dim]})
+
+            # Los equipos sin centro no cuentan (igual que en rebuild): el resumen exige inventario_id.
+            # La modificación va en dos triggers para poder filtrar la fila anterior y la nueva por separado.
+            cursor.execute(f"CREATE TRIGGER trg_stats_{table}_ins AFTER INSERT ON {table} "
+                           f"WHEN NEW.inventario_id IS NOT NULL BEGIN {upsert('NEW', 1)} END")
+            cursor.execute(f"CREATE TRIGGER trg_stats_{table}_del AFTER DELETE ON {table} "
+                           f"WHEN OLD.inventario_id IS NOT NULL BEGIN {upsert('OLD', -1)} {purge.format(ref='OLD')} END")
+            cursor.execute(f"CREATE TRIGGER trg_stats_{table}_upd_old AFTER UPDATE OF {', '.join(watched)} ON {table} "
+                           f"WHEN OLD.inventario_id IS NOT NULL BEGIN {upsert('OLD', -1)} {purge.format(ref='OLD')} END")
+            cursor.execute(f"CREATE TRIGGER trg_stats_{table}_upd_new AFTER UPDATE OF {', '.join(watched)} ON {table} "
+                           f"WHEN NEW.inventario_id IS NOT NULL BEGIN {upsert('NEW', 1)} END")
+
+    def rebuild(self):
+        """Recrea los triggers y recalcula `stats_resumen` desde cero (una sola pasada por tabla)."""
+        cursor = self.db.cursor
+        try:
+            self._create_triggers()
+            cursor.execute("DELETE FROM stats_resumen")
+            for dim, table, expr in DIMENSIONS:
+                cursor.execute(f'''
+                    INSERT INTO stats_resumen (inventario_id, dimension, valor, total)
+                    SELECT r.inventario_id, '{dim}', {expr.format(r='r')}, COUNT(*) FROM {table} r
+                    WHERE r.inventario_id IS NOT NULL GROUP BY 1, 3
+                    ON CONFLICT (inventario_id, dimension, valor) DO UPDATE SET total = total + excluded.total
+                ''')
+            cursor.execute("INSERT INTO app_meta (key, value) VALUES ('stats_signature', ?) "
+                           "ON CONFLICT(key) DO UPDATE SET value=excluded.value", (self._signature(),))
+            self.db.conn.commit()
+        except Exception:
+            self.db.conn.rollback()
+            raise
+
+    # --- Consultas ---
+    def totals(self, dimension, inventory_id=None):
+        """Devuelve [(valor, total)] de una dimensión, para toda la flota o un solo centro."""
+        if inventory_id is None:
+            return merge_totals(self.db.fleet_query(
+                "SELECT valor, SUM(total) FROM {db}stats_resumen WHERE dimension=? GROUP BY valor", (dimension,)))
+        return self.db.fetch_all(
+            "SELECT valor, total FROM stats_resumen WHERE inventario_id=? AND dimension=? ORDER BY 2 DESC, valor",
+            (inventory_id, dimension))
+
+    def totals_by_centro(self, dimension):
+        """Devuelve [(cliente, valor, total)] de una dimensión desglosada por centro."""
+        rows = self.db.fleet_query('''
+            SELECT i.cliente, s.valor, s.total FROM {db}stats_resumen s
+            JOIN {db}inventarios i ON i.id = s.inventario_id
+            WHERE s.dimension=?
+        ''', (dimension,))
+        return sorted(rows, key=lambda row: (row[0], -row[2]))
+
+    def summary(self):
+        """KPIs globales: número de centros, equipos totales y cobertura antivirus (%)."""
+        equipos = dict(self.totals('equipos'))
+        antivirus = dict(self.totals('antivirus'))
+        centros = len(self.db.centro_ids())
+        protegidos = antivirus.get('Con antivirus', 0)
+        total_pcs = protegidos + antivirus.get('Sin antivirus', 0)
+        return {
+            'centros': centros,
+            'equipos': sum(v for k, v in equipos.items() if k not in ('software', 'credenciales')),
+            'equipos_por_tabla': equipos,
+            'cobertura_antivirus': (100.0 * protegidos / total_pcs) if total_pcs else 0.0,
+        }
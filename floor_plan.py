@@ -0,0 +1,433 @@
+# floor_plan.py
+import hashlib
+import math
+import os
+
+from PyQt6.QtCore import Qt, QRect, QRectF, QPointF, QSize, QThread, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader, QImageIOHandler, QPainter, QColor, QPen
+from PyQt6.QtWidgets import QWidget
+
+from database import EQUIPMENT_TABLES, PIN_COLORS
+from image_viewer import ImageLoader, _CACHE
+
+# Lado de los mosaicos de la pirámide (píxeles)
+TILE = 256
+# Equipos que se pueden ubicar en el plano: los que tienen columna de ubicación
+PLACEABLE_TABLES = [table for table, location in EQUIPMENT_TABLES.items() if location]
+
+PIN_RADIUS = 6
+# Por encima de este número de chinchetas visibles no se dibujan las etiquetas
+MAX_LABELS = 300
+# Por encima de este número se agrupan las chinchetas que caen en la misma celda de pantalla
+MAX_PINS_DRAWN = 2000
+
+
+def _label_sql(table):
+    return "t.codigo" if EQUIPMENT_TABLES[table] == 'ubicacion_equipo' else "t.marca || ' ' || t.modelo"
+
+
+# --- Posiciones de los equipos ---
+class FloorPlanStore:
+    """Posición de cada equipo sobre el plano del centro, en coordenadas normalizadas (0-1)
+    para que no dependan de la resolución de la imagen del plano."""
+
+    def __init__(self, db):
+        self.db = db
+        self.ensure_schema()
+
+    def ensure_schema(self):
+        cursor = self.db.cursor
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS plan_positions (
+                item_type TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                inventario_id INTEGER NOT NULL,
+                x REAL NOT NULL,
+                y REAL NOT NULL,
+                PRIMARY KEY (item_type, item_id)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_plan_positions_inv ON plan_positions (inventario_id)")
+        # Al borrar un equipo desaparece su chincheta; si cambia de centro, la posición deja de valer
+        for table in PLACEABLE_TABLES:
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_plan_{table}_del AFTER DELETE ON {table} BEGIN
+                    DELETE FROM plan_positions WHERE item_type='{table}' AND item_id=OLD.id;
+                END''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_plan_{table}_move AFTER UPDATE OF inventario_id ON {table}
+                WHEN OLD.inventario_id IS NOT NEW.inventario_id BEGIN
+                    DELETE FROM plan_positions WHERE item_type='{table}' AND item_id=OLD.id;
+                END''')
+        self.db.conn.commit()
+
+    def positions(self, inventory_id):
+        """[(item_type, item_id, x, y, etiqueta)] de los equipos ubicados en el plano del centro."""
+        parts = [f"SELECT p.item_type, p.item_id, p.x, p.y, {_label_sql(table)} FROM plan_positions p "
+                 f"JOIN {table} t ON t.id = p.item_id WHERE p.item_type='{table}' AND p.inventario_id=?"
+                 for table in PLACEABLE_TABLES]
+        return self.db.fetch_all(" UNION ALL ".join(parts), (inventory_id,) * len(parts))
+
+    def unplaced(self, inventory_id):
+        """[(item_type, item_id, etiqueta)] de los equipos del centro que aún no están en el plano."""
+        parts = [f"SELECT '{table}', t.id, {_label_sql(table)} FROM {table} t WHERE t.inventario_id=? AND NOT EXISTS "
+                 f"(SELECT 1 FROM plan_positions p WHERE p.item_type='{table}' AND p.item_id=t.id)"
+                 for table in PLACEABLE_TABLES]
+        return self.db.fetch_all(" UNION ALL ".join(parts), (inventory_id,) * len(parts))
+
+    def set_position(self, item_type, item_id, inventory_id, x, y):
+        self.db.execute_query(
+            "INSERT INTO plan_positions (item_type, item_id, inventario_id, x, y) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(item_type, item_id) DO UPDATE SET inventario_id=excluded.inventario_id, x=excluded.x, y=excluded.y",
+            (item_type, int(item_id), inventory_id, x, y))
+
+    def remove_position(self, item_type, item_id):
+        self.db.execute_query("DELETE FROM plan_positions WHERE item_type=? AND item_id=?", (item_type, int(item_id)))
+
+
+# --- Índice espacial ---
+class QuadTree:
+    """Quadtree de puntos para recortar las chinchetas visibles y localizar la pulsada."""
+    CAPACITY = 16
+    MAX_DEPTH = 12
+
+    def __init__(self, bounds=QRectF(0, 0, 1, 1), depth=0):
+        self.bounds = bounds
+        self.depth = depth
+        self.points = []
+        self.children = None
+
+    def insert(self, x, y, payload):
+        if not self.bounds.contains(QPointF(x, y)):
+            return False
+        if self.children is None:
+            if len(self.points) < self.CAPACITY or self.depth >= self.MAX_DEPTH:
+                self.points.append((x, y, payload))
+                return True
+            self._split()
+        return any(child.insert(x, y, payload) for child in self.children)
+
+    def _split(self):
+        b = self.bounds
+        half_w, half_h = b.width() / 2, b.height() / 2
+        self.children = [QuadTree(QRectF(b.left() + dx * half_w, b.top() + dy * half_h, half_w, half_h), self.depth + 1)
+                         for dy in (0, 1) for dx in (0, 1)]
+        points, self.points = self.points, []
+        for x, y, payload in points:
+            any(child.insert(x, y, payload) for child in self.children)
+
+    def query(self, rect, found=None):
+        """Puntos dentro de `rect` como [(x, y, payload)]."""
+        found = [] if found is None else found
+        if not self.bounds.intersects(rect) and not rect.contains(self.bounds.topLeft()):
+            return found
+        for x, y, payload in self.points:
+            if rect.left() <= x <= rect.right() and rect.top() <= y <= rect.bottom():
+                found.append((x, y, payload))
+        if self.children:
+            for child in self.children:
+                child.query(rect, found)
+        return found
+
+    def nearest(self, x, y, radius):
+        """Punto más cercano a (x, y) a una distancia máxima `radius`, o None."""
+        candidates = self.query(QRectF(x - radius, y - radius, radius * 2, radius * 2))
+        best = min(candidates, key=lambda p: (p[0] - x) ** 2 + (p[1] - y) ** 2, default=None)
+        if best and (best[0] - x) ** 2 + (best[1] - y) ** 2 <= radius ** 2:
+            return best
+        return None
+
+
+# --- Pirámide de mosaicos ---
+class TilePyramid:
+    """Pirámide multirresolución del plano en mosaicos de TILE píxeles guardados en disco.
+
+    El nivel 0 es la resolución original y cada nivel siguiente la mitad; el último
+    cabe en un solo mosaico. Se guarda en una carpeta por fichero (ruta, tamaño y
+    fecha), de modo que solo se genera la primera vez que se abre un plano."""
+
+    def __init__(self, image_path, cache_root):
+        self.image_path = image_path
+        self.size = QImageReader(image_path).size()
+        stat = os.stat(image_path)
+        key = f"{os.path.abspath(image_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        self.dir = os.path.join(cache_root, hashlib.sha1(key.encode('utf-8')).hexdigest()[:16])
+        longest = max(self.size.width(), self.size.height(), 1)
+        self.levels = max(1, math.ceil(math.log2(longest / TILE)) + 1) if longest > TILE else 1
+
+    def level_size(self, level):
+        scale = 0.5 ** level
+        return QSize(max(1, math.ceil(self.size.width() * scale)), max(1, math.ceil(self.size.height() * scale)))
+
+    def tile_path(self, level, col, row):
+        return os.path.join(self.dir, f"{level}_{col}_{row}.jpg")
+
+    def _marker(self, level):
+        return os.path.join(self.dir, f"nivel_{level}.ok")
+
+    def level_ready(self, level):
+        return os.path.exists(self._marker(level))
+
+    def is_built(self):
+        return all(self.level_ready(level) for level in range(self.levels))
+
+    def _save_tiles(self, level, image, first_row):
+        for col in range(math.ceil(image.width() / TILE)):
+            for r in range(math.ceil(image.height() / TILE)):
+                tile = image.copy(col * TILE, r * TILE, min(TILE, image.width() - col * TILE), min(TILE, image.height() - r * TILE))
+                tile.save(self.tile_path(level, col, first_row + r), 'JPG', 90)
+
+    def build(self, level_done=None, should_stop=None):
+        """Genera los niveles que falten, del más pequeño al original, llamando a `level_done(nivel)` al acabar cada uno.
+        Si `should_stop()` devuelve True se interrumpe; los niveles ya terminados se conservan."""
+        os.makedirs(self.dir, exist_ok=True)
+        probe = QImageReader(self.image_path)
+        by_strips = (probe.supportsOption(QImageIOHandler.ImageOption.ClipRect)
+                     and probe.supportsOption(QImageIOHandler.ImageOption.ScaledSize))
+        full = None
+        for level in reversed(range(self.levels)):
+            if self.level_ready(level):
+                continue
+            size = self.level_size(level)
+            if by_strips:
+                # JPEG y similares: cada franja de mosaicos se decodifica recortada y ya escalada,
+                # sin cargar nunca el plano entero en memoria
+                strip_src = TILE * 2 ** level
+                for row in range(math.ceil(size.height() / TILE)):
+                    if should_stop and should_stop():
+                        return
+                    reader = QImageReader(self.image_path)
+                    src_top = row * strip_src
+                    reader.setClipRect(QRect(0, src_top, self.size.width(), min(strip_src, self.size.height() - src_top)))
+                    reader.setScaledSize(QSize(size.width(), min(TILE, size.height() - row * TILE)))
+                    self._save_tiles(level, reader.read(), row)
+            else:
+                if should_stop and should_stop():
+                    return
+                if full is None:
+                    full = QImageReader(self.image_path).read()
+                image = full if level == 0 else full.scaled(size, Qt.AspectRatioMode.IgnoreAspectRatio,
+                                                            Qt.TransformationMode.SmoothTransformation)
+                self._save_tiles(level, image, 0)
+            open(self._marker(level), 'w').close()
+            if level_done:
+                level_done(level)
+
+
+class PyramidBuilder(QThread):
+    """Genera la pirámide en segundo plano avisando de cada nivel terminado."""
+    level_ready = pyqtSignal(int)
+
+    def __init__(self, pyramid, parent=None):
+        super().__init__(parent)
+        self.pyramid = pyramid
+
+    def run(self):
+        try:
+            self.pyramid.build(self.level_ready.emit, self.isInterruptionRequested)
+        except Exception as e:
+            print(f"No se pudo generar la pirámide del plano: {e}")
+
+
+# --- Vista del plano ---
+class FloorPlanCanvas(QWidget):
+    """Plano con zoom y desplazamiento que pinta solo los mosaicos y chinchetas visibles.
+
+    Señales: `pin_clicked(item_type, item_id)`, `pin_context(item_type, item_id, QPoint global)`
+    y `plan_clicked(x, y)` con coordenadas normalizadas del plano."""
+    # item_id como object: con un fichero por centro los ids pasan de 32 bits (ver shards.ID_BLOCK_BITS)
+    pin_clicked = pyqtSignal(str, object)
+    pin_context = pyqtSignal(str, object, object)
+    plan_clicked = pyqtSignal(float, float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pyramid = None
+        self.ready_levels = set()
+        self.loader = ImageLoader(self)
+        self.loader.loaded.connect(lambda key: self.update())
+        self.tree = QuadTree()
+        self.pin_count = 0
+        self.selected = None
+        self.zoom = None
+        self.offset = QPointF(0, 0)
+        self._press = None
+        self.setMinimumSize(500, 400)
+        self.setMouseTracking(False)
+
+    def set_pyramid(self, pyramid):
+        self.pyramid = pyramid
+        self.ready_levels = {level for level in range(pyramid.levels) if pyramid.level_ready(level)}
+        self.loader.failed.clear()
+        self.zoom = None
+        self.update()
+
+    def on_level_ready(self, level):
+        self.ready_levels.add(level)
+        # Los mosaicos del nivel recién escrito pueden haber fallado antes de existir
+        self.loader.failed.clear()
+        self.update()
+
+    def set_pins(self, pins):
+        """`pins`: [(item_type, item_id, x, y, etiqueta)]."""
+        self.tree = QuadTree()
+        for item_type, item_id, x, y, label in pins:
+            self.tree.insert(x, y, (item_type, item_id, label or ''))
+        self.pin_count = len(pins)
+        self.update()
+
+    # --- Geometría ---
+    def fit_scale(self):
+        size = self.pyramid.size
+        return min(self.width() / size.width(), self.height() / size.height())
+
+    def current_scale(self):
+        return self.fit_scale() if self.zoom is None else self.zoom
+
+    def image_rect(self):
+        scale = self.current_scale()
+        w, h = self.pyramid.size.width() * scale, self.pyramid.size.height() * scale
+        if self.zoom is None:
+            self.offset = QPointF((self.width() - w) / 2, (self.height() - h) / 2)
+        return QRectF(self.offset.x(), self.offset.y(), w, h)
+
+    def to_plan(self, pos):
+        rect = self.image_rect()
+        return (pos.x() - rect.left()) / rect.width(), (pos.y() - rect.top()) / rect.height()
+
+    def set_zoom(self, zoom, anchor):
+        old = self.current_scale()
+        self.image_rect()
+        zoom = max(self.fit_scale() * 0.5, min(4.0, zoom))
+        self.offset = anchor - (anchor - self.offset) * (zoom / old)
+        self.zoom = zoom
+        self.update()
+
+    # --- Pintado ---
+    def _level_for(self, scale):
+        wanted = max(0, min(self.pyramid.levels - 1, int(math.floor(math.log2(1 / scale))) if scale < 1 else 0))
+        # Si ese nivel aún se está generando, el más cercano de menor resolución ya disponible
+        for level in range(wanted, self.pyramid.levels):
+            if level in self.ready_levels:
+                return level
+        return None
+
+    def _draw_level(self, painter, level, target, visible):
+        size = self.pyramid.level_size(level)
+        scale = target.width() / size.width()
+        # El borde derecho/inferior de la vista puede caer justo fuera de la rejilla del nivel
+        first_col = max(0, int((visible.left() - target.left()) / (TILE * scale)))
+        last_col = min(int((visible.right() - target.left()) / (TILE * scale)), math.ceil(size.width() / TILE) - 1)
+        first_row = max(0, int((visible.top() - target.top()) / (TILE * scale)))
+        last_row = min(int((visible.bottom() - target.top()) / (TILE * scale)), math.ceil(size.height() / TILE) - 1)
+        complete = True
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                path = self.pyramid.tile_path(level, col, row)
+                tile = _CACHE.get(path)
+                if tile is None:
+                    complete = False
+                    self.loader.request(path, lambda path=path: QImage(path))
+                    continue
+                painter.drawImage(QRectF(target.left() + col * TILE * scale, target.top() + row * TILE * scale,
+                                         tile.width() * scale, tile.height() * scale), tile)
+        return complete
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor('#505050'))
+        if self.pyramid is None:
+            return
+        target = self.image_rect()
+        visible = QRectF(self.rect()).intersected(target)
+        level = self._level_for(self.current_scale())
+        if level is None:
+            painter.setPen(Qt.GlobalColor.white)
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "Preparando el plano...")
+        else:
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+            # Fondo con el nivel más pequeño (un solo mosaico) mientras llegan los del nivel adecuado
+            coarsest = self.pyramid.levels - 1
+            if level != coarsest and coarsest in self.ready_levels:
+                self._draw_level(painter, coarsest, target, visible)
+            self._draw_level(painter, level, target, visible)
+        self._draw_pins(painter, target, visible)
+
+    def _draw_pins(self, painter, target, visible):
+        plan_rect = QRectF((visible.left() - target.left()) / target.width(), (visible.top() - target.top()) / target.height(),
+                           visible.width() / target.width(), visible.height() / target.height())
+        pins = self.tree.query(plan_rect)
+        show_labels = len(pins) <= MAX_LABELS
+        if len(pins) > MAX_PINS_DRAWN:
+            # Vista muy alejada: una chincheta por celda de pantalla, sin suavizado
+            cells = {}
+            for pin in pins:
+                cell = (int(pin[0] * target.width() / (PIN_RADIUS * 2)), int(pin[1] * target.height() / (PIN_RADIUS * 2)))
+                cells.setdefault(cell, pin)
+            pins = list(cells.values())
+        else:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        for x, y, (item_type, item_id, label) in pins:
+            center = QPointF(target.left() + x * target.width(), target.top() + y * target.height())
+            selected = self.selected == (item_type, item_id)
+            painter.setPen(QPen(QColor('yellow') if selected else QColor('white'), 3 if selected else 1.5))
+            painter.setBrush(QColor(PIN_COLORS.get(item_type, '#333333')))
+            painter.drawEllipse(center, PIN_RADIUS, PIN_RADIUS)
+            if show_labels and label:
+                painter.setPen(Qt.GlobalColor.black)
+                painter.drawText(center + QPointF(PIN_RADIUS + 2, 4), label)
+
+    # --- Ratón ---
+    def pin_at(self, pos):
+        if self.pyramid is None:
+            return None
+        rect = self.image_rect()
+        x, y = self.to_plan(pos)
+        radius = (PIN_RADIUS + 2) / min(rect.width(), rect.height())
+        hit = self.tree.nearest(x, y, radius)
+        return hit[2] if hit else None
+
+    def wheelEvent(self, event):
+        if self.pyramid is not None:
+            factor = 1.25 if event.angleDelta().y() > 0 else 0.8
+            self.set_zoom(self.current_scale() * factor, event.position())
+
+    def mousePressEvent(self, event):
+        if self.pyramid is None:
+            return
+        if event.button() == Qt.MouseButton.RightButton:
+            pin = self.pin_at(event.position())
+            if pin:
+                self.pin_context.emit(pin[0], pin[1], event.globalPosition().toPoint())
+            return
+        self.image_rect()
+        self._press = (event.position(), QPointF(self.offset), False)
+
+    def mouseMoveEvent(self, event):
+        if self._press is None:
+            return
+        start, offset, _ = self._press
+        delta = event.position() - start
+        if abs(delta.x()) + abs(delta.y()) > 4:
+            if self.zoom is None:
+                self.zoom = self.fit_scale()
+            self.offset = offset + delta
+            self._press = (start, offset, True)
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if self._press is None:
+            return
+        dragged = self._press[2]
+        self._press = None
+        if dragged or event.button() != Qt.MouseButton.LeftButton:
+            return
+        pin = self.pin_at(event.position())
+        if pin:
+            self.selected = (pin[0], pin[1])
+            self.update()
+            self.pin_clicked.emit(pin[0], pin[1])
+            return
+        x, y = self.to_plan(event.position())
+        if 0 <= x <= 1 and 0 <= y <= 1:
+            self.plan_clicked.emit(x, y)
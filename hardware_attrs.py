@@ -0,0 +1,318 @@
+# hardware_attrs.py
+import hashlib
+import json
+import re
+
+from database import merge_totals
+
+# Versión de los analizadores: al cambiarla se vuelven a analizar todos los PCs
+PARSER_VERSION = 1
+
+# Campos normalizados de `pcs_attrs` (además de pc_id, inventario_id y dirty)
+ATTRIBUTES = ['ram_gb', 'disco_gb', 'disco_tipo', 'cpu_familia', 'cpu_generacion', 'so_familia', 'so_version']
+
+# Umbral de RAM por debajo del cual un PC cuenta como "poca memoria" en el dashboard
+LOW_RAM_GB = 8
+
+# Filas analizadas por transacción al rellenar la tabla (no bloquear la interfaz ni la base de datos)
+BATCH_SIZE = 500
+
+_UNITS = {'T': 1024.0, 'TB': 1024.0, 'G': 1.0, 'GB': 1.0, 'M': 1 / 1024.0, 'MB': 1 / 1024.0}
+# Número con unidad opcional; no vale si va pegado a letras (DDR4, i5) ni seguido de Hz
+_SIZE = re.compile(r'(?<![A-Z0-9.])(\d+(?:[.,]\d+)?)\s*(TB|GB|MB|T|G|M)?(?![A-Z0-9]*HZ)(?![A-Z])')
+_MULTIPLIED = re.compile(r'(\d+)\s*[X×]\s*(\d+(?:[.,]\d+)?)\s*(TB|GB|MB|T|G|M)?')
+_DISK_PARTS = re.compile(r'\+|/|,|;|\bY\b|&')
+
+
+def _number(text):
+    return float(text.replace(',', '.'))
+
+
+def _sizes(text):
+    return [(_number(value), unit) for value, unit in _SIZE.findall(text)]
+
+
+def parse_ram(text):
+    """'8GB', '8 GB DDR4', '2x4GB', '512MB', '16' -> GB (float) o None."""
+    if not text:
+        return None
+    upper = text.upper()
+    multiplied = _MULTIPLIED.search(upper)
+    if multiplied:
+        count, value, unit = multiplied.groups()
+        return int(count) * _number(value) * _UNITS.get(unit or 'GB', 1.0)
+    sizes = _sizes(upper)
+    with_unit = [s for s in sizes if s[1]]
+    value, unit = (with_unit or sizes or [(None, None)])[0]
+    if value is None:
+        return None
+    return value * _UNITS.get(unit or 'GB', 1.0)
+
+
+def _disk_type(part):
+    if 'NVME' in part or 'M.2' in part or 'M2' in part.split():
+        return 'NVMe'
+    if 'SSD' in part or 'SOLIDO' in part or 'SÓLIDO' in part:
+        return 'SSD'
+    if 'HDD' in part or 'SATA' in part or 'MECANICO' in part or 'MECÁNICO' in part or 'RPM' in part:
+        return 'HDD'
+    return None
+
+
+def parse_disk(text):
+    """'512 SSD', '1TB HDD', '256GB SSD + 1TB' -> (GB totales, tipo) con tipo SSD/NVMe/HDD/Mixto o None."""
+    if not text:
+        return None, None
+    total = None
+    types = set()
+    for part in _DISK_PARTS.split(text.upper()):
+        sizes = _sizes(part)
+        if sizes:
+            value, unit = sizes[0]
+            # Sin unidad, las cifras pequeñas son TB ("1", "2") y las demás GB ("500", "256")
+            gb = value * _UNITS[unit] if unit else (value * 1024 if value < 16 else value)
+            total = (total or 0) + gb
+        disk_type = _disk_type(part)
+        if disk_type:
+            types.add(disk_type)
+    disk_type = types.pop() if len(types) == 1 else ('Mixto' if types else None)
+    return total, disk_type
+
+
+_INTEL_CORE = re.compile(r'\bI([3579])\b(?:\s*-?\s*(\d{3,5})[A-Z]*)?')
+_RYZEN = re.compile(r'RYZEN\s*([3579])(?:\s*(?:PRO\s*)?-?\s*(\d{4}))?')
+_GENERATION = re.compile(r'(\d{1,2})\s*(?:ª|º|TH|ND|RD|ST|A)?\s*(?:GEN|GENERACI)')
+_OTHER_CPUS = [('CELERON', 'Celeron'), ('PENTIUM', 'Pentium'), ('ATOM', 'Atom'), ('XEON', 'Xeon'),
+               ('ATHLON', 'Athlon'), ('CORE 2', 'Core 2'), ('CORE2', 'Core 2'), ('EPYC', 'EPYC')]
+
+
+def _intel_generation(model):
+    # i7-920 -> 1ª; i5-8400 -> 8ª; i7-10700 -> 10ª; i5-1135G7 (portátil, 4 cifras empezando por 1) -> 11ª
+    if len(model) == 3:
+        return 1
+    if len(model) == 5 or model.startswith('1'):
+        return int(model[:2])
+    return int(model[0])
+
+
+def parse_cpu(text):
+    """'i5-8400', 'Core i7 10700', 'i3 4ª gen', 'Ryzen 5 3600', 'Celeron J4005' -> (familia, generación)."""
+    if not text:
+        return None, None
+    upper = text.upper()
+    generation = None
+    explicit = _GENERATION.search(upper)
+    if explicit:
+        generation = int(explicit.group(1))
+
+    intel = _INTEL_CORE.search(upper)
+    if intel:
+        tier, model = intel.groups()
+        if model and generation is None:
+            generation = _intel_generation(model)
+        return f"Core i{tier}", generation
+    ryzen = _RYZEN.search(upper)
+    if ryzen:
+        tier, model = ryzen.groups()
+        if model and generation is None:
+            generation = int(model[0])
+        return f"Ryzen {tier}", generation
+    if 'APPLE' in upper or re.search(r'\bM[1-4]\b', upper):
+        chip = re.search(r'\bM([1-4])\b', upper)
+        return 'Apple M', int(chip.group(1)) if chip else generation
+    for token, family in _OTHER_CPUS:
+        if token in upper:
+            return family, generation
+    return text.strip()[:40], generation
+
+
+_WINDOWS = re.compile(r'\b(?:WINDOWS|WIN)\s*-?\s*(XP|VISTA|SERVER\s*\d{4}(?:\s*R2)?|\d{1,2}(?:\.1)?)\b|\bW(7|8|10|11)\b')
+_LINUX = ['UBUNTU', 'DEBIAN', 'MINT', 'FEDORA', 'CENTOS', 'RED HAT', 'SUSE', 'LLIUREX', 'MAX', 'LINUX']
+
+
+def parse_os(text):
+    """'Windows 10 Pro', 'W11', 'Ubuntu 22.04', 'macOS 13' -> (familia, versión)."""
+    if not text:
+        return None, None
+    upper = text.upper()
+    windows = _WINDOWS.search(upper)
+    if windows or 'WINDOWS' in upper:
+        version = next((g for g in windows.groups() if g), None) if windows else None
+        return 'Windows', re.sub(r'\s+', ' ', version.title()) if version else None
+    if 'MAC' in upper or 'OS X' in upper:
+        version = re.search(r'(\d+(?:\.\d+)?)', upper)
+        return 'macOS', version.group(1) if version else None
+    if 'CHROME' in upper:
+        return 'ChromeOS', None
+    for distro in _LINUX:
+        if re.search(rf'\b{distro}\b', upper):
+            version = re.search(r'(\d+(?:\.\d+)?)', upper)
+            name = 'Linux' if distro == 'LINUX' else distro.title()
+            return 'Linux', f"{name} {version.group(1)}" if version else name
+    return 'Otro', text.strip()[:40]
+
+
+def parse_pc(ram, disco, core, so):
+    """Atributos normalizados de un PC en el orden de ATTRIBUTES."""
+    disco_gb, disco_tipo = parse_disk(disco)
+    cpu_familia, cpu_generacion = parse_cpu(core)
+    so_familia, so_version = parse_os(so)
+    return (parse_ram(ram), disco_gb, disco_tipo, cpu_familia, cpu_generacion, so_familia, so_version)
+
+
+class HardwareAttributes:
+    """Atributos de hardware de los PCs ya analizados (`pcs_attrs`, una fila por PC)
+    para filtrar por rangos y agregar en SQL con índices.
+
+    Los triggers solo marcan como pendientes (`dirty`) los PCs dados de alta o con
+    RAM, disco, CPU o S.O. modificados; el análisis de texto se hace en Python con
+    `refresh()`, por lotes. Antes de consultar un centro se llama a `refresh(centro)`,
+    que apenas cuesta si no hay nada pendiente (índice parcial sobre las pendientes)."""
+
+    def __init__(self, db):
+        self.db = db
+        self.ensure_schema()
+
+    def _signature(self):
+        return hashlib.sha1(json.dumps([PARSER_VERSION, ATTRIBUTES]).encode('utf-8')).hexdigest()
+
+    def ensure_schema(self):
+        cursor = self.db.cursor
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pcs_attrs (
+                pc_id INTEGER PRIMARY KEY,
+                inventario_id INTEGER,
+                dirty INTEGER NOT NULL DEFAULT 1,
+                ram_gb REAL,
+                disco_gb REAL,
+                disco_tipo TEXT,
+                cpu_familia TEXT,
+                cpu_generacion INTEGER,
+                so_familia TEXT,
+                so_version TEXT
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pcs_attrs_ram ON pcs_attrs (inventario_id, ram_gb)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pcs_attrs_disco ON pcs_attrs (inventario_id, disco_gb)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pcs_attrs_cpu ON pcs_attrs (inventario_id, cpu_familia, cpu_generacion)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pcs_attrs_so ON pcs_attrs (inventario_id, so_familia, so_version)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pcs_attrs_dirty ON pcs_attrs (inventario_id, pc_id) WHERE dirty = 1")
+
+        if self.db.get_meta('hardware_attrs_signature') != self._signature():
+            self._install()
+
+    def _install(self):
+        """Crea los triggers y marca todos los PCs como pendientes (se rellenan con `refresh`)."""
+        cursor = self.db.cursor
+        mark = ("INSERT INTO pcs_attrs (pc_id, inventario_id, dirty) VALUES (NEW.id, NEW.inventario_id, 1) "
+                "ON CONFLICT(pc_id) DO UPDATE SET inventario_id = excluded.inventario_id, dirty = 1;")
+        try:
+            for name in ('trg_hw_pcs_ins', 'trg_hw_pcs_upd', 'trg_hw_pcs_del'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"CREATE TRIGGER trg_hw_pcs_ins AFTER INSERT ON pcs BEGIN {mark} END")
+            cursor.execute(f"CREATE TRIGGER trg_hw_pcs_upd AFTER UPDATE OF ram, disco, core, so, inventario_id ON pcs BEGIN {mark} END")
+            cursor.execute("CREATE TRIGGER trg_hw_pcs_del AFTER DELETE ON pcs BEGIN DELETE FROM pcs_attrs WHERE pc_id = OLD.id; END")
+            cursor.execute("DELETE FROM pcs_attrs WHERE pc_id NOT IN (SELECT id FROM pcs)")
+            cursor.execute("INSERT INTO pcs_attrs (pc_id, inventario_id, dirty) SELECT id, inventario_id, 1 FROM pcs WHERE true "
+                           "ON CONFLICT(pc_id) DO UPDATE SET inventario_id = excluded.inventario_id, dirty = 1")
+            cursor.execute("INSERT INTO app_meta (key, value) VALUES ('hardware_attrs_signature', ?) "
+                           "ON CONFLICT(key) DO UPDATE SET value=excluded.value", (self._signature(),))
+            self.db.conn.commit()
+        except Exception:
+            self.db.conn.rollback()
+            raise
+
+    def pending(self):
+        return self.db.fetch_one("SELECT COUNT(*) FROM pcs_attrs WHERE dirty = 1")[0]
+
+    def refresh_batch(self, batch_size=BATCH_SIZE, inventory_id=None):
+        """Analiza un lote de PCs pendientes (de un centro o de todos) en una transacción.
+        Devuelve cuántos se han procesado."""
+        where, params = ("AND a.inventario_id = ?", (inventory_id,)) if inventory_id is not None else ("", ())
+        rows = self.db.fetch_all(f'''
+            SELECT p.id, p.ram, p.disco, p.core, p.so FROM pcs_attrs a JOIN pcs p ON p.id = a.pc_id
+            WHERE a.dirty = 1 {where} LIMIT ?
+        ''', params + (batch_size,))
+        if not rows:
+            return 0
+        assignments = ", ".join(f"{column}=?" for column in ATTRIBUTES)
+        with self.db.transaction():
+            self.db.cursor.executemany(f"UPDATE pcs_attrs SET {assignments}, dirty = 0 WHERE pc_id = ?",
+                                       [parse_pc(ram, disco, core, so) + (pc_id,) for pc_id, ram, disco, core, so in rows])
+        return len(rows)
+
+    def refresh(self, inventory_id=None, batch_size=BATCH_SIZE):
+        """Procesa todos los pendientes (de un centro o de todos), lote a lote. Devuelve el total procesado."""
+        total = 0
+        while True:
+            done = self.refresh_batch(batch_size, inventory_id)
+            if not done:
+                return total
+            total += done
+
+
+# --- Consultas (reciben la conexión para poder ejecutarse en el hilo de base de datos) ---
+def filter_pcs(db, inventory_id, ram_min=None, ram_max=None, disco_min=None, disco_max=None, disco_tipo=None,
+               cpu_familia=None, cpu_generacion_min=None, so_familia=None):
+    """Ids de los PCs del centro que cumplen todos los filtros indicados (los None no filtran)."""
+    conditions = ["inventario_id = ?"]
+    params = [inventory_id]
+    for column, operator, value in (('ram_gb', '>=', ram_min), ('ram_gb', '<=', ram_max),
+                                    ('disco_gb', '>=', disco_min), ('disco_gb', '<=', disco_max),
+                                    ('disco_tipo', '=', disco_tipo), ('cpu_familia', '=', cpu_familia),
+                                    ('cpu_generacion', '>=', cpu_generacion_min), ('so_familia', '=', so_familia)):
+        if value is not None:
+            conditions.append(f"{column} {operator} ?")
+            params.append(value)
+    rows = db.fetch_all(f"SELECT pc_id FROM pcs_attrs WHERE {' AND '.join(conditions)}", tuple(params))
+    return {pc_id for (pc_id,) in rows}
+
+
+def distinct_values(db, column):
+    """Valores presentes de un atributo (para los desplegables de filtro)."""
+    if column not in ATTRIBUTES:
+        raise ValueError(f"Atributo desconocido: {column}")
+    return [value for (value,) in db.fetch_all(
+        f"SELECT DISTINCT {column} FROM pcs_attrs WHERE {column} IS NOT NULL ORDER BY {column}")]
+
+
+def summary(db, inventory_id=None):
+    """Agregados de hardware de un centro (o de toda la flota si `inventory_id` es None)."""
+    where, params = ("WHERE inventario_id = ?", (inventory_id,)) if inventory_id is not None else ("", ())
+    # Subtotales por centro (uno solo con una única base de datos) que se suman aquí
+    parts = db.fleet_query(f'''
+        SELECT COUNT(*), SUM(ram_gb), COUNT(ram_gb), SUM(disco_gb),
+               SUM(disco_tipo IN ('SSD', 'NVMe')), SUM(ram_gb < {LOW_RAM_GB})
+        FROM {{db}}pcs_attrs {where}
+    ''', params, inventory_id)
+    pcs, ram_total, ram_count, disco_total, ssd, poca_ram = (sum(part[i] or 0 for part in parts) for i in range(6))
+    cpus = merge_totals(db.fleet_query(f'''
+        SELECT cpu_familia, COUNT(*) FROM {{db}}pcs_attrs {where} {'AND' if where else 'WHERE'} cpu_familia IS NOT NULL
+        GROUP BY cpu_familia
+    ''', params, inventory_id))
+    return {
+        'pcs': pcs,
+        'ram_total_gb': ram_total,
+        'ram_media_gb': ram_total / ram_count if ram_count else 0,
+        'disco_total_gb': disco_total,
+        'pcs_ssd': ssd,
+        'pcs_poca_ram': poca_ram,
+        'cpus': cpus,
+    }
+
+
+def storage_by_centro(db):
+    """[(cliente, PCs, GB de disco, GB de RAM)] de todos los centros, de más a menos almacenamiento."""
+    rows = db.fleet_query('''
+        SELECT i.cliente, COUNT(a.pc_id), COALESCE(SUM(a.disco_gb), 0), COALESCE(SUM(a.ram_gb), 0)
+        FROM {db}pcs_attrs a JOIN {db}inventarios i ON i.id = a.inventario_id
+        GROUP BY a.inventario_id
+    ''')
+    return sorted(rows, key=lambda row: (-row[2], row[0]))
+
+
+def format_gb(gb):
+    """Tamaño legible: '512 GB', '1.5 TB'."""
+    if gb >= 1024:
+        return f"{gb / 1024:.1f} TB"
+    return f"{gb:.0f} GB"
@@ -0,0 +1,393 @@
+# image_viewer.py
+import os
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+
+from PyQt6.QtCore import Qt, QObject, QRect, QRectF, QPointF, QSize, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImageReader, QImageIOHandler, QPainter, QGuiApplication
+from PyQt6.QtWidgets import QDialog, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QMessageBox
+
+# Memoria máxima para imágenes decodificadas (compartida por todos los visores)
+CACHE_BYTES = 256 * 1024 * 1024
+# Lado de los mosaicos (en píxeles de la imagen original) que se decodifican al hacer zoom
+TILE_SIZE = 1024
+# Imágenes vecinas que se precargan a cada lado de la actual
+PREFETCH = 2
+MAX_ZOOM = 4.0
+
+
+def open_with_system_viewer(path):
+    """Abre la imagen con el visor del sistema operativo."""
+    if sys.platform == "win32":
+        os.startfile(path)
+    elif sys.platform == "darwin":
+        subprocess.call(["open", path])
+    else:
+        subprocess.call(["xdg-open", path])
+
+
+class ImageCache:
+    """LRU de QImage decodificadas limitada por bytes. Segura entre hilos."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._items.get(key)
+            if image is not None:
+                self._items.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= old.sizeInBytes()
+            self._items[key] = image
+            self.bytes += image.sizeInBytes()
+            while self.bytes > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self.bytes -= evicted.sizeInBytes()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+_CACHE = ImageCache()
+
+
+def screen_size():
+    """Resolución de pantalla en píxeles físicos: tamaño al que se decodifica cada foto para verla entera."""
+    screen = QGuiApplication.primaryScreen()
+    if screen is None:
+        return QSize(1920, 1080)
+    return screen.availableSize() * screen.devicePixelRatio()
+
+
+def decode(path, max_size=None, clip=None, scale=1.0):
+    """Decodifica `path` entera ajustada a `max_size`, o solo la región `clip` (coordenadas originales) a escala `scale`."""
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if clip is not None:
+        reader.setClipRect(clip)
+        reader.setScaledSize(QSize(max(1, round(clip.width() * scale)), max(1, round(clip.height() * scale))))
+    elif max_size is not None and size.isValid() and (size.width() > max_size.width() or size.height() > max_size.height()):
+        reader.setScaledSize(size.scaled(max_size, Qt.AspectRatioMode.KeepAspectRatio))
+    return reader.read()
+
+
+def original_size(path):
+    """Tamaño original ya orientado según EXIF y si la imagen admite mosaicos.
+
+    Las fotos con orientación EXIF no se decodifican por mosaicos (el recorte se
+    aplica antes de girar): al ampliarlas se escala la imagen a resolución de pantalla."""
+    reader = QImageReader(path)
+    size = reader.size()
+    transformation = reader.transformation()
+    if transformation & QImageIOHandler.Transformation.TransformationRotate90:
+        size = size.transposed()
+    return size, transformation == QImageIOHandler.Transformation.TransformationNone
+
+
+class _DecodeSignals(QObject):
+    decoded = pyqtSignal(object, bool)
+
+
+class _DecodeTask(QRunnable):
+    def __init__(self, key, func, signals):
+        super().__init__()
+        self.key = key
+        self.func = func
+        self.signals = signals
+
+    def run(self):
+        image = self.func()
+        ok = image is not None and not image.isNull()
+        if ok:
+            _CACHE.put(self.key, image)
+        self.signals.decoded.emit(self.key, ok)
+
+
+class ImageLoader(QObject):
+    """Decodifica en segundo plano y avisa con `loaded(key)` cuando la imagen está en la caché.
+    Las claves que no se pudieron decodificar quedan en `failed` y no se vuelven a pedir."""
+    loaded = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self._pending = set()
+        self.failed = set()
+        self._signals = _DecodeSignals()
+        self._signals.decoded.connect(self._on_decoded)
+
+    def request(self, key, func, priority=0):
+        if key in self._pending or key in self.failed or _CACHE.get(key) is not None:
+            return
+        self._pending.add(key)
+        self.pool.start(_DecodeTask(key, func, self._signals), priority)
+
+    def _on_decoded(self, key, ok):
+        self._pending.discard(key)
+        if not ok:
+            self.failed.add(key)
+        self.loaded.emit(key)
+
+    def shutdown(self):
+        self.pool.clear()
+        self.pool.waitForDone()
+
+
+class ImageCanvas(QWidget):
+    """Lienzo con zoom (rueda) y desplazamiento (arrastrar). Dibuja la imagen a resolución de
+    pantalla y, al ampliar, superpone los mosaicos a resolución completa que ya estén decodificados."""
+
+    def __init__(self, loader, parent=None):
+        super().__init__(parent)
+        self.loader = loader
+        self.path = None
+        self.base = None
+        self.error = None
+        self.full_size = QSize()
+        self.tiles_allowed = True
+        self.zoom = None  # None = ajustar a la ventana
+        self.offset = QPointF(0, 0)
+        self._drag_start = None
+        self.setMinimumSize(400, 300)
+        self.setStyleSheet("background-color: #202020;")
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+
+    def set_image(self, path, base, full_size, tiles_allowed, error=None):
+        self.path = path
+        self.base = base
+        self.error = error
+        self.full_size = full_size
+        self.tiles_allowed = tiles_allowed
+        self.zoom = None
+        self.offset = QPointF(0, 0)
+        self.update()
+
+    def fit_scale(self):
+        if not self.full_size.isValid() or self.full_size.isEmpty():
+            return 1.0
+        return min(self.width() / self.full_size.width(), self.height() / self.full_size.height())
+
+    def current_scale(self):
+        return self.fit_scale() if self.zoom is None else self.zoom
+
+    def set_zoom(self, zoom, anchor=None):
+        old = self.current_scale()
+        self.offset = self._image_rect().topLeft()
+        zoom = max(self.fit_scale(), min(MAX_ZOOM, zoom))
+        anchor = anchor or QPointF(self.width() / 2, self.height() / 2)
+        # Mantener fijo el punto de la imagen bajo el cursor
+        self.offset = anchor - (anchor - self.offset) * (zoom / old)
+        self.zoom = zoom
+        self.update()
+
+    def _image_rect(self):
+        scale = self.current_scale()
+        w, h = self.full_size.width() * scale, self.full_size.height() * scale
+        if self.zoom is None:
+            return QRectF((self.width() - w) / 2, (self.height() - h) / 2, w, h)
+        # Centrar si la imagen es menor que el lienzo; si no, limitar el desplazamiento
+        x = (self.width() - w) / 2 if w <= self.width() else min(0, max(self.width() - w, self.offset.x()))
+        y = (self.height() - h) / 2 if h <= self.height() else min(0, max(self.height() - h, self.offset.y()))
+        self.offset = QPointF(x, y)
+        return QRectF(x, y, w, h)
+
+    def _tile_scale(self, scale):
+        # Niveles en potencias de 2 (1, 1/2, 1/4...) para reutilizar mosaicos entre zooms parecidos
+        level = 1.0
+        while level / 2 >= scale and level > 1 / 16:
+            level /= 2
+        return level
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.GlobalColor.black)
+        if self.base is None or self.base.isNull():
+            painter.setPen(Qt.GlobalColor.white)
+            text = self.error or ("Cargando..." if self.path else "")
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, text)
+            return
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        target = self._image_rect()
+        painter.drawImage(target, self.base)
+
+        scale = self.current_scale()
+        # Mosaicos solo al ampliar: ajustada a la ventana basta la imagen a resolución de pantalla
+        if (self.zoom is not None and self.tiles_allowed and self.full_size.isValid()
+                and scale > self.base.width() / self.full_size.width() * 1.05):
+            self._paint_tiles(painter, target, scale)
+
+    def _paint_tiles(self, painter, target, scale):
+        level = self._tile_scale(scale)
+        visible = QRectF(self.rect()).intersected(target)
+        # Región visible en coordenadas de la imagen original
+        left = int((visible.left() - target.left()) / scale)
+        top = int((visible.top() - target.top()) / scale)
+        right = int((visible.right() - target.left()) / scale)
+        bottom = int((visible.bottom() - target.top()) / scale)
+        for row in range(top // TILE_SIZE, bottom // TILE_SIZE + 1):
+            for col in range(left // TILE_SIZE, right // TILE_SIZE + 1):
+                clip = QRect(col * TILE_SIZE, row * TILE_SIZE, TILE_SIZE, TILE_SIZE).intersected(QRect(0, 0, self.full_size.width(), self.full_size.height()))
+                if clip.isEmpty():
+                    continue
+                key = (self.path, 'tile', col, row, level)
+                tile = _CACHE.get(key)
+                if tile is None:
+                    path = self.path
+                    self.loader.request(key, lambda path=path, clip=clip, level=level: decode(path, clip=clip, scale=level), priority=1)
+                    continue
+                dest = QRectF(target.left() + clip.left() * scale, target.top() + clip.top() * scale,
+                              clip.width() * scale, clip.height() * scale)
+                painter.drawImage(dest, tile)
+
+    def wheelEvent(self, event):
+        factor = 1.25 if event.angleDelta().y() > 0 else 0.8
+        self.set_zoom(self.current_scale() * factor, event.position())
+
+    def mousePressEvent(self, event):
+        self._drag_start = (event.position(), self.offset)
+
+    def mouseMoveEvent(self, event):
+        if self._drag_start is not None and self.zoom is not None:
+            start, offset = self._drag_start
+            self.offset = offset + (event.position() - start)
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        self._drag_start = None
+
+    def mouseDoubleClickEvent(self, event):
+        if self.zoom is None:
+            self.set_zoom(1.0, event.position())
+        else:
+            self.zoom = None
+            self.update()
+
+
+
+class ImageViewerDialog(QDialog):
+    """Visor de las fotos de un equipo con anterior/siguiente (flechas del teclado).
+
+    Cada foto se decodifica ya escalada a la resolución de pantalla y las vecinas
+    se precargan en segundo plano; las imágenes decodificadas quedan en una caché
+    LRU limitada en memoria, de modo que pasar de una foto a otra es inmediato."""
+
+    def __init__(self, paths, index=0, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Visor de Imágenes")
+        self.resize(1100, 800)
+        self.paths = paths
+        self.index = index
+        self.screen = screen_size()
+        self._sizes = {}
+
+        self.loader = ImageLoader(self)
+        self.loader.loaded.connect(self._on_loaded)
+        self.canvas = ImageCanvas(self.loader)
+
+        self.label_position = QLabel()
+        self.btn_prev = QPushButton("< Anterior")
+        self.btn_next = QPushButton("Siguiente >")
+        self.btn_fit = QPushButton("Ajustar")
+        self.btn_actual = QPushButton("100%")
+        self.btn_external = QPushButton("Abrir con visor externo")
+        self.btn_close = QPushButton("Cerrar")
+
+        buttons = QHBoxLayout()
+        for widget in (self.btn_prev, self.btn_next, self.label_position):
+            buttons.addWidget(widget)
+        buttons.addStretch()
+        for widget in (self.btn_fit, self.btn_actual, self.btn_external, self.btn_close):
+            buttons.addWidget(widget)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.canvas, 1)
+        layout.addLayout(buttons)
+
+        self.btn_prev.clicked.connect(lambda: self.show_index(self.index - 1))
+        self.btn_next.clicked.connect(lambda: self.show_index(self.index + 1))
+        self.btn_fit.clicked.connect(self.fit)
+        self.btn_actual.clicked.connect(lambda: self.canvas.set_zoom(1.0))
+        self.btn_external.clicked.connect(self.open_external)
+        self.btn_close.clicked.connect(self.accept)
+
+        self.show_index(index)
+
+    def _base_key(self, path):
+        return (path, 'pantalla', self.screen.width(), self.screen.height())
+
+    def _request_base(self, path, priority):
+        self.loader.request(self._base_key(path), lambda: decode(path, self.screen), priority)
+
+    def show_index(self, index):
+        if not self.paths:
+            return
+        self.index = index % len(self.paths)
+        path = self.paths[self.index]
+        self.label_position.setText(f"{self.index + 1} / {len(self.paths)} - {os.path.basename(path)}")
+        if path not in self._sizes:
+            self._sizes[path] = original_size(path)
+        full_size, tiles_allowed = self._sizes[path]
+        key = self._base_key(path)
+        base = _CACHE.get(key)
+        error = self._error_text(path) if key in self.loader.failed else None
+        self.canvas.set_image(path, base, full_size, tiles_allowed, error)
+        if base is None and error is None:
+            self._request_base(path, priority=2)
+        self._prefetch()
+
+    def _prefetch(self):
+        for step in range(1, PREFETCH + 1):
+            for neighbour in (self.index + step, self.index - step):
+                self._request_base(self.paths[neighbour % len(self.paths)], priority=0)
+
+    def _on_loaded(self, key):
+        if not self.paths or key[0] != self.paths[self.index]:
+            return
+        if key == self._base_key(key[0]):
+            self.canvas.base = _CACHE.get(key)
+            if key in self.loader.failed:
+                self.canvas.error = self._error_text(key[0])
+        self.canvas.update()
+
+    def _error_text(self, path):
+        reason = "el fichero no existe" if not os.path.exists(path) else "formato no válido o fichero dañado"
+        return f"No se pudo abrir la imagen ({reason}).\nPruebe con el visor externo."
+
+    def fit(self):
+        self.canvas.zoom = None
+        self.canvas.update()
+
+    def open_external(self):
+        try:
+            open_with_system_viewer(self.paths[self.index])
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudo abrir la imagen: {e}")
+
+    def keyPressEvent(self, event):
+        if event.key() in (Qt.Key.Key_Right, Qt.Key.Key_PageDown, Qt.Key.Key_Space):
+            self.show_index(self.index + 1)
+        elif event.key() in (Qt.Key.Key_Left, Qt.Key.Key_PageUp, Qt.Key.Key_Backspace):
+            self.show_index(self.index - 1)
+        elif event.key() == Qt.Key.Key_Home:
+            self.show_index(0)
+        elif event.key() == Qt.Key.Key_End:
+            self.show_index(len(self.paths) - 1)
+        else:
+            super().keyPressEvent(event)
+
+    def done(self, result):
+        self.loader.shutdown()
+        super().done(result)
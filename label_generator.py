@@ -0,0 +1,251 @@
+# label_generator.py
+"""Hojas de etiquetas adhesivas (plantillas tipo Avery) con código, ubicación y un
+código QR que identifica cada equipo.
+
+Uso sin interfaz:
+    python label_generator.py inventario.db etiquetas.pdf                       # todos los centros
+    python label_generator.py inventario.db etiquetas.pdf --centro 3 --tablas pcs,red --plantilla L7651
+"""
+import argparse
+import functools
+import os
+import sys
+from collections import namedtuple
+
+from reportlab.graphics.barcode import qrencoder
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import Canvas
+
+from app_paths import resource_path
+from database import DatabaseManager, EQUIPMENT_TABLES, LABEL_TABLES
+
+# Medidas en mm; paso = distancia entre el origen de una etiqueta y el de la siguiente
+LabelLayout = namedtuple('LabelLayout', 'descripcion pagina columnas filas ancho alto margen_izq margen_sup paso_h paso_v')
+
+LAYOUTS = {
+    'L7160': LabelLayout('Avery L7160 - 21 por hoja (63,5 x 38,1 mm)', A4, 3, 7, 63.5, 38.1, 7.25, 15.15, 66.0, 38.1),
+    'L7159': LabelLayout('Avery L7159 - 24 por hoja (63,5 x 33,9 mm)', A4, 3, 8, 63.5, 33.9, 7.25, 12.9, 66.0, 33.9),
+    'L7163': LabelLayout('Avery L7163 - 14 por hoja (99,1 x 38,1 mm)', A4, 2, 7, 99.1, 38.1, 4.65, 15.15, 101.6, 38.1),
+    'L7651': LabelLayout('Avery L7651 - 65 por hoja (38,1 x 21,2 mm)', A4, 5, 13, 38.1, 21.2, 4.75, 10.7, 40.6, 21.2),
+    '3474': LabelLayout('Avery Zweckform 3474 - 24 por hoja (70 x 37 mm)', A4, 3, 8, 70.0, 37.0, 0.0, 4.5, 70.0, 37.0),
+}
+DEFAULT_LAYOUT = 'L7160'
+
+# Contenido del QR: INV:<tabla>:<gid de sync_rows>, estable entre copias sincronizadas
+# (o el id local si la base de datos no tiene sincronización)
+QR_PREFIX = 'INV'
+# Cualquier máscara produce un QR válido; fijarla evita probar las ocho (lo más lento de la codificación)
+QR_MASK = 0
+
+LabelItem = namedtuple('LabelItem', 'tabla id texto ubicacion cliente qr')
+
+# ReportLab recalcula en cada QR el polinomio generador, que solo depende del número de bytes
+# de corrección (igual para todas las etiquetas): era casi la mitad del tiempo de codificación
+if not hasattr(qrencoder.QRUtil.getErrorCorrectPolynomial, 'cache_info'):
+    qrencoder.QRUtil.getErrorCorrectPolynomial = staticmethod(
+        functools.lru_cache(maxsize=None)(qrencoder.QRUtil.getErrorCorrectPolynomial))
+
+
+def label_items(db, inventory_ids=None, tables=None, ids=None):
+    """Equipos a etiquetar, ordenados por centro, tabla e id.
+
+    `inventory_ids` limita a esos centros; `ids` ({tabla: [ids]}) a una selección."""
+    has_sync = db.fetch_one("SELECT 1 FROM sqlite_master WHERE type='table' AND name='sync_rows'")
+    items = []
+    for table in tables or list(LABEL_TABLES):
+        if ids is not None and table not in ids:
+            continue
+        location = f"t.{EQUIPMENT_TABLES[table]}"
+        gid = "s.gid" if has_sync else "NULL"
+        join = f"LEFT JOIN sync_rows s ON s.item_type = '{table}' AND s.item_id = t.id" if has_sync else ""
+        where, params = [], []
+        if inventory_ids is not None:
+            where.append("t.inventario_id IN (SELECT value FROM json_each(?))")
+            params.append(_json_list(inventory_ids))
+        if ids is not None:
+            where.append("t.id IN (SELECT value FROM json_each(?))")
+            params.append(_json_list(ids[table]))
+        rows = db.fetch_all(f'''
+            SELECT t.id, {LABEL_TABLES[table]}, {location}, i.cliente, {gid}
+            FROM {table} t JOIN inventarios i ON i.id = t.inventario_id {join}
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY i.cliente, t.id
+        ''', tuple(params))
+        items.extend(LabelItem(table, item_id, text or '', location_text or '', cliente or '',
+                               f"{QR_PREFIX}:{table}:{gid_value or item_id}")
+                     for item_id, text, location_text, cliente, gid_value in rows)
+    items.sort(key=lambda item: (item.cliente, list(LABEL_TABLES).index(item.tabla), item.id))
+    return items
+
+
+def _json_list(values):
+    return "[" + ",".join(str(int(value)) for value in values) + "]"
+
+
+def qr_modules(data):
+    """Matriz del QR como lista de filas de booleanos (True = módulo oscuro)."""
+    qr = qrencoder.QRCode(None, qrencoder.QRErrorCorrectLevel.M)
+    qr.addData(data)
+    qr.version = qr.calculate_version()
+    qr.makeImpl(False, QR_MASK)
+    return qr.modules
+
+
+def _draw_qr(canvas, data, x, y, size):
+    """Dibuja el QR en el cuadrado (x, y, size) con un margen de silencio de 2 módulos
+    (la norma pide 4; el borde de la etiqueta completa el resto)."""
+    modules = qr_modules(data)
+    count = len(modules)
+    module = size / (count + 4)
+    # En unidades de módulo con el eje Y hacia abajo: las coordenadas son enteros y el trazado
+    # (un rectángulo por tramo horizontal oscuro) se escribe directamente, sin formatear decimales
+    canvas.saveState()
+    canvas.translate(x + 2 * module, y + size - 2 * module)
+    canvas.scale(module, -module)
+    operations = []
+    for row_index, row in enumerate(modules):
+        col = 0
+        while col < count:
+            if row[col]:
+                start = col
+                while col < count and row[col]:
+                    col += 1
+                operations.append(f"{start} {row_index} {col - start} 1 re")
+            else:
+                col += 1
+    operations.append("f")
+    canvas.addLiteral("\n".join(operations))
+    canvas.restoreState()
+
+
+def _fit(text, font, size, width, minimum=5):
+    """Tamaño de letra para que `text` quepa en `width` (recortando si ni el mínimo cabe)."""
+    natural = stringWidth(text, font, 1)
+    if natural * size <= width:
+        return text, size
+    size = max(minimum, int(width / natural * 2) / 2) if natural else size
+    while text and stringWidth(text, font, size) > width:
+        text = text[:-1]
+    return text, size
+
+
+class LabelSheet:
+    """Dibuja etiquetas sobre un lienzo de ReportLab siguiendo una plantilla.
+
+    Lo común a todas las etiquetas (borde de guía y logo) se dibuja una sola vez como
+    formulario (XObject) y cada etiqueta lo reutiliza; solo el QR y los textos son propios."""
+
+    def __init__(self, filename, layout=DEFAULT_LAYOUT, borders=False):
+        self.layout = LAYOUTS[layout] if isinstance(layout, str) else layout
+        self.canvas = Canvas(filename, pagesize=self.layout.pagina)
+        self.canvas.setTitle("Etiquetas de inventario")
+        self.per_page = self.layout.columnas * self.layout.filas
+        self.form = 'etiqueta'
+        self._build_form(borders)
+
+    def _build_form(self, borders):
+        layout, c = self.layout, self.canvas
+        width, height = layout.ancho * mm, layout.alto * mm
+        c.beginForm(self.form, lowerx=0, lowery=0, upperx=width, uppery=height)
+        if borders:
+            c.setLineWidth(0.3)
+            c.setStrokeGray(0.7)
+            c.roundRect(0.5, 0.5, width - 1, height - 1, 2 * mm, stroke=1, fill=0)
+        logo_path = resource_path('logo.png')
+        if height >= 30 * mm and os.path.exists(logo_path):
+            c.drawImage(logo_path, width - 16 * mm, 2 * mm, width=14 * mm, height=5 * mm, preserveAspectRatio=True, mask='auto')
+        c.endForm()
+
+    def _origin(self, position):
+        layout = self.layout
+        row, col = divmod(position % self.per_page, layout.columnas)
+        x = (layout.margen_izq + col * layout.paso_h) * mm
+        y = layout.pagina[1] - (layout.margen_sup + row * layout.paso_v + layout.alto) * mm
+        return x, y
+
+    def draw(self, items, start=0):
+        """Dibuja las etiquetas a partir de la posición `start` de la primera hoja (para
+        aprovechar hojas ya empezadas). Devuelve el número de hojas."""
+        c, layout = self.canvas, self.layout
+        width, height = layout.ancho * mm, layout.alto * mm
+        padding = min(2 * mm, height * 0.08)
+        qr_size = height - 2 * padding
+        text_x = padding + qr_size + padding
+        text_width = width - text_x - padding
+        compact = height < 30 * mm
+        for index, item in enumerate(items):
+            position = start + index
+            if position % self.per_page == 0 and index:
+                c.showPage()
+            x, y = self._origin(position)
+            c.saveState()
+            c.translate(x, y)
+            c.doForm(self.form)
+            _draw_qr(c, item.qr, padding, padding, qr_size)
+            text, size = _fit(item.texto or f"{item.tabla} {item.id}", 'Helvetica-Bold', 14 if not compact else 9, text_width)
+            c.setFont('Helvetica-Bold', size)
+            c.drawString(text_x, height - padding - size, text)
+            lines = [(item.ubicacion, 9), (item.cliente, 7)] if not compact else [(item.ubicacion, 6)]
+            line_y = height - padding - size - 2 * mm
+            for line, line_size in lines:
+                if not line:
+                    continue
+                line, line_size = _fit(line, 'Helvetica', line_size, text_width)
+                line_y -= line_size + 1
+                c.setFont('Helvetica', line_size)
+                c.drawString(text_x, line_y, line)
+            c.restoreState()
+        return (start + len(items) - 1) // self.per_page + 1 if items else 0
+
+    def save(self):
+        self.canvas.save()
+
+
+def generate_labels(filename, items, layout=DEFAULT_LAYOUT, start=0, borders=False):
+    """Genera el PDF de etiquetas de `items` (ver label_items). Devuelve el número de hojas."""
+    sheet = LabelSheet(filename, layout, borders)
+    pages = sheet.draw(items, start)
+    sheet.save()
+    return pages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera hojas de etiquetas con código QR para los equipos.")
+    parser.add_argument('db', help="base de datos (inventario.db)")
+    parser.add_argument('salida', help="fichero PDF de salida")
+    parser.add_argument('--centro', type=int, action='append', help="id del centro (se puede repetir; por defecto todos)")
+    parser.add_argument('--tablas', help=f"tablas separadas por comas ({', '.join(LABEL_TABLES)})")
+    parser.add_argument('--plantilla', choices=list(LAYOUTS), default=DEFAULT_LAYOUT)
+    parser.add_argument('--inicio', type=int, default=0, help="posiciones ya usadas en la primera hoja")
+    parser.add_argument('--bordes', action='store_true', help="dibujar el contorno de las etiquetas")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No existe la base de datos {args.db}")
+        return 2
+    tables = args.tablas.split(',') if args.tablas else None
+    unknown = [table for table in tables or [] if table not in LABEL_TABLES]
+    if unknown:
+        print(f"Tablas sin etiquetas: {', '.join(unknown)}")
+        return 2
+    db = DatabaseManager(args.db, create_tables=False)
+    try:
+        if db.sharded:
+            # Un fichero por centro: se leen uno a uno
+            items = []
+            for inventory_id in args.centro or db.centro_ids():
+                db.use_centro(inventory_id)
+                items.extend(label_items(db, [inventory_id], tables))
+        else:
+            items = label_items(db, args.centro, tables)
+    finally:
+        db.close()
+    pages = generate_labels(args.salida, items, args.plantilla, args.inicio, args.bordes)
+    print(f"{len(items)} etiquetas en {pages} hojas: {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
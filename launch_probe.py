@@ -0,0 +1,126 @@
+# launch_probe.py
+"""Sonda del tiempo de arranque hasta la ventana de login.
+
+La aplicación arrancada con --medir-arranque FICHERO escribe en FICHERO (JSON) el tiempo
+que tardó en mostrar el login desde que empezó a ejecutarse main.py y los módulos pesados
+que ya estaban cargados, y se cierra. Este script la lanza varias veces y mide también
+el tiempo desde fuera, que en el ejecutable único incluye la descompresión en el temporal:
+
+    python launch_probe.py                                   # python main.py
+    python launch_probe.py dist\\main\\main.exe --veces 5
+    python launch_probe.py dist\\main\\main.exe --maximo 2.5   # rc 1 si la mediana supera 2,5 s
+"""
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROBE_FLAG = '--medir-arranque'
+# Módulos que no deberían estar cargados al mostrar el login
+HEAVY_MODULES = ['pandas', 'matplotlib', 'reportlab', 'pyarrow', 'pypdf']
+# Se cargan en segundo plano mientras el usuario elige centro (informes y etiquetas): solo
+# módulos sin Qt, que no puede inicializarse fuera del hilo de la interfaz
+PRELOAD_MODULES = ['pdf_generator', 'excel_generator', 'label_generator']
+# Con Qt o matplotlib (backend Qt): se importan en el hilo de la interfaz cuando queda libre
+GUI_PRELOAD_MODULES = ['dashboard_widgets']
+
+
+# --- Lado de la aplicación ---
+def probe_path(argv):
+    """Fichero de --medir-arranque, o None si no se pide la medición."""
+    if PROBE_FLAG not in argv:
+        return None
+    index = argv.index(PROBE_FLAG) + 1
+    return argv[index] if index < len(argv) else None
+
+
+def write_report(path, started):
+    from app_paths import build_mode
+    report = {'login_s': round(time.perf_counter() - started, 3), 'modo': build_mode(),
+              'modulos_pesados': [name for name in HEAVY_MODULES if name in sys.modules]}
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(report, f)
+    # Sustitución atómica: quien espera el fichero nunca lo lee a medias
+    os.replace(path + '.tmp', path)
+
+
+def _preload(name):
+    try:
+        importlib.import_module(name)
+    except Exception as e:
+        print(f"No se pudo precargar {name}: {e}")
+
+
+def preload_in_background():
+    """Importa los módulos pesados mientras se muestra el login: al abrir el centro ya están cargados.
+
+    Los que no tocan Qt van en un hilo; los demás, uno por vuelta del bucle de eventos de
+    la interfaz para no bloquear el login más de lo que tarda cada import."""
+    from PyQt6.QtCore import QTimer
+
+    def run():
+        for name in PRELOAD_MODULES:
+            _preload(name)
+    threading.Thread(target=run, name='precarga', daemon=True).start()
+    for name in GUI_PRELOAD_MODULES:
+        QTimer.singleShot(0, lambda name=name: _preload(name))
+
+
+# --- Lanzador ---
+def measure(command, timeout=60):
+    """Lanza `command` con la sonda. Devuelve (segundos hasta el login medidos desde fuera, informe)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'arranque.json')
+        start = time.perf_counter()
+        process = subprocess.Popen(command + [PROBE_FLAG, path])
+        try:
+            while not os.path.exists(path):
+                if process.poll() is not None or time.perf_counter() - start > timeout:
+                    raise RuntimeError(f"La aplicación terminó o no mostró el login (código {process.poll()})")
+                time.sleep(0.01)
+            elapsed = time.perf_counter() - start
+            with open(path, encoding='utf-8') as f:
+                report = json.load(f)
+            process.wait(timeout)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+    return elapsed, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el tiempo de arranque hasta la ventana de login.")
+    parser.add_argument('comando', nargs='*', help="ejecutable a medir (por defecto: python main.py)")
+    parser.add_argument('--veces', type=int, default=5, help="arranques a medir (por defecto 5)")
+    parser.add_argument('--maximo', type=float, help="segundos: termina con código 1 si la mediana los supera")
+    args = parser.parse_args(argv)
+
+    command = args.comando or [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')]
+    times, report = [], None
+    for run in range(1, args.veces + 1):
+        try:
+            elapsed, report = measure(command)
+        except RuntimeError as e:
+            print(e)
+            return 2
+        times.append(elapsed)
+        print(f"Arranque {run}: login en {elapsed:.2f} s ({report['login_s']:.2f} s dentro de Python)")
+    median = statistics.median(times)
+    print(f"Modo {report['modo']}: mediana {median:.2f} s, mínimo {min(times):.2f} s, máximo {max(times):.2f} s")
+    if report['modulos_pesados']:
+        print(f"Aviso: cargados antes del login: {', '.join(report['modulos_pesados'])}")
+    if args.maximo is not None and median > args.maximo:
+        print(f"La mediana supera el máximo de {args.maximo:.2f} s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,72 +1,127 @@
 # main.py
+import time
+# Referencia para la sonda de arranque (--medir-arranque): lo primero que se ejecuta
+_STARTED = time.perf_counter()
 import sys
 import os
 import sqlite3
 import shutil
-import subprocess
+import multiprocessing
+import inspect
 from datetime import datetime
 from collections import Counter
 
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QTableWidgetItem, QMessageBox, 
                              QFileDialog, QDialog, QLabel, QFormLayout, QWidget,
                              QListWidgetItem, QListWidget, QComboBox, QDialogButtonBox, QPushButton,
-                             QGroupBox, QVBoxLayout)
+                             QGroupBox, QVBoxLayout, QHBoxLayout, QLineEdit, QPlainTextEdit,
+                             QDateTimeEdit, QAbstractItemView, QTabWidget, QTableWidget, QCheckBox,
+                             QDoubleSpinBox, QMenu, QListView, QProgressDialog, QInputDialog)
 from PyQt6.uic import loadUi
-from PyQt6.QtCore import QDate, Qt, QSize
-from PyQt6.QtGui import QIcon, QAction, QPixmap
-
-from database import DatabaseManager
-from pdf_generator import generate_pdf
-from excel_generator import generate_excel
-from dashboard_widgets import BarChartWidget, PieChartWidget
-
-# --- Funciones Auxiliares para manejo de rutas ---
-
-def is_frozen():
-    """ Devuelve True si la aplicación está 'congelada' (es un EXE) """
-    return getattr(sys, 'frozen', False)
-
-def get_base_path():
-    """ Obtiene la ruta base para leer recursos (funciona en dev y EXE) """
-    if is_frozen():
-        # Ruta al directorio temporal _MEIPASS creado por PyInstaller
-        return sys._MEIPASS
-    else:
-        # Ruta al directorio del script
-        return os.path.dirname(os.path.abspath(__file__))
-
-def get_writable_data_path(relative_path=''):
-    """ Obtiene una ruta en un directorio donde se puede escribir, al lado del EXE o script """
-    if is_frozen():
-        # Ruta al directorio donde está el .exe
-        base_path = os.path.dirname(sys.executable)
-    else:
-        # Ruta al directorio del script
-        base_path = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base_path, relative_path)
+from PyQt6.QtCore import QDate, QDateTime, Qt, QSortFilterProxyModel, QTimer
+from PyQt6.QtGui import QIcon, QAction, QPixmap, QFont, QColor, QStandardItem, QStandardItemModel
+
+# pandas (Excel), matplotlib (gráficos) y ReportLab (PDF, etiquetas) se importan al usarlos
+# y se precargan en segundo plano con el login abierto: no retrasan el arranque (ver App.run)
+from database import DatabaseManager, LABEL_TABLES
+from app_paths import get_base_path, get_writable_data_path
+import launch_probe
+from fleet_analytics import FleetAnalytics, DIMENSION_LABELS
+from change_log import ChangeLog
+from sync_engine import SyncEngine
+from db_worker import DatabaseWorker, executor_for
+from image_viewer import ImageViewerDialog
+from floor_plan import FloorPlanStore, FloorPlanCanvas, TilePyramid, PyramidBuilder
+from topology_view import TopologyStore, TopologyView, compute_layout, diagram_data
+from centro_sessions import SessionCache, data_versions, table_version, recent_centros, remember_centro
+import hardware_attrs
+from hardware_attrs import HardwareAttributes, format_gb
+import compliance
+from compliance import ComplianceEngine
+import reconciliation
+from export_cache import ExportCache
+from backup import BackupWorker, export_centro, import_centro, read_manifest, ARCHIVE_EXTENSION
+import warehouse_export
+import query_service
+from detail_cache import DetailCache, load_record, THUMBNAIL_SIZE, PREFETCH_NEIGHBOURS
+from bulk_operations import delete_items, update_field, duplicate_items, distinct_values, remove_files_in_background
+import tracing
 
 # --- Ventana de Login ---
 class LoginDialog(QDialog):
-    def __init__(self, db):
-        super().__init__()
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
         loadUi(os.path.join(get_base_path(), "ui_login.ui"), self)
         self.db = db
         self.selected_inventory_id = None
+
+        # Selector con búsqueda y los centros recientes primero (escala a miles de centros)
+        self.search_centros = QLineEdit()
+        self.search_centros.setPlaceholderText("Buscar centro...")
+        self.search_centros.setClearButtonEnabled(True)
+        self.list_centros = QListView()
+        self.list_centros.setUniformItemSizes(True)
+        self.list_centros.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.centros_model = QStandardItemModel(self)
+        self.centros_proxy = QSortFilterProxyModel(self)
+        self.centros_proxy.setSourceModel(self.centros_model)
+        self.centros_proxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.list_centros.setModel(self.centros_proxy)
+        index = self.verticalLayout.indexOf(self.combo_centros)
+        self.verticalLayout.insertWidget(index, self.search_centros)
+        self.verticalLayout.insertWidget(index + 1, self.list_centros)
+        self.combo_centros.hide()
         self.load_centros()
 
+        self.search_centros.textChanged.connect(self.filter_centros)
+        self.search_centros.returnPressed.connect(self.accept_selection)
+        self.list_centros.doubleClicked.connect(self.accept_selection)
         self.btn_seleccionar.clicked.connect(self.accept_selection)
         self.btn_crear.clicked.connect(self.create_and_accept)
+        self.search_centros.setFocus()
 
     def load_centros(self):
-        self.combo_centros.clear()
-        inventories = self.db.fetch_all("SELECT id, cliente FROM inventarios ORDER BY cliente")
-        self.combo_centros.addItem("--- Seleccione un centro ---", -1)
-        for inv_id, cliente in inventories:
-            self.combo_centros.addItem(cliente, inv_id)
+        self.centros_model.clear()
+        # La lista de centros está en el catálogo si la base de datos está dividida por centros
+        with self.db.on_catalog():
+            recent = recent_centros(self.db)
+            names = dict(self.db.fetch_all("SELECT id, cliente FROM inventarios ORDER BY cliente COLLATE NOCASE"))
+        bold = QFont()
+        bold.setBold(True)
+        for inv_id in recent:
+            if inv_id in names:
+                item = QStandardItem(names[inv_id])
+                item.setData(inv_id, Qt.ItemDataRole.UserRole)
+                item.setFont(bold)
+                item.setToolTip("Abierto recientemente")
+                self.centros_model.appendRow(item)
+        for inv_id, cliente in names.items():
+            if inv_id not in recent:
+                item = QStandardItem(cliente)
+                item.setData(inv_id, Qt.ItemDataRole.UserRole)
+                self.centros_model.appendRow(item)
+        if self.centros_proxy.rowCount():
+            self.list_centros.setCurrentIndex(self.centros_proxy.index(0, 0))
+
+    def filter_centros(self, text):
+        self.centros_proxy.setFilterFixedString(text.strip())
+        if self.centros_proxy.rowCount():
+            self.list_centros.setCurrentIndex(self.centros_proxy.index(0, 0))
+
+    def set_current_centro(self, inventory_id):
+        """Selecciona un centro de la lista por su id (quitando el filtro de búsqueda)."""
+        self.search_centros.clear()
+        matches = self.centros_model.match(self.centros_model.index(0, 0), Qt.ItemDataRole.UserRole, inventory_id, 1,
+                                           Qt.MatchFlag.MatchExactly)
+        if matches:
+            self.list_centros.setCurrentIndex(self.centros_proxy.mapFromSource(matches[0]))
 
     def accept_selection(self):
-        if self.combo_centros.currentData() != -1:
-            self.selected_inventory_id = self.combo_centros.currentData()
+        index = self.list_centros.currentIndex()
+        if index.isValid():
+            self.selected_inventory_id = index.data(Qt.ItemDataRole.UserRole)
+            with self.db.on_catalog():
+                remember_centro(self.db, self.selected_inventory_id)
             self.accept()
         else:
             QMessageBox.warning(self, "Selección Requerida", "Por favor, seleccione un centro de la lista.")
@@ -78,10 +133,13 @@ class LoginDialog(QDialog):
             return
 
         try:
-            cursor = self.db.execute_query("INSERT INTO inventarios (cliente, fecha) VALUES (?, ?)", 
-                                           (cliente_name, QDate.currentDate().toString("dd/MM/yyyy")))
+            with self.db.on_catalog():
+                cursor = self.db.execute_query("INSERT INTO inventarios (cliente, fecha) VALUES (?, ?)", 
+                                               (cliente_name, QDate.currentDate().toString("dd/MM/yyyy")))
+                if cursor:
+                    self.selected_inventory_id = cursor.lastrowid
+                    remember_centro(self.db, self.selected_inventory_id)
             if cursor:
-                self.selected_inventory_id = cursor.lastrowid
                 self.accept()
             else:
                  QMessageBox.critical(self, "Error", "No se pudo crear el centro. Verifique los logs.")
@@ -146,6 +204,9 @@ class DetailViewDialog(QDialog):
         self.item_id = item_id
         self.db = db
         self.main_window = parent
+        self.executor = executor_for(parent, db)
+        # Caché compartida de la ventana principal (precargada al seleccionar filas)
+        self.cache = getattr(parent, 'detail_cache', None) or DetailCache()
 
         self.image_dir = get_writable_data_path(os.path.join('data', 'images'))
         os.makedirs(self.image_dir, exist_ok=True)
@@ -155,10 +216,22 @@ class DetailViewDialog(QDialog):
         self.btn_connect_item.clicked.connect(self.open_connect_dialog)
         # Asumiendo que el layout se llama `horizontalLayout_2` en tu .ui
         self.horizontalLayout_2.insertWidget(2, self.btn_connect_item)
-        
-        self.populate_details()
-        self.load_images()
-        self.load_connections()
+
+        self.image_list_widget.setIconSize(THUMBNAIL_SIZE)
+        self.image_list_widget.setViewMode(QListWidget.ViewMode.IconMode)
+        self.image_list_widget.setResizeMode(QListWidget.ResizeMode.Adjust)
+
+        self.connections_groupbox = QGroupBox("Artículos Conectados")
+        self.connections_layout = QVBoxLayout(self.connections_groupbox)
+        self.connections_list = QListWidget()
+        self.btn_delete_connection = QPushButton("Eliminar Conexión Seleccionada")
+        self.btn_delete_connection.clicked.connect(self.delete_connection)
+        self.connections_layout.addWidget(self.connections_list)
+        self.connections_layout.addWidget(self.btn_delete_connection)
+        # Insertar el groupbox en el layout principal del diálogo
+        self.verticalLayout.insertWidget(2, self.connections_groupbox)
+
+        self.load_record()
 
         self.btn_close.clicked.connect(self.accept)
         self.btn_edit_item.clicked.connect(self.request_edit)
@@ -176,16 +249,38 @@ class DetailViewDialog(QDialog):
                     "INSERT INTO connections (parent_item_type, parent_item_id, child_item_type, child_item_id, notes) VALUES (?, ?, ?, ?, ?)",
                     (self.item_type, self.item_id, data['child_item_type'], data['child_item_id'], data['notes'])
                 )
-                self.load_connections() # Refrescar la lista de conexiones
-    def populate_details(self):
-        data = self.db.fetch_one(f"SELECT * FROM {self.item_type} WHERE id=?", (self.item_id,))
-        if not data:
+                self.reload() # Refrescar la lista de conexiones
+                self._connections_changed([(data['child_item_type'], data['child_item_id'])])
+    def load_record(self):
+        # Si el registro ya está en caché (abierto antes o precargado) se muestra sin consultar
+        record = self.cache.get(self.item_type, self.item_id)
+        if record is not None:
+            self._show_record(record)
+            return
+        item_type, item_id = self.item_type, self.item_id
+        version = self.cache.version
+        self.executor.submit(lambda db: load_record(db, item_type, item_id, get_writable_data_path),
+                             lambda record: self._record_loaded(record, version),
+                             key=(id(self), 'record'), owner=self)
+
+    def reload(self):
+        """Vuelve a cargar el elemento tras modificar sus imágenes o conexiones."""
+        self.cache.invalidate(self.item_type, self.item_id)
+        self.load_record()
+
+    def _record_loaded(self, record, version):
+        self.cache.put(record, version)
+        self._show_record(record)
+
+    def _show_record(self, record):
+        if record is None or not record.row:
             self.close()
             return
-        
-        cursor = self.db.execute_query(f"SELECT * FROM {self.item_type} WHERE id=?", (self.item_id,))
-        headers = [desc[0] for desc in cursor.description]
-        
+        self._show_details(record.headers, record.row)
+        self._show_images(record.images)
+        self._show_connections(record.connections)
+
+    def _show_details(self, headers, data):
         while self.info_layout.count():
             child = self.info_layout.takeAt(0)
             if child.widget():
@@ -197,45 +292,20 @@ class DetailViewDialog(QDialog):
             label_value.setWordWrap(True)
             self.info_layout.addRow(label_header, label_value)
 
-    def load_images(self):
+    def _show_images(self, thumbnails):
         self.image_list_widget.clear()
-        self.image_list_widget.setIconSize(QSize(128, 128))
-        self.image_list_widget.setViewMode(QListWidget.ViewMode.IconMode)
-        self.image_list_widget.setResizeMode(QListWidget.ResizeMode.Adjust)
-
-        images = self.db.fetch_all("SELECT id, image_path FROM images WHERE item_type=? AND item_id=?", (self.item_type, self.item_id))
-        for img_id, relative_img_path in images:
-            full_path = get_writable_data_path(relative_img_path)
-            if os.path.exists(full_path):
-                pixmap = QPixmap(full_path)
-                icon = QIcon(pixmap)
-                item = QListWidgetItem(icon, os.path.basename(full_path))
-                item.setData(Qt.ItemDataRole.UserRole, (img_id, full_path, relative_img_path))
-                self.image_list_widget.addItem(item)
-    
-    def load_connections(self):
-        # Primero, asegurar que el groupbox y el layout para conexiones existan
-        if not hasattr(self, 'connections_groupbox'):
-            self.connections_groupbox = QGroupBox("Artículos Conectados")
-            self.connections_layout = QVBoxLayout(self.connections_groupbox)
-            self.connections_list = QListWidget()
-            self.btn_delete_connection = QPushButton("Eliminar Conexión Seleccionada")
-            self.btn_delete_connection.clicked.connect(self.delete_connection)
-            self.connections_layout.addWidget(self.connections_list)
-            self.connections_layout.addWidget(self.btn_delete_connection)
-            # Insertar el groupbox en el layout principal del diálogo
-            self.verticalLayout.insertWidget(2, self.connections_groupbox)
+        for img_id, full_path, relative_img_path, image in thumbnails:
+            icon = QIcon(QPixmap.fromImage(image))
+            item = QListWidgetItem(icon, os.path.basename(full_path))
+            item.setData(Qt.ItemDataRole.UserRole, (img_id, full_path, relative_img_path))
+            self.image_list_widget.addItem(item)
 
+    def _show_connections(self, connections):
         self.connections_list.clear()
-        connections = self.db.fetch_all(
-            "SELECT id, child_item_type, child_item_id, notes FROM connections WHERE parent_item_type=? AND parent_item_id=?",
-            (self.item_type, self.item_id)
-        )
-        for conn_id, child_type, child_id, notes in connections:
-            child_info = self.main_window.item_map.get(child_type, {})
+        for conn_id, child_type, child_id, notes, child_code in connections:
+            child_info = self.main_window.item_map.get(child_type, {}) if self.main_window else {}
             display_name = child_info.get('display_name', child_type)
-            child_data = self.db.fetch_one(f"SELECT codigo FROM {child_type} WHERE id=?", (child_id,))
-            child_code = child_data[0] if child_data else f"ID:{child_id}"
+            child_code = child_code if child_code is not None else f"ID:{child_id}"
             
             text = f"[{display_name}] {child_code} - Notas: {notes or 'N/A'}"
             item = QListWidgetItem(text)
@@ -254,8 +324,15 @@ class DetailViewDialog(QDialog):
                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
                                      QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
+            child = self.db.fetch_one("SELECT child_item_type, child_item_id FROM connections WHERE id=?", (conn_id,))
             self.db.execute_query("DELETE FROM connections WHERE id=?", (conn_id,))
-            self.load_connections()
+            self.reload()
+            self._connections_changed([child] if child else [])
+
+    def _connections_changed(self, others):
+        # Las reglas de cumplimiento sobre conexiones afectan a ambos extremos
+        if self.main_window:
+            self.main_window.connections_changed([(self.item_type, self.item_id)] + list(others))
 
 
     def add_images(self):
@@ -272,7 +349,8 @@ class DetailViewDialog(QDialog):
             except Exception as e:
                 QMessageBox.critical(self, "Error al copiar", f"No se pudo guardar la imagen: {e}")
         
-        self.load_images()
+        if files:
+            self.reload()
 
     def delete_image(self):
         selected_items = self.image_list_widget.selectedItems()
@@ -292,22 +370,16 @@ class DetailViewDialog(QDialog):
                 if os.path.exists(full_path):
                     os.remove(full_path)
                 self.db.execute_query("DELETE FROM images WHERE id=?", (img_id,))
-                self.load_images()
+                self.reload()
                 QMessageBox.information(self, "Éxito", "Imagen eliminada.")
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"No se pudo eliminar la imagen: {e}")
 
     def view_image(self, item):
-        _, full_path, _ = item.data(Qt.ItemDataRole.UserRole)
-        try:
-            if sys.platform == "win32":
-                os.startfile(full_path)
-            elif sys.platform == "darwin":
-                subprocess.call(["open", full_path])
-            else:
-                subprocess.call(["xdg-open", full_path])
-        except Exception as e:
-             QMessageBox.critical(self, "Error", f"No se pudo abrir la imagen: {e}")
+        # Visor interno con todas las fotos del equipo, empezando por la pulsada
+        paths = [self.image_list_widget.item(i).data(Qt.ItemDataRole.UserRole)[1] for i in range(self.image_list_widget.count())]
+        dialog = ImageViewerDialog(paths, self.image_list_widget.row(item), self)
+        dialog.exec()
 
     def request_edit(self):
         self.main_window.prepare_to_edit(self.item_type, self.item_id)
@@ -324,8 +396,12 @@ class SearchDialog(QDialog):
         self.db = db
         self.inventory_id = inventory_id
         self.main_window = parent
+        self.executor = executor_for(parent, db)
         self.all_items = []
-        
+        # Ids de PCs que cumplen los filtros de hardware (None: sin filtros activos)
+        self.hardware_ids = None
+
+        self.setup_hardware_filters()
         self.load_all_items()
         
         self.search_input.textChanged.connect(self.filter_results)
@@ -333,31 +409,118 @@ class SearchDialog(QDialog):
         self.btn_close.clicked.connect(self.accept)
 
     def load_all_items(self):
-        self.all_items = []
-        for table_name, info in self.main_window.item_map.items():
-            display_name = info['display_name']
-            query_fields = ", ".join(info['search_fields'])
-            query = f"SELECT id, {query_fields} FROM {table_name} WHERE inventario_id=?"
-            results = self.db.fetch_all(query, (self.inventory_id,))
-            for row in results:
-                item_id = row[0]
-                display_text = f"[{display_name}] " + " - ".join(map(str, row[1:]))
-                searchable_text = display_text.lower()
-                self.all_items.append((table_name, item_id, display_text, searchable_text))
-        
+        item_map = dict(self.main_window.item_map)
+        inventory_id = self.inventory_id
+
+        def load(db):
+            all_items = []
+            for table_name, info in item_map.items():
+                display_name = info['display_name']
+                query_fields = ", ".join(info['search_fields'])
+                query = f"SELECT id, {query_fields} FROM {table_name} WHERE inventario_id=?"
+                results = db.fetch_all(query, (inventory_id,))
+                for row in results:
+                    item_id = row[0]
+                    display_text = f"[{display_name}] " + " - ".join(map(str, row[1:]))
+                    searchable_text = display_text.lower()
+                    all_items.append((table_name, item_id, display_text, searchable_text))
+            return all_items
+        self.executor.submit(load, self._set_items, key=(id(self), 'search_items'), owner=self)
+
+    def setup_hardware_filters(self):
+        group = QGroupBox("Filtros de hardware (solo PCs)")
+        layout = QHBoxLayout(group)
+
+        def spin(suffix, maximum, decimals=0):
+            box = QDoubleSpinBox()
+            box.setRange(0, maximum)
+            box.setDecimals(decimals)
+            box.setSuffix(suffix)
+            box.setSpecialValueText("Cualquiera")
+            box.valueChanged.connect(self.apply_hardware_filters)
+            return box
+
+        def combo():
+            box = QComboBox()
+            box.addItem("Cualquiera", None)
+            box.currentIndexChanged.connect(self.apply_hardware_filters)
+            return box
+
+        self.spin_ram_min = spin(" GB", 1024)
+        self.spin_ram_max = spin(" GB", 1024)
+        self.spin_disco_min = spin(" GB", 100000)
+        self.combo_disco_tipo = combo()
+        self.combo_cpu = combo()
+        self.spin_cpu_gen = spin("ª", 20)
+        self.combo_so = combo()
+        for label, widget in (("RAM mín.:", self.spin_ram_min), ("RAM máx.:", self.spin_ram_max),
+                              ("Disco mín.:", self.spin_disco_min), ("Tipo:", self.combo_disco_tipo),
+                              ("CPU:", self.combo_cpu), ("Gen. mín.:", self.spin_cpu_gen), ("S.O.:", self.combo_so)):
+            layout.addWidget(QLabel(label))
+            layout.addWidget(widget)
+        self.verticalLayout.insertWidget(2, group)
+
+        hardware = getattr(self.main_window, 'hardware', None)
+        if hardware is not None:
+            hardware.refresh(self.inventory_id)
+
+        def load(db):
+            return {column: hardware_attrs.distinct_values(db, column) for column in ('disco_tipo', 'cpu_familia', 'so_familia')}
+        self.executor.submit(load, self._set_hardware_choices, key=(id(self), 'hardware_choices'), owner=self)
+
+    def _set_hardware_choices(self, choices):
+        for column, box in (('disco_tipo', self.combo_disco_tipo), ('cpu_familia', self.combo_cpu), ('so_familia', self.combo_so)):
+            box.blockSignals(True)
+            for value in choices[column]:
+                box.addItem(str(value), value)
+            box.blockSignals(False)
+
+    def hardware_filters(self):
+        """Filtros de hardware activos como argumentos de hardware_attrs.filter_pcs."""
+        filters = {
+            'ram_min': self.spin_ram_min.value() or None,
+            'ram_max': self.spin_ram_max.value() or None,
+            'disco_min': self.spin_disco_min.value() or None,
+            'disco_tipo': self.combo_disco_tipo.currentData(),
+            'cpu_familia': self.combo_cpu.currentData(),
+            'cpu_generacion_min': int(self.spin_cpu_gen.value()) or None,
+            'so_familia': self.combo_so.currentData(),
+        }
+        return {key: value for key, value in filters.items() if value is not None}
+
+    def apply_hardware_filters(self):
+        filters = self.hardware_filters()
+        if not filters:
+            self.executor.cancel((id(self), 'hardware_filter'))
+            self.hardware_ids = None
+            self.filter_results()
+            return
+        inventory_id = self.inventory_id
+        self.executor.submit(lambda db: hardware_attrs.filter_pcs(db, inventory_id, **filters), self._set_hardware_ids,
+                             key=(id(self), 'hardware_filter'), owner=self)
+
+    def _set_hardware_ids(self, ids):
+        self.hardware_ids = ids
+        self.filter_results()
+
+    def _set_items(self, all_items):
+        self.all_items = all_items
         self.filter_results()
 
     def filter_results(self):
         search_term = self.search_input.text().lower()
         self.results_list.clear()
+        items = self.all_items
+        if self.hardware_ids is not None:
+            items = [entry for entry in items if entry[0] == 'pcs' and entry[1] in self.hardware_ids]
         
         if not search_term:
-            for table_name, item_id, display_text, _ in self.all_items:
+            for table_name, item_id, display_text, _ in items:
                 item = QListWidgetItem(display_text)
                 item.setData(Qt.ItemDataRole.UserRole, (table_name, item_id))
                 self.results_list.addItem(item)
         else:
-            for table_name, item_id, display_text, searchable_text in self.all_items:
+            for table_name, item_id, display_text, searchable_text in items:
                 if search_term in searchable_text:
                     item = QListWidgetItem(display_text)
                     item.setData(Qt.ItemDataRole.UserRole, (table_name, item_id))
@@ -367,6 +530,653 @@ class SearchDialog(QDialog):
         table_name, item_id = item.data(Qt.ItemDataRole.UserRole)
         self.main_window.open_detail_view(table_name, item_id)
 
+# --- Ventana de Analítica de Flota ---
+class FleetAnalyticsDialog(QDialog):
+    def __init__(self, fleet, item_map, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Analítica de Flota (todos los centros)")
+        self.resize(1000, 600)
+        self.fleet = fleet
+        self.item_map = item_map
+
+        layout = QVBoxLayout(self)
+        self.label_summary = QLabel()
+        layout.addWidget(self.label_summary)
+
+        self.combo_dimension = QComboBox()
+        for dimension, label in DIMENSION_LABELS.items():
+            self.combo_dimension.addItem(label, dimension)
+        form = QFormLayout()
+        form.addRow("Dimensión del gráfico de tarta:", self.combo_dimension)
+        layout.addLayout(form)
+
+        from dashboard_widgets import BarChartWidget, PieChartWidget
+        charts = QHBoxLayout()
+        self.bar_chart = BarChartWidget()
+        self.pie_chart = PieChartWidget()
+        charts.addWidget(self.bar_chart)
+        charts.addWidget(self.pie_chart)
+        layout.addLayout(charts)
+
+        layout.addWidget(QLabel("<b>Hardware de PCs por centro</b>"))
+        self.table_storage = QTableWidget()
+        self.table_storage.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table_storage)
+
+        self.button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+
+        self.combo_dimension.currentIndexChanged.connect(self.update_pie)
+        self.update_summary()
+        self.update_storage()
+        self.update_pie()
+
+    def update_summary(self):
+        summary = self.fleet.summary()
+        hardware = hardware_attrs.summary(self.fleet.db)
+        self.label_summary.setText(
+            f"<b>Centros:</b> {summary['centros']} &nbsp;&nbsp; <b>Equipos:</b> {summary['equipos']} &nbsp;&nbsp; "
+            f"<b>Cobertura antivirus:</b> {summary['cobertura_antivirus']:.1f}% &nbsp;&nbsp; "
+            f"<b>Almacenamiento en PCs:</b> {format_gb(hardware['disco_total_gb'])} &nbsp;&nbsp; "
+            f"<b>PCs con menos de {hardware_attrs.LOW_RAM_GB} GB de RAM:</b> {hardware['pcs_poca_ram']}")
+        per_table = summary['equipos_por_tabla']
+        tables = ['pcs', 'proyectores', 'impresoras', 'servidores', 'red', 'cctv_cameras']
+        labels = [self.item_map[t]['display_name'] for t in tables]
+        self.bar_chart.update_chart(labels, [per_table.get(t, 0) for t in tables], title='Equipos por Categoría (Flota)')
+
+    def update_storage(self):
+        rows = hardware_attrs.storage_by_centro(self.fleet.db)
+        headers = ["Centro", "PCs", "Almacenamiento", "RAM total"]
+        self.table_storage.setColumnCount(len(headers))
+        self.table_storage.setHorizontalHeaderLabels(headers)
+        self.table_storage.setRowCount(len(rows))
+        for row_num, (cliente, pcs, disco_gb, ram_gb) in enumerate(rows):
+            for col_num, value in enumerate((cliente, str(pcs), format_gb(disco_gb), format_gb(ram_gb))):
+                self.table_storage.setItem(row_num, col_num, QTableWidgetItem(value))
+        self.table_storage.resizeColumnsToContents()
+
+    def update_pie(self):
+        dimension = self.combo_dimension.currentData()
+        title = DIMENSION_LABELS[dimension]
+        rows = self.fleet.totals(dimension)
+        self.pie_chart.update_chart([r[0] for r in rows], [r[1] for r in rows], title=title,
+                                    empty_text='Sin datos', legend_title=title)
+
+# --- Ventana de Alertas de Cumplimiento ---
+class ComplianceDialog(QDialog):
+    def __init__(self, db, engine, item_map, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Alertas de Cumplimiento (todos los centros)")
+        self.resize(1000, 600)
+        self.db = db
+        self.engine = engine
+        self.item_map = item_map
+        self.main_window = parent
+
+        layout = QVBoxLayout(self)
+        self.label_summary = QLabel()
+        layout.addWidget(self.label_summary)
+
+        self.combo_severity = QComboBox()
+        self.combo_severity.addItem("Todas", 0)
+        for severity, label in compliance.SEVERITY_LABELS.items():
+            self.combo_severity.addItem(f"{label} o superior", severity)
+        form = QFormLayout()
+        form.addRow("Severidad:", self.combo_severity)
+        layout.addLayout(form)
+
+        self.table_findings = QTableWidget()
+        self.table_findings.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table_findings.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        layout.addWidget(self.table_findings)
+
+        self.button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        self.btn_reevaluate = self.button_box.addButton("Reevaluar Todo", QDialogButtonBox.ButtonRole.ActionRole)
+        self.btn_reevaluate.clicked.connect(self.reevaluate)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+
+        self.combo_severity.currentIndexChanged.connect(self.load_findings)
+        self.table_findings.cellDoubleClicked.connect(self.open_finding)
+        self.load_findings()
+
+    def load_findings(self):
+        minimum = self.combo_severity.currentData()
+        rows = [f for f in compliance.findings(self.db) if f[0] >= minimum]
+        counts = compliance.counts(self.db)
+        self.label_summary.setText(" &nbsp;&nbsp; ".join(
+            f"<b>{label}:</b> {counts.get(severity, 0)}" for severity, label in compliance.SEVERITY_LABELS.items()))
+
+        headers = ["Severidad", "Centro", "Regla", "Tipo", "Elemento", "Detalle"]
+        self.table_findings.setUpdatesEnabled(False)
+        self.table_findings.setColumnCount(len(headers))
+        self.table_findings.setHorizontalHeaderLabels(headers)
+        self.table_findings.setRowCount(len(rows))
+        for row_num, (severity, rule, item_type, item_id, label, detail, cliente) in enumerate(rows):
+            display_name = self.item_map.get(item_type, {}).get('display_name', item_type)
+            values = (compliance.SEVERITY_LABELS[severity], cliente or '', compliance.RULE_TITLES.get(rule, rule),
+                      display_name, label or f"ID:{item_id}", detail or '')
+            for col_num, value in enumerate(values):
+                cell = QTableWidgetItem(value)
+                cell.setData(Qt.ItemDataRole.UserRole, (item_type, item_id))
+                self.table_findings.setItem(row_num, col_num, cell)
+        self.table_findings.resizeColumnsToContents()
+        self.table_findings.setUpdatesEnabled(True)
+
+    def reevaluate(self):
+        # Con la base de datos dividida, cada centro guarda sus alertas en su fichero
+        for inventory_id in self.db.centro_ids() if self.db.sharded else [self.db.centro_id]:
+            with self.db.on_centro(inventory_id):
+                self.engine.evaluate_all()
+        self.load_findings()
+
+    def open_finding(self, row, column):
+        item_type, item_id = self.table_findings.item(row, 0).data(Qt.ItemDataRole.UserRole)
+        if self.main_window:
+            if self.db.sharded:
+                # El elemento solo se ve desde el fichero de su centro: se abre ese centro antes
+                found = self.db.fleet_query(f"SELECT inventario_id FROM {{db}}{item_type} WHERE id = ?", (item_id,))
+                if found and found[0][0] != self.main_window.current_inventory_id:
+                    self.main_window.open_centro(found[0][0])
+            self.main_window.open_detail_view(item_type, item_id)
+            self.load_findings()
+
+# --- Ventana de Reconciliación de Datos ---
+class ReconciliationDialog(QDialog):
+    # Filas mostradas como máximo en la tabla (los totales siempre son completos)
+    MAX_LISTED = 2000
+
+    def __init__(self, db, data_dir, item_map, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Reconciliación de Imágenes y Conexiones")
+        self.resize(900, 550)
+        self.db = db
+        self.data_dir = data_dir
+        self.item_map = item_map
+        self.main_window = parent
+        self.executor = executor_for(parent, db)
+        self.report = None
+        self.repaired = None
+
+        layout = QVBoxLayout(self)
+        self.label_summary = QLabel("Analizando...")
+        self.label_summary.setWordWrap(True)
+        layout.addWidget(self.label_summary)
+
+        self.table_orphans = QTableWidget()
+        self.table_orphans.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table_orphans)
+
+        self.button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        self.btn_scan = self.button_box.addButton("Analizar de Nuevo", QDialogButtonBox.ButtonRole.ActionRole)
+        self.btn_repair = self.button_box.addButton("Reparar", QDialogButtonBox.ButtonRole.ActionRole)
+        self.btn_scan.clicked.connect(self.start_scan)
+        self.btn_repair.clicked.connect(self.repair)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+
+        self.start_scan()
+
+    def start_scan(self):
+        # El recorrido del directorio y los cruces se hacen en el hilo de base de datos
+        self.btn_scan.setEnabled(False)
+        self.btn_repair.setEnabled(False)
+        self.label_summary.setText("Analizando...")
+        data_dir = self.data_dir
+        self.executor.submit(lambda db: reconciliation.scan(db, data_dir), self.show_report,
+                             key=(id(self), 'reconciliation'), owner=self)
+
+    def show_report(self, report):
+        self.report = report
+        self.btn_scan.setEnabled(True)
+        self.btn_repair.setEnabled(not report.is_clean())
+        summary = (f"<b>Imágenes de equipos inexistentes:</b> {len(report.orphan_images)} &nbsp; "
+                   f"<b>Imágenes sin fichero:</b> {len(report.missing_files)} &nbsp; "
+                   f"<b>Ficheros sin imagen:</b> {len(report.orphan_files)} &nbsp; "
+                   f"<b>Conexiones rotas:</b> {len(report.dangling_connections)}<br>"
+                   f"<b>Espacio recuperable:</b> {reconciliation.format_bytes(report.reclaimable_bytes)}")
+        self.label_summary.setText(summary if not report.is_clean() else "No hay datos huérfanos.")
+
+        def name(item_type, item_id):
+            return f"{self.item_map.get(item_type, {}).get('display_name', item_type)} ID:{item_id}"
+
+        rows = ([("Imagen de equipo inexistente", path, reconciliation.format_bytes(size) if size else "")
+                 for _, path, size in report.orphan_images]
+                + [("Imagen sin fichero", path, "") for _, path in report.missing_files]
+                + [("Fichero sin imagen", path, reconciliation.format_bytes(size)) for path, size in report.orphan_files]
+                + [("Conexión rota", f"{name(parent_type, parent_id)} -> {name(child_type, child_id)}", "")
+                   for _, parent_type, parent_id, child_type, child_id in report.dangling_connections])
+        headers = ["Problema", "Elemento", "Tamaño"]
+        self.table_orphans.setUpdatesEnabled(False)
+        self.table_orphans.setColumnCount(len(headers))
+        self.table_orphans.setHorizontalHeaderLabels(headers)
+        self.table_orphans.setRowCount(min(len(rows), self.MAX_LISTED))
+        for row_num, values in enumerate(rows[:self.MAX_LISTED]):
+            for col_num, value in enumerate(values):
+                self.table_orphans.setItem(row_num, col_num, QTableWidgetItem(value))
+        self.table_orphans.resizeColumnsToContents()
+        self.table_orphans.setUpdatesEnabled(True)
+
+    def repair(self):
+        if self.report is None or self.report.is_clean():
+            return
+        reply = QMessageBox.question(self, "Confirmar Reparación",
+                                     "Se eliminarán las filas y ficheros listados. ¿Desea continuar?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        progress = QProgressDialog("Reparando...", None, 0, 100, self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+
+        def advance(done, total):
+            progress.setValue(int(done * 100 / total) if total else 100)
+            QApplication.processEvents()
+
+        try:
+            self.repaired = reconciliation.repair(self.db, self.report, progress=advance)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudo completar la reparación: {e}")
+            return
+        finally:
+            progress.close()
+        QMessageBox.information(self, "Reparación completada",
+                                f"Imágenes eliminadas: {self.repaired['imagenes']}\n"
+                                f"Conexiones eliminadas: {self.repaired['conexiones']}\n"
+                                f"Ficheros borrados: {self.repaired['ficheros']} "
+                                f"({reconciliation.format_bytes(self.repaired['bytes'])})")
+        self.start_scan()
+
+# --- Ventana de Historial de Auditorías ---
+class AuditHistoryDialog(QDialog):
+    def __init__(self, change_log, inventory_id, item_map, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Historial de Auditorías")
+        self.resize(800, 650)
+        self.change_log = change_log
+        self.inventory_id = inventory_id
+        self.item_map = item_map
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Instantáneas del centro (seleccione una o dos para comparar):"))
+        self.snapshot_list = QListWidget()
+        self.snapshot_list.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection)
+        layout.addWidget(self.snapshot_list)
+
+        snapshot_row = QHBoxLayout()
+        self.input_etiqueta = QLineEdit()
+        self.input_etiqueta.setPlaceholderText("Etiqueta de la auditoría (ej: Visita 2025)")
+        self.btn_take_snapshot = QPushButton("Registrar Auditoría")
+        self.btn_compare = QPushButton("Comparar Seleccionadas")
+        snapshot_row.addWidget(self.input_etiqueta)
+        snapshot_row.addWidget(self.btn_take_snapshot)
+        snapshot_row.addWidget(self.btn_compare)
+        layout.addLayout(snapshot_row)
+
+        date_row = QHBoxLayout()
+        self.datetime_state = QDateTimeEdit(QDateTime.currentDateTime())
+        self.datetime_state.setDisplayFormat("dd/MM/yyyy HH:mm")
+        self.datetime_state.setCalendarPopup(True)
+        self.btn_state_at = QPushButton("Ver Estado en Fecha")
+        date_row.addWidget(QLabel("Fecha:"))
+        date_row.addWidget(self.datetime_state)
+        date_row.addWidget(self.btn_state_at)
+        layout.addLayout(date_row)
+
+        self.result_text = QPlainTextEdit()
+        self.result_text.setReadOnly(True)
+        layout.addWidget(self.result_text)
+
+        self.button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+
+        self.btn_take_snapshot.clicked.connect(self.take_snapshot)
+        self.btn_compare.clicked.connect(self.compare_selected)
+        self.btn_state_at.clicked.connect(self.show_state_at)
+        self.load_snapshots()
+
+    def load_snapshots(self):
+        self.snapshot_list.clear()
+        current = QListWidgetItem("Estado actual")
+        current.setData(Qt.ItemDataRole.UserRole, None)
+        self.snapshot_list.addItem(current)
+        for snap_id, ts, etiqueta, _ in self.change_log.list_snapshots(self.inventory_id):
+            item = QListWidgetItem(f"{ts[:16]} - {etiqueta or 'Instantánea automática'}")
+            item.setData(Qt.ItemDataRole.UserRole, snap_id)
+            self.snapshot_list.addItem(item)
+
+    def take_snapshot(self):
+        etiqueta = self.input_etiqueta.text().strip() or f"Auditoría {QDate.currentDate().toString('dd/MM/yyyy')}"
+        self.change_log.take_snapshot(self.inventory_id, etiqueta)
+        self.input_etiqueta.clear()
+        self.load_snapshots()
+
+    def _seq_of(self, item):
+        snap_id = item.data(Qt.ItemDataRole.UserRole)
+        return self.change_log.current_seq() if snap_id is None else self.change_log.snapshot_seq(snap_id)
+
+    def _describe(self, item_type, item_id, row):
+        display_name = self.item_map.get(item_type, {}).get('display_name', 'Información General')
+        label = " ".join(str(row.get(col)) for col in ('codigo', 'marca', 'modelo', 'nombre', 'elemento', 'cliente') if row.get(col))
+        return f"[{display_name}] {label or f'ID:{item_id}'}"
+
+    def compare_selected(self):
+        selected = self.snapshot_list.selectedItems()
+        if len(selected) not in (1, 2):
+            QMessageBox.warning(self, "Selección Requerida", "Seleccione una o dos instantáneas para comparar.")
+            return
+        seq_a = self._seq_of(selected[0])
+        seq_b = self._seq_of(selected[1]) if len(selected) == 2 else self.change_log.current_seq()
+        diff = self.change_log.diff(self.inventory_id, seq_a, seq_b)
+
+        lines = [f"AÑADIDOS ({len(diff['added'])})"]
+        lines += [f"  + {self._describe(t, i, row)}" for t, i, row in diff['added']]
+        lines += ["", f"ELIMINADOS ({len(diff['removed'])})"]
+        lines += [f"  - {self._describe(t, i, row)}" for t, i, row in diff['removed']]
+        lines += ["", f"MODIFICADOS ({len(diff['modified'])})"]
+        for t, i, before, after, fields in diff['modified']:
+            lines.append(f"  * {self._describe(t, i, after)}")
+            lines += [f"      {f}: {before.get(f)!r} -> {after.get(f)!r}" for f in fields]
+        self.result_text.setPlainText("\n".join(lines))
+
+    def show_state_at(self):
+        ts = self.datetime_state.dateTime().toString("yyyy-MM-dd HH:mm:59.999")
+        state = self.change_log.state_at(self.inventory_id, ts)
+        lines = [f"Estado del centro a {self.datetime_state.dateTime().toString('dd/MM/yyyy HH:mm')}", ""]
+        for table, info in self.item_map.items():
+            rows = state.get(table, {})
+            if rows:
+                lines.append(f"{info['display_name']} ({len(rows)})")
+                lines += [f"  {self._describe(table, i, row)}" for i, row in sorted(rows.items())]
+        self.result_text.setPlainText("\n".join(lines))
+
+# --- Panel de Depuración SQL ---
+class SqlStatsDialog(QDialog):
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Panel de Depuración SQL")
+        self.resize(1000, 600)
+        self.db = db
+
+        layout = QVBoxLayout(self)
+        options = QHBoxLayout()
+        self.check_enabled = QCheckBox("Instrumentación activa")
+        self.check_plans = QCheckBox("Capturar EXPLAIN QUERY PLAN de las lentas")
+        self.spin_slow_ms = QDoubleSpinBox()
+        self.spin_slow_ms.setRange(0, 60000)
+        self.spin_slow_ms.setSuffix(" ms")
+        stats = self.db.stats
+        self.check_enabled.setChecked(stats is not None)
+        self.check_plans.setChecked(bool(stats and stats.capture_plans))
+        self.spin_slow_ms.setValue(stats.slow_ms if stats else 50.0)
+        options.addWidget(self.check_enabled)
+        options.addWidget(QLabel("Umbral de consulta lenta:"))
+        options.addWidget(self.spin_slow_ms)
+        options.addWidget(self.check_plans)
+        layout.addLayout(options)
+
+        self.tabs = QTabWidget()
+        self.table_actions = QTableWidget()
+        self.table_shapes = QTableWidget()
+        self.table_slow = QTableWidget()
+        for table in (self.table_actions, self.table_shapes, self.table_slow):
+            table.setEditTriggers(table.EditTrigger.NoEditTriggers)
+        self.tabs.addTab(self.table_actions, "Acciones de la UI")
+        self.tabs.addTab(self.table_shapes, "Consultas")
+        self.tabs.addTab(self.table_slow, "Consultas Lentas")
+        layout.addWidget(self.tabs)
+
+        buttons = QHBoxLayout()
+        self.btn_refresh = QPushButton("Actualizar")
+        self.btn_reset = QPushButton("Reiniciar Contadores")
+        self.btn_export_json = QPushButton("Exportar JSON...")
+        self.btn_close = QPushButton("Cerrar")
+        for button in (self.btn_refresh, self.btn_reset, self.btn_export_json, self.btn_close):
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+
+        self.check_enabled.toggled.connect(self.apply_options)
+        self.check_plans.toggled.connect(self.apply_options)
+        self.spin_slow_ms.valueChanged.connect(self.apply_options)
+        self.btn_refresh.clicked.connect(self.refresh)
+        self.btn_reset.clicked.connect(self.reset)
+        self.btn_export_json.clicked.connect(self.export_json)
+        self.btn_close.clicked.connect(self.accept)
+        self.refresh()
+
+    def apply_options(self):
+        if self.check_enabled.isChecked():
+            self.db.enable_instrumentation(self.spin_slow_ms.value(), self.check_plans.isChecked())
+        else:
+            self.db.disable_instrumentation()
+        self.refresh()
+
+    def _fill(self, table, headers, rows):
+        table.setRowCount(0)
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setRowCount(len(rows))
+        for row_num, row_data in enumerate(rows):
+            for col_num, value in enumerate(row_data):
+                text = f"{value:.2f}" if isinstance(value, float) else str(value)
+                table.setItem(row_num, col_num, QTableWidgetItem(text))
+        table.resizeColumnsToContents()
+
+    def refresh(self):
+        data = self.db.stats.to_dict() if self.db.stats else {'actions': [], 'shapes': [], 'slow_log': []}
+        self._fill(self.table_actions, ['Acción', 'Veces', 'Consultas', 'ms en BD', 'ms totales', 'ms máx.', 'Última'],
+                   [(a['name'], a['calls'], a['queries'], a['db_ms'], a['wall_ms'], a['max_wall_ms'], a['last']) for a in data['actions']])
+        self._fill(self.table_shapes, ['Llamadas', 'ms totales', 'ms medio', 'ms máx.', 'Filas', 'Consulta'],
+                   [(q['calls'], q['total_ms'], q['total_ms'] / q['calls'], q['max_ms'], q['rows'], q['sql']) for q in data['shapes']])
+        self._fill(self.table_slow, ['Hora', 'ms', 'Filas', 'Acción', 'Consulta', 'Plan'],
+                   [(q['time'], q['ms'], q['rows'], q['action'] or '', q['sql'], " | ".join(q.get('plan', []))) for q in data['slow_log']])
+
+    def reset(self):
+        if self.db.stats:
+            self.db.stats.reset()
+        self.refresh()
+
+    def export_json(self):
+        if not self.db.stats:
+            QMessageBox.warning(self, "Instrumentación inactiva", "Active la instrumentación para recoger estadísticas.")
+            return
+        default_filename = f"sql_stats_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
+        filename, _ = QFileDialog.getSaveFileName(self, "Guardar Estadísticas", default_filename, "JSON (*.json)")
+        if filename:
+            self.db.stats.dump_json(filename)
+
+# --- Ventana del Plano ---
+class FloorPlanDialog(QDialog):
+    def __init__(self, store, inventory_id, plan_path, item_map, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Plano del Centro")
+        self.resize(1200, 800)
+        self.store = store
+        self.inventory_id = inventory_id
+        self.item_map = item_map
+        self.main_window = parent
+        self.moving = None
+
+        self.canvas = FloorPlanCanvas()
+        self.unplaced_list = QListWidget()
+        help_label = QLabel("Seleccione un equipo de la lista y pulse en el plano para ubicarlo.\n"
+                            "Clic en una chincheta: ver detalles. Botón derecho: mover o quitar.")
+        help_label.setWordWrap(True)
+        self.btn_close = QPushButton("Cerrar")
+
+        side = QVBoxLayout()
+        side.addWidget(help_label)
+        side.addWidget(QLabel("<b>Equipos sin ubicar:</b>"))
+        side.addWidget(self.unplaced_list)
+        side.addWidget(self.btn_close)
+        layout = QHBoxLayout(self)
+        layout.addWidget(self.canvas, 1)
+        layout.addLayout(side)
+
+        # Pirámide de mosaicos: se genera una sola vez por plano, en segundo plano
+        pyramid = TilePyramid(plan_path, get_writable_data_path(os.path.join('data', 'plan_tiles')))
+        self.canvas.set_pyramid(pyramid)
+        self.builder = None
+        if not pyramid.is_built():
+            self.builder = PyramidBuilder(pyramid, self)
+            self.builder.level_ready.connect(self.canvas.on_level_ready)
+            self.builder.start()
+
+        self.canvas.plan_clicked.connect(self.place_item)
+        self.canvas.pin_clicked.connect(self.open_pin)
+        self.canvas.pin_context.connect(self.show_pin_menu)
+        self.btn_close.clicked.connect(self.accept)
+        self.load_pins()
+
+    def load_pins(self):
+        self.canvas.set_pins(self.store.positions(self.inventory_id))
+        self.unplaced_list.clear()
+        for item_type, item_id, label in self.store.unplaced(self.inventory_id):
+            display_name = self.item_map.get(item_type, {}).get('display_name', item_type)
+            item = QListWidgetItem(f"[{display_name}] {label or f'ID:{item_id}'}")
+            item.setData(Qt.ItemDataRole.UserRole, (item_type, item_id))
+            self.unplaced_list.addItem(item)
+
+    def place_item(self, x, y):
+        if self.moving:
+            item_type, item_id = self.moving
+            self.moving = None
+            self.setCursor(Qt.CursorShape.ArrowCursor)
+        else:
+            current = self.unplaced_list.currentItem()
+            if not current:
+                return
+            item_type, item_id = current.data(Qt.ItemDataRole.UserRole)
+        self.store.set_position(item_type, item_id, self.inventory_id, x, y)
+        self.load_pins()
+
+    def open_pin(self, item_type, item_id):
+        self.main_window.open_detail_view(item_type, item_id)
+        self.load_pins()  # el equipo puede haberse eliminado desde el detalle
+
+    def show_pin_menu(self, item_type, item_id, global_pos):
+        menu = QMenu(self)
+        detail_action = menu.addAction("Ver detalles")
+        move_action = menu.addAction("Mover en el plano")
+        remove_action = menu.addAction("Quitar del plano")
+        chosen = menu.exec(global_pos)
+        if chosen == detail_action:
+            self.open_pin(item_type, item_id)
+        elif chosen == move_action:
+            self.moving = (item_type, item_id)
+            self.setCursor(Qt.CursorShape.CrossCursor)
+        elif chosen == remove_action:
+            self.store.remove_position(item_type, item_id)
+            self.load_pins()
+
+    def done(self, result):
+        if self.builder is not None and self.builder.isRunning():
+            self.builder.requestInterruption()
+            self.builder.wait()
+        self.canvas.loader.shutdown()
+        super().done(result)
+
+# --- Ventana del Esquema de Red ---
+class TopologyDialog(QDialog):
+    def __init__(self, db, store, inventory_id, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Esquema de Red del Centro")
+        self.resize(1200, 800)
+        self.db = db
+        self.store = store
+        self.inventory_id = inventory_id
+        self.main_window = parent
+        self.executor = executor_for(parent, db)
+        self.fitted = False
+
+        self.view = TopologyView()
+        self.label_status = QLabel("Calculando el esquema...")
+        help_label = QLabel("Rueda: zoom. Arrastrar el fondo: desplazar. Arrastrar un equipo: moverlo. Doble clic: ver detalles.")
+        help_label.setWordWrap(True)
+        self.button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        self.btn_fit = self.button_box.addButton("Ajustar a la Ventana", QDialogButtonBox.ButtonRole.ActionRole)
+        self.btn_reset = self.button_box.addButton("Reorganizar", QDialogButtonBox.ButtonRole.ActionRole)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(help_label)
+        layout.addWidget(self.view, 1)
+        bottom = QHBoxLayout()
+        bottom.addWidget(self.label_status, 1)
+        bottom.addWidget(self.button_box)
+        layout.addLayout(bottom)
+
+        self.view.node_activated.connect(self.open_node)
+        self.view.node_moved.connect(self.store.move_node)
+        self.btn_fit.clicked.connect(self.view.fit)
+        self.btn_reset.clicked.connect(self.reset_layout)
+        self.button_box.rejected.connect(self.reject)
+        self.load()
+
+    def load(self):
+        # La distribución se calcula en el hilo de base de datos; aquí solo se guarda y se dibuja
+        self.btn_reset.setEnabled(False)
+        inventory_id = self.inventory_id
+        self.executor.submit(lambda db: compute_layout(db, inventory_id), self.show_layout,
+                             key=(id(self), 'topology'), owner=self)
+
+    def show_layout(self, layout):
+        self.store.save(layout)
+        self.view.set_layout(layout)
+        if not self.fitted:
+            self.view.fit()
+            self.fitted = True
+        self.btn_reset.setEnabled(True)
+        self.label_status.setText(f"{len(layout.nodes)} equipos, {len(layout.edges)} conexiones, "
+                                  f"{len(layout.groups)} ubicaciones")
+
+    def open_node(self, item_type, item_id):
+        self.main_window.open_detail_view(item_type, item_id)
+        self.load()  # el equipo puede haberse cambiado, conectado o eliminado desde el detalle
+
+    def reset_layout(self):
+        reply = QMessageBox.question(self, "Reorganizar",
+                                     "Se descartarán las posiciones guardadas y se volverá a distribuir todo el esquema. ¿Desea continuar?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        self.store.reset(self.inventory_id)
+        self.fitted = False
+        self.load()
+
+# --- Ventana de Edición en Bloque ---
+class BulkEditDialog(QDialog):
+    def __init__(self, db, table_name, fields, count, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Editar {count} elementos")
+        self.db = db
+        self.table_name = table_name
+
+        layout = QFormLayout(self)
+        self.combo_field = QComboBox()
+        for column, header in fields:
+            self.combo_field.addItem(header, column)
+        self.combo_value = QComboBox()
+        self.combo_value.setEditable(True)
+        layout.addRow("Campo:", self.combo_field)
+        layout.addRow("Nuevo valor:", self.combo_value)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+        self.combo_field.currentIndexChanged.connect(self.load_values)
+        self.load_values()
+
+    def load_values(self):
+        self.combo_value.clear()
+        self.combo_value.addItems(distinct_values(self.db, self.table_name, self.combo_field.currentData()))
+        self.combo_value.setCurrentText("")
+
+    def get_data(self):
+        return self.combo_field.currentData(), self.combo_value.currentText()
+
 # --- Ventana Principal ---
 class MainWindow(QMainWindow):
     def __init__(self, inventory_id, app_instance=None):
@@ -376,7 +1186,29 @@ class MainWindow(QMainWindow):
         loadUi(os.path.join(get_base_path(), "ui_inventario.ui"), self)
         
         self.db = DatabaseManager()
+        # Con la base de datos dividida por centros, las consultas van al fichero del centro (ver shards.py)
+        self.db.use_centro(inventory_id)
+        # Lecturas de la interfaz en segundo plano (tablas, dashboard, búsqueda, detalles)
+        self.db_worker = DatabaseWorker(self.db.db_name, self)
+        self.db_worker.centro_id = inventory_id
+        self.detail_cache = DetailCache()
+        self.fleet = FleetAnalytics(self.db)
+        self.change_log = ChangeLog(self.db)
+        self.floor_plan = FloorPlanStore(self.db)
+        self.topology = TopologyStore(self.db)
+        self.export_cache = ExportCache(self.db, get_writable_data_path(os.path.join('cache', 'informes')))
+        self.hardware = HardwareAttributes(self.db)
+        self.compliance = ComplianceEngine(self.db, self.hardware)
+        self.sync = SyncEngine(self.db, get_writable_data_path())
+        self.backup_worker = None
+        # Servicio local de consultas JSON para otras herramientas (opcional, ver query_service.py)
+        self.query_service = None
         self.current_inventory_id = inventory_id
+        # Estado ya cargado de los últimos centros abiertos (cambio de centro sin recargar)
+        self.sessions = SessionCache(on_evict=self._discard_session)
+        self.session = self.sessions.session(inventory_id)
+        # Rellenos de tablas y dashboard pendientes hasta que su pestaña sea visible
+        self._deferred_views = {}
         
         self.editing_item_id = None
         self.editing_item_type = None
@@ -410,20 +1242,48 @@ class MainWindow(QMainWindow):
         self.setup_ui()
         self.connect_signals()
         self.load_selected_inventory()
+        # Relleno inicial de pcs_attrs por lotes, entre eventos de la interfaz
+        QTimer.singleShot(0, self._backfill_hardware_attrs)
+        if self.db.get_meta('query_service') == '1':
+            self.query_service_action.setChecked(True)
+            self.toggle_query_service(True)
 
     def setup_ui(self):
         for table_name in self.table_map:
             widget = self.table_map[table_name]['widget']
             widget.setEditTriggers(widget.EditTrigger.NoEditTriggers)
             widget.setColumnHidden(0, True)
+            # Selección de varias filas con acciones en bloque desde el menú contextual
+            widget.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+            widget.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+            widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         
         self.statusbar.addPermanentWidget(QLabel("Hecho por ForgeNEX (www.forgenex.com)"))
         
-        # --- Dashboard Widgets ---
-        self.bar_chart = BarChartWidget()
-        self.pie_chart = PieChartWidget()
-        self.bar_chart_layout.addWidget(self.bar_chart)
-        self.pie_chart_layout.addWidget(self.pie_chart)
+        # Botón para ubicar equipos en el plano, junto al selector del plano
+        plano_layout = self.btn_select_plano.parentWidget().layout()
+        self.btn_open_plano = QPushButton("Ubicar Equipos en el Plano...")
+        plano_layout.addWidget(self.btn_open_plano, plano_layout.rowCount(), 1)
+
+        # --- Dashboard Widgets --- (una pareja de gráficos por centro abierto, ver _activate_session_charts)
+        self.bar_chart = None
+        self.pie_chart = None
+        self._activate_session_charts()
+        self.tabs_main.currentChanged.connect(self._run_deferred_views)
+
+        # Resumen de hardware de los PCs (a partir de pcs_attrs), junto al botón de refrescar
+        self.label_hardware_summary = QLabel()
+        self.label_hardware_summary.setWordWrap(True)
+        self.gridLayout_12.addWidget(self.label_hardware_summary, 3, 1, 1, 3)
+
+        # Alertas de cumplimiento del centro (tabla compliance_findings)
+        self.group_compliance = QGroupBox("Alertas de Cumplimiento")
+        compliance_layout = QVBoxLayout(self.group_compliance)
+        self.list_compliance = QListWidget()
+        self.list_compliance.setMaximumHeight(140)
+        self.list_compliance.itemDoubleClicked.connect(self.open_compliance_alert)
+        compliance_layout.addWidget(self.list_compliance)
+        self.gridLayout_12.addWidget(self.group_compliance, 4, 0, 1, 4)
 
         menu_bar = self.menuBar()
         file_menu = menu_bar.addMenu("&Archivo")
@@ -432,56 +1292,462 @@ class MainWindow(QMainWindow):
         switch_action.triggered.connect(self.switch_center)
         file_menu.addAction(switch_action)
 
+        file_menu.addSeparator()
+        backup_action = QAction("Copia de Seguridad", self)
+        backup_action.triggered.connect(self.start_backup)
+        file_menu.addAction(backup_action)
+
+        export_centro_action = QAction("Exportar Centro...", self)
+        export_centro_action.triggered.connect(self.export_centro_archive)
+        file_menu.addAction(export_centro_action)
+
+        import_centro_action = QAction("Importar Centro...", self)
+        import_centro_action.triggered.connect(self.import_centro_archive)
+        file_menu.addAction(import_centro_action)
+
+        warehouse_action = QAction("Exportar para BI...", self)
+        warehouse_action.triggered.connect(self.export_warehouse)
+        file_menu.addAction(warehouse_action)
+        file_menu.addSeparator()
+
         exit_action = QAction("Salir", self)
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
 
+        tools_menu = menu_bar.addMenu("&Herramientas")
+
+        plan_action = QAction("Plano del Centro", self)
+        plan_action.triggered.connect(self.open_floor_plan)
+        tools_menu.addAction(plan_action)
+
+        topology_action = QAction("Esquema de Red", self)
+        topology_action.triggered.connect(self.open_topology)
+        tools_menu.addAction(topology_action)
+
+        fleet_action = QAction("Analítica de Flota", self)
+        fleet_action.triggered.connect(self.open_fleet_analytics)
+        tools_menu.addAction(fleet_action)
+
+        history_action = QAction("Historial de Auditorías", self)
+        history_action.triggered.connect(self.open_audit_history)
+        tools_menu.addAction(history_action)
+
+        labels_action = QAction("Etiquetas del Centro...", self)
+        labels_action.triggered.connect(lambda: self.print_labels())
+        tools_menu.addAction(labels_action)
+
+        compliance_action = QAction("Alertas de Cumplimiento", self)
+        compliance_action.triggered.connect(self.open_compliance)
+        tools_menu.addAction(compliance_action)
+
+        reconcile_action = QAction("Reconciliar Imágenes y Conexiones", self)
+        reconcile_action.triggered.connect(self.open_reconciliation)
+        tools_menu.addAction(reconcile_action)
+
+        sql_stats_action = QAction("Panel de Depuración SQL", self)
+        sql_stats_action.triggered.connect(self.open_sql_stats)
+        tools_menu.addAction(sql_stats_action)
+
+        self.query_service_action = QAction("Servicio de Consultas Local", self)
+        self.query_service_action.setCheckable(True)
+        self.query_service_action.triggered.connect(self.toggle_query_service)
+        tools_menu.addAction(self.query_service_action)
+
+        sync_menu = menu_bar.addMenu("&Sincronización")
+
+        export_sync_action = QAction("Exportar Cambios...", self)
+        export_sync_action.triggered.connect(self.export_sync_changes)
+        sync_menu.addAction(export_sync_action)
+
+        import_sync_action = QAction("Importar Cambios de otro Equipo...", self)
+        import_sync_action.triggered.connect(self.import_sync_changes)
+        sync_menu.addAction(import_sync_action)
+
     def switch_center(self):
-        if self.app_instance:
-            self.app_instance.should_switch_user = True
-        self.close()
+        login = LoginDialog(self.db, self)
+        login.set_current_centro(self.current_inventory_id)
+        if login.exec():
+            self.open_centro(login.selected_inventory_id)
+
+    def open_centro(self, inventory_id):
+        """Cambia la ventana a otro centro. Lo que ya se cargó de ese centro en una sesión
+        reciente y no ha cambiado desde entonces (según change_log) se muestra sin consultar."""
+        with tracing.span('abrir_centro'):
+            self._save_view_state()
+            for table_name in self.table_map:
+                getattr(self, f"clear_{table_name}_inputs", lambda: None)()
+            self._deferred_views.clear()
+            self._use_centro(inventory_id)
+            # Como en load_selected_inventory: con un fichero por centro las sugerencias cambian con él
+            self.populate_all_comboboxes()
+            self.current_inventory_id = inventory_id
+            self.session = self.sessions.session(inventory_id)
+            if not self._load_general_info():
+                return
+            if self.session.tab_index is not None:
+                self.tabs_main.blockSignals(True)
+                self.tabs_main.setCurrentIndex(self.session.tab_index)
+                self.tabs_main.blockSignals(False)
+            self._activate_session_charts()
+
+            versions = data_versions(self.db, inventory_id)
+            for table_name in self.table_map:
+                rows = self.session.table_rows(table_name, versions)
+                if rows is not None:
+                    self._show_table(table_name, rows, self.session.scroll.get(table_name))
+                else:
+                    self.refresh_table(table_name)
+            dashboard = self.session.dashboard_result(versions)
+            if dashboard is not None:
+                self._when_visible(self.label_kpi_pcs_value, 'dashboard', lambda: self._show_dashboard(dashboard, versions))
+            else:
+                self.update_dashboard()
+
+    def _use_centro(self, inventory_id):
+        """Dirige las consultas de la ventana y del hilo de base de datos al centro. Con la base
+        de datos dividida, el fichero de un centro nuevo recibe aquí el esquema de los subsistemas."""
+        self.db.use_centro(inventory_id)
+        self.db_worker.centro_id = inventory_id
+        if self.db.sharded:
+            for subsystem in (self.fleet, self.change_log, self.floor_plan, self.topology, self.export_cache,
+                              self.hardware, self.compliance, self.sync):
+                subsystem.ensure_schema()
+
+    def _save_view_state(self):
+        self.session.tab_index = self.tabs_main.currentIndex()
+        self.session.scroll = {table_name: info['widget'].verticalScrollBar().value() for table_name, info in self.table_map.items()}
+
+    def _activate_session_charts(self):
+        if self.session.charts is None:
+            from dashboard_widgets import BarChartWidget, PieChartWidget
+            self.session.charts = (BarChartWidget(), PieChartWidget())
+            self.bar_chart_layout.addWidget(self.session.charts[0])
+            self.pie_chart_layout.addWidget(self.session.charts[1])
+        for chart in (self.bar_chart, self.pie_chart):
+            if chart is not None:
+                chart.hide()
+        self.bar_chart, self.pie_chart = self.session.charts
+        self.bar_chart.show()
+        self.pie_chart.show()
+
+    def _discard_session(self, session):
+        if session.charts is not None:
+            for chart in session.charts:
+                chart.deleteLater()
+            session.charts = None
+
+    def _backfill_hardware_attrs(self):
+        if self.hardware.refresh_batch():
+            QTimer.singleShot(0, self._backfill_hardware_attrs)
+
+    def _when_visible(self, widget, key, func):
+        """Ejecuta `func` ya si `widget` está a la vista; si no, al mostrar su pestaña
+        (de varias peticiones con la misma `key` solo se ejecuta la última). Devuelve True si se ejecutó."""
+        if widget.isVisibleTo(self):
+            self._deferred_views.pop(key, None)
+            func()
+            return True
+        self._deferred_views[key] = (widget, func)
+        return False
+
+    def _run_deferred_views(self):
+        for key, (widget, func) in list(self._deferred_views.items()):
+            if widget.isVisibleTo(self):
+                del self._deferred_views[key]
+                func()
+
+    def closeEvent(self, event):
+        if self.backup_worker is not None and self.backup_worker.isRunning():
+            self.backup_worker.requestInterruption()
+            self.backup_worker.wait()
+        if self.query_service is not None:
+            self.query_service.stop()
+        self.db_worker.stop()
+        super().closeEvent(event)
 
     def connect_signals(self):
         # Dashboard
-        self.btn_refresh_dashboard.clicked.connect(self.update_dashboard)
-        self.combo_dashboard_locations.currentIndexChanged.connect(self.update_dashboard_location_list)
-        self.list_dashboard_location_items.itemDoubleClicked.connect(self.open_detail_from_dashboard)
+        self._connect(self.btn_refresh_dashboard.clicked, self.update_dashboard)
+        self._connect(self.combo_dashboard_locations.currentIndexChanged, self.update_dashboard_location_list)
+        self._connect(self.list_dashboard_location_items.itemDoubleClicked, self.open_detail_from_dashboard)
 
         # Botones Globales
-        self.btn_search.clicked.connect(self.open_search_dialog)
-        self.btn_guardar_todo.clicked.connect(self.save_all_data)
-        self.btn_exportar_excel.clicked.connect(self.export_to_excel)
-        self.btn_exportar_pdf.clicked.connect(self.export_to_pdf)
-        self.btn_select_plano.clicked.connect(self.select_plano)
+        self._connect(self.btn_search.clicked, self.open_search_dialog)
+        self._connect(self.btn_guardar_todo.clicked, self.save_all_data)
+        self._connect(self.btn_exportar_excel.clicked, self.export_to_excel)
+        self._connect(self.btn_exportar_pdf.clicked, self.export_to_pdf)
+        self._connect(self.btn_select_plano.clicked, self.select_plano)
+        self._connect(self.btn_open_plano.clicked, self.open_floor_plan)
         # Conexiones para GUARDAR (añadir/actualizar)
-        self.btn_save_pc.clicked.connect(self.save_pc)
-        self.btn_save_proyector.clicked.connect(self.save_proyector)
-        self.btn_save_impresora.clicked.connect(self.save_impresora)
-        self.btn_save_servidor.clicked.connect(self.save_servidor)
-        self.btn_save_red.clicked.connect(self.save_red)
-        self.btn_save_cctv_recorder.clicked.connect(self.save_recorder) 
-        self.btn_save_cctv_camera.clicked.connect(self.save_camera)
-        self.btn_save_acceso.clicked.connect(self.save_acceso)
-        self.btn_save_software.clicked.connect(self.save_software)
-        self.btn_save_credencial.clicked.connect(self.save_credencial)
+        self._connect(self.btn_save_pc.clicked, self.save_pc)
+        self._connect(self.btn_save_proyector.clicked, self.save_proyector)
+        self._connect(self.btn_save_impresora.clicked, self.save_impresora)
+        self._connect(self.btn_save_servidor.clicked, self.save_servidor)
+        self._connect(self.btn_save_red.clicked, self.save_red)
+        self._connect(self.btn_save_cctv_recorder.clicked, self.save_recorder) 
+        self._connect(self.btn_save_cctv_camera.clicked, self.save_camera)
+        self._connect(self.btn_save_acceso.clicked, self.save_acceso)
+        self._connect(self.btn_save_software.clicked, self.save_software)
+        self._connect(self.btn_save_credencial.clicked, self.save_credencial)
 
         # Conexiones para LIMPIAR CAMPOS
-        self.btn_clear_pc.clicked.connect(self.clear_pcs_inputs)
-        self.btn_clear_proyector.clicked.connect(self.clear_proyectores_inputs)
-        self.btn_clear_impresora.clicked.connect(self.clear_impresoras_inputs)
-        self.btn_clear_servidor.clicked.connect(self.clear_servidores_inputs)
-        self.btn_clear_red.clicked.connect(self.clear_red_inputs)
-        self.btn_clear_cctv_recorder.clicked.connect(self.clear_cctv_recorders_inputs)
-        self.btn_clear_cctv_camera.clicked.connect(self.clear_cctv_cameras_inputs)
-        self.btn_clear_acceso.clicked.connect(self.clear_accesos_inputs)
-        self.btn_clear_software.clicked.connect(self.clear_software_inputs)
-        self.btn_clear_credencial.clicked.connect(self.clear_credenciales_inputs)
+        self._connect(self.btn_clear_pc.clicked, self.clear_pcs_inputs)
+        self._connect(self.btn_clear_proyector.clicked, self.clear_proyectores_inputs)
+        self._connect(self.btn_clear_impresora.clicked, self.clear_impresoras_inputs)
+        self._connect(self.btn_clear_servidor.clicked, self.clear_servidores_inputs)
+        self._connect(self.btn_clear_red.clicked, self.clear_red_inputs)
+        self._connect(self.btn_clear_cctv_recorder.clicked, self.clear_cctv_recorders_inputs)
+        self._connect(self.btn_clear_cctv_camera.clicked, self.clear_cctv_cameras_inputs)
+        self._connect(self.btn_clear_acceso.clicked, self.clear_accesos_inputs)
+        self._connect(self.btn_clear_software.clicked, self.clear_software_inputs)
+        self._connect(self.btn_clear_credencial.clicked, self.clear_credenciales_inputs)
         
         # Conexiones de DOBLE CLIC para ver detalles
         for table_name, table_info in self.table_map.items():
-            table_info['widget'].cellDoubleClicked.connect(
-                lambda row, col, name=table_name: self.open_detail_view_from_table(name, row)
-            )
+            self._connect(table_info['widget'].cellDoubleClicked,
+                          lambda row, col, name=table_name: self.open_detail_view_from_table(name, row),
+                          name=f"open_detail_{table_name}")
+            self._connect(table_info['widget'].customContextMenuRequested,
+                          lambda pos, name=table_name: self.show_table_context_menu(name, pos),
+                          name=f"context_menu_{table_name}")
+            # Precarga de los detalles de la fila seleccionada y sus vecinas
+            self._connect(table_info['widget'].currentCellChanged,
+                          lambda row, col, prev_row, prev_col, name=table_name: self.prefetch_details(name, row),
+                          name=f"prefetch_detail_{table_name}")
+
+    def _connect(self, signal, slot, name=None):
+        """Conecta una señal a un slot agrupando las consultas SQL que lance bajo una acción con nombre."""
+        name = name or slot.__name__
+        params = inspect.signature(slot).parameters.values()
+        n_args = sum(1 for p in params if p.default is inspect.Parameter.empty)
+
+        def run_action(*args):
+            with tracing.span(name) as span, self.db.action(name) as current:
+                result = slot(*args[:n_args])
+                if span is not None and current is not None:
+                    span.args.update(consultas=current['queries'], db_ms=round(current['db_ms'], 1))
+            if self.db.stats is not None and name in self.db.stats.actions:
+                self.statusbar.showMessage(self.db.stats.actions[name]['last'], 5000)
+            return result
+        signal.connect(run_action)
+
+    def open_floor_plan(self):
+        plan_path = self.label_plano_path.text()
+        if not plan_path or not os.path.exists(plan_path):
+            QMessageBox.warning(self, "Plano no disponible", "Seleccione primero una imagen de plano en la pestaña de información general.")
+            return
+        dialog = FloorPlanDialog(self.floor_plan, self.current_inventory_id, plan_path, self.item_map, self)
+        dialog.exec()
+
+    def open_topology(self):
+        dialog = TopologyDialog(self.db, self.topology, self.current_inventory_id, self)
+        dialog.exec()
+
+    def open_fleet_analytics(self):
+        self.hardware.refresh()
+        dialog = FleetAnalyticsDialog(self.fleet, self.item_map, self)
+        dialog.exec()
+
+    def open_compliance(self):
+        dialog = ComplianceDialog(self.db, self.compliance, self.item_map, self)
+        dialog.exec()
+        self.update_dashboard()
+
+    def open_reconciliation(self):
+        dialog = ReconciliationDialog(self.db, get_writable_data_path(), self.item_map, self)
+        dialog.exec()
+        if dialog.repaired and (dialog.repaired['imagenes'] or dialog.repaired['conexiones']):
+            # Las conexiones borradas cambian los detalles y las reglas de cumplimiento
+            self.detail_cache.clear()
+            self.compliance.evaluate_all()
+            self.update_dashboard()
+
+    def open_sql_stats(self):
+        dialog = SqlStatsDialog(self.db, self)
+        dialog.exec()
+
+    def toggle_query_service(self, enabled):
+        """Arranca o para el servicio local de consultas; el estado se recuerda entre sesiones."""
+        if enabled and self.query_service is None:
+            try:
+                query_service.prepare_database(self.db)
+                self.query_service = query_service.QueryService(self.db.db_name, sharded=self.db.sharded)
+            except OSError as e:
+                QMessageBox.warning(self, "Servicio de Consultas", f"No se pudo arrancar el servicio: {e}")
+                self.query_service_action.setChecked(False)
+                return
+            self.query_service.start()
+            self.statusbar.showMessage(f"Servicio de consultas en {self.query_service.url}", 5000)
+        elif not enabled and self.query_service is not None:
+            self.query_service.stop()
+            self.query_service = None
+        self.db.set_meta('query_service', '1' if enabled else '0')
+
+    def open_audit_history(self):
+        dialog = AuditHistoryDialog(self.change_log, self.current_inventory_id, self.item_map, self)
+        dialog.exec()
+
+    def export_sync_changes(self):
+        # Cada equipo de destino lleva su propio punto de partida para las exportaciones incrementales
+        peers = self.sync.peers()
+        last_peer = self.db.get_meta('sync_last_peer')
+        current = peers.index(last_peer) if last_peer in peers else 0
+        peer, ok = QInputDialog.getItem(self, "Exportar Cambios", "Equipo de destino:", peers or ['principal'], current, True)
+        peer = peer.strip()
+        if not ok or not peer:
+            return
+        reply = QMessageBox.question(self, "Exportar Cambios",
+                                     f"¿Exportar solo los cambios desde la última exportación a '{peer}'?\n"
+                                     "(Pulse 'No' para exportar la base de datos completa)",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel,
+                                     QMessageBox.StandardButton.Yes)
+        if reply == QMessageBox.StandardButton.Cancel:
+            return
+        default_filename = f"Cambios_{self.sync.origin}_{peer}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.invsync"
+        filename, _ = QFileDialog.getSaveFileName(self, "Guardar Cambios", default_filename, "Sincronización (*.invsync)")
+        if filename:
+            try:
+                count = self.sync.export_changeset(filename, peer=peer, full=(reply == QMessageBox.StandardButton.No))
+                self.db.set_meta('sync_last_peer', peer)
+                QMessageBox.information(self, "Éxito", f"Se han exportado {count} cambios en:\n{filename}")
+            except Exception as e:
+                QMessageBox.critical(self, "Error de Sincronización", f"No se pudieron exportar los cambios. Error: {e}")
+
+    # --- Copias de seguridad y archivo de centro ---
+    def start_backup(self):
+        # La copia se hace en su propio hilo y conexión: se puede seguir trabajando mientras tanto
+        if self.backup_worker is not None and self.backup_worker.isRunning():
+            self.statusbar.showMessage("Ya hay una copia de seguridad en curso.", 5000)
+            return
+        self.backup_worker = BackupWorker(os.path.abspath(self.db.db_name), get_writable_data_path(),
+                                          get_writable_data_path('backups'), self)
+        self.backup_worker.progress.connect(
+            lambda done, total: self.statusbar.showMessage(f"Copia de seguridad: {done * 100 // max(total, 1)}%"))
+        self.backup_worker.done.connect(self._backup_done)
+        self.backup_worker.failed.connect(
+            lambda error: QMessageBox.critical(self, "Copia de Seguridad", f"No se pudo completar la copia. Error: {error}"))
+        self.backup_worker.start()
+
+    def _backup_done(self, report):
+        self.statusbar.showMessage(f"Copia de seguridad creada en {report['ruta']} "
+                                   f"({report['imagenes_copiadas']} imágenes nuevas, {report['imagenes_enlazadas']} sin cambios)", 10000)
+
+    def export_centro_archive(self):
+        cliente = self.db.fetch_one("SELECT cliente FROM inventarios WHERE id=?", (self.current_inventory_id,))[0]
+        cliente_name_safe = "".join(x for x in cliente if x.isalnum() or x in " -_").rstrip()
+        filename, _ = QFileDialog.getSaveFileName(self, "Exportar Centro", f"{cliente_name_safe}{ARCHIVE_EXTENSION}",
+                                                  f"Archivo de centro (*{ARCHIVE_EXTENSION})")
+        if filename:
+            try:
+                report = export_centro(self.db, get_writable_data_path(), self.current_inventory_id, filename)
+                QMessageBox.information(self, "Éxito", f"Centro exportado en:\n{filename}\n\n"
+                                                       f"{report['filas']} filas, {report['imagenes']} imágenes")
+            except Exception as e:
+                QMessageBox.critical(self, "Error de Exportación", f"No se pudo exportar el centro. Error: {e}")
+
+    def import_centro_archive(self):
+        filename, _ = QFileDialog.getOpenFileName(self, "Importar Centro", "", f"Archivo de centro (*{ARCHIVE_EXTENSION})")
+        if not filename:
+            return
+        try:
+            manifest = read_manifest(filename)
+            # Con la base de datos dividida se importa en el catálogo y pasa a su fichero al abrirlo
+            with self.db.on_catalog():
+                inventory_id, report = import_centro(self.db, get_writable_data_path(), filename)
+        except Exception as e:
+            QMessageBox.critical(self, "Error de Importación", f"No se pudo importar el centro. Error: {e}")
+            return
+        with self.db.on_centro(inventory_id):
+            self.compliance.evaluate_all()
+        reply = QMessageBox.question(self, "Centro importado",
+                                     f"Se ha importado '{report['cliente']}' ({report['filas']} filas, {report['imagenes']} imágenes"
+                                     f" de {manifest['imagenes']}).\n¿Desea abrirlo ahora?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.Yes)
+        if reply == QMessageBox.StandardButton.Yes:
+            self.open_centro(inventory_id)
+
+    def print_labels(self, ids=None):
+        """Hoja de etiquetas con QR de los equipos seleccionados (`ids`: {tabla: [ids]}) o de todo el centro."""
+        from label_generator import LAYOUTS, DEFAULT_LAYOUT, label_items, generate_labels
+        names = list(LAYOUTS)
+        descriptions = [LAYOUTS[name].descripcion for name in names]
+        description, ok = QInputDialog.getItem(self, "Imprimir Etiquetas", "Plantilla de etiquetas:", descriptions,
+                                               names.index(DEFAULT_LAYOUT), False)
+        if not ok:
+            return
+        layout = names[descriptions.index(description)]
+        start, ok = QInputDialog.getInt(self, "Imprimir Etiquetas", "Etiquetas ya usadas en la primera hoja:",
+                                        0, 0, LAYOUTS[layout].columnas * LAYOUTS[layout].filas - 1)
+        if not ok:
+            return
+        cliente = self.db.fetch_one("SELECT cliente FROM inventarios WHERE id=?", (self.current_inventory_id,))[0]
+        cliente_name_safe = "".join(x for x in cliente if x.isalnum() or x in " -_").rstrip()
+        filename, _ = QFileDialog.getSaveFileName(self, "Guardar Etiquetas", f"Etiquetas_{cliente_name_safe}.pdf", "PDF Files (*.pdf)")
+        if not filename:
+            return
+        try:
+            items = label_items(self.db, [self.current_inventory_id], ids=ids)
+            pages = generate_labels(filename, items, layout, start)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudieron generar las etiquetas. Error: {e}")
+            return
+        QMessageBox.information(self, "Éxito", f"{len(items)} etiquetas en {pages} hoja(s):\n{filename}")
+
+    def export_warehouse(self):
+        directory = QFileDialog.getExistingDirectory(self, "Exportar para BI (directorio de salida)")
+        if not directory:
+            return
+        formats = warehouse_export.available_formats()
+        if len(formats) > 1:
+            formato, ok = QInputDialog.getItem(self, "Exportar para BI", "Formato:", formats, 0, False)
+            if not ok:
+                return
+        else:
+            formato = formats[0]
+        reply = QMessageBox.question(self, "Exportar para BI",
+                                     "¿Exportar solo los cambios desde la última exportación en este directorio?\n"
+                                     "(Pulse 'No' para reescribirlo todo)",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel,
+                                     QMessageBox.StandardButton.Yes)
+        if reply == QMessageBox.StandardButton.Cancel:
+            return
+        progress = QProgressDialog("Exportando tablas...", None, 0, 100, self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+
+        def advance(done, total):
+            progress.setValue(int(done * 100 / total) if total else 100)
+            QApplication.processEvents()
+
+        try:
+            warehouse_export.ensure_indexes(self.db)
+            result = warehouse_export.export_warehouse(self.db, directory, formato,
+                                                       incremental=(reply == QMessageBox.StandardButton.Yes), progress=advance)
+        except Exception as e:
+            QMessageBox.critical(self, "Error de Exportación", f"No se pudo exportar para BI. Error: {e}")
+            return
+        finally:
+            progress.close()
+        QMessageBox.information(self, "Éxito", f"Exportación {result['modo']} en:\n{directory}\n\n"
+                                               f"{result['particiones']} particiones ({result['filas']} filas) escritas, "
+                                               f"{result['eliminadas']} eliminadas en {result['segundos']} s")
+
+    def import_sync_changes(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "Importar Cambios", "", "Sincronización (*.invsync)")
+        if not files:
+            return
+        totals = Counter()
+        try:
+            for filename in files:
+                totals.update(self.sync.import_changeset(filename))
+        except Exception as e:
+            QMessageBox.critical(self, "Error de Sincronización", f"No se pudieron importar los cambios. Error: {e}")
+            return
+        self.detail_cache.clear()
+        self.compliance.evaluate_all()
+        self.load_selected_inventory()
+        QMessageBox.information(self, "Sincronización completada",
+                                f"Cambios aplicados: {totals['aplicados']}\nOmitidos (ya actualizados): {totals['omitidos']}\n"
+                                f"Conflictos: {totals['conflictos']}\nImágenes recibidas: {totals['imagenes']}")
 
     def open_search_dialog(self):
         dialog = SearchDialog(self.db, self.current_inventory_id, self)
@@ -495,6 +1761,26 @@ class MainWindow(QMainWindow):
     def open_detail_view(self, item_type, item_id):
         dialog = DetailViewDialog(item_type, item_id, self.db, self)
         dialog.exec()
+
+    def prefetch_details(self, item_type, row):
+        """Carga en segundo plano los registros de detalle de la fila actual y de sus vecinas,
+        para que el doble clic abra la ventana de detalles sin esperar a la base de datos."""
+        table_widget = self.table_map[item_type]['widget']
+        if row < 0:
+            return
+        rows = [row] + [r for offset in range(1, PREFETCH_NEIGHBOURS + 1) for r in (row + offset, row - offset)]
+        for slot, r in enumerate(rows):
+            cell = table_widget.item(r, 0) if 0 <= r < table_widget.rowCount() else None
+            key = ('prefetch_detail', slot)
+            if cell is None or self.detail_cache.contains(item_type, cell.text()):
+                # Descarta la precarga anterior de este hueco si ya no hace falta
+                self.db_worker.cancel(key)
+                continue
+            item_id = int(cell.text())
+            version = self.detail_cache.version
+            self.db_worker.submit(lambda db, t=item_type, i=item_id: load_record(db, t, i, get_writable_data_path),
+                                  lambda record, v=version: self.detail_cache.put(record, v),
+                                  key=key, owner=self)
         
     def prepare_to_edit(self, item_type, item_id):
         self.editing_item_type = item_type
@@ -520,6 +1806,12 @@ class MainWindow(QMainWindow):
         self.delete_item(item_type, item_id, table_widget, clear_func)
 
     def load_selected_inventory(self):
+        if self._load_general_info():
+            self.populate_all_comboboxes()
+            self.refresh_all_tables()
+            self.update_dashboard()
+
+    def _load_general_info(self):
         data = self.db.fetch_one("SELECT * FROM inventarios WHERE id=?", (self.current_inventory_id,))
         if data:
             self.input_cliente.setText(data[1])
@@ -536,78 +1828,169 @@ class MainWindow(QMainWindow):
             self.text_equipos_extra.setPlainText(data[9] or "")
             self.label_plano_path.setText(data[10] or "")
             self.setWindowTitle(f"Inventario - {data[1]}")
-            
-            self.populate_all_comboboxes()
-            self.refresh_all_tables()
-            self.update_dashboard()
+        return data is not None
 
     def update_dashboard(self):
+        inventory_id = self.current_inventory_id
+        tables = list(self.item_map.keys())
+        # Los PCs modificados se analizan aquí (pocos); el agregado se hace en el hilo de base de datos
+        self.hardware.refresh(inventory_id)
+
+        def load(db):
+            # La versión se lee antes que los datos: si cambian entre medias, la sesión queda invalidada
+            versions = data_versions(db, inventory_id)
+            counts = {table: db.fetch_one(f"SELECT COUNT(id) FROM {table} WHERE inventario_id=?", (inventory_id,))[0]
+                      for table in ('pcs', 'proyectores', 'impresoras', 'servidores', 'red', 'cctv_recorders', 'cctv_cameras')}
+            os_data = db.fetch_all(f"SELECT so FROM pcs WHERE inventario_id=?", (inventory_id,))
+
+            all_locations = set()
+            for table in tables:
+                columns = [c[1] for c in db.execute_query(f"PRAGMA table_info({table})")]
+                if 'ubicacion_equipo' in columns:
+                    locations = db.fetch_all(f"SELECT DISTINCT ubicacion_equipo FROM {table} WHERE inventario_id=? AND ubicacion_equipo IS NOT NULL AND ubicacion_equipo != ''", (inventory_id,))
+                    all_locations.update([loc[0] for loc in locations])
+                elif 'ubicacion' in columns:
+                    locations = db.fetch_all(f"SELECT DISTINCT ubicacion FROM {table} WHERE inventario_id=? AND ubicacion IS NOT NULL AND ubicacion != ''", (inventory_id,))
+                    all_locations.update([loc[0] for loc in locations])
+            alerts = (compliance.findings(db, inventory_id, limit=compliance.DASHBOARD_LIMIT), compliance.counts(db, inventory_id))
+            return versions, (counts, os_data, all_locations, hardware_attrs.summary(db, inventory_id), alerts)
+        self.db_worker.submit(load, lambda result: self._dashboard_loaded(inventory_id, result), key='dashboard', owner=self)
+
+    def _dashboard_loaded(self, inventory_id, result):
+        versions, dashboard = result
+        session = self.sessions.peek(inventory_id)
+        if session is not None:
+            session.set_dashboard(versions, dashboard)
+        if inventory_id == self.current_inventory_id:
+            self._when_visible(self.label_kpi_pcs_value, 'dashboard', lambda: self._show_dashboard(dashboard))
+
+    def _show_dashboard(self, result, versions=None):
+        counts, os_data, all_locations, hardware, alerts = result
         # KPIs
-        pcs_count = self.db.fetch_one(f"SELECT COUNT(id) FROM pcs WHERE inventario_id=?", (self.current_inventory_id,))[0]
-        network_count = self.db.fetch_one(f"SELECT COUNT(id) FROM red WHERE inventario_id=?", (self.current_inventory_id,))[0]
-        printers_count = self.db.fetch_one(f"SELECT COUNT(id) FROM impresoras WHERE inventario_id=?", (self.current_inventory_id,))[0]
-        cctv_count = self.db.fetch_one(f"SELECT COUNT(id) FROM cctv_recorders WHERE inventario_id=?", (self.current_inventory_id,))[0] + \
-                     self.db.fetch_one(f"SELECT COUNT(id) FROM cctv_cameras WHERE inventario_id=?", (self.current_inventory_id,))[0]
+        pcs_count = counts['pcs']
+        network_count = counts['red']
+        printers_count = counts['impresoras']
+        cctv_count = counts['cctv_recorders'] + counts['cctv_cameras']
         
         self.label_kpi_pcs_value.setText(str(pcs_count))
         self.label_kpi_network_value.setText(str(network_count))
         self.label_kpi_printers_value.setText(str(printers_count))
         self.label_kpi_cctv_value.setText(str(cctv_count))
+        self._show_hardware_summary(hardware)
+        self._show_compliance_alerts(*alerts)
         
-        # Bar Chart
-        bar_labels = ['PCs', 'Proyectores', 'Impresoras', 'Servidores', 'Red', 'Cámaras']
-        bar_values = [
-            pcs_count,
-            self.db.fetch_one(f"SELECT COUNT(id) FROM proyectores WHERE inventario_id=?", (self.current_inventory_id,))[0],
-            printers_count,
-            self.db.fetch_one(f"SELECT COUNT(id) FROM servidores WHERE inventario_id=?", (self.current_inventory_id,))[0],
-            network_count,
-            self.db.fetch_one(f"SELECT COUNT(id) FROM cctv_cameras WHERE inventario_id=?", (self.current_inventory_id,))[0]
-        ]
-        self.bar_chart.update_chart(bar_labels, bar_values)
-
-        # Pie Chart
-        os_data = self.db.fetch_all(f"SELECT so FROM pcs WHERE inventario_id=?", (self.current_inventory_id,))
-        os_counts = Counter([row[0] for row in os_data if row[0]])
-        pie_labels = list(os_counts.keys())
-        pie_values = list(os_counts.values())
-        self.pie_chart.update_chart(pie_labels, pie_values)
+        # Los gráficos de este centro ya muestran este resultado si se vuelve a él sin cambios
+        if self.session.charts_data is not result:
+            # Bar Chart
+            bar_labels = ['PCs', 'Proyectores', 'Impresoras', 'Servidores', 'Red', 'Cámaras']
+            bar_values = [
+                pcs_count,
+                counts['proyectores'],
+                printers_count,
+                counts['servidores'],
+                network_count,
+                counts['cctv_cameras']
+            ]
+            self.bar_chart.update_chart(bar_labels, bar_values)
+
+            # Pie Chart
+            os_counts = Counter([row[0] for row in os_data if row[0]])
+            pie_labels = list(os_counts.keys())
+            pie_values = list(os_counts.values())
+            self.pie_chart.update_chart(pie_labels, pie_values)
+            self.session.charts_data = result
         
         # Location ComboBox
-        all_locations = set()
-        for table in self.item_map.keys():
-            if 'ubicacion_equipo' in [c[1] for c in self.db.execute_query(f"PRAGMA table_info({table})")]:
-                locations = self.db.fetch_all(f"SELECT DISTINCT ubicacion_equipo FROM {table} WHERE inventario_id=? AND ubicacion_equipo IS NOT NULL AND ubicacion_equipo != ''", (self.current_inventory_id,))
-                all_locations.update([loc[0] for loc in locations])
-            elif 'ubicacion' in [c[1] for c in self.db.execute_query(f"PRAGMA table_info({table})")]:
-                 locations = self.db.fetch_all(f"SELECT DISTINCT ubicacion FROM {table} WHERE inventario_id=? AND ubicacion IS NOT NULL AND ubicacion != ''", (self.current_inventory_id,))
-                 all_locations.update([loc[0] for loc in locations])
-
         self.combo_dashboard_locations.blockSignals(True)
         self.combo_dashboard_locations.clear()
         self.combo_dashboard_locations.addItem("Todas las Ubicaciones")
         self.combo_dashboard_locations.addItems(sorted(list(all_locations)))
         self.combo_dashboard_locations.blockSignals(False)
-        self.update_dashboard_location_list()
+        self.update_dashboard_location_list(versions)
+
+    def _show_hardware_summary(self, hardware):
+        if not hardware['pcs']:
+            self.label_hardware_summary.setText("")
+            return
+        cpus = ", ".join(f"{family}: {count}" for family, count in hardware['cpus'][:4])
+        self.label_hardware_summary.setText(
+            f"<b>Almacenamiento total:</b> {format_gb(hardware['disco_total_gb'])} &nbsp; "
+            f"<b>RAM media:</b> {hardware['ram_media_gb']:.1f} GB &nbsp; "
+            f"<b>PCs con menos de {hardware_attrs.LOW_RAM_GB} GB:</b> {hardware['pcs_poca_ram']} &nbsp; "
+            f"<b>PCs con SSD:</b> {hardware['pcs_ssd']} de {hardware['pcs']}"
+            + (f"<br><b>CPUs:</b> {cpus}" if cpus else ""))
+
+    def _show_compliance_alerts(self, findings, counts):
+        total = sum(counts.values())
+        summary = ", ".join(f"{counts[severity]} {label.lower()}" for severity, label in compliance.SEVERITY_LABELS.items() if counts.get(severity))
+        self.group_compliance.setTitle(f"Alertas de Cumplimiento ({total}: {summary})" if total else "Alertas de Cumplimiento (ninguna)")
+        self.list_compliance.clear()
+        for finding in findings:
+            item = QListWidgetItem(compliance.describe(finding))
+            item.setData(Qt.ItemDataRole.UserRole, (finding[2], finding[3]))
+            if finding[0] == compliance.ALTA:
+                item.setForeground(QColor('#b00020'))
+            self.list_compliance.addItem(item)
+        if total > len(findings):
+            self.list_compliance.addItem(f"... y {total - len(findings)} más (Herramientas > Alertas de Cumplimiento)")
+
+    def open_compliance_alert(self, item):
+        target = item.data(Qt.ItemDataRole.UserRole)
+        if target:
+            self.open_detail_view(*target)
+
+    def connections_changed(self, items):
+        """Reevalúa las reglas de cumplimiento de los elementos cuyas conexiones han cambiado."""
+        by_type = {}
+        for item_type, item_id in items:
+            by_type.setdefault(item_type, []).append(item_id)
+        for item_type, ids in by_type.items():
+            self.compliance.evaluate_items(item_type, ids, self.current_inventory_id)
+        self.update_dashboard()
 
-    def update_dashboard_location_list(self):
+    def update_dashboard_location_list(self, versions=None):
         location = self.combo_dashboard_locations.currentText()
+        inventory_id = self.current_inventory_id
+        item_map = dict(self.item_map)
+        # Al volver a un centro reciente, la lista ya calculada sirve si los datos no han cambiado
+        rows = self.session.location_rows(location, versions) if versions is not None else None
+        if rows is not None:
+            self._show_dashboard_location_list(rows)
+            return
+
+        def load(db):
+            versions = data_versions(db, inventory_id)
+            rows = []
+            for table_name, info in item_map.items():
+                columns = [c[1] for c in db.execute_query(f"PRAGMA table_info({table_name})")]
+                loc_field = 'ubicacion_equipo' if 'ubicacion_equipo' in columns else 'ubicacion'
+                if 'ubicacion' in columns or 'ubicacion_equipo' in columns:
+                    query = f"SELECT id, codigo FROM {table_name} WHERE inventario_id=?"
+                    params = [inventory_id]
+                    if location != "Todas las Ubicaciones":
+                        query += f" AND {loc_field} = ?"
+                        params.append(location)
+
+                    items = db.fetch_all(query, tuple(params))
+                    rows.extend((table_name, info['display_name'], item_id, item_code) for item_id, item_code in items)
+            return versions, rows
+        self.db_worker.submit(load, lambda result: self._location_list_loaded(inventory_id, location, result),
+                              key='dashboard_locations', owner=self)
+
+    def _location_list_loaded(self, inventory_id, location, result):
+        versions, rows = result
+        session = self.sessions.peek(inventory_id)
+        if session is not None:
+            session.set_location_rows(location, versions, rows)
+        if inventory_id == self.current_inventory_id:
+            self._show_dashboard_location_list(rows)
+
+    def _show_dashboard_location_list(self, rows):
         self.list_dashboard_location_items.clear()
-        
-        for table_name, info in self.item_map.items():
-            loc_field = 'ubicacion_equipo' if 'ubicacion_equipo' in [c[1] for c in self.db.execute_query(f"PRAGMA table_info({table_name})")] else 'ubicacion'
-            if 'ubicacion' in [c[1] for c in self.db.execute_query(f"PRAGMA table_info({table_name})")] or 'ubicacion_equipo' in [c[1] for c in self.db.execute_query(f"PRAGMA table_info({table_name})")]:
-                query = f"SELECT id, codigo FROM {table_name} WHERE inventario_id=?"
-                params = [self.current_inventory_id]
-                if location != "Todas las Ubicaciones":
-                    query += f" AND {loc_field} = ?"
-                    params.append(location)
-
-                items = self.db.fetch_all(query, tuple(params))
-                for item_id, item_code in items:
-                    list_item = QListWidgetItem(f"[{info['display_name']}] {item_code}")
-                    list_item.setData(Qt.ItemDataRole.UserRole, (table_name, item_id))
-                    self.list_dashboard_location_items.addItem(list_item)
+        for table_name, display_name, item_id, item_code in rows:
+            list_item = QListWidgetItem(f"[{display_name}] {item_code}")
+            list_item.setData(Qt.ItemDataRole.UserRole, (table_name, item_id))
+            self.list_dashboard_location_items.addItem(list_item)
                     
     def open_detail_from_dashboard(self, item):
         table_name, item_id = item.data(Qt.ItemDataRole.UserRole)
@@ -656,6 +2039,7 @@ class MainWindow(QMainWindow):
                    estructura_info=?, ubicacion_manuales=?, historico_problemas=?, modo_trabajo=?,
                    equipos_extra=?, plano_path=? WHERE id=?"""
         self.db.execute_query(query, data + (self.current_inventory_id,))
+        self.change_log.maybe_snapshot(self.current_inventory_id)
         self.setWindowTitle(f"Inventario - {data[0]}")
         QMessageBox.information(self, "Éxito", "Toda la información general ha sido guardada.")
 
@@ -672,26 +2056,52 @@ class MainWindow(QMainWindow):
         if table_name not in self.table_map:
             return
             
+        db_cols = self.table_map[table_name]['db_cols']
+        query = f"SELECT {', '.join(db_cols)} FROM {table_name} WHERE inventario_id=?"
+        inventory_id = self.current_inventory_id
+
+        def load(db):
+            return table_version(db, inventory_id, table_name), db.fetch_all(query, (inventory_id,))
+        self.db_worker.submit(load, lambda result: self._table_loaded(inventory_id, table_name, result),
+                              key=f"refresh_table:{table_name}", owner=self)
+
+    def _table_loaded(self, inventory_id, table_name, result):
+        version, data = result
+        session = self.sessions.peek(inventory_id)
+        if session is not None:
+            session.set_table(table_name, version, data)
+        if inventory_id == self.current_inventory_id:
+            self._show_table(table_name, data)
+
+    def _show_table(self, table_name, data, scroll=None):
+        def show():
+            self._fill_table(table_name, data)
+            if scroll is not None:
+                self.table_map[table_name]['widget'].verticalScrollBar().setValue(scroll)
+        table_widget = self.table_map[table_name]['widget']
+        if not self._when_visible(table_widget, ('tabla', table_name), show):
+            # Que la pestaña oculta no conserve filas de otro centro hasta que se rellene
+            table_widget.setRowCount(0)
+
+    def _fill_table(self, table_name, data):
         table_info = self.table_map[table_name]
         table_widget = table_info['widget']
         headers = table_info['headers']
-        db_cols = table_info['db_cols']
 
+        table_widget.setUpdatesEnabled(False)
         table_widget.setRowCount(0)
         table_widget.setColumnCount(len(headers))
         table_widget.setHorizontalHeaderLabels(headers)
-        
-        query = f"SELECT {', '.join(db_cols)} FROM {table_name} WHERE inventario_id=?"
-        data = self.db.fetch_all(query, (self.current_inventory_id,))
+        table_widget.setRowCount(len(data))
         
         for row_num, row_data in enumerate(data):
-            table_widget.insertRow(row_num)
             for col_num, cell_data in enumerate(row_data):
                 item = QTableWidgetItem(str(cell_data))
                 table_widget.setItem(row_num, col_num, item)
                 
         table_widget.resizeColumnsToContents()
         table_widget.setColumnHidden(0, True)
+        table_widget.setUpdatesEnabled(True)
 
     def delete_item(self, table_name, item_id, table_widget, clear_func):
         reply = QMessageBox.question(self, 'Confirmar eliminación', 
@@ -699,20 +2109,14 @@ class MainWindow(QMainWindow):
                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
         
         if reply == QMessageBox.StandardButton.Yes:
-            images = self.db.fetch_all("SELECT image_path FROM images WHERE item_type=? AND item_id=?", (table_name, item_id))
-            for (img_path,) in images:
-                try:
-                    full_path = get_writable_data_path(img_path)
-                    if os.path.exists(full_path):
-                        os.remove(full_path)
-                except Exception as e:
-                    print(f"No se pudo borrar el archivo de imagen {img_path}: {e}")
-            self.db.execute_query("DELETE FROM images WHERE item_type=? AND item_id=?", (table_name, item_id))
-            
-            self.db.execute_query("DELETE FROM connections WHERE (parent_item_type=? AND parent_item_id=?) OR (child_item_type=? AND child_item_id=?)",
-                                  (table_name, item_id, table_name, item_id))
-
-            self.db.execute_query(f"DELETE FROM {table_name} WHERE id=?", (item_id,))
+            try:
+                images = delete_items(self.db, table_name, [item_id])
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"No se pudo eliminar el elemento: {e}")
+                return
+            remove_files_in_background([get_writable_data_path(path) for path in images])
+            self.detail_cache.invalidate(table_name, item_id)
+            self.compliance.evaluate_items(table_name, [item_id], self.current_inventory_id)
             
             self.refresh_table(table_name)
             self.populate_all_comboboxes()
@@ -720,14 +2124,95 @@ class MainWindow(QMainWindow):
             clear_func()
             QMessageBox.information(self, "Éxito", "Elemento eliminado.")
 
+    # --- Acciones en bloque ---
+    def selected_item_ids(self, table_name):
+        table_widget = self.table_map[table_name]['widget']
+        rows = sorted(index.row() for index in table_widget.selectionModel().selectedRows())
+        return [int(table_widget.item(row, 0).text()) for row in rows if table_widget.item(row, 0)]
+
+    def show_table_context_menu(self, table_name, pos):
+        table_widget = self.table_map[table_name]['widget']
+        ids = self.selected_item_ids(table_name)
+        if not ids:
+            return
+        count = len(ids)
+        menu = QMenu(self)
+        edit_action = menu.addAction(f"Editar campo en {count} elemento(s)...")
+        duplicate_action = menu.addAction(f"Duplicar {count} elemento(s)")
+        labels_action = menu.addAction(f"Imprimir etiquetas de {count} elemento(s)...") if table_name in LABEL_TABLES else None
+        menu.addSeparator()
+        delete_action = menu.addAction(f"Eliminar {count} elemento(s)")
+
+        chosen = menu.exec(table_widget.viewport().mapToGlobal(pos))
+        if chosen == edit_action:
+            self.bulk_edit(table_name, ids)
+        elif chosen == duplicate_action:
+            self.bulk_duplicate(table_name, ids)
+        elif chosen == delete_action:
+            self.bulk_delete(table_name, ids)
+        elif labels_action is not None and chosen == labels_action:
+            self.print_labels({table_name: ids})
+
+    def bulk_delete(self, table_name, ids):
+        reply = QMessageBox.question(self, 'Confirmar eliminación',
+                                     f"¿Está seguro de que desea eliminar {len(ids)} elemento(s) y todas sus imágenes y conexiones asociadas?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            images = delete_items(self.db, table_name, ids)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudieron eliminar los elementos: {e}")
+            return
+        remove_files_in_background([get_writable_data_path(path) for path in images])
+        if self.editing_item_type == table_name and self.editing_item_id is not None and int(self.editing_item_id) in ids:
+            getattr(self, f"clear_{table_name}_inputs")()
+        self._after_bulk_change(table_name, f"{len(ids)} elemento(s) eliminados.")
+
+    def bulk_edit(self, table_name, ids):
+        table_info = self.table_map[table_name]
+        fields = list(zip(table_info['db_cols'], table_info['headers']))[1:]
+        dialog = BulkEditDialog(self.db, table_name, fields, len(ids), self)
+        if not dialog.exec():
+            return
+        column, value = dialog.get_data()
+        try:
+            changed = update_field(self.db, table_name, ids, column, value)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudieron actualizar los elementos: {e}")
+            return
+        self._after_bulk_change(table_name, f"{changed} elemento(s) actualizados.")
+
+    def bulk_duplicate(self, table_name, ids):
+        try:
+            created = duplicate_items(self.db, table_name, ids)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudieron duplicar los elementos: {e}")
+            return
+        self._after_bulk_change(table_name, f"{created} elemento(s) duplicados.")
+
+    def _after_bulk_change(self, table_name, message):
+        # Un único refresco de la interfaz tras toda la operación
+        self.detail_cache.invalidate_table(table_name)
+        self.compliance.evaluate_table(table_name, self.current_inventory_id)
+        self.refresh_table(table_name)
+        self.populate_all_comboboxes()
+        self.update_dashboard()
+        self.statusbar.showMessage(message, 5000)
+
     def _save_item(self, item_type, data_tuple, insert_query, update_query):
         clear_func_name = f"clear_{item_type}_inputs"
         clear_func = getattr(self, clear_func_name)
         
         if self.editing_item_type == item_type and self.editing_item_id is not None:
             self.db.execute_query(update_query, data_tuple + (self.editing_item_id,))
+            self.detail_cache.invalidate(item_type, self.editing_item_id)
+            item_id = self.editing_item_id
         else:
-            self.db.execute_query(insert_query, (self.current_inventory_id,) + data_tuple)
+            cursor = self.db.execute_query(insert_query, (self.current_inventory_id,) + data_tuple)
+            item_id = cursor.lastrowid if cursor is not None else None
+        if item_id is not None:
+            self.compliance.evaluate_items(item_type, [item_id], self.current_inventory_id)
         
         self.refresh_table(item_type)
         self.populate_all_comboboxes()
@@ -928,11 +2413,14 @@ class MainWindow(QMainWindow):
     def _get_full_data_for_export(self):
         inv_data = self.db.fetch_one("SELECT * FROM inventarios WHERE id=?", (self.current_inventory_id,))
         if not inv_data: return None
+        # Misma distribución que la ventana del esquema (parte de la guardada), sin guardarla aquí
+        topology = diagram_data(compute_layout(self.db, self.current_inventory_id))
         return {
             "cliente": inv_data[1], "ubicacion": inv_data[2], "responsable": inv_data[3], "fecha": inv_data[4],
             "estructura_info": inv_data[5] or "", "ubicacion_manuales": inv_data[6] or "", 
             "historico_problemas": inv_data[7] or "", "modo_trabajo": inv_data[8] or "", 
             "equipos_extra": inv_data[9] or "", "plano_path": inv_data[10] or "",
+            "plano_posiciones": [(x, y, label or '', item_type) for item_type, _, x, y, label in self.floor_plan.positions(self.current_inventory_id)],
             "pcs": self.db.fetch_all("SELECT * FROM pcs WHERE inventario_id=?", (self.current_inventory_id,)),
             "proyectores": self.db.fetch_all("SELECT * FROM proyectores WHERE inventario_id=?", (self.current_inventory_id,)),
             "impresoras": self.db.fetch_all("SELECT * FROM impresoras WHERE inventario_id=?", (self.current_inventory_id,)),
@@ -942,42 +2430,65 @@ class MainWindow(QMainWindow):
             "cctv_cameras": self.db.fetch_all("SELECT * FROM cctv_cameras WHERE inventario_id=?", (self.current_inventory_id,)),
             "accesos": self.db.fetch_all("SELECT * FROM accesos WHERE inventario_id=?", (self.current_inventory_id,)),
             "software": self.db.fetch_all("SELECT * FROM software WHERE inventario_id=?", (self.current_inventory_id,)),
-            "credenciales": self.db.fetch_all("SELECT * FROM credenciales WHERE inventario_id=?", (self.current_inventory_id,))
+            "credenciales": self.db.fetch_all("SELECT * FROM credenciales WHERE inventario_id=?", (self.current_inventory_id,)),
+            "cumplimiento": [(compliance.SEVERITY_LABELS[severity], compliance.RULE_TITLES.get(rule, rule), label or '', detail or '')
+                             for severity, rule, _, _, label, detail, _ in compliance.findings(self.db, self.current_inventory_id)],
+            "topologia": topology,
         }
 
-    def export_to_pdf(self):
-        export_data = self._get_full_data_for_export()
-        if not export_data:
+    def _export_report(self, formato, filename, generator):
+        """Genera el informe del centro o, si no ha cambiado desde la última vez, copia el ya generado.
+        Devuelve True si se reutilizó."""
+        plan_path = self.db.fetch_one("SELECT plano_path FROM inventarios WHERE id=?", (self.current_inventory_id,))[0]
+        plan_stamp = None
+        if plan_path and os.path.exists(plan_path):
+            stat = os.stat(plan_path)
+            plan_stamp = [plan_path, stat.st_size, stat.st_mtime]
+        # El plano es un fichero externo y las alertas dependen de las reglas: forman parte de la clave
+        options = {'plano': plan_stamp, 'reglas': self.db.get_meta('compliance_signature'),
+                   'hardware': self.db.get_meta('hardware_attrs_signature')}
+        return self.export_cache.export(self.current_inventory_id, formato, filename,
+                                        lambda path: generator(path, self._get_full_data_for_export()), options)
+
+    def _export_cliente(self):
+        row = self.db.fetch_one("SELECT cliente FROM inventarios WHERE id=?", (self.current_inventory_id,))
+        if not row:
             QMessageBox.warning(self, "Datos insuficientes", "No hay datos que exportar.")
+            return None
+        return "".join(x for x in row[0] if x.isalnum() or x in " -_").rstrip()
+
+    def export_to_pdf(self):
+        cliente_name_safe = self._export_cliente()
+        if cliente_name_safe is None:
             return
-        
-        cliente_name_safe = "".join(x for x in export_data['cliente'] if x.isalnum() or x in " -_").rstrip()
         default_filename = f"Auditoria_{cliente_name_safe}.pdf"
 
         filename, _ = QFileDialog.getSaveFileName(self, "Guardar PDF", default_filename, "PDF Files (*.pdf)")
         if filename:
             try:
-                generate_pdf(filename, export_data)
-                QMessageBox.information(self, "Éxito", f"PDF generado correctamente en:\n{filename}")
+                from pdf_generator import generate_pdf
+                reused = self._export_report('pdf', filename, generate_pdf)
+                detail = " (sin cambios desde la última exportación)" if reused else ""
+                QMessageBox.information(self, "Éxito", f"PDF generado correctamente{detail} en:\n{filename}")
             except Exception as e:
                 QMessageBox.critical(self, "Error de Exportación", f"No se pudo generar el PDF. Error: {e}")
 
     def export_to_excel(self):
-        export_data = self._get_full_data_for_export()
-        if not export_data:
-            QMessageBox.warning(self, "Datos insuficientes", "No hay datos que exportar.")
+        cliente_name_safe = self._export_cliente()
+        if cliente_name_safe is None:
             return
         
         now = datetime.now()
         timestamp = now.strftime("%Y-%m-%d_%H-%M-%S")
-        cliente_name_safe = "".join(x for x in export_data['cliente'] if x.isalnum() or x in " -_").rstrip()
         default_filename = f"Inventario_{cliente_name_safe}_{timestamp}.xlsx"
 
         filename, _ = QFileDialog.getSaveFileName(self, "Guardar Excel", default_filename, "Excel Files (*.xlsx)")
         if filename:
             try:
-                generate_excel(filename, export_data)
-                QMessageBox.information(self, "Éxito", f"Archivo Excel generado correctamente en:\n{filename}")
+                from excel_generator import generate_excel
+                reused = self._export_report('xlsx', filename, generate_excel)
+                detail = " (sin cambios desde la última exportación)" if reused else ""
+                QMessageBox.information(self, "Éxito", f"Archivo Excel generado correctamente{detail} en:\n{filename}")
             except Exception as e:
                 QMessageBox.critical(self, "Error de Exportación", f"No se pudo generar el archivo Excel. Error: {e}")
 
@@ -987,28 +2498,32 @@ class App(QApplication):
         super().__init__(argv)
         self.db = DatabaseManager()
         self.main_window = None
-        self.should_switch_user = False
+        # Trazas de latencia opcionales (INVENTARIO_TRACE=1 o --trace)
+        tracing.start_from_environment(get_writable_data_path('logs'), argv)
+        # Sonda de arranque: --medir-arranque FICHERO (ver launch_probe.py)
+        self.probe_path = launch_probe.probe_path(argv)
 
     def run(self):
-        while True:
-            self.should_switch_user = False
-            login = LoginDialog(self.db)
-            
-            if not login.exec():
-                break
-
-            inventory_id = login.selected_inventory_id
-            self.main_window = MainWindow(inventory_id, app_instance=self)
-            self.main_window.show()
+        # El cambio de centro se hace dentro de la ventana principal (MainWindow.switch_center)
+        login = LoginDialog(self.db)
+        if self.probe_path:
+            # Con el login ya pintado: se anota el tiempo y se cierra sin abrir ningún centro
+            QTimer.singleShot(0, lambda: (launch_probe.write_report(self.probe_path, _STARTED), login.reject()))
+        else:
+            launch_probe.preload_in_background()
+        if login.exec():
+            with tracing.span('abrir_centro'):
+                self.main_window = MainWindow(login.selected_inventory_id, app_instance=self)
+                self.main_window.show()
             self.exec()
-            
-            if not self.should_switch_user:
-                break
         
         self.db.close()
+        tracing.stop()
         return 0
 
 if __name__ == "__main__":
+    # Los procesos del PDF en paralelo arrancan el ejecutable de PyInstaller
+    multiprocessing.freeze_support()
     os.makedirs(get_writable_data_path('data/images'), exist_ok=True)
     app = App(sys.argv)
     sys.exit(app.run())
@@ -1,39 +1,86 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+
+# Por defecto se genera la carpeta dist\main (onedir): las librerías quedan ya descomprimidas
+# junto a main.exe y el arranque no extrae nada. Con INVENTARIO_ONEFILE=1 (compile.bat onefile)
+# se genera el ejecutable único, que descomprime Qt, pandas, matplotlib... en un temporal en cada arranque.
+ONEFILE = os.environ.get('INVENTARIO_ONEFILE') == '1'
+
+# Módulos que arrastran las dependencias pero la aplicación no usa
+EXCLUDES = [
+    'tkinter', '_tkinter', 'IPython', 'ipykernel', 'jupyter_client', 'notebook', 'pytest',
+    'scipy', 'sqlalchemy', 'numexpr', 'bottleneck', 'tables', 'PyQt5', 'PySide2', 'PySide6',
+    'matplotlib.backends.backend_tkagg', 'matplotlib.backends.backend_tkcairo', 'matplotlib.backends.backend_wx',
+    'matplotlib.backends.backend_wxagg', 'matplotlib.backends.backend_gtk3agg', 'matplotlib.backends.backend_gtk4agg',
+    'matplotlib.backends.backend_webagg', 'matplotlib.backends.backend_nbagg',
+    'PyQt6.QtWebEngineCore', 'PyQt6.QtWebEngineWidgets', 'PyQt6.QtQml', 'PyQt6.QtQuick', 'PyQt6.QtMultimedia',
+    'PyQt6.QtBluetooth', 'PyQt6.QtPositioning', 'PyQt6.QtSensors', 'PyQt6.Qt3DCore',
+]
 
 
 a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('logo.png', '.'), ('ui_login.ui', '.'), ('detail_view_dialog.ui', '.'), ('search_dialog.ui', '.'), ('dashboard_widgets.py', '.'), ('excel_generator.py', '.'), ('pdf_generator.py', '.'), ('database.py', '.')],
+    datas=[('logo.png', '.'), ('ui_login.ui', '.'), ('ui_inventario.ui', '.'), ('detail_view_dialog.ui', '.'), ('search_dialog.ui', '.'), ('dashboard_widgets.py', '.'), ('excel_generator.py', '.'), ('pdf_generator.py', '.'), ('database.py', '.'), ('fleet_analytics.py', '.'), ('change_log.py', '.'), ('sync_engine.py', '.'), ('tracing.py', '.'), ('db_worker.py', '.'), ('bulk_operations.py', '.'), ('image_viewer.py', '.'), ('floor_plan.py', '.'), ('detail_cache.py', '.'), ('centro_sessions.py', '.'), ('hardware_attrs.py', '.'), ('compliance.py', '.'), ('reconciliation.py', '.'), ('backup.py', '.'), ('export_cache.py', '.'), ('warehouse_export.py', '.'), ('label_generator.py', '.'), ('topology_view.py', '.'), ('query_service.py', '.'), ('app_paths.py', '.'), ('launch_probe.py', '.'), ('shards.py', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='main',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    icon=['appicon.ico'],
-)
+if ONEFILE:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name='main',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon=['appicon.ico'],
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='main',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        # Sin UPX: las DLL comprimidas se descomprimen en memoria en cada arranque
+        upx=False,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon=['appicon.ico'],
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='main',
+    )
@@ -1,22 +1,110 @@
 # pdf_generator.py
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, PageBreak, PageTemplate, Frame
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, PageBreak, Flowable
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from reportlab.lib import colors
 from reportlab.lib.units import inch, cm
-import sys, os
+from reportlab.pdfgen.canvas import Canvas
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import os, tempfile
 
-def resource_path(relative_path):
-    # CORRECCIÓN: Usamos la nueva estructura de rutas para compatibilidad con EXE
-    if getattr(sys, 'frozen', False):
-        base_path = os.path.dirname(sys.executable)
-    else:
-        base_path = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base_path, relative_path)
+# Opcional: unir las secciones renderizadas en paralelo (sin él se genera siempre en serie)
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = PdfWriter = None
+
+from app_paths import resource_path
+from database import PIN_COLORS
+
+class PlanWithPins(Flowable):
+    """Imagen del plano con las chinchetas de los equipos ubicados encima.
+    `pins`: [(x, y, etiqueta, tipo)] con x, y normalizadas (0-1) desde la esquina superior izquierda."""
+    def __init__(self, path, pins, width, height):
+        super().__init__()
+        self.image = Image(path, width=width, height=height, kind='proportional')
+        self.pins = pins
+        self.width, self.height = self.image.drawWidth, self.image.drawHeight
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.image.drawOn(self.canv, 0, 0)
+        show_labels = len(self.pins) <= 150
+        for x, y, label, item_type in self.pins:
+            px, py = x * self.width, (1 - y) * self.height
+            self.canv.setFillColor(colors.HexColor(PIN_COLORS.get(item_type, '#333333')))
+            self.canv.setStrokeColor(colors.white)
+            self.canv.circle(px, py, 3.5, stroke=1, fill=1)
+            if show_labels and label:
+                self.canv.setFillColor(colors.black)
+                self.canv.setFont('Helvetica', 5)
+                self.canv.drawString(px + 5, py - 2, str(label))
+
+class TopologyDiagram(Flowable):
+    """Esquema de conexiones escalado al espacio disponible (ver topology_view.diagram_data).
+    `data`: {'nodos': [(x, y, etiqueta, tipo)], 'enlaces': [(x1, y1, x2, y2)], 'grupos': [(x, y, ancho, alto, nombre)]}
+    en coordenadas de la vista (y hacia abajo, centro de cada nodo)."""
+    NODE_WIDTH, NODE_HEIGHT = 130, 34
+
+    def __init__(self, data, width, height):
+        super().__init__()
+        self.data = data
+        boxes = [(x, y, w, h) for x, y, w, h, _ in data['grupos']] or [(0, 0, 1, 1)]
+        self.x0 = min(x for x, _, _, _ in boxes)
+        self.y0 = min(y for _, y, _, _ in boxes)
+        span_w = max(x + w for x, _, w, _ in boxes) - self.x0
+        span_h = max(y + h for _, y, _, h in boxes) - self.y0
+        self.scale = min(width / span_w, height / span_h, 1)
+        self.width, self.height = span_w * self.scale, span_h * self.scale
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def _point(self, x, y):
+        return (x - self.x0) * self.scale, self.height - (y - self.y0) * self.scale
+
+    def draw(self):
+        canv, s = self.canv, self.scale
+        canv.setLineWidth(0.5)
+        canv.setDash(2, 2)
+        canv.setStrokeColor(colors.HexColor('#b0b0b0'))
+        canv.setFont('Helvetica-Bold', max(4, min(10, 14 * s)))
+        for x, y, w, h, name in self.data['grupos']:
+            px, py = self._point(x, y)
+            canv.rect(px, py - h * s, w * s, h * s, stroke=1, fill=0)
+            canv.setFillColor(colors.black)
+            canv.drawString(px + 3, py - max(4, min(10, 14 * s)) - 2, str(name))
+        canv.setDash()
+        canv.setLineWidth(0.3)
+        canv.setStrokeColor(colors.HexColor('#808080'))
+        path = canv.beginPath()
+        for x1, y1, x2, y2 in self.data['enlaces']:
+            path.moveTo(*self._point(x1, y1))
+            path.lineTo(*self._point(x2, y2))
+        canv.drawPath(path, stroke=1, fill=0)
+        # Con los nodos muy pequeños el texto no se leería: solo los colores del tipo
+        node_w, node_h = self.NODE_WIDTH * s, self.NODE_HEIGHT * s
+        font_size = min(7, node_h * 0.45)
+        show_labels = font_size >= 3
+        canv.setFont('Helvetica', font_size)
+        for x, y, label, item_type in self.data['nodos']:
+            px, py = self._point(x, y)
+            color = colors.HexColor(PIN_COLORS.get(item_type, '#333333'))
+            canv.setFillColor(color)
+            canv.setStrokeColor(color)
+            canv.rect(px - node_w / 2, py - node_h / 2, node_w, node_h, stroke=0, fill=1)
+            if show_labels and label:
+                canv.setFillColor(colors.white)
+                text = str(label)
+                while len(text) > 1 and canv.stringWidth(text, 'Helvetica', font_size) > node_w - 2:
+                    text = text[:-1]
+                canv.drawString(px - node_w / 2 + 1, py - font_size / 3, text)
 
 # --- NUEVO: Función para el pie de página ---
-def footer(canvas, doc):
-    canvas.saveState()
+def _draw_logo(canvas, doc):
     try:
         # Cargar el logo desde una ruta compatible
         logo_path = resource_path('logo.png')
@@ -29,20 +117,65 @@ def footer(canvas, doc):
         canvas.setFont('Helvetica', 9)
         canvas.drawString(doc.leftMargin, 0.75 * inch, "ForgeNEX")
 
+def _draw_page_number(canvas, doc, page):
     canvas.setFont('Helvetica', 9)
     # Número de página en la esquina inferior derecha
-    canvas.drawRightString(doc.width + doc.leftMargin, 0.75 * inch, f"Página {doc.page}")
+    canvas.drawRightString(doc.width + doc.leftMargin, 0.75 * inch, f"Página {page}")
+
+def footer(canvas, doc):
+    canvas.saveState()
+    _draw_logo(canvas, doc)
+    _draw_page_number(canvas, doc, doc.page)
+    canvas.restoreState()
+
+def footer_without_number(canvas, doc):
+    # Secciones renderizadas por separado: el número se estampa al unirlas (ver _stamp_page_numbers)
+    canvas.saveState()
+    _draw_logo(canvas, doc)
     canvas.restoreState()
 
-def generate_pdf(filename, data):
+def _document(filename):
     # Aumentar el margen inferior para dar espacio al pie de página
-    doc = SimpleDocTemplate(filename, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=1.2 * inch)
-    
-    # Crear una plantilla de página que llame a nuestra función de pie de página
-    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')
-    template = PageTemplate(id='main_template', frames=[frame], onPage=footer)
-    doc.addPageTemplates([template])
+    return SimpleDocTemplate(filename, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=1.2 * inch)
 
+def _build(filename, story, on_page=footer):
+    # build() añade sus propias plantillas 'First'/'Later': una plantilla propia solo se usaba
+    # en la primera página y el resto salía sin pie. El pie se pasa para todas.
+    doc = _document(filename)
+    doc.build(story, onFirstPage=on_page, onLaterPages=on_page)
+    return doc
+
+# Sección del informe -> claves de `data` que usa (lo único que recibe cada proceso auxiliar)
+_SECTION_KEYS = {
+    'portada': ['cliente', 'fecha'],
+    'equipos': ['pcs', 'proyectores', 'impresoras', 'servidores', 'red'],
+    'seguridad': ['cctv_recorders', 'cctv_cameras', 'accesos', 'credenciales'],
+    'cumplimiento': ['cumplimiento'],
+    'notas': ['software', 'estructura_info', 'ubicacion_manuales', 'historico_problemas', 'modo_trabajo', 'equipos_extra'],
+    'plano': ['plano_path', 'plano_posiciones'],
+    'topologia': ['topologia'],
+}
+
+def _section_names(data):
+    """Secciones con contenido, en orden, sin maquetar nada."""
+    present = {
+        'portada': True,
+        'equipos': any(data[key] for key in _SECTION_KEYS['equipos']),
+        'seguridad': any(data[key] for key in _SECTION_KEYS['seguridad']),
+        'cumplimiento': bool(data.get('cumplimiento')),
+        'notas': any(data[key] for key in _SECTION_KEYS['notas']),
+        'plano': bool(data['plano_path'] and os.path.exists(data['plano_path'])),
+        'topologia': bool(data.get('topologia')),
+    }
+    return [name for name in _SECTION_KEYS if present[name]]
+
+def _section_stories(data, names=None):
+    """El informe dividido en secciones que empiezan siempre en página nueva: [(nombre, flowables)].
+
+    Unidas con un salto de página forman el documento completo; al no compartir
+    páginas, cada una se puede maquetar por separado (ver generate_pdf). Con `names`
+    solo se maquetan esas secciones y `data` solo necesita sus claves (_SECTION_KEYS)."""
+    names = _section_names(data) if names is None else names
     styles = getSampleStyleSheet()
     
     styles.add(ParagraphStyle(name='AppMainTitle', fontSize=36, alignment=TA_LEFT, fontName="Helvetica-Bold", leading=42))
@@ -64,15 +197,22 @@ def generate_pdf(filename, data):
         ('GRID', (0,0), (-1,-1), 1, colors.black)
     ])
     
+    sections = []
     story = []
+
+    def new_section(name):
+        nonlocal story
+        story = []
+        sections.append((name, story))
     
     # --- PÁGINA DE PORTADA ---
     # CORRECCIÓN: Estructura para evitar solapamiento
-    story.append(Spacer(1, 4 * inch))
-    story.append(Paragraph("AUDITORÍA TECNOLÓGICA", styles['AppMainTitle']))
-    story.append(Paragraph(data['cliente'].upper(), styles['AppClientSubtitle']))
-    story.append(Paragraph(data['fecha'].upper(), styles['AppBodyText']))
-    story.append(PageBreak())
+    if 'portada' in names:
+        new_section('portada')
+        story.append(Spacer(1, 4 * inch))
+        story.append(Paragraph("AUDITORÍA TECNOLÓGICA", styles['AppMainTitle']))
+        story.append(Paragraph(data['cliente'].upper(), styles['AppClientSubtitle']))
+        story.append(Paragraph(data['fecha'].upper(), styles['AppBodyText']))
 
     def add_section(title, data_list, headers):
         if not data_list: return
@@ -87,50 +227,132 @@ def generate_pdf(filename, data):
         story.append(Spacer(1, 18)) # Espacio después de cada tabla
 
     # --- SECCIÓN 1: EQUIPOS ---
-    if any([data['pcs'], data['proyectores'], data['impresoras'], data['servidores'], data['red']]):
+    if 'equipos' in names:
+        new_section('equipos')
         story.append(Paragraph("1. RELACIÓN DE EQUIPOS", styles['AppPageHeader']))
         add_section("ORDENADORES", data['pcs'], ['Cód.', 'Placa', 'RAM', 'Core', 'Disco', 'S.O', 'Fuente', 'Antivirus', 'Ubic.', 'Obs.'])
         add_section("PROYECTORES / PANTALLAS", data['proyectores'], ['Cód.', 'Modelo', 'Táctil', 'Ubic.', 'Obs.'])
         add_section("IMPRESORAS", data['impresoras'], ['Cód.', 'Modelo', 'Conexión', 'Ubic.', 'Obs.'])
         add_section("SERVIDORES", data['servidores'], ['Cód.', 'Modelo', 'Uso', 'Ubic.', 'Obs.'])
         add_section("ROUTERS / SWITCH / WIFI / NAS", data['red'], ['Cód.', 'Tipo', 'Modelo', 'Ubic.', 'Obs.'])
-        story.append(PageBreak())
     
     # --- SECCIÓN 2: SEGURIDAD ---
-    if any([data['cctv_recorders'], data['cctv_cameras'], data['accesos'], data['credenciales']]):
+    if 'seguridad' in names:
+        new_section('seguridad')
         story.append(Paragraph("2. SEGURIDAD FÍSICA Y LÓGICA", styles['AppPageHeader']))
         add_section("GRABADORES CCTV (DVR/NVR)", data['cctv_recorders'], ['Marca', 'Modelo', 'Canales', 'Ubic.', 'Obs.'])
         add_section("CÁMARAS CCTV", data['cctv_cameras'], ['Marca', 'Modelo', 'Lente', 'Ubic.', 'Obs.'])
         add_section("CONTROL DE ACCESO", data['accesos'], ['Marca', 'Modelo', 'Tipo', 'Ubic.', 'Obs.'])
         add_section("CREDENCIALES (CONFIDENCIAL)", data['credenciales'], ['Elemento', 'Usuario', 'Contraseña', 'Notas'])
-        story.append(PageBreak())
-    
-    # --- SECCIONES DE TEXTO Y SOFTWARE ---
-    if any([data['software'], data['estructura_info'], data['ubicacion_manuales'], data['historico_problemas'], data['modo_trabajo'], data['equipos_extra']]):
-        story.append(Paragraph("3. SOFTWARE, NOTAS Y PLANO", styles['AppPageHeader']))
 
-        if data['software']:
-            add_section("SOFTWARE Y LICENCIAS", data['software'], ['Software', 'Licencia'])
-    
+    # --- ALERTAS DE CUMPLIMIENTO --- (ya vienen como texto: severidad, regla, elemento, detalle)
+    if 'cumplimiento' in names:
+        new_section('cumplimiento')
+        story.append(Paragraph("ALERTAS DE CUMPLIMIENTO", styles['AppPageHeader']))
+        t = Table([['Severidad', 'Regla', 'Elemento', 'Detalle']] + [list(row) for row in data['cumplimiento']], repeatRows=1)
+        t.setStyle(table_style)
+        story.append(t)
+
+    # --- SECCIONES DE TEXTO Y SOFTWARE ---
     def add_text_section(title, content):
         if not content.strip(): return
         story.append(Paragraph(title, styles['AppTableTitle']))
         story.append(Paragraph(content.replace('\n', '<br/>'), styles['AppBodyText']))
         story.append(Spacer(1, 18))
 
-    add_text_section("ESTRUCTURA INFORMÁTICA", data['estructura_info'])
-    add_text_section("UBICACIÓN MANUALES", data['ubicacion_manuales'])
-    add_text_section("HISTÓRICO DE PROBLEMAS", data['historico_problemas'])
-    add_text_section("MODO DE TRABAJO", data['modo_trabajo'])
-    add_text_section("EQUIPOS EXTRA", data['equipos_extra'])
+    if 'notas' in names:
+        new_section('notas')
+        story.append(Paragraph("3. SOFTWARE, NOTAS Y PLANO", styles['AppPageHeader']))
 
-    if data['plano_path'] and os.path.exists(data['plano_path']):
-        story.append(PageBreak())
+        if data['software']:
+            add_section("SOFTWARE Y LICENCIAS", data['software'], ['Software', 'Licencia'])
+
+        add_text_section("ESTRUCTURA INFORMÁTICA", data['estructura_info'])
+        add_text_section("UBICACIÓN MANUALES", data['ubicacion_manuales'])
+        add_text_section("HISTÓRICO DE PROBLEMAS", data['historico_problemas'])
+        add_text_section("MODO DE TRABAJO", data['modo_trabajo'])
+        add_text_section("EQUIPOS EXTRA", data['equipos_extra'])
+
+    if 'plano' in names:
+        new_section('plano')
         story.append(Paragraph("PLANO DE UBICACIÓN", styles['AppPageHeader']))
         try:
-            plano_img = Image(data['plano_path'], width=7*inch, height=9*inch, kind='proportional')
-            story.append(plano_img)
+            if data.get('plano_posiciones'):
+                story.append(PlanWithPins(data['plano_path'], data['plano_posiciones'], 7*inch, 9*inch))
+            else:
+                plano_img = Image(data['plano_path'], width=7*inch, height=9*inch, kind='proportional')
+                story.append(plano_img)
         except Exception as e:
             story.append(Paragraph(f"No se pudo cargar la imagen del plano: {e}", styles['AppBodyText']))
 
-    doc.build(story)
\ No newline at end of file
+    if 'topologia' in names:
+        new_section('topologia')
+        story.append(Paragraph("ESQUEMA DE CONEXIONES", styles['AppPageHeader']))
+        story.append(TopologyDiagram(data['topologia'], 7*inch, 8.5*inch))
+
+    return [(name, flowables) for name, flowables in sections if flowables]
+
+# --- Renderizado en paralelo ---
+# Filas de tablas a partir de las cuales compensa arrancar procesos (en Windows cada uno tarda ~0,3 s)
+PARALLEL_MIN_ROWS = 3000
+_TABLE_KEYS = ['pcs', 'proyectores', 'impresoras', 'servidores', 'red', 'cctv_recorders', 'cctv_cameras',
+               'accesos', 'software', 'credenciales', 'cumplimiento']
+
+def _render_section(args):
+    """Proceso auxiliar: maqueta una sola sección en su propio PDF, sin número de página.
+    Recibe solo los datos de esa sección. Devuelve el número de páginas."""
+    section_data, name, filename = args
+    story = [flowable for _, flowables in _section_stories(section_data, [name]) for flowable in flowables]
+    return _build(filename, story, footer_without_number).page
+
+def _section_rows(data, name):
+    return sum(len(data.get(key) or ()) for key in _SECTION_KEYS[name] if key in _TABLE_KEYS)
+
+def _stamp_page_numbers(writer, template_doc):
+    """Añade a cada página de `writer` el mismo número que pondría `footer` en el documento único."""
+    overlay_buffer = BytesIO()
+    overlay = Canvas(overlay_buffer, pagesize=template_doc.pagesize)
+    for page in range(1, len(writer.pages) + 1):
+        _draw_page_number(overlay, template_doc, page)
+        overlay.showPage()
+    overlay.save()
+    overlay_buffer.seek(0)
+    for page, stamp in zip(writer.pages, PdfReader(overlay_buffer).pages):
+        # Debajo del contenido, como hace onPage al empezar cada página
+        page.merge_page(stamp, over=False)
+
+def _default_workers(data):
+    rows = sum(len(data.get(key) or ()) for key in _TABLE_KEYS)
+    return min(os.cpu_count() or 1, 4) if rows >= PARALLEL_MIN_ROWS else 1
+
+def generate_pdf(filename, data, workers=None):
+    """Genera el informe de auditoría.
+
+    Con `workers` > 1 (por defecto, según el tamaño del centro y los núcleos) cada
+    sección se maqueta en un proceso aparte y se unen en orden; la numeración de
+    páginas se estampa después, así que el resultado es el mismo que en serie.
+    Sin pypdf, o con una sola sección, se genera en serie."""
+    workers = _default_workers(data) if workers is None else workers
+    names = _section_names(data)
+    if workers <= 1 or PdfWriter is None or len(names) < 2:
+        story = []
+        for name, flowables in _section_stories(data, names):
+            if story:
+                story.append(PageBreak())
+            story.extend(flowables)
+        _build(filename, story)
+        return
+
+    with tempfile.TemporaryDirectory(prefix='informe_') as tmp:
+        parts = [os.path.join(tmp, f"{index:02d}_{name}.pdf") for index, name in enumerate(names)]
+        with ProcessPoolExecutor(max_workers=min(workers, len(names))) as pool:
+            # Las secciones con más filas primero, para que no queden solas al final
+            order = sorted(range(len(names)), key=lambda i: -_section_rows(data, names[i]))
+            list(pool.map(_render_section, [({key: data.get(key) for key in _SECTION_KEYS[names[index]]},
+                                             names[index], parts[index]) for index in order]))
+        writer = PdfWriter()
+        for part in parts:
+            writer.append(part)
+        _stamp_page_numbers(writer, _document(os.path.join(tmp, 'plantilla.pdf')))
+        with open(filename, 'wb') as f:
+            writer.write(f)
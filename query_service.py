@@ -0,0 +1,572 @@
+# query_service.py
+"""Servicio local de consultas HTTP/JSON (solo lectura) sobre inventario.db.
+
+Pensado para otras herramientas internas (helpdesk, scripts de monitorización) que
+hoy abren la base de datos directamente mientras la aplicación escribe en ella.
+Cada petición usa una conexión de un pool de conexiones de solo lectura; con la base
+de datos en modo WAL las lecturas no bloquean a la aplicación ni esperan por ella.
+
+    GET /centros                                 centros
+    GET /centros/<id>                            datos del centro y nº de equipos por tabla
+    GET /centros/<id>/<tabla>?limite=&desde=     equipos del centro (página tras el id `desde`)
+    GET /equipos/<tabla>/<id>                    un equipo con sus conexiones
+    GET /buscar?codigo=X | ?q=texto [&centro=]   búsqueda por código exacto o por texto
+    GET /metricas                                peticiones, errores y latencias por endpoint
+
+Las respuestas llevan ETag con la versión de los datos (ver export_cache.py y
+change_log.py): con If-None-Match se responde 304 sin consultar nada más, y las
+respuestas recientes se sirven de memoria mientras la versión no cambie. Las
+credenciales no se sirven nunca.
+
+Uso sin interfaz: python query_service.py [--db inventario.db] [--puerto 8765] [--conexiones 4]
+"""
+import argparse
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, quote
+
+from database import DatabaseManager, EQUIPMENT_TABLES, SHARD_DIR
+from export_cache import ExportCache
+import shards
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+POOL_SIZE = 4
+# Espera máxima por una conexión libre antes de responder 503
+POOL_TIMEOUT = 5.0
+# Conexiones libres guardadas como mucho (con la base de datos dividida, una por fichero de centro)
+IDLE_CONNECTIONS = 32
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+SEARCH_LIMIT = 200
+# Respuestas guardadas en memoria (se validan con la versión de los datos antes de servirlas)
+RESPONSE_CACHE_SIZE = 512
+# Latencias recientes por endpoint para los percentiles de /metricas
+LATENCY_WINDOW = 1000
+
+# Tablas expuestas: todas las de equipos salvo las credenciales
+SERVED_TABLES = [table for table in EQUIPMENT_TABLES if table != 'credenciales']
+# Campos de la búsqueda por texto (los mismos que la ventana de búsqueda)
+SEARCH_FIELDS = {
+    'pcs': ['codigo', 'placa', 'ubicacion_equipo'],
+    'proyectores': ['codigo', 'modelo', 'ubicacion_equipo'],
+    'impresoras': ['codigo', 'modelo', 'ubicacion_equipo'],
+    'servidores': ['codigo', 'modelo', 'uso'],
+    'red': ['codigo', 'tipo', 'modelo', 'ubicacion_equipo'],
+    'cctv_recorders': ['marca', 'modelo', 'ubicacion'],
+    'cctv_cameras': ['marca', 'modelo', 'ubicacion'],
+    'accesos': ['marca', 'modelo', 'ubicacion'],
+    'software': ['nombre', 'licencia'],
+}
+# Tablas con código de inventario (búsqueda exacta por índice)
+CODE_TABLES = [table for table in SERVED_TABLES if EQUIPMENT_TABLES[table] == 'ubicacion_equipo']
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def enable_wal(db):
+    """Pasa la base de datos a modo WAL (queda guardado en el fichero): lectores y escritor
+    dejan de bloquearse entre sí. Devuelve el modo resultante."""
+    try:
+        return db.conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    except sqlite3.Error as e:
+        print(f"No se pudo activar el modo WAL: {e}")
+        return None
+
+
+def ensure_indexes(db):
+    """Índices que usan las consultas del servicio (equipos por centro y búsqueda por código)."""
+    for table in SERVED_TABLES:
+        db.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_inventario ON {table} (inventario_id)")
+    for table in CODE_TABLES:
+        db.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_codigo ON {table} (codigo)")
+    db.conn.commit()
+
+
+# --- Pool de conexiones de lectura ---
+class ReaderPool:
+    """Conexiones de solo lectura (mode=ro y query_only) compartidas por los hilos del servidor.
+
+    Como mucho `size` peticiones usan una conexión a la vez. Con la base de datos dividida
+    cada conexión es de un fichero (catálogo o centro) y las libres se guardan por fichero,
+    hasta IDLE_CONNECTIONS, cerrando las usadas hace más tiempo."""
+
+    def __init__(self, db_path, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.size = size
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        # [(fichero, conexión)] de la usada hace más tiempo a la más reciente
+        self._idle = [(db_path, self._open(db_path)) for _ in range(size)]
+
+    def _open(self, path):
+        uri = f"file:{quote(os.path.abspath(path).replace(os.sep, '/'))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False)
+        conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    def _take(self, path):
+        with self._lock:
+            for index in range(len(self._idle) - 1, -1, -1):
+                if self._idle[index][0] == path:
+                    return self._idle.pop(index)[1]
+        return None
+
+    def _put(self, path, conn):
+        with self._lock:
+            self._idle.append((path, conn))
+            excess = self._idle[:-IDLE_CONNECTIONS]
+            del self._idle[:-IDLE_CONNECTIONS]
+        for _, old in excess:
+            old.close()
+
+    @contextmanager
+    def connection(self, path=None):
+        """Conexión a `path` (por defecto la base de datos principal) durante el bloque."""
+        path = path or self.db_path
+        if not self._slots.acquire(timeout=self.timeout):
+            raise ServiceError(503, "Servicio ocupado, vuelva a intentarlo")
+        try:
+            conn = self._take(path) or self._open(path)
+            try:
+                yield conn
+            finally:
+                # Sin transacción abierta: la siguiente petición ve los últimos datos confirmados
+                if conn.in_transaction:
+                    conn.rollback()
+                self._put(path, conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, conn in idle:
+            conn.close()
+
+
+# --- Métricas ---
+class ServiceMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.endpoints = {}
+
+    def record(self, endpoint, status, elapsed_ms, cached):
+        with self._lock:
+            entry = self.endpoints.get(endpoint)
+            if entry is None:
+                entry = self.endpoints[endpoint] = {'peticiones': 0, 'errores': 0, 'no_modificadas': 0, 'de_memoria': 0,
+                                                    'total_ms': 0.0, 'max_ms': 0.0, 'recientes': deque(maxlen=LATENCY_WINDOW)}
+            entry['peticiones'] += 1
+            entry['errores'] += status >= 400
+            entry['no_modificadas'] += status == 304
+            entry['de_memoria'] += cached
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['recientes'].append(elapsed_ms)
+
+    def to_dict(self):
+        with self._lock:
+            endpoints = {}
+            for name, entry in self.endpoints.items():
+                recent = sorted(entry['recientes'])
+                endpoints[name] = {key: value for key, value in entry.items() if key != 'recientes'}
+                endpoints[name].update(
+                    total_ms=round(entry['total_ms'], 1), max_ms=round(entry['max_ms'], 3),
+                    media_ms=round(entry['total_ms'] / entry['peticiones'], 3),
+                    p50_ms=round(recent[len(recent) // 2], 3), p95_ms=round(recent[int(len(recent) * 0.95)], 3))
+            return {'activo_desde': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+                    'endpoints': endpoints}
+
+
+# --- Consultas ---
+def _rows(cursor):
+    columns = [c[0] for c in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone() is not None
+
+
+def data_version(conn, inventory_id=None):
+    """Versión de los datos de un centro (centro_versions) o de toda la base de datos
+    (último cambio registrado más la suma de versiones de centro, que cubre las conexiones).
+    None si la base de datos aún no tiene esas tablas: entonces no se usa ETag ni memoria."""
+    if not _table_exists(conn, 'centro_versions'):
+        return None
+    if inventory_id is not None:
+        row = conn.execute("SELECT version FROM centro_versions WHERE inventario_id = ?", (inventory_id,)).fetchone()
+        return f"c{inventory_id}.{row[0] if row else 0}"
+    total = conn.execute("SELECT COALESCE(SUM(version), 0), COUNT(*) FROM centro_versions").fetchone()
+    seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0] if _table_exists(conn, 'change_log') else 0
+    return f"g{seq}.{total[0]}.{total[1]}"
+
+
+def _int(params, name, default=None, minimum=0, maximum=None):
+    value = params.get(name, [None])[0]
+    if value is None or value == '':
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ServiceError(400, f"El parámetro '{name}' debe ser un número entero")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ServiceError(400, f"El parámetro '{name}' está fuera de rango")
+    return value
+
+
+def _table(name):
+    if name not in SERVED_TABLES:
+        raise ServiceError(404, f"Tabla desconocida: {name}")
+    return name
+
+
+def _centro_row(conn, inventory_id):
+    cursor = conn.execute("SELECT id, cliente, ubicacion, responsable, fecha FROM inventarios WHERE id = ?", (inventory_id,))
+    rows = _rows(cursor)
+    if not rows:
+        raise ServiceError(404, f"No existe el centro {inventory_id}")
+    return rows[0]
+
+
+def list_centros(conn, params):
+    return {'centros': _rows(conn.execute("SELECT id, cliente, ubicacion, responsable, fecha FROM inventarios ORDER BY cliente"))}
+
+
+def get_centro(conn, params, inventory_id):
+    centro = _centro_row(conn, inventory_id)
+    counts = " UNION ALL ".join(f"SELECT '{table}', COUNT(*) FROM {table} WHERE inventario_id = ?" for table in SERVED_TABLES)
+    centro['equipos'] = dict(conn.execute(counts, (inventory_id,) * len(SERVED_TABLES)).fetchall())
+    return centro
+
+
+def list_equipment(conn, params, inventory_id, table):
+    """Página de equipos por id: `desde` es el último id de la página anterior (`siguiente`)."""
+    table = _table(table)
+    _centro_row(conn, inventory_id)
+    limit = _int(params, 'limite', PAGE_SIZE, 1, MAX_PAGE_SIZE)
+    after = _int(params, 'desde', 0)
+    rows = _rows(conn.execute(f"SELECT * FROM {table} WHERE inventario_id = ? AND id > ? ORDER BY id LIMIT ?",
+                              (inventory_id, after, limit + 1)))
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {'tabla': table, 'centro': inventory_id, 'elementos': rows,
+            'siguiente': rows[-1]['id'] if more else None}
+
+
+def _labels(conn, refs):
+    """Etiqueta de cada (tabla, id) enlazado, en una consulta por tabla."""
+    by_table = {}
+    for table, item_id in refs:
+        by_table.setdefault(table, set()).add(item_id)
+    labels = {}
+    for table, ids in by_table.items():
+        if table not in SERVED_TABLES:
+            continue
+        label = "codigo" if table in CODE_TABLES else "COALESCE(marca, '') || ' ' || COALESCE(modelo, '')"
+        ids_json = json.dumps(sorted(ids))
+        for item_id, text, inventory_id in conn.execute(
+                f"SELECT id, {label}, inventario_id FROM {table} WHERE id IN (SELECT value FROM json_each(?))", (ids_json,)):
+            labels[(table, item_id)] = (text, inventory_id)
+    return labels
+
+
+def get_equipment(conn, params, table, item_id):
+    table = _table(table)
+    rows = _rows(conn.execute(f"SELECT * FROM {table} WHERE id = ?", (item_id,)))
+    if not rows:
+        raise ServiceError(404, f"No existe {table} {item_id}")
+    item = rows[0]
+    links = conn.execute(
+        "SELECT 'padre', parent_item_type, parent_item_id, notes FROM connections WHERE child_item_type = ? AND child_item_id = ? "
+        "UNION ALL SELECT 'hijo', child_item_type, child_item_id, notes FROM connections WHERE parent_item_type = ? AND parent_item_id = ?",
+        (table, item_id, table, item_id)).fetchall()
+    labels = _labels(conn, [(link_type, link_id) for _, link_type, link_id, _ in links])
+    item['conexiones'] = [{'relacion': relation, 'tabla': link_type, 'id': link_id, 'notas': notes,
+                           'etiqueta': labels.get((link_type, link_id), (None, None))[0]}
+                          for relation, link_type, link_id, notes in links if (link_type, link_id) in labels]
+    return item
+
+
+def search(conn, params):
+    """Por `codigo` (exacto, con índice) o por `q` (texto en los campos de búsqueda). `centro` opcional."""
+    code = params.get('codigo', [None])[0]
+    text = params.get('q', [None])[0]
+    inventory_id = _int(params, 'centro')
+    limit = _int(params, 'limite', SEARCH_LIMIT, 1, MAX_PAGE_SIZE)
+    if not code and not text:
+        raise ServiceError(400, "Indique 'codigo' o 'q'")
+    centro_filter = " AND t.inventario_id = ?" if inventory_id is not None else ""
+    parts, args = [], []
+    if code:
+        for table in CODE_TABLES:
+            parts.append(f"SELECT '{table}', t.id, t.inventario_id, t.codigo FROM {table} t WHERE t.codigo = ?{centro_filter}")
+            args += [code] + ([inventory_id] if inventory_id is not None else [])
+    else:
+        pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        for table, fields in SEARCH_FIELDS.items():
+            matches = " OR ".join(f"t.{field} LIKE ? ESCAPE '\\'" for field in fields)
+            shown = " || ' - ' || ".join(f"COALESCE(t.{field}, '')" for field in fields)
+            parts.append(f"SELECT '{table}', t.id, t.inventario_id, {shown} FROM {table} t WHERE ({matches}){centro_filter}")
+            args += [pattern] * len(fields) + ([inventory_id] if inventory_id is not None else [])
+    rows = conn.execute(" UNION ALL ".join(parts) + " LIMIT ?", args + [limit + 1]).fetchall()
+    results = [{'tabla': table, 'id': item_id, 'centro': centro, 'texto': shown} for table, item_id, centro, shown in rows[:limit]]
+    return {'resultados': results, 'truncado': len(rows) > limit}
+
+
+# (patrón, endpoint, función, índice del grupo con el centro o None para la versión global)
+ROUTES = [
+    (re.compile(r'^/centros/?$'), 'centros', list_centros, None),
+    (re.compile(r'^/centros/(\d+)/?$'), 'centro', get_centro, 0),
+    (re.compile(r'^/centros/(\d+)/(\w+)/?$'), 'equipos_centro', list_equipment, 0),
+    (re.compile(r'^/equipos/(\w+)/(\d+)/?$'), 'equipo', get_equipment, None),
+    (re.compile(r'^/buscar/?$'), 'buscar', search, None),
+]
+
+
+# --- Servidor ---
+class QueryService:
+    """Servidor HTTP con un hilo por petición. `start()` lo arranca en segundo plano
+    (desde la aplicación) y `serve_forever()` en el hilo actual (desde la línea de órdenes).
+
+    Con `sharded` (base de datos dividida por centros) las rutas de un centro se sirven de su
+    fichero; la lista de centros sale del catálogo y la búsqueda y los equipos sueltos se
+    consultan fichero a fichero, sin ETag ni memoria."""
+
+    def __init__(self, db_path, host=DEFAULT_HOST, port=DEFAULT_PORT, pool_size=POOL_SIZE, sharded=False):
+        self.db_path = db_path
+        self.sharded = sharded
+        self.pool = ReaderPool(db_path, pool_size)
+        self.metrics = ServiceMetrics()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='query_service', daemon=True)
+        self._thread.start()
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        self.pool.close()
+
+    def _cached(self, key, version):
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _remember(self, key, version, body):
+        with self._cache_lock:
+            self._cache[key] = (version, body)
+            self._cache.move_to_end(key)
+            while len(self._cache) > RESPONSE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def handle(self, path, query, if_none_match):
+        """Devuelve (endpoint, estado, cuerpo JSON o None, etag, desde memoria)."""
+        if path.rstrip('/') == '/metricas':
+            return 'metricas', 200, _encode(self.metrics.to_dict()), None, False
+        for pattern, endpoint, function, centro_group in ROUTES:
+            match = pattern.match(path)
+            if match:
+                break
+        else:
+            raise ServiceError(404, f"Ruta desconocida: {path}")
+        args = [int(value) if value.isdigit() else value for value in match.groups()]
+        params = parse_qs(query)
+        inventory_id = args[centro_group] if centro_group is not None else None
+        if self.sharded and inventory_id is None:
+            return endpoint, 200, _encode(self._fleet(function, params, args)), None, False
+        with self.pool.connection(self._path(inventory_id)) as conn:
+            # Versión y datos en la misma transacción de lectura: el ETag corresponde a lo servido
+            conn.execute("BEGIN")
+            version = data_version(conn, inventory_id)
+            etag = None
+            if version is not None:
+                etag = '"' + hashlib.sha1(f"{path}?{query}|{version}".encode('utf-8')).hexdigest()[:20] + '"'
+                if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+                    return endpoint, 304, None, etag, True
+                body = self._cached(f"{path}?{query}", version)
+                if body is not None:
+                    return endpoint, 200, body, etag, True
+            body = _encode(function(conn, params, *args))
+        if version is not None:
+            self._remember(f"{path}?{query}", version, body)
+        return endpoint, 200, body, etag, False
+
+    # --- Base de datos dividida por centros ---
+    def _shard_path(self, inventory_id):
+        return os.path.join(os.path.dirname(os.path.abspath(self.db_path)), SHARD_DIR, f"centro_{int(inventory_id)}.db")
+
+    def _path(self, inventory_id):
+        """Fichero con los datos de `inventory_id` (la base de datos principal si no está dividida)."""
+        if not self.sharded or inventory_id is None:
+            return self.db_path
+        path = self._shard_path(inventory_id)
+        if not os.path.exists(path):
+            raise ServiceError(404, f"No existe el centro {inventory_id}")
+        return path
+
+    def _centro_ids(self, first=None):
+        """Centros con fichero, empezando por `first` si está entre ellos."""
+        with self.pool.connection() as conn:
+            ids = [inventory_id for (inventory_id,) in conn.execute("SELECT id FROM inventarios ORDER BY id")]
+        ids = [inventory_id for inventory_id in ids if os.path.exists(self._shard_path(inventory_id))]
+        if first in ids:
+            ids.remove(first)
+            ids.insert(0, first)
+        return ids
+
+    def _fleet(self, function, params, args):
+        """Rutas sin centro con la base de datos dividida."""
+        if function is list_centros:
+            with self.pool.connection() as conn:
+                return list_centros(conn, params)
+        if function is get_equipment:
+            table, item_id = _table(args[0]), args[1]
+            # Los ids nuevos de cada fichero empiezan en id_centro << ID_BLOCK_BITS
+            for inventory_id in self._centro_ids(first=item_id >> shards.ID_BLOCK_BITS):
+                with self.pool.connection(self._path(inventory_id)) as conn:
+                    if conn.execute(f"SELECT 1 FROM {table} WHERE id = ?", (item_id,)).fetchone():
+                        return get_equipment(conn, params, table, item_id)
+            raise ServiceError(404, f"No existe {table} {item_id}")
+        inventory_id = _int(params, 'centro')
+        limit = _int(params, 'limite', SEARCH_LIMIT, 1, MAX_PAGE_SIZE)
+        results = []
+        for inventory_id in [inventory_id] if inventory_id is not None else self._centro_ids():
+            with self.pool.connection(self._path(inventory_id)) as conn:
+                found = search(conn, params)
+            results += found['resultados']
+            if found['truncado'] or len(results) > limit:
+                return {'resultados': results[:limit], 'truncado': True}
+        return {'resultados': results, 'truncado': False}
+
+
+def _encode(data):
+    return json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+
+
+def _make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = 'InventarioConsultas/1.0'
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            start = time.perf_counter()
+            url = urlsplit(self.path)
+            endpoint, cached, etag = 'desconocido', False, None
+            try:
+                endpoint, status, body, etag, cached = service.handle(url.path, url.query, self.headers.get('If-None-Match'))
+            except ServiceError as e:
+                status, body = e.status, _encode({'error': str(e)})
+            except sqlite3.Error as e:
+                status, body = 503, _encode({'error': f"Error de base de datos: {e}"})
+            self.send_response(status)
+            if etag:
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
+            if body is not None:
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+            else:
+                self.send_header('Content-Length', '0')
+            self.end_headers()
+            if body is not None:
+                self.wfile.write(body)
+            service.metrics.record(endpoint, status, (time.perf_counter() - start) * 1000, cached)
+
+        def _not_allowed(self):
+            body = _encode({'error': "Servicio de solo lectura"})
+            self.send_response(405)
+            self.send_header('Allow', 'GET')
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_POST = do_PUT = do_PATCH = do_DELETE = _not_allowed
+
+        def log_message(self, format, *args):
+            # Sin una línea por petición: las cifras están en /metricas
+            pass
+
+    return Handler
+
+
+def prepare_database(db):
+    """WAL, índices y versiones de centro (los triggers de export_cache, para los ETag) en cada
+    fichero de centro; se hace con la conexión de escritura antes de abrir el pool."""
+    for _ in db.each_centro():
+        enable_wal(db)
+        ensure_indexes(db)
+        ExportCache(db, os.path.join(os.path.dirname(os.path.abspath(db.db_name)), 'cache', 'informes'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio local de consultas JSON (solo lectura) sobre el inventario.")
+    parser.add_argument('--db', default='inventario.db', help="base de datos (por defecto inventario.db)")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"dirección de escucha (por defecto {DEFAULT_HOST}, solo este equipo)")
+    parser.add_argument('--puerto', type=int, default=DEFAULT_PORT, help=f"puerto (por defecto {DEFAULT_PORT})")
+    parser.add_argument('--conexiones', type=int, default=POOL_SIZE, help=f"conexiones de lectura (por defecto {POOL_SIZE})")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No existe la base de datos {args.db}")
+        return 2
+    db = DatabaseManager(args.db, create_tables=False)
+    try:
+        prepare_database(db)
+        sharded = db.sharded
+    finally:
+        db.close()
+    try:
+        service = QueryService(args.db, args.host, args.puerto, max(1, args.conexiones), sharded)
+    except OSError as e:
+        print(f"No se pudo abrir el puerto {args.puerto}: {e}")
+        return 2
+    print(f"Servicio de consultas en {service.url} (Ctrl+C para terminar)")
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.server.server_close()
+        service.pool.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
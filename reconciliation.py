@@ -0,0 +1,258 @@
+# reconciliation.py
+"""Detección y reparación de datos huérfanos: filas de `images` y extremos de
+`connections` que apuntan a equipos que ya no existen, ficheros de data/images
+que ninguna fila usa y filas de imagen cuyo fichero ha desaparecido.
+
+Uso sin interfaz: python reconciliation.py [inventario.db] [--data-dir DIR] [--reparar]
+"""
+import argparse
+import json
+import os
+import sys
+
+from database import DatabaseManager, EQUIPMENT_TABLES
+
+IMAGES_DIR = os.path.join('data', 'images')
+# Filas borradas por transacción al reparar
+BATCH_SIZE = 500
+
+
+def _item_exists(type_column, id_column):
+    # Una sola expresión por fila: búsqueda por clave primaria en la tabla que indica el tipo
+    cases = " ".join(f"WHEN '{table}' THEN EXISTS (SELECT 1 FROM {table} WHERE id = {id_column})" for table in EQUIPMENT_TABLES)
+    return f"(CASE {type_column} {cases} ELSE 0 END)"
+
+
+def _normalized(column):
+    return f"REPLACE({column}, '\\', '/')"
+
+
+def _image_path(relative_path):
+    return relative_path.replace('\\', '/')
+
+
+def _unreferenced(db, paths):
+    """Las rutas de `paths` que ninguna fila de `images` usa (de ningún centro, si la base de
+    datos está dividida: data/images es común a todos)."""
+    used = {path for (path,) in db.fleet_query(
+        f"SELECT value FROM json_each(?) WHERE value IN (SELECT {_normalized('image_path')} FROM {{db}}images)",
+        (json.dumps(paths),))}
+    return [path for path in paths if path not in used]
+
+
+class ReconciliationReport:
+    """Resultado de `scan`. Cada lista contiene lo necesario para mostrarlo y repararlo."""
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.orphan_images = []         # [(id, image_path, bytes del fichero o None)] equipo inexistente
+        self.missing_files = []         # [(id, image_path)] fichero inexistente
+        self.orphan_files = []          # [(ruta relativa, bytes)] fichero sin fila en images
+        self.dangling_connections = []  # [(id, tipo_padre, id_padre, tipo_hijo, id_hijo)]
+
+    @property
+    def reclaimable_bytes(self):
+        """Espacio en disco que se libera al reparar (ficheros huérfanos y los de las filas huérfanas)."""
+        return (sum(size for _, size in self.orphan_files)
+                + sum(size for _, _, size in self.orphan_images if size))
+
+    def is_clean(self):
+        return not (self.orphan_images or self.missing_files or self.orphan_files or self.dangling_connections)
+
+    def summary(self):
+        return {'imagenes_huerfanas': len(self.orphan_images), 'imagenes_sin_fichero': len(self.missing_files),
+                'ficheros_huerfanos': len(self.orphan_files), 'conexiones_rotas': len(self.dangling_connections),
+                'bytes_recuperables': self.reclaimable_bytes}
+
+
+def _scan_files(data_dir):
+    """Un único recorrido de data/images: {ruta relativa con '/': tamaño}."""
+    files = {}
+    directory = os.path.join(data_dir, IMAGES_DIR)
+    if not os.path.isdir(directory):
+        return files
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                files[f"data/images/{entry.name}"] = entry.stat(follow_symlinks=False).st_size
+    return files
+
+
+def scan(db, data_dir):
+    """Busca todo lo huérfano con consultas sobre conjuntos: el listado del directorio
+    se carga en una tabla temporal y se cruza con `images` en ambos sentidos."""
+    report = ReconciliationReport(data_dir)
+    files = _scan_files(data_dir)
+
+    cursor = db.conn.cursor()
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS reconcile_files (path TEXT PRIMARY KEY, size INTEGER) WITHOUT ROWID")
+    cursor.execute("DELETE FROM temp.reconcile_files")
+    cursor.executemany("INSERT INTO temp.reconcile_files (path, size) VALUES (?, ?)", files.items())
+    used = f"SELECT {_normalized('image_path')} FROM images"
+    if db.sharded:
+        # Un fichero solo es huérfano si no lo usa ningún centro
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS reconcile_used (path TEXT PRIMARY KEY) WITHOUT ROWID")
+        cursor.execute("DELETE FROM temp.reconcile_used")
+        cursor.executemany("INSERT OR IGNORE INTO temp.reconcile_used (path) VALUES (?)",
+                           db.fleet_query(f"SELECT {_normalized('image_path')} FROM {{db}}images"))
+        used = "SELECT path FROM temp.reconcile_used"
+    try:
+        report.orphan_images = db.fetch_all(f'''
+            SELECT i.id, i.image_path, f.size
+            FROM images i LEFT JOIN temp.reconcile_files f ON f.path = {_normalized('i.image_path')}
+            WHERE NOT {_item_exists('i.item_type', 'i.item_id')}
+            ORDER BY i.id
+        ''')
+        orphan_ids = {image_id for image_id, _, _ in report.orphan_images}
+        # Las filas ya huérfanas se eliminan igualmente; aquí solo las de equipos existentes
+        missing = db.fetch_all(f'''
+            SELECT i.id, i.image_path FROM images i
+            WHERE {_normalized('i.image_path')} NOT IN (SELECT path FROM temp.reconcile_files)
+            ORDER BY i.id
+        ''')
+        # Las rutas fuera de data/images (no cubiertas por el recorrido) se comprueban una a una
+        report.missing_files = [(image_id, path) for image_id, path in missing
+                                if image_id not in orphan_ids and
+                                (_image_path(path).startswith('data/images/') or not os.path.exists(os.path.join(data_dir, path)))]
+        report.orphan_files = db.fetch_all(f'''
+            SELECT f.path, f.size FROM temp.reconcile_files f
+            WHERE f.path NOT IN ({used})
+            ORDER BY f.path
+        ''')
+        report.dangling_connections = db.fetch_all(f'''
+            SELECT id, parent_item_type, parent_item_id, child_item_type, child_item_id FROM connections
+            WHERE NOT {_item_exists('parent_item_type', 'parent_item_id')} OR NOT {_item_exists('child_item_type', 'child_item_id')}
+            ORDER BY id
+        ''')
+    finally:
+        cursor.execute("DROP TABLE IF EXISTS temp.reconcile_files")
+        cursor.execute("DROP TABLE IF EXISTS temp.reconcile_used")
+        # Escribir en la tabla temporal abre una transacción que retendría el bloqueo de lectura
+        db.conn.commit()
+    return report
+
+
+def _batches(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _remove_files(data_dir, paths):
+    removed = freed = 0
+    for path in paths:
+        full_path = os.path.join(data_dir, path)
+        try:
+            size = os.path.getsize(full_path)
+            os.remove(full_path)
+            removed += 1
+            freed += size
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"No se pudo borrar el archivo de imagen {full_path}: {e}")
+    return removed, freed
+
+
+def repair(db, report, batch_size=BATCH_SIZE, progress=None):
+    """Elimina lo encontrado por `scan` en transacciones de `batch_size` filas.
+
+    Cada borrado vuelve a comprobar la condición (un equipo o fila creado después
+    del análisis no se toca) y un fichero solo se borra si ninguna fila lo usa ya.
+    `progress(hechos, total)` se llama tras cada lote. Devuelve los totales reparados."""
+    result = {'imagenes': 0, 'conexiones': 0, 'ficheros': 0, 'bytes': 0}
+    total = (len(report.orphan_images) + len(report.missing_files)
+             + len(report.dangling_connections) + len(report.orphan_files))
+    done = 0
+
+    def advance(count):
+        nonlocal done
+        done += count
+        if progress:
+            progress(done, total)
+
+    for batch in _batches(report.orphan_images, batch_size):
+        ids = json.dumps([image_id for image_id, _, _ in batch])
+        paths = sorted({_image_path(path) for _, path, _ in batch})
+        with db.transaction():
+            cursor = db.execute_query(f"DELETE FROM images WHERE id IN (SELECT value FROM json_each(?)) "
+                                      f"AND NOT {_item_exists('item_type', 'item_id')}", (ids,))
+            result['imagenes'] += cursor.rowcount
+        # Tras confirmar: las demás conexiones (otros centros) ya no ven las filas borradas
+        removed, freed = _remove_files(report.data_dir, _unreferenced(db, paths))
+        result['ficheros'] += removed
+        result['bytes'] += freed
+        advance(len(batch))
+
+    for batch in _batches(report.missing_files, batch_size):
+        ids = json.dumps([image_id for image_id, path in batch if not os.path.exists(os.path.join(report.data_dir, path))])
+        with db.transaction():
+            cursor = db.execute_query("DELETE FROM images WHERE id IN (SELECT value FROM json_each(?))", (ids,))
+            result['imagenes'] += cursor.rowcount
+        advance(len(batch))
+
+    for batch in _batches(report.dangling_connections, batch_size):
+        ids = json.dumps([row[0] for row in batch])
+        with db.transaction():
+            cursor = db.execute_query(
+                f"DELETE FROM connections WHERE id IN (SELECT value FROM json_each(?)) AND "
+                f"(NOT {_item_exists('parent_item_type', 'parent_item_id')} OR NOT {_item_exists('child_item_type', 'child_item_id')})",
+                (ids,))
+            result['conexiones'] += cursor.rowcount
+        advance(len(batch))
+
+    for batch in _batches(report.orphan_files, batch_size):
+        removed, freed = _remove_files(report.data_dir, _unreferenced(db, [path for path, _ in batch]))
+        result['ficheros'] += removed
+        result['bytes'] += freed
+        advance(len(batch))
+    return result
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busca (y opcionalmente elimina) imágenes, ficheros y conexiones huérfanos.")
+    parser.add_argument('db', nargs='?', default='inventario.db', help="base de datos (por defecto inventario.db)")
+    parser.add_argument('--data-dir', help="directorio que contiene data/images (por defecto, el de la base de datos)")
+    parser.add_argument('--reparar', action='store_true', help="eliminar lo encontrado")
+    parser.add_argument('--lote', type=int, default=BATCH_SIZE, help="filas por transacción al reparar")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No existe la base de datos {args.db}")
+        return 2
+    data_dir = args.data_dir or os.path.dirname(os.path.abspath(args.db))
+    db = DatabaseManager(args.db, create_tables=False)
+    clean = True
+    try:
+        # Con la base de datos dividida cada centro se revisa en su fichero; los ficheros
+        # huérfanos son comunes a todos y se cuentan con el primero
+        for number, inventory_id in enumerate(db.centro_ids() if db.sharded else [None]):
+            db.use_centro(inventory_id)
+            report = scan(db, data_dir)
+            if number:
+                report.orphan_files = []
+            if inventory_id is not None:
+                print(f"\nCentro {inventory_id}:" if number else f"Centro {inventory_id}:")
+            print(f"Imágenes de equipos inexistentes: {len(report.orphan_images)}")
+            print(f"Imágenes sin fichero:             {len(report.missing_files)}")
+            print(f"Ficheros sin imagen asociada:     {len(report.orphan_files)}")
+            print(f"Conexiones con extremos borrados: {len(report.dangling_connections)}")
+            print(f"Espacio recuperable:              {format_bytes(report.reclaimable_bytes)}")
+            if args.reparar and not report.is_clean():
+                result = repair(db, report, args.lote)
+                print(f"\nReparado: {result['imagenes']} imágenes, {result['conexiones']} conexiones, "
+                      f"{result['ficheros']} ficheros ({format_bytes(result['bytes'])} liberados)")
+            clean = clean and report.is_clean()
+    finally:
+        db.close()
+    return 0 if clean or args.reparar else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,419 @@
+# shards.py
+"""Base de datos dividida por centros (opcional).
+
+Con todo en un único inventario.db, un cliente muy grande ralentiza a todos, un fichero
+dañado deja sin datos a todos los clientes y archivar un cliente antiguo es borrar filas.
+Dividida, inventario.db queda como catálogo (la lista de centros y los ajustes generales)
+y cada centro va en centros/centro_<id>.db con sus equipos, imágenes, conexiones y tablas
+derivadas (cambios, estadísticas, alertas, posiciones...). Cada fichero tiene el esquema
+completo con sus disparadores, así que se puede copiar, archivar o reparar por separado.
+
+DatabaseManager dirige las consultas al fichero del centro en uso (`use_centro`) y las de
+toda la flota adjuntan los ficheros por lotes (`fleet_query`). Con la aplicación cerrada:
+
+    python shards.py dividir inventario.db        # deja la copia inventario.db.monolitica
+    python shards.py unir inventario.db           # vuelve a un único fichero
+    python shards.py archivar inventario.db 12    # saca el centro 12 a centros/archivados
+    python shards.py recuperar inventario.db centros/archivados/centro_12.db
+    python shards.py estado inventario.db
+
+Los ids de los equipos que se crean en cada centro empiezan en id_centro << 32: siguen siendo
+únicos en toda la flota y al volver a unir los ficheros no hay que renumerar nada.
+"""
+import argparse
+import glob
+import os
+import shutil
+import sqlite3
+import sys
+from datetime import datetime
+
+from database import DatabaseManager, EQUIPMENT_TABLES, SHARD_DIR, STORAGE_LAYOUT_KEY
+
+MONOLITHIC_SUFFIX = '.monolitica'
+ARCHIVE_DIR = 'archivados'
+ID_BLOCK_BITS = 32
+# Orden de creación del esquema: los disparadores al final para no repetir su trabajo al copiar
+_SCHEMA_ORDER = {'table': 0, 'index': 1, 'view': 2, 'trigger': 3}
+
+
+# --- Esquema y filas de un centro ---
+def _schema(conn, schema):
+    """[(tipo, nombre, tabla, sql)] del esquema: tablas, índices, vistas y disparadores."""
+    rows = conn.execute(f"SELECT type, name, tbl_name, sql FROM {schema}.sqlite_master "
+                        "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'").fetchall()
+    return sorted(rows, key=lambda row: _SCHEMA_ORDER[row[0]])
+
+
+def _columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _row_filter(table, columns):
+    """Condición (sobre el alias t) de las filas de una tabla que pertenecen al centro, o None
+    si la tabla no es de ningún centro (ajustes, firmas de esquema) y se copia entera."""
+    if table == 'inventarios':
+        return "t.id = :centro"
+    if 'inventario_id' in columns:
+        return "t.inventario_id = :centro"
+    if table in ('images', 'connections'):
+        return f"EXISTS (SELECT 1 FROM temp.shard_items s WHERE s.item_type = '{table}' AND s.item_id = t.id)"
+    if 'item_type' in columns and 'item_id' in columns:
+        return "EXISTS (SELECT 1 FROM temp.shard_items s WHERE s.item_type = t.item_type AND s.item_id = t.item_id)"
+    return None
+
+
+def _collect_items(conn, schema, inventory_id):
+    """Tabla temporal shard_items con los elementos del centro: el propio centro, sus equipos,
+    las imágenes de esos equipos y las conexiones que salen de ellos."""
+    tables = {name for (name,) in conn.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type='table'")}
+    conn.execute("DROP TABLE IF EXISTS temp.shard_items")
+    conn.execute("CREATE TEMP TABLE shard_items (item_type TEXT, item_id INTEGER, PRIMARY KEY (item_type, item_id)) WITHOUT ROWID")
+    conn.execute("INSERT INTO temp.shard_items VALUES ('inventarios', ?)", (inventory_id,))
+    for table in EQUIPMENT_TABLES:
+        if table in tables:
+            conn.execute(f"INSERT INTO temp.shard_items SELECT '{table}', id FROM {schema}.{table} WHERE inventario_id = ?",
+                         (inventory_id,))
+    if 'images' in tables:
+        conn.execute(f'''
+            INSERT INTO temp.shard_items SELECT 'images', i.id FROM {schema}.images i
+            WHERE EXISTS (SELECT 1 FROM temp.shard_items s WHERE s.item_type = i.item_type AND s.item_id = i.item_id)
+        ''')
+    if 'connections' in tables:
+        conn.execute(f'''
+            INSERT INTO temp.shard_items SELECT 'connections', c.id FROM {schema}.connections c
+            WHERE EXISTS (SELECT 1 FROM temp.shard_items s WHERE s.item_type = c.parent_item_type AND s.item_id = c.parent_item_id)
+        ''')
+    return tables
+
+
+def build_shard(path, source_path, inventory_id, template_path=None, move=False):
+    """Crea el fichero de un centro con sus filas de `source_path`.
+
+    Sin plantilla (al dividir) el esquema es el del origen y las tablas derivadas se copian
+    tal cual, con los disparadores creados al final. Con plantilla (centro nuevo o importado
+    en el catálogo) los disparadores van primero y rellenan las tablas derivadas al copiar.
+    Con `move`, las filas copiadas se borran del origen en la misma transacción."""
+    work_path = path + '.tmp'
+    if os.path.exists(work_path):
+        os.remove(work_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(work_path, isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS origen", (source_path,))
+        schema_from = 'origen'
+        if template_path:
+            conn.execute("ATTACH DATABASE ? AS plantilla", (template_path,))
+            schema_from = 'plantilla'
+        schema = _schema(conn, schema_from)
+        conn.execute("BEGIN")
+        source_tables = _collect_items(conn, 'origen', inventory_id)
+        tables = [name for kind, name, _, _ in schema if kind == 'table']
+        early = [sql for kind, _, _, sql in schema if kind == 'table' or template_path]
+        late = [sql for kind, _, _, sql in schema if kind != 'table' and not template_path]
+        for sql in early:
+            conn.execute(sql)
+
+        # app_meta primero: los disparadores de la plantilla leen de ella (p. ej. el origen de sincronización)
+        for table in sorted(tables, key=lambda name: name != 'app_meta'):
+            if table not in source_tables:
+                continue
+            source_columns = set(_columns(conn, 'origen', table))
+            columns = [col for col in _columns(conn, 'main', table) if col in source_columns]
+            where = _row_filter(table, columns)
+            names = ", ".join(columns)
+            if table == 'app_meta':
+                # Los ajustes y firmas de esquema vienen del fichero que da el esquema
+                conn.execute(f"INSERT INTO main.app_meta (key, value) SELECT key, value FROM {schema_from}.app_meta WHERE key != ?",
+                             (STORAGE_LAYOUT_KEY,))
+            elif where is not None:
+                conn.execute(f"INSERT INTO main.{table} ({names}) SELECT {names} FROM origen.{table} AS t WHERE {where}",
+                             {'centro': inventory_id})
+            elif not template_path:
+                conn.execute(f"INSERT INTO main.{table} ({names}) SELECT {names} FROM origen.{table}")
+        for sql in late:
+            conn.execute(sql)
+
+        # Los ids nuevos del centro, en su propio bloque
+        for kind, table, _, sql in schema:
+            if kind == 'table' and table != 'inventarios' and 'AUTOINCREMENT' in sql.upper():
+                row = conn.execute("SELECT MAX(seq) FROM main.sqlite_sequence WHERE name = ?", (table,)).fetchone()
+                conn.execute("DELETE FROM main.sqlite_sequence WHERE name = ?", (table,))
+                conn.execute("INSERT INTO main.sqlite_sequence (name, seq) VALUES (?, ?)",
+                             (table, max(row[0] or 0, inventory_id << ID_BLOCK_BITS)))
+
+        if move:
+            for table in tables:
+                if table in source_tables and table not in ('inventarios', 'app_meta'):
+                    where = _row_filter(table, _columns(conn, 'origen', table))
+                    if where is not None:
+                        conn.execute(f"DELETE FROM origen.{table} AS t WHERE {where}", {'centro': inventory_id})
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        conn.close()
+        os.remove(work_path)
+        raise
+    conn.close()
+    os.replace(work_path, path)
+
+
+def create_shard(db, inventory_id):
+    """Crea el fichero de un centro recién dado de alta (o importado) en el catálogo, con el
+    esquema de otro centro como plantilla y moviendo allí lo que se haya importado."""
+    path = db.shard_path(inventory_id)
+    templates = [p for p in glob.glob(os.path.join(os.path.dirname(path), 'centro_*.db')) if p != path]
+    build_shard(path, os.path.abspath(db.db_name), inventory_id, templates[0] if templates else None, move=True)
+
+
+# --- Dividir y unir ---
+def _checkpoint(path):
+    """Vacía el WAL y vuelve al diario normal: el fichero queda completo por sí solo."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        conn.close()
+
+
+def _build_catalog(path, source_path):
+    """Catálogo: las tablas del origen (sin índices ni disparadores, sirven para preparar
+    importaciones) con solo la lista de centros y los ajustes generales."""
+    work_path = path + '.tmp'
+    if os.path.exists(work_path):
+        os.remove(work_path)
+    conn = sqlite3.connect(work_path, isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS origen", (source_path,))
+        conn.execute("BEGIN")
+        for kind, _, _, sql in _schema(conn, 'origen'):
+            if kind == 'table':
+                conn.execute(sql)
+        conn.execute("INSERT INTO main.inventarios SELECT * FROM origen.inventarios")
+        # Sin firmas de esquema: el catálogo no tiene los disparadores de los subsistemas
+        conn.execute("INSERT INTO main.app_meta (key, value) SELECT key, value FROM origen.app_meta WHERE key NOT LIKE '%_signature'")
+        conn.execute("INSERT INTO main.app_meta (key, value) VALUES (?, 'shards')", (STORAGE_LAYOUT_KEY,))
+        if conn.execute("SELECT 1 FROM main.sqlite_master WHERE name = 'sqlite_sequence'").fetchone():
+            conn.execute("INSERT INTO main.sqlite_sequence (name, seq) SELECT name, seq FROM origen.sqlite_sequence")
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return work_path
+
+
+def split(db_path, progress=print):
+    """Divide una base de datos de un solo fichero. El original queda como <db>.monolitica."""
+    db = DatabaseManager(db_path, create_tables=False)
+    try:
+        if db.sharded:
+            raise RuntimeError("La base de datos ya está dividida por centros")
+        inventory_ids = db.centro_ids()
+        existing = [db.shard_path(i) for i in inventory_ids if os.path.exists(db.shard_path(i))]
+    finally:
+        db.close()
+    if existing:
+        raise RuntimeError(f"Ya existen ficheros de centros en {os.path.dirname(existing[0])}")
+    backup_path = db_path + MONOLITHIC_SUFFIX
+    if os.path.exists(backup_path):
+        raise RuntimeError(f"Ya existe {backup_path}: muévalo antes de volver a dividir")
+
+    _checkpoint(db_path)
+    shutil.copy2(db_path, backup_path)
+    shard_dir = os.path.join(os.path.dirname(os.path.abspath(db_path)), SHARD_DIR)
+    for number, inventory_id in enumerate(inventory_ids, 1):
+        build_shard(os.path.join(shard_dir, f"centro_{inventory_id}.db"), backup_path, inventory_id)
+        progress(f"Centro {inventory_id}: {number}/{len(inventory_ids)}")
+    os.replace(_build_catalog(db_path, backup_path), db_path)
+    return len(inventory_ids)
+
+
+def merge(db_path, progress=print):
+    """Vuelve a juntar el catálogo y los ficheros de los centros en un solo fichero. Los
+    ficheros de los centros quedan en centros.unidos_<fecha> por si hay que volver atrás."""
+    db = DatabaseManager(db_path, create_tables=False)
+    try:
+        if not db.sharded:
+            raise RuntimeError("La base de datos no está dividida por centros")
+        paths = [(i, db.shard_path(i)) for i in db.centro_ids() if os.path.exists(db.shard_path(i))]
+    finally:
+        db.close()
+    _checkpoint(db_path)
+    work_path = db_path + '.tmp'
+    if os.path.exists(work_path):
+        os.remove(work_path)
+    conn = sqlite3.connect(work_path, isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS catalogo", (db_path,))
+        schema_from = 'catalogo'
+        if paths:
+            conn.execute("ATTACH DATABASE ? AS plantilla", (paths[0][1],))
+            schema_from = 'plantilla'
+        schema = _schema(conn, schema_from)
+        tables = [name for kind, name, _, _ in schema if kind == 'table']
+        conn.execute("BEGIN")
+        for kind, _, _, sql in schema:
+            if kind == 'table':
+                conn.execute(sql)
+        conn.execute("INSERT INTO main.inventarios SELECT * FROM catalogo.inventarios")
+        conn.execute("INSERT INTO main.app_meta (key, value) SELECT key, value FROM catalogo.app_meta WHERE key != ?",
+                     (STORAGE_LAYOUT_KEY,))
+        conn.execute("COMMIT")
+        if paths:
+            conn.execute("DETACH DATABASE plantilla")
+
+        for number, (inventory_id, path) in enumerate(paths, 1):
+            _checkpoint(path)
+            conn.execute("ATTACH DATABASE ? AS centro", (path,))
+            conn.execute("BEGIN")
+            shard_tables = {name for (name,) in conn.execute("SELECT name FROM centro.sqlite_master WHERE type='table'")}
+            for table in tables:
+                if table in ('inventarios', 'app_meta') or table not in shard_tables:
+                    continue
+                shard_columns = set(_columns(conn, 'centro', table))
+                columns = [col for col in _columns(conn, 'main', table) if col in shard_columns]
+                # Las tablas que no son de ningún centro se toman del primero
+                if _row_filter(table, columns) is None and number > 1:
+                    continue
+                names = ", ".join(columns)
+                conn.execute(f"INSERT OR IGNORE INTO main.{table} ({names}) SELECT {names} FROM centro.{table}")
+            conn.execute("INSERT OR IGNORE INTO main.app_meta (key, value) SELECT key, value FROM centro.app_meta")
+            conn.execute('''
+                INSERT INTO main.sqlite_sequence (name, seq)
+                SELECT name, seq FROM centro.sqlite_sequence WHERE name != 'inventarios'
+            ''')
+            conn.execute("COMMIT")
+            conn.execute("DETACH DATABASE centro")
+            progress(f"Centro {inventory_id}: {number}/{len(paths)}")
+
+        conn.execute("BEGIN")
+        # Una fila por tabla con el mayor id de todos los centros (y del catálogo para inventarios)
+        conn.execute("INSERT INTO main.sqlite_sequence (name, seq) SELECT name, seq FROM catalogo.sqlite_sequence WHERE name = 'inventarios'")
+        conn.execute("CREATE TEMP TABLE merged_sequence AS SELECT name, MAX(seq) AS seq FROM main.sqlite_sequence GROUP BY name")
+        conn.execute("DELETE FROM main.sqlite_sequence")
+        conn.execute("INSERT INTO main.sqlite_sequence (name, seq) SELECT name, seq FROM temp.merged_sequence")
+        for kind, _, _, sql in schema:
+            if kind != 'table':
+                conn.execute(sql)
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        conn.close()
+        os.remove(work_path)
+        raise
+    conn.close()
+
+    shard_dir = os.path.join(os.path.dirname(os.path.abspath(db_path)), SHARD_DIR)
+    os.replace(work_path, db_path)
+    if os.path.isdir(shard_dir):
+        os.replace(shard_dir, f"{shard_dir}.unidos_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    return len(paths)
+
+
+# --- Archivo de centros ---
+def archive(db_path, inventory_id):
+    """Saca un centro del catálogo y mueve su fichero a centros/archivados. Devuelve la ruta."""
+    db = DatabaseManager(db_path, create_tables=False)
+    try:
+        if not db.sharded:
+            raise RuntimeError("Archivar un centro requiere la base de datos dividida por centros")
+        path = db.shard_path(inventory_id)
+        if not os.path.exists(path):
+            raise RuntimeError(f"No existe el fichero del centro {inventory_id}")
+        destination = os.path.join(os.path.dirname(path), ARCHIVE_DIR, os.path.basename(path))
+        if os.path.exists(destination):
+            raise RuntimeError(f"Ya hay un centro archivado en {destination}")
+        _checkpoint(path)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(path, destination)
+        db.execute_query("DELETE FROM inventarios WHERE id = ?", (inventory_id,))
+    finally:
+        db.close()
+    return destination
+
+
+def restore(db_path, shard_file):
+    """Vuelve a dar de alta en el catálogo un centro archivado. Devuelve su id."""
+    source = sqlite3.connect(shard_file)
+    try:
+        rows = source.execute("SELECT * FROM inventarios").fetchall()
+        columns = [d[0] for d in source.execute("SELECT * FROM inventarios LIMIT 0").description]
+    finally:
+        source.close()
+    if len(rows) != 1:
+        raise RuntimeError(f"{shard_file} no es el fichero de un centro")
+    data = dict(zip(columns, rows[0]))
+    db = DatabaseManager(db_path, create_tables=False)
+    try:
+        if not db.sharded:
+            raise RuntimeError("Recuperar un centro requiere la base de datos dividida por centros")
+        path = db.shard_path(data['id'])
+        if os.path.exists(path) or db.fetch_one("SELECT 1 FROM inventarios WHERE id = ? OR cliente = ?", (data['id'], data['cliente'])):
+            raise RuntimeError(f"Ya existe un centro con el id {data['id']} o el nombre '{data['cliente']}'")
+        shutil.move(shard_file, path)
+        names = [col for col in columns if col in {row[1] for row in db.fetch_all("PRAGMA table_info(inventarios)")}]
+        db.execute_query(f"INSERT INTO inventarios ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                         tuple(data[col] for col in names))
+    finally:
+        db.close()
+    return data['id']
+
+
+def status(db_path):
+    """[(id, cliente, bytes del fichero o None si falta)] de los centros del catálogo."""
+    db = DatabaseManager(db_path, create_tables=False)
+    try:
+        if not db.sharded:
+            return None
+        rows = db.fetch_all("SELECT id, cliente FROM inventarios ORDER BY id")
+        return [(inventory_id, cliente, os.path.getsize(db.shard_path(inventory_id)) if os.path.exists(db.shard_path(inventory_id)) else None)
+                for inventory_id, cliente in rows]
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Base de datos dividida por centros (un fichero por centro).")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('dividir', "divide una base de datos de un solo fichero"),
+                            ('unir', "vuelve a juntar todos los centros en un solo fichero"),
+                            ('estado', "lista los centros y el tamaño de sus ficheros")):
+        commands.add_parser(name, help=help_text).add_argument('db', help="base de datos (inventario.db)")
+    archive_parser = commands.add_parser('archivar', help="saca un centro del catálogo y archiva su fichero")
+    archive_parser.add_argument('db', help="base de datos (inventario.db)")
+    archive_parser.add_argument('centro', type=int, help="id del centro")
+    restore_parser = commands.add_parser('recuperar', help="vuelve a dar de alta un centro archivado")
+    restore_parser.add_argument('db', help="base de datos (inventario.db)")
+    restore_parser.add_argument('fichero', help="fichero del centro archivado")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No existe la base de datos {args.db}")
+        return 2
+    try:
+        if args.command == 'dividir':
+            count = split(args.db)
+            print(f"Dividida en {count} centros; el fichero original queda en {args.db}{MONOLITHIC_SUFFIX}")
+        elif args.command == 'unir':
+            count = merge(args.db)
+            print(f"Unidos {count} centros en {args.db}")
+        elif args.command == 'archivar':
+            print(f"Centro archivado en {archive(args.db, args.centro)}")
+        elif args.command == 'recuperar':
+            print(f"Recuperado el centro {restore(args.db, args.fichero)}")
+        else:
+            rows = status(args.db)
+            if rows is None:
+                print(f"{args.db} es una base de datos de un solo fichero")
+            for inventory_id, cliente, size in rows or []:
+                print(f"{inventory_id:>6}  {cliente:<40} {f'{size / 1024:.0f} KB' if size is not None else 'sin fichero'}")
+    except (RuntimeError, sqlite3.Error, OSError) as e:
+        print(e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+# sync_engine.py
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import uuid
+import zipfile
+from datetime import datetime, timezone
+
+from database import EQUIPMENT_TABLES
+
+# Tablas sincronizadas, en orden de dependencia (los padres antes que los hijos)
+SYNC_TABLES = ['inventarios'] + list(EQUIPMENT_TABLES) + ['images', 'connections']
+
+# Columnas que apuntan a otras filas: columna de id -> tabla fija o columna con el tipo (referencia polimórfica)
+_REFERENCES = {table: {'inventario_id': 'inventarios'} for table in EQUIPMENT_TABLES}
+_REFERENCES['images'] = {'item_id': ('item_type',)}
+_REFERENCES['connections'] = {'parent_item_id': ('parent_item_type',), 'child_item_id': ('child_item_type',)}
+
+CHANGESET_FORMAT = 1
+
+_NOW = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+_ORIGIN = "(SELECT value FROM app_meta WHERE key='sync_origin')"
+_NEXT_SEQ = "(SELECT COALESCE(MAX(local_seq), 0) + 1 FROM sync_rows)"
+
+
+class SyncEngine:
+    """Sincronización sin servidor entre copias de inventario.db mediante ficheros de cambios.
+
+    Cada fila sincronizada recibe en `sync_rows` un identificador global estable
+    (`gid`), una marca de modificación (`modified_at`, `origin`) y un contador local
+    (`local_seq`) que permite exportar solo lo cambiado desde la última sincronización.
+    Los conflictos se resuelven de forma determinista: gana la marca (modified_at, origin) mayor."""
+
+    def __init__(self, db, data_dir):
+        self.db = db
+        self.data_dir = data_dir
+        self._column_cache = {}
+        self.ensure_schema()
+
+    @property
+    def origin(self):
+        return self.db.get_meta('sync_origin')
+
+    def ensure_schema(self):
+        cursor = self.db.cursor
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_rows (
+                item_type TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                gid TEXT NOT NULL UNIQUE,
+                modified_at TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                local_seq INTEGER NOT NULL,
+                PRIMARY KEY (item_type, item_id)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sync_rows_seq ON sync_rows (local_seq)")
+        # gid remotos que corresponden a una fila local con otro gid (el mismo centro dado de alta en dos equipos)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_aliases (
+                gid TEXT PRIMARY KEY,
+                local_gid TEXT NOT NULL
+            )
+        ''')
+        if self.db.get_meta('sync_origin') is None:
+            self.db.set_meta('sync_origin', uuid.uuid4().hex[:12])
+        if self.db.get_meta('sync_signature') != self._signature():
+            self._install()
+
+    def _columns(self, table):
+        if table not in self._column_cache:
+            self._column_cache[table] = [c[1] for c in self.db.cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+        return self._column_cache[table]
+
+    def _signature(self):
+        # Los triggers de modificación enumeran las columnas: si cambian, hay que reinstalarlos
+        schema = {table: self._columns(table) for table in SYNC_TABLES}
+        return hashlib.sha1(json.dumps(schema).encode('utf-8')).hexdigest()
+
+    def _install(self):
+        cursor = self.db.cursor
+        with self.db.transaction():
+            for (name,) in cursor.execute("SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE 'trg_sync_%'").fetchall():
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            for table in SYNC_TABLES:
+                changed = " OR ".join(f"OLD.{col} IS NOT NEW.{col}" for col in self._columns(table))
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_sync_{table}_ins AFTER INSERT ON {table} BEGIN
+                        INSERT INTO sync_rows (item_type, item_id, gid, modified_at, origin, deleted, local_seq)
+                        VALUES ('{table}', NEW.id, lower(hex(randomblob(16))), {_NOW}, {_ORIGIN}, 0, {_NEXT_SEQ});
+                    END''')
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_sync_{table}_upd AFTER UPDATE ON {table} WHEN {changed} BEGIN
+                        UPDATE sync_rows SET modified_at={_NOW}, origin={_ORIGIN}, local_seq={_NEXT_SEQ}
+                        WHERE item_type='{table}' AND item_id=NEW.id;
+                    END''')
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_sync_{table}_del AFTER DELETE ON {table} BEGIN
+                        UPDATE sync_rows SET deleted=1, modified_at={_NOW}, origin={_ORIGIN}, local_seq={_NEXT_SEQ}
+                        WHERE item_type='{table}' AND item_id=OLD.id;
+                    END''')
+            self._register_existing_rows()
+            self.db.set_meta('sync_signature', self._signature())
+
+    def _register_existing_rows(self):
+        """Asigna gid a las filas previas a la instalación.
+
+        El gid se deriva del contenido (centro, tabla, id y datos) para que dos copias
+        de una misma base de datos anterior a la sincronización reconozcan las mismas filas."""
+        cursor = self.db.cursor
+        clientes = dict(cursor.execute("SELECT id, cliente FROM inventarios").fetchall())
+        stamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        seq = cursor.execute("SELECT COALESCE(MAX(local_seq), 0) FROM sync_rows").fetchone()[0]
+        for table in SYNC_TABLES:
+            rows = cursor.execute(f"SELECT * FROM {table} WHERE id NOT IN (SELECT item_id FROM sync_rows WHERE item_type=?)",
+                                  (table,)).fetchall()
+            entries = []
+            for row in rows:
+                owner = clientes.get(row[1]) if table in EQUIPMENT_TABLES else ''
+                gid = hashlib.sha1(json.dumps([table, owner, list(row)], default=str).encode('utf-8')).hexdigest()[:32]
+                seq += 1
+                entries.append((table, row[0], gid, stamp, self.origin, seq))
+            cursor.executemany("INSERT OR IGNORE INTO sync_rows (item_type, item_id, gid, modified_at, origin, deleted, local_seq) "
+                               "VALUES (?, ?, ?, ?, ?, 0, ?)", entries)
+
+    # --- Exportación ---
+    def peers(self):
+        """Equipos conocidos: aquellos a los que ya se exportó y los orígenes de los cambios importados."""
+        exported, imported = set(), set()
+        for _ in self.db.each_centro():
+            exported.update(key.split(':', 1)[1] for (key,) in
+                            self.db.fetch_all("SELECT key FROM app_meta WHERE key LIKE 'sync_export_seq:%'"))
+            imported.update(origin for (origin,) in
+                            self.db.fetch_all("SELECT DISTINCT origin FROM sync_rows WHERE origin != ?", (self.origin,)))
+        return sorted(exported) + sorted(imported - exported)
+
+    def _gid_of(self, item_type, item_id):
+        row = self.db.fetch_one("SELECT gid FROM sync_rows WHERE item_type=? AND item_id=?", (item_type, item_id))
+        return row[0] if row else None
+
+    def export_changeset(self, path, peer='default', full=False):
+        """Escribe en `path` un fichero de cambios (zip) con lo modificado desde la última exportación a `peer`.
+
+        Con la base de datos dividida se recorren todos los centros: `local_seq` y la marca de
+        la última exportación son de cada fichero. Devuelve el número de filas exportadas."""
+        key = f'sync_export_seq:{peer}'
+        order = {table: i for i, table in enumerate(SYNC_TABLES)}
+        pending = {}
+        for centro in self.db.each_centro():
+            since = 0 if full else int(self.db.get_meta(key, 0))
+            changes = self.db.fetch_all(
+                "SELECT item_type, item_id, gid, modified_at, origin, deleted, local_seq FROM sync_rows WHERE local_seq > ? ORDER BY local_seq",
+                (since,))
+            last_seq = max((c[6] for c in changes), default=since)
+            changes.sort(key=lambda c: (order.get(c[0], len(order)), c[6]))
+            pending[centro] = (since, last_seq, changes)
+
+        if self.db.sharded:
+            seqs = {'centros': {str(centro): [since, last_seq] for centro, (since, last_seq, _) in pending.items()}}
+        else:
+            since, last_seq, _ = pending[None]
+            seqs = {'from_seq': since, 'to_seq': last_seq}
+        image_files = {}
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            with zf.open('changeset.jsonl', 'w') as out:
+                header = {'format': CHANGESET_FORMAT, 'origin': self.origin, **seqs,
+                          'created': datetime.now(timezone.utc).isoformat()}
+                out.write((json.dumps(header) + '\n').encode('utf-8'))
+                # Cada centro con sus filas: dentro de un fichero los padres van antes que los hijos
+                for centro in self.db.each_centro():
+                    for item_type, item_id, gid, modified_at, origin, deleted, _ in pending.get(centro, (0, 0, []))[2]:
+                        record = {'t': item_type, 'gid': gid, 'ts': modified_at, 'origin': origin, 'del': bool(deleted)}
+                        if not deleted:
+                            record['row'] = self._export_row(item_type, item_id, image_files)
+                            if record['row'] is None:
+                                continue
+                        out.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+            for name, full_path in image_files.items():
+                zf.write(full_path, name)
+
+        # Las marcas solo avanzan con el fichero completo
+        for centro in self.db.each_centro():
+            if centro in pending:
+                self.db.set_meta(key, str(pending[centro][1]))
+        return sum(len(changes) for _, _, changes in pending.values())
+
+    def _export_row(self, item_type, item_id, image_files):
+        row = self.db.fetch_one(f"SELECT * FROM {item_type} WHERE id=?", (item_id,))
+        if not row:
+            return None
+        data = dict(zip(self._columns(item_type), row))
+        data.pop('id')
+        for column, target in _REFERENCES.get(item_type, {}).items():
+            target_type = data[target[0]] if isinstance(target, tuple) else target
+            data[column] = self._gid_of(target_type, data[column])
+        if item_type == 'images':
+            full_path = os.path.join(self.data_dir, data['image_path'])
+            if os.path.exists(full_path):
+                image_files['images/' + os.path.basename(data['image_path'])] = full_path
+        return data
+
+    # --- Importación ---
+    def import_changeset(self, path):
+        """Aplica un fichero de cambios de otro equipo. Devuelve un resumen con los contadores."""
+        report = {'aplicados': 0, 'omitidos': 0, 'conflictos': 0, 'imagenes': 0}
+        with zipfile.ZipFile(path) as zf:
+            with zf.open('changeset.jsonl') as source:
+                header = json.loads(source.readline())
+                if header.get('format') != CHANGESET_FORMAT:
+                    raise ValueError("Formato de fichero de sincronización no soportado.")
+                if header.get('origin') == self.origin:
+                    return report
+                if self.db.sharded:
+                    self._import_sharded([json.loads(line) for line in source], zf, report)
+                    return report
+                with self.db.transaction():
+                    for line in source:
+                        self._apply_record(json.loads(line), zf, report)
+        return report
+
+    # --- Base de datos dividida por centros ---
+    def _import_sharded(self, records, zf, report):
+        """Reparte los registros entre los ficheros de sus centros y los aplica con una
+        transacción por centro, en el orden del fichero de cambios (los padres antes que los hijos)."""
+        located = self._locate({gid for record in records for gid in self._record_gids(record)})
+        groups = {}
+        for record in records:
+            if record['t'] == 'inventarios' and record['del']:
+                # Los centros se retiran con shards.py archivar, no desde otro equipo
+                report['omitidos'] += 1
+                continue
+            centro = located.get(record['gid'])
+            if centro is None and not record['del']:
+                refs = self._record_gids(record)[1:]
+                centro = located.get(refs[0]) if refs else self._catalog_centro(record['row'])
+            if centro is None:
+                report['omitidos'] += 1
+                continue
+            located[record['gid']] = centro
+            groups.setdefault(centro, []).append(record)
+        for centro, group in groups.items():
+            with self.db.on_centro(centro):
+                self.ensure_schema()
+                with self.db.transaction():
+                    for record in group:
+                        self._apply_record(record, zf, report)
+
+    def _record_gids(self, record):
+        """gid del registro seguido de los de las filas a las que apunta (el centro o el equipo)."""
+        gids = [record['gid']]
+        if not record['del']:
+            gids += [record['row'][column] for column in _REFERENCES.get(record['t'], {})
+                     if record['row'].get(column) is not None]
+        return gids
+
+    def _locate(self, gids):
+        """{gid: centro} de los gid que ya están en algún fichero de centro (una consulta por fichero)."""
+        located = {}
+        wanted = json.dumps(sorted(gids))
+        for centro in self.db.each_centro():
+            # Los ficheros abiertos por primera vez pueden no tener aún sync_aliases
+            self.ensure_schema()
+            for (gid,) in self.db.fetch_all(
+                    "SELECT gid FROM sync_rows WHERE gid IN (SELECT value FROM json_each(?)) "
+                    "UNION SELECT gid FROM sync_aliases WHERE gid IN (SELECT value FROM json_each(?))", (wanted, wanted)):
+                located[gid] = centro
+        return located
+
+    def _catalog_centro(self, row):
+        """Centro del catálogo con el nombre de `row`, dado de alta con sus datos si no existe.
+        Su fichero se crea al entrar en él; allí el gid remoto queda como alias (ver _merge_centro)."""
+        with self.db.on_catalog():
+            existing = self.db.fetch_one("SELECT id FROM inventarios WHERE cliente=?", (row.get('cliente'),))
+            if existing:
+                return existing[0]
+            catalog_columns = [c[1] for c in self.db.fetch_all("PRAGMA table_info(inventarios)")]
+            names = [c for c in catalog_columns if c in row and c != 'id']
+            cursor = self.db.execute_query(f"INSERT INTO inventarios ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                                           tuple(row[c] for c in names))
+            return cursor.lastrowid if cursor else None
+
+    def _canonical(self, gid):
+        row = self.db.fetch_one("SELECT local_gid FROM sync_aliases WHERE gid=?", (gid,))
+        return row[0] if row else gid
+
+    def _resolve(self, gid):
+        row = self.db.fetch_one("SELECT item_id FROM sync_rows WHERE gid=? AND deleted=0", (self._canonical(gid),))
+        return row[0] if row else None
+
+    def _merge_centro(self, record):
+        """Centro que ya existe aquí con el mismo nombre pero otro gid (dado de alta por separado
+        en los dos equipos): el gid remoto pasa a ser un alias del local. Devuelve True si se unió."""
+        row = self.db.fetch_one("SELECT s.gid FROM inventarios i JOIN sync_rows s ON s.item_type='inventarios' AND s.item_id=i.id "
+                                "WHERE i.cliente=? AND s.deleted=0", (record['row'].get('cliente'),))
+        if row is None:
+            return False
+        self.db.execute_query("INSERT OR REPLACE INTO sync_aliases (gid, local_gid) VALUES (?, ?)", (record['gid'], row[0]))
+        return True
+
+    def _apply_record(self, record, zf, report):
+        table = record['t']
+        if table not in SYNC_TABLES:
+            report['omitidos'] += 1
+            return
+        gid = self._canonical(record['gid'])
+        local = self.db.fetch_one("SELECT item_id, modified_at, origin, deleted FROM sync_rows WHERE gid=?", (gid,))
+        if local and (local[1], local[2]) >= (record['ts'], record['origin']):
+            report['omitidos'] += 1
+            return
+
+        try:
+            if record['del']:
+                if not local or local[3]:
+                    report['omitidos'] += 1
+                    return
+                self.db.execute_query(f"DELETE FROM {table} WHERE id=?", (local[0],))
+                item_id = local[0]
+            else:
+                data = self._localize_row(table, record['row'], zf, report)
+                if data is None:
+                    report['omitidos'] += 1
+                    return
+                columns = [c for c in self._columns(table) if c in data and c != 'id']
+                if local and not local[3]:
+                    item_id = local[0]
+                    assignments = ", ".join(f"{c}=?" for c in columns)
+                    self.db.execute_query(f"UPDATE {table} SET {assignments} WHERE id=?",
+                                          tuple(data[c] for c in columns) + (item_id,))
+                else:
+                    cursor = self.db.execute_query(
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                        tuple(data[c] for c in columns))
+                    item_id = cursor.lastrowid
+                    # El trigger ha creado la entrada con un gid nuevo: se sustituye por el remoto
+                    self.db.execute_query("DELETE FROM sync_rows WHERE gid=? AND NOT (item_type=? AND item_id=?)",
+                                          (gid, table, item_id))
+        except sqlite3.IntegrityError:
+            if table == 'inventarios' and not local and not record['del'] and self._merge_centro(record):
+                # El registro apunta ahora al centro local: se aplica como una modificación más
+                self._apply_record(record, zf, report)
+                return
+            report['conflictos'] += 1
+            return
+
+        self.db.execute_query("UPDATE sync_rows SET gid=?, modified_at=?, origin=? WHERE item_type=? AND item_id=?",
+                              (gid, record['ts'], record['origin'], table, item_id))
+        report['aplicados'] += 1
+
+    def _localize_row(self, table, row, zf, report):
+        """Traduce los gid de las referencias a ids locales y extrae la imagen asociada si la hay."""
+        data = dict(row)
+        for column, target in _REFERENCES.get(table, {}).items():
+            if data.get(column) is None:
+                continue
+            local_id = self._resolve(data[column])
+            if local_id is None:
+                return None
+            data[column] = local_id
+        if table == 'images':
+            name = os.path.basename(data['image_path'])
+            destination = os.path.join(self.data_dir, 'data', 'images', name)
+            data['image_path'] = f"data/images/{name}"
+            if not os.path.exists(destination) and f"images/{name}" in zf.NameToInfo:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                with zf.open(f"images/{name}") as src, open(destination, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                report['imagenes'] += 1
+        return data
@@ -0,0 +1,169 @@
+# synthetic_data.py
+"""Generador de datos sintéticos reproducibles para pruebas de rendimiento.
+
+Uso: python synthetic_data.py inventario.db --centros 20 --equipos 500 [--seed 1234] [--imagenes]
+"""
+import argparse
+import os
+import random
+import struct
+import zlib
+
+from database import DatabaseManager
+
+# Proporción aproximada de cada tipo de equipo en un centro real
+DEVICE_MIX = {
+    'pcs': 0.55, 'proyectores': 0.08, 'impresoras': 0.08, 'servidores': 0.02, 'red': 0.07,
+    'cctv_recorders': 0.01, 'cctv_cameras': 0.12, 'accesos': 0.03, 'software': 0.02, 'credenciales': 0.02,
+}
+IMAGES_PER_DEVICE = 0.6
+CONNECTIONS_PER_DEVICE = 0.5
+
+_PLACAS = ['ASUS H110M', 'Gigabyte B450', 'MSI B560M', 'Dell 0K240Y', 'HP 8054', 'Lenovo 3102']
+_RAM = ['2GB', '4GB', '4 GB DDR3', '8GB', '8 GB', '16GB', '16GB DDR4', '32GB']
+_CORE = ['i3 4ª gen', 'i5 6ª gen', 'i5-8400', 'i7-7700', 'i5 10ª gen', 'i7-12700', 'Ryzen 5 3600', 'Celeron J4105', 'Pentium G4560']
+_DISCO = ['256 SSD', '500 HDD', '512GB SSD', '1TB HDD', '1TB SSD', '128 SSD', '2TB HDD']
+_SO = ['Windows 10 Pro', 'Windows 11 Pro', 'Windows 7', 'Windows 8.1', 'Windows 10 Home', 'Ubuntu 22.04', 'Windows XP']
+_FUENTE = ['500W', '450W', '300W', '650W', '']
+_ANTIVIRUS = ['ESET', 'Windows Defender', 'Kaspersky', 'Panda', '', '']
+_UBICACIONES = ['Aula 1', 'Aula 2', 'Aula 3', 'Aula 4', 'Aula 5', 'Secretaría', 'Dirección', 'Sala de Profesores',
+                'Biblioteca', 'Conserjería', 'Laboratorio', 'Rack', 'Pasillo Planta 1', 'Pasillo Planta 2', 'Entrada']
+_MODELOS_PROY = ['Epson EB-X41', 'BenQ MX550', 'Promethean AP7', 'Smart MX275']
+_MODELOS_IMP = ['HP LaserJet M404', 'Brother HL-L2350', 'Canon i-SENSYS', 'Kyocera ECOSYS M2040', 'Ricoh MP 2555']
+_MODELOS_SRV = ['Dell PowerEdge T140', 'HP ProLiant ML30', 'Synology DS920+']
+_MODELOS_RED = [('Switch', 'TP-Link TL-SG1024'), ('Switch', 'HP 1920-24G'), ('Router', 'Mikrotik hEX'),
+                ('WiFi', 'Ubiquiti UAP-AC-LR'), ('NAS', 'QNAP TS-231')]
+_MARCAS_CCTV = [('Hikvision', 'DS-7608NI', 'DS-2CD1043'), ('Dahua', 'NVR4108', 'IPC-HFW1230'), ('Uniview', 'NVR301', 'IPC2122')]
+_SOFTWARE = [('Office 2019', 'Volumen'), ('Office 365', 'Suscripción'), ('AutoCAD', 'Educativa'), ('Adobe Reader', 'Gratuita')]
+
+
+def _png_bytes(width, height, rgb):
+    """PNG RGB de color liso, sin dependencias externas."""
+    raw = b''.join(b'\x00' + bytes(rgb) * width for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 6)) + chunk(b'IEND', b''))
+
+
+def _row(table, rng, n):
+    ubicacion = rng.choice(_UBICACIONES)
+    if table == 'pcs':
+        return (f"PC-{n:04d}", rng.choice(_PLACAS), rng.choice(_RAM), rng.choice(_CORE), rng.choice(_DISCO),
+                rng.choice(_SO), rng.choice(_FUENTE), rng.choice(_ANTIVIRUS), ubicacion, '')
+    if table == 'proyectores':
+        return (f"PROY-{n:03d}", rng.choice(_MODELOS_PROY), rng.choice(['Sí', 'No']), ubicacion, '')
+    if table == 'impresoras':
+        return (f"IMP-{n:03d}", rng.choice(_MODELOS_IMP), rng.choice(['USB', 'Red', 'WiFi']), ubicacion, '')
+    if table == 'servidores':
+        return (f"SRV-{n:02d}", rng.choice(_MODELOS_SRV), rng.choice(['Ficheros', 'Dominio', 'Copias']), 'Rack', '')
+    if table == 'red':
+        tipo, modelo = rng.choice(_MODELOS_RED)
+        return (f"NET-{n:03d}", tipo, modelo, rng.choice(['Rack', ubicacion]), '')
+    if table == 'cctv_recorders':
+        marca, modelo, _ = rng.choice(_MARCAS_CCTV)
+        return (marca, modelo, rng.choice(['8', '16', '32']), 'Rack', '')
+    if table == 'cctv_cameras':
+        marca, _, modelo = rng.choice(_MARCAS_CCTV)
+        return (marca, modelo, rng.choice(['2.8mm', '4mm', 'Varifocal']), ubicacion, '')
+    if table == 'accesos':
+        return (rng.choice(['ZKTeco', 'Suprema']), rng.choice(['F18', 'BioEntry W2']), rng.choice(['Huella', 'Tarjeta']), ubicacion, '')
+    if table == 'software':
+        return rng.choice(_SOFTWARE)
+    return (rng.choice(['Router', 'NVR', 'WiFi', 'Servidor']), 'admin', rng.choice(['', '1234', 'S3cr3t!']), '')
+
+
+_COLUMNS = {
+    'pcs': 'codigo, placa, ram, core, disco, so, fuente, antivirus, ubicacion_equipo, observaciones',
+    'proyectores': 'codigo, modelo, tactil, ubicacion_equipo, observaciones',
+    'impresoras': 'codigo, modelo, conexion, ubicacion_equipo, observaciones',
+    'servidores': 'codigo, modelo, uso, ubicacion_equipo, observaciones',
+    'red': 'codigo, tipo, modelo, ubicacion_equipo, observaciones',
+    'cctv_recorders': 'marca, modelo, canales, ubicacion, observaciones',
+    'cctv_cameras': 'marca, modelo, tipo_lente, ubicacion, observaciones',
+    'accesos': 'marca, modelo, tipo, ubicacion, observaciones',
+    'software': 'nombre, licencia',
+    'credenciales': 'elemento, usuario, clave, notas',
+}
+
+
+def install_subsystems(db, data_dir):
+    """Instala las tablas auxiliares y triggers que crea la aplicación al abrir la ventana principal."""
+    from fleet_analytics import FleetAnalytics
+    from change_log import ChangeLog
+    from sync_engine import SyncEngine
+    FleetAnalytics(db)
+    ChangeLog(db)
+    SyncEngine(db, data_dir)
+
+
+def generate(db_path, centros=10, equipos=200, seed=1234, data_dir=None, image_files=False):
+    """Llena `db_path` con `centros` x `equipos` equipos, imágenes y conexiones. Devuelve los ids de los centros."""
+    rng = random.Random(seed)
+    data_dir = data_dir or os.path.dirname(os.path.abspath(db_path))
+    image_dir = os.path.join(data_dir, 'data', 'images')
+    if image_files:
+        os.makedirs(image_dir, exist_ok=True)
+
+    db = DatabaseManager(db_path)
+    inventory_ids = []
+    with db.transaction():
+        for c in range(centros):
+            cursor = db.execute_query(
+                "INSERT INTO inventarios (cliente, ubicacion, responsable, fecha, estructura_info, modo_trabajo) VALUES (?, ?, ?, ?, ?, ?)",
+                (f"Centro {c + 1:04d}", f"Calle {rng.randint(1, 200)}", rng.choice(['Ana', 'Luis', 'Marta', 'Jorge']),
+                 f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025",
+                 "Dominio con servidor de ficheros.\nRed cableada en todas las aulas.", "Presencial"))
+            inventory_id = cursor.lastrowid
+            inventory_ids.append(inventory_id)
+
+            created = {}
+            for table, ratio in DEVICE_MIX.items():
+                count = max(1, round(equipos * ratio))
+                columns = _COLUMNS[table]
+                placeholders = ", ".join("?" * (columns.count(',') + 2))
+                db.cursor.executemany(f"INSERT INTO {table} (inventario_id, {columns}) VALUES ({placeholders})",
+                                      [(inventory_id,) + _row(table, rng, n + 1) for n in range(count)])
+                first = db.cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table} WHERE inventario_id=?", (inventory_id,)).fetchone()
+                created[table] = list(range(first[0], first[1] + 1))
+
+            images = []
+            for table in ('pcs', 'impresoras', 'servidores', 'red', 'cctv_cameras', 'cctv_recorders'):
+                for item_id in created[table]:
+                    for k in range(int(IMAGES_PER_DEVICE) + (rng.random() < IMAGES_PER_DEVICE % 1)):
+                        name = f"{table}_{item_id}_synthetic_{k}.png"
+                        images.append((table, item_id, f"data/images/{name}"))
+                        if image_files:
+                            with open(os.path.join(image_dir, name), 'wb') as f:
+                                f.write(_png_bytes(64, 48, (rng.randrange(256), rng.randrange(256), rng.randrange(256))))
+            db.cursor.executemany("INSERT INTO images (item_type, item_id, image_path) VALUES (?, ?, ?)", images)
+
+            # Conexiones: equipos a switches de red y cámaras a su grabador
+            connections = []
+            switches = created['red']
+            for table in ('pcs', 'impresoras', 'proyectores', 'servidores'):
+                for item_id in created[table]:
+                    if rng.random() < CONNECTIONS_PER_DEVICE:
+                        connections.append(('red', rng.choice(switches), table, item_id, 'Puerto %d' % rng.randint(1, 24)))
+            for camera_id in created['cctv_cameras']:
+                if rng.random() < 0.9:
+                    connections.append(('cctv_recorders', rng.choice(created['cctv_recorders']), 'cctv_cameras', camera_id, ''))
+            db.cursor.executemany("INSERT INTO connections (parent_item_type, parent_item_id, child_item_type, child_item_id, notes) "
+                                  "VALUES (?, ?, ?, ?, ?)", connections)
+
+    install_subsystems(db, data_dir)
+    db.close()
+    return inventory_ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un inventario sintético para pruebas de rendimiento.")
+    parser.add_argument('db_path')
+    parser.add_argument('--centros', type=int, default=10)
+    parser.add_argument('--equipos', type=int, default=200, help="equipos por centro")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--imagenes', action='store_true', help="crear también los ficheros de imagen")
+    args = parser.parse_args()
+    ids = generate(args.db_path, args.centros, args.equipos, args.seed, image_files=args.imagenes)
+    print(f"Generados {len(ids)} centros con ~{args.equipos} equipos cada uno en {args.db_path}")
@@ -0,0 +1,44 @@
+# test_sync_engine.py
+"""Pruebas de sincronización entre dos copias de inventario.db (python -m pytest)."""
+from database import DatabaseManager
+from sync_engine import SyncEngine
+
+
+def _laptop(tmp_path, name, codigo):
+    """Base de datos de un técnico que ha dado de alta "Colegio X" con un PC."""
+    db = DatabaseManager(str(tmp_path / f"{name}.db"))
+    sync = SyncEngine(db, str(tmp_path))
+    cursor = db.execute_query("INSERT INTO inventarios (cliente) VALUES ('Colegio X')")
+    db.execute_query("INSERT INTO pcs (inventario_id, codigo) VALUES (?, ?)", (cursor.lastrowid, codigo))
+    return db, sync
+
+
+def _codigos(db):
+    return sorted(row[0] for row in db.fetch_all(
+        "SELECT p.codigo FROM pcs p JOIN inventarios i ON i.id = p.inventario_id WHERE i.cliente = 'Colegio X'"))
+
+
+def test_mismo_centro_creado_en_dos_equipos(tmp_path):
+    db_a, sync_a = _laptop(tmp_path, 'a', 'PC-A')
+    db_b, sync_b = _laptop(tmp_path, 'b', 'PC-B')
+    try:
+        sync_a.export_changeset(str(tmp_path / 'a.invsync'), peer='b')
+        report = sync_b.import_changeset(str(tmp_path / 'a.invsync'))
+        assert report['conflictos'] == 0
+        assert _codigos(db_b) == ['PC-A', 'PC-B']
+        assert db_b.fetch_one("SELECT COUNT(*) FROM inventarios")[0] == 1
+
+        # De vuelta: el equipo A recibe el PC de B sobre su propio centro
+        sync_b.export_changeset(str(tmp_path / 'b.invsync'), peer='a')
+        report = sync_a.import_changeset(str(tmp_path / 'b.invsync'))
+        assert report['conflictos'] == 0
+        assert _codigos(db_a) == ['PC-A', 'PC-B']
+
+        # Los cambios posteriores de A en el centro llegan a B a través del alias
+        db_a.execute_query("UPDATE inventarios SET responsable = 'Ana' WHERE cliente = 'Colegio X'")
+        sync_a.export_changeset(str(tmp_path / 'a2.invsync'), peer='b')
+        sync_b.import_changeset(str(tmp_path / 'a2.invsync'))
+        assert db_b.fetch_one("SELECT responsable FROM inventarios WHERE cliente = 'Colegio X'")[0] == 'Ana'
+    finally:
+        db_a.close()
+        db_b.close()
@@ -0,0 +1,392 @@
+# topology_view.py
+import math
+from collections import defaultdict
+
+from PyQt6.QtCore import Qt, QRectF, QLineF, pyqtSignal
+from PyQt6.QtGui import QColor, QPen, QBrush, QPainter, QFont, QFontMetrics
+from PyQt6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsItem, QGraphicsLineItem, QGraphicsRectItem, QGraphicsSimpleTextItem
+
+from database import EQUIPMENT_TABLES, LABEL_TABLES, PIN_COLORS
+
+# Equipos del diagrama, del núcleo de la red hacia los extremos: orden dentro de cada grupo
+TOPOLOGY_TABLES = ['red', 'servidores', 'cctv_recorders', 'accesos', 'cctv_cameras', 'pcs', 'impresoras', 'proyectores']
+_RANK = {table: rank for rank, table in enumerate(TOPOLOGY_TABLES)}
+
+# Medidas del diagrama (unidades de escena)
+NODE_WIDTH, NODE_HEIGHT = 130, 34
+NODE_GAP = 14
+GROUP_PADDING = 16
+GROUP_TITLE = 26
+GROUP_GAP = 60
+NO_LOCATION = 'Sin ubicación'
+# Por debajo de esta escala los nodos se dibujan sin texto
+LABEL_MIN_SCALE = 0.35
+
+
+# --- Grafo y distribución (sin Qt: se ejecuta en el hilo de base de datos) ---
+def load_graph(db, inventory_id):
+    """Nodos {(tabla, id): (etiqueta, grupo)} y enlaces [(nodo, nodo)] del centro.
+    El grupo es la ubicación del equipo."""
+    nodes = {}
+    for table in TOPOLOGY_TABLES:
+        rows = db.fetch_all(f"SELECT t.id, {LABEL_TABLES[table]}, TRIM(COALESCE(t.{EQUIPMENT_TABLES[table]}, '')) "
+                            f"FROM {table} t WHERE t.inventario_id = ?", (inventory_id,))
+        for item_id, label, location in rows:
+            nodes[(table, item_id)] = (label or f"ID:{item_id}", location or NO_LOCATION)
+    # Conexiones cuyo padre es del centro (búsqueda por índice en cada tabla); el hijo se comprueba aquí
+    parts = [f"SELECT c.parent_item_type, c.parent_item_id, c.child_item_type, c.child_item_id FROM connections c "
+             f"JOIN {table} t ON t.id = c.parent_item_id WHERE c.parent_item_type = '{table}' AND t.inventario_id = ?"
+             for table in TOPOLOGY_TABLES]
+    edges = []
+    for parent_type, parent_id, child_type, child_id in db.fetch_all(" UNION ALL ".join(parts), (inventory_id,) * len(parts)):
+        parent, child = (parent_type, parent_id), (child_type, child_id)
+        if child in nodes and parent != child:
+            edges.append((parent, child))
+    return nodes, edges
+
+
+def load_cached_layout(db, inventory_id):
+    positions = {(item_type, item_id): (group, x, y) for item_type, item_id, group, x, y in db.fetch_all(
+        "SELECT item_type, item_id, grupo, x, y FROM topology_positions WHERE inventario_id = ?", (inventory_id,))}
+    groups = {group: (x, y, width, height) for group, x, y, width, height in db.fetch_all(
+        "SELECT grupo, x, y, ancho, alto FROM topology_groups WHERE inventario_id = ?", (inventory_id,))}
+    return positions, groups
+
+
+class TopologyLayout:
+    """Resultado de `compute_layout`: el grafo con la posición (centro) de cada nodo y el
+    rectángulo de cada grupo, más los cambios respecto a lo guardado para persistirlos."""
+
+    def __init__(self, inventory_id, nodes, edges):
+        self.inventory_id = inventory_id
+        self.nodes = nodes
+        self.edges = edges
+        self.positions = {}         # nodo -> (x, y)
+        self.groups = {}            # grupo -> (x, y, ancho, alto)
+        self.changed_positions = {}
+        self.changed_groups = {}
+        self.removed_nodes = []
+        self.removed_groups = []
+
+    @property
+    def changed(self):
+        return bool(self.changed_positions or self.changed_groups or self.removed_nodes or self.removed_groups)
+
+
+def _pack_group(members, nodes, neighbours):
+    """Coloca los nodos de un grupo en filas: primero los de núcleo (red, servidores...) y, dentro de
+    cada tipo, junto a los de su equipo superior. Devuelve (ancho, alto, {nodo: (dx, dy)})."""
+    def upstream(node):
+        parents = [other for other in neighbours.get(node, ()) if _RANK[other[0]] < _RANK[node[0]]]
+        return min((_RANK[p[0]], nodes[p][0], p[1]) for p in parents) if parents else (len(_RANK), '', 0)
+
+    ordered = sorted(members, key=lambda node: (_RANK[node[0]], upstream(node), nodes[node][0], node[1]))
+    columns = max(1, min(len(ordered), math.ceil(math.sqrt(len(ordered) * 2))))
+    rows = math.ceil(len(ordered) / columns)
+    width = 2 * GROUP_PADDING + columns * NODE_WIDTH + (columns - 1) * NODE_GAP
+    height = GROUP_TITLE + GROUP_PADDING + rows * NODE_HEIGHT + (rows - 1) * NODE_GAP
+    offsets = {}
+    for index, node in enumerate(ordered):
+        row, col = divmod(index, columns)
+        offsets[node] = (GROUP_PADDING + col * (NODE_WIDTH + NODE_GAP) + NODE_WIDTH / 2,
+                         GROUP_TITLE + row * (NODE_HEIGHT + NODE_GAP) + NODE_HEIGHT / 2)
+    return width, height, offsets
+
+
+def compute_layout(db, inventory_id, cached=None):
+    """Distribución del diagrama del centro partiendo de la guardada.
+
+    Solo se recolocan los grupos con altas, bajas o equipos que han cambiado de ubicación;
+    si un grupo ya no cabe en su rectángulo, o es nuevo, se añade debajo de los existentes.
+    Sin nada guardado se distribuye todo. `cached` = (posiciones, grupos) o None para leerlos."""
+    nodes, edges = load_graph(db, inventory_id)
+    positions, boxes = cached if cached is not None else load_cached_layout(db, inventory_id)
+    layout = TopologyLayout(inventory_id, nodes, edges)
+
+    members = defaultdict(list)
+    for node, (_, group) in nodes.items():
+        members[group].append(node)
+    dirty = set()
+    for node, (_, group) in nodes.items():
+        if node not in positions or positions[node][0] != group:
+            dirty.add(group)
+            if node in positions:
+                dirty.add(positions[node][0])
+    for node, (group, _, _) in positions.items():
+        if node not in nodes:
+            layout.removed_nodes.append(node)
+            dirty.add(group)
+    layout.removed_groups = [group for group in boxes if group not in members]
+    # Un grupo sin rectángulo guardado (p. ej. distribución interrumpida) también se recoloca
+    dirty.update(group for group in members if group not in boxes)
+
+    neighbours = defaultdict(list)
+    for a, b in edges:
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+
+    kept = {group: box for group, box in boxes.items() if group in members}
+    unplaced = []
+    for group in sorted(members):
+        if group not in dirty:
+            layout.groups[group] = kept[group]
+            for node in members[group]:
+                layout.positions[node] = positions[node][1:]
+            continue
+        width, height, offsets = _pack_group(members[group], nodes, neighbours)
+        box = kept.get(group)
+        if box is not None and width <= box[2] and height <= box[3]:
+            _place_group(layout, group, (box[0], box[1], width, height), offsets)
+        else:
+            kept.pop(group, None)
+            unplaced.append((group, width, height, offsets))
+
+    # Estanterías bajo lo ya colocado, con un ancho de fila acorde al tamaño total del diagrama
+    area = sum(width * height for _, width, height, _ in unplaced) + sum(box[2] * box[3] for box in kept.values())
+    row_width = max(1600, math.sqrt(area) * 1.4)
+    x = 0
+    y = max((box[1] + box[3] for box in kept.values()), default=-GROUP_GAP) + GROUP_GAP
+    row_height = 0
+    for group, width, height, offsets in unplaced:
+        if x > 0 and x + width > row_width:
+            x, y, row_height = 0, y + row_height + GROUP_GAP, 0
+        _place_group(layout, group, (x, y, width, height), offsets)
+        x += width + GROUP_GAP
+        row_height = max(row_height, height)
+    return layout
+
+
+def _place_group(layout, group, box, offsets):
+    layout.groups[group] = layout.changed_groups[group] = box
+    for node, (dx, dy) in offsets.items():
+        layout.positions[node] = layout.changed_positions[node] = (box[0] + dx, box[1] + dy)
+
+
+def diagram_data(layout):
+    """El diagrama en el formato del informe PDF (ver pdf_generator.TopologyDiagram), o None sin conexiones."""
+    if not layout.edges:
+        return None
+    positions = layout.positions
+    return {
+        'nodos': [(x, y, layout.nodes[node][0], node[0]) for node, (x, y) in positions.items()],
+        'enlaces': [positions[a] + positions[b] for a, b in layout.edges],
+        'grupos': [(x, y, width, height, group) for group, (x, y, width, height) in layout.groups.items()],
+    }
+
+
+# --- Persistencia ---
+class TopologyStore:
+    """Posiciones del diagrama de conexiones de cada centro (`topology_positions`) y el
+    rectángulo de cada grupo (`topology_groups`), para abrirlo sin recalcular."""
+
+    def __init__(self, db):
+        self.db = db
+        self.ensure_schema()
+
+    def ensure_schema(self):
+        cursor = self.db.cursor
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS topology_positions (
+                item_type TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                inventario_id INTEGER NOT NULL,
+                grupo TEXT NOT NULL,
+                x REAL NOT NULL,
+                y REAL NOT NULL,
+                PRIMARY KEY (item_type, item_id)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_topology_positions_inv ON topology_positions (inventario_id)")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS topology_groups (
+                inventario_id INTEGER NOT NULL,
+                grupo TEXT NOT NULL,
+                x REAL NOT NULL,
+                y REAL NOT NULL,
+                ancho REAL NOT NULL,
+                alto REAL NOT NULL,
+                PRIMARY KEY (inventario_id, grupo)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_topology_inventarios_del AFTER DELETE ON inventarios BEGIN
+                DELETE FROM topology_positions WHERE inventario_id = OLD.id;
+                DELETE FROM topology_groups WHERE inventario_id = OLD.id;
+            END''')
+        self.db.conn.commit()
+
+    def save(self, layout):
+        """Guarda los cambios de una distribución calculada por `compute_layout`."""
+        if not layout.changed:
+            return
+        inventory_id = layout.inventory_id
+        with self.db.transaction():
+            for item_type, item_id in layout.removed_nodes:
+                self.db.execute_query("DELETE FROM topology_positions WHERE item_type = ? AND item_id = ?", (item_type, item_id))
+            for group in layout.removed_groups:
+                self.db.execute_query("DELETE FROM topology_groups WHERE inventario_id = ? AND grupo = ?", (inventory_id, group))
+            for group, (x, y, width, height) in layout.changed_groups.items():
+                self.db.execute_query(
+                    "INSERT INTO topology_groups (inventario_id, grupo, x, y, ancho, alto) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(inventario_id, grupo) DO UPDATE SET x=excluded.x, y=excluded.y, ancho=excluded.ancho, alto=excluded.alto",
+                    (inventory_id, group, x, y, width, height))
+            for (item_type, item_id), (x, y) in layout.changed_positions.items():
+                self.db.execute_query(
+                    "INSERT INTO topology_positions (item_type, item_id, inventario_id, grupo, x, y) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(item_type, item_id) DO UPDATE SET inventario_id=excluded.inventario_id, grupo=excluded.grupo, "
+                    "x=excluded.x, y=excluded.y",
+                    (item_type, item_id, inventory_id, layout.nodes[(item_type, item_id)][1], x, y))
+
+    def move_node(self, item_type, item_id, x, y):
+        """Posición elegida a mano; se conserva hasta que su grupo se vuelva a distribuir."""
+        self.db.execute_query("UPDATE topology_positions SET x = ?, y = ? WHERE item_type = ? AND item_id = ?",
+                              (x, y, item_type, int(item_id)))
+
+    def reset(self, inventory_id):
+        with self.db.transaction():
+            self.db.execute_query("DELETE FROM topology_positions WHERE inventario_id = ?", (inventory_id,))
+            self.db.execute_query("DELETE FROM topology_groups WHERE inventario_id = ?", (inventory_id,))
+
+
+# --- Vista ---
+class NodeItem(QGraphicsItem):
+    """Un equipo: rectángulo del color de su tipo con la etiqueta. Sin texto al alejarse."""
+
+    _font = None
+
+    def __init__(self, node, label):
+        super().__init__()
+        self.node = node
+        self.edges = []
+        self.color = QColor(PIN_COLORS.get(node[0], '#333333'))
+        if NodeItem._font is None:
+            NodeItem._font = QFont()
+            NodeItem._font.setPointSize(8)
+        self.label = QFontMetrics(NodeItem._font).elidedText(label, Qt.TextElideMode.ElideRight, NODE_WIDTH - 12)
+        self.setFlags(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable | QGraphicsItem.GraphicsItemFlag.ItemIsMovable
+                      | QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
+        self.setToolTip(label)
+
+    def boundingRect(self):
+        return QRectF(-NODE_WIDTH / 2 - 1, -NODE_HEIGHT / 2 - 1, NODE_WIDTH + 2, NODE_HEIGHT + 2)
+
+    def paint(self, painter, option, widget=None):
+        rect = QRectF(-NODE_WIDTH / 2, -NODE_HEIGHT / 2, NODE_WIDTH, NODE_HEIGHT)
+        selected = self.isSelected()
+        painter.setPen(QPen(QColor('#000000') if selected else self.color.darker(140), 2 if selected else 1))
+        painter.setBrush(QBrush(self.color.lighter(170)))
+        if option.levelOfDetailFromTransform(painter.worldTransform()) < LABEL_MIN_SCALE:
+            painter.drawRect(rect)
+            return
+        painter.drawRoundedRect(rect, 6, 6)
+        painter.setPen(QColor('#000000'))
+        painter.setFont(NodeItem._font)
+        painter.drawText(rect.adjusted(6, 0, -6, 0), Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, self.label)
+
+    def itemChange(self, change, value):
+        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
+            for edge in self.edges:
+                edge.adjust()
+        return super().itemChange(change, value)
+
+    def mouseReleaseEvent(self, event):
+        moved = event.buttonDownScenePos(Qt.MouseButton.LeftButton) != event.scenePos()
+        super().mouseReleaseEvent(event)
+        if moved and self.scene() is not None:
+            for view in self.scene().views():
+                view.node_moved.emit(self.node[0], self.node[1], self.pos().x(), self.pos().y())
+
+
+class EdgeItem(QGraphicsLineItem):
+    def __init__(self, source, target, pen):
+        super().__init__()
+        self.source, self.target = source, target
+        self.setPen(pen)
+        self.setZValue(-1)
+        source.edges.append(self)
+        target.edges.append(self)
+        self.adjust()
+
+    def adjust(self):
+        self.setLine(QLineF(self.source.pos(), self.target.pos()))
+
+
+class TopologyView(QGraphicsView):
+    """Diagrama de conexiones sobre QGraphicsScene con índice BSP: al desplazarse o hacer zoom
+    solo se pintan los elementos visibles, con miles de nodos."""
+
+    # item_id como object: con un fichero por centro los ids pasan de 32 bits (ver shards.ID_BLOCK_BITS)
+    node_activated = pyqtSignal(str, object)
+    node_moved = pyqtSignal(str, object, float, float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.nodes = {}
+        self.setRenderHint(QPainter.RenderHint.Antialiasing)
+        self.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+        self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.SmartViewportUpdate)
+        self.setOptimizationFlag(QGraphicsView.OptimizationFlag.DontAdjustForAntialiasing, True)
+        self.setBackgroundBrush(QColor('#fafafa'))
+
+    def set_layout(self, layout):
+        scene = self.scene()
+        scene.clear()
+        self.nodes = {}
+        # Sin índice mientras se añaden miles de elementos; el árbol BSP se construye una vez al final
+        scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex)
+        title_font = QFont()
+        title_font.setBold(True)
+        for group, (x, y, width, height) in layout.groups.items():
+            box = QGraphicsRectItem(x, y, width, height)
+            box.setPen(QPen(QColor('#b0b0b0'), 1, Qt.PenStyle.DashLine))
+            box.setBrush(QBrush(QColor('#ffffff')))
+            box.setZValue(-2)
+            scene.addItem(box)
+            title = QGraphicsSimpleTextItem(group, box)
+            title.setFont(title_font)
+            title.setPos(x + GROUP_PADDING, y + 5)
+        for node, (x, y) in layout.positions.items():
+            item = NodeItem(node, layout.nodes[node][0])
+            item.setPos(x, y)
+            scene.addItem(item)
+            self.nodes[node] = item
+        pen = QPen(QColor('#808080'), 1)
+        pen.setCosmetic(True)
+        for a, b in layout.edges:
+            if a in self.nodes and b in self.nodes:
+                scene.addItem(EdgeItem(self.nodes[a], self.nodes[b], pen))
+        scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.BspTreeIndex)
+        scene.setSceneRect(scene.itemsBoundingRect().adjusted(-GROUP_GAP, -GROUP_GAP, GROUP_GAP, GROUP_GAP))
+
+    def fit(self):
+        self.fitInView(self.scene().sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
+
+    def wheelEvent(self, event):
+        factor = 1.25 if event.angleDelta().y() > 0 else 0.8
+        scale = self.transform().m11() * factor
+        if 0.02 <= scale <= 4:
+            self.scale(factor, factor)
+
+    def mouseDoubleClickEvent(self, event):
+        item = self.itemAt(event.position().toPoint())
+        if isinstance(item, NodeItem):
+            self.node_activated.emit(item.node[0], item.node[1])
+            return
+        super().mouseDoubleClickEvent(event)
+
+    def drawForeground(self, painter, rect):
+        # Leyenda de colores fija en la esquina superior izquierda de la ventana
+        painter.save()
+        painter.resetTransform()
+        painter.setFont(QFont())
+        y = 10
+        for table in TOPOLOGY_TABLES:
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor(PIN_COLORS[table]))
+            painter.drawRect(10, y, 12, 12)
+            painter.setPen(QColor('#000000'))
+            painter.drawText(28, y + 11, table)
+            y += 18
+        painter.restore()
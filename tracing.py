@@ -0,0 +1,294 @@
+# tracing.py
+"""Trazas de latencia de la interfaz (opcional).
+
+Se activa con INVENTARIO_TRACE=1 o con el argumento --trace:
+  - Cada slot conectado en MainWindow genera un tramo (span) con su duración.
+  - Un hilo vigilante detecta bloqueos del bucle de eventos por encima de
+    INVENTARIO_STALL_MS (200 ms por defecto) y guarda la pila Python del hilo de la GUI.
+  - Todo se escribe en logs/trace.json (formato Chrome trace, se abre en
+    chrome://tracing o ui.perfetto.dev), rotando a trace.1.json, trace.2.json...
+
+Resumen de los peores puntos de un fichero recogido de un usuario:
+    python tracing.py logs/trace.json [logs/trace.1.json ...]
+"""
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+MAX_FILE_BYTES = 5 * 1024 * 1024
+MAX_FILES = 5
+DEFAULT_STALL_MS = 200
+HEARTBEAT_MS = 20
+MAX_STACKS_PER_STALL = 5
+
+
+class Tracer:
+    """Escritor de eventos en formato Chrome trace (array JSON sin cerrar) con rotación por tamaño."""
+
+    def __init__(self, log_dir, max_bytes=MAX_FILE_BYTES, max_files=MAX_FILES):
+        os.makedirs(log_dir, exist_ok=True)
+        self.path = os.path.join(log_dir, 'trace.json')
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.pid = os.getpid()
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._file = None
+        self._open()
+        self.metadata('process_name', {'name': 'inventario'})
+
+    def _open(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if self._file.tell() == 0:
+            self._file.write('[\n')
+
+    def _rotate(self):
+        self._file.close()
+        for n in range(self.max_files - 1, 0, -1):
+            older = f"{self.path[:-5]}.{n}.json"
+            newer = self.path if n == 1 else f"{self.path[:-5]}.{n - 1}.json"
+            if os.path.exists(newer):
+                os.replace(newer, older)
+        self._open()
+
+    def now_us(self):
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def emit(self, event, flush=False):
+        event.setdefault('pid', self.pid)
+        event.setdefault('tid', threading.get_ident())
+        line = json.dumps(event, ensure_ascii=False, default=str) + ',\n'
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            if flush:
+                self._file.flush()
+            if self._file.tell() > self.max_bytes:
+                self._rotate()
+
+    def metadata(self, name, args):
+        self.emit({'name': name, 'ph': 'M', 'args': args})
+
+    def complete(self, name, start_us, dur_us, cat='ui', args=None, tid=None):
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': round(start_us, 1), 'dur': round(dur_us, 1)}
+        if args:
+            event['args'] = args
+        if tid is not None:
+            event['tid'] = tid
+        self.emit(event)
+
+    def instant(self, name, cat='ui', args=None, tid=None, flush=False):
+        event = {'name': name, 'cat': cat, 'ph': 'i', 's': 't', 'ts': round(self.now_us(), 1), 'args': args or {}}
+        if tid is not None:
+            event['tid'] = tid
+        self.emit(event, flush)
+
+    def span(self, name, cat='ui'):
+        return _Span(self, name, cat)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class _Span:
+    """Tramo con duración; `args` se puede completar dentro del bloque (p. ej. con el nº de consultas)."""
+
+    def __init__(self, tracer, name, cat):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = {}
+
+    def __enter__(self):
+        self.start = self.tracer.now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args['error'] = repr(exc)
+        self.tracer.complete(self.name, self.start, self.tracer.now_us() - self.start, self.cat, self.args)
+        return False
+
+
+class _NoSpan:
+    """Tramo vacío usado cuando las trazas están desactivadas."""
+    args = {}
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+
+class StallWatchdog(threading.Thread):
+    """Vigila el latido que el hilo de la GUI emite con un QTimer.
+
+    Si el latido se retrasa más de `threshold_ms`, captura la pila del hilo de la
+    GUI (varias muestras si el bloqueo se prolonga) y la escribe en la traza de
+    inmediato, para que quede registrada aunque la aplicación no se recupere."""
+
+    def __init__(self, tracer, threshold_ms=DEFAULT_STALL_MS):
+        super().__init__(name='StallWatchdog', daemon=True)
+        self.tracer = tracer
+        self.threshold = threshold_ms / 1000
+        self.gui_thread_id = threading.get_ident()
+        self.last_beat = time.perf_counter()
+        # Lo llena el hilo vigilante y lo vacía el de la GUI en `_beat`
+        self.stall_stacks = []
+        self._stacks_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._timer = None
+
+    def start(self):
+        from PyQt6.QtCore import QTimer
+        # El temporizador vive en el hilo de la GUI: solo late si el bucle de eventos está libre
+        self._timer = QTimer()
+        self._timer.setInterval(HEARTBEAT_MS)
+        self._timer.timeout.connect(self._beat)
+        self._timer.start()
+        super().start()
+
+    def _beat(self):
+        now = time.perf_counter()
+        gap = now - self.last_beat
+        self.last_beat = now
+        if gap > self.threshold:
+            with self._stacks_lock:
+                stacks, self.stall_stacks = self.stall_stacks, []
+            self.tracer.complete('bloqueo GUI', (now - gap - self.tracer._origin) * 1e6, gap * 1e6, 'stall',
+                                 {'ms': round(gap * 1000), 'pilas': stacks}, tid=self.gui_thread_id)
+
+    def _capture_stack(self):
+        frame = sys._current_frames().get(self.gui_thread_id)
+        return ''.join(traceback.format_stack(frame)) if frame is not None else ''
+
+    def run(self):
+        next_sample = None
+        while not self._stop_event.wait(self.threshold / 4):
+            blocked = time.perf_counter() - self.last_beat
+            if blocked < self.threshold:
+                next_sample = None
+                continue
+            if next_sample is None:
+                next_sample = self.threshold
+            if blocked < next_sample:
+                continue
+            with self._stacks_lock:
+                if len(self.stall_stacks) >= MAX_STACKS_PER_STALL:
+                    continue
+                stack = self._capture_stack()
+                self.stall_stacks.append(stack)
+            self.tracer.instant('bloqueo detectado', 'stall',
+                                {'ms': round(blocked * 1000), 'pila': stack}, tid=self.gui_thread_id, flush=True)
+            next_sample *= 2
+
+    def stop(self):
+        self._stop_event.set()
+        if self._timer is not None:
+            self._timer.stop()
+
+
+# --- Estado global (la GUI tiene un único trazador) ---
+_tracer = None
+_watchdog = None
+
+
+def enabled():
+    return _tracer is not None
+
+
+def start(log_dir, stall_ms=DEFAULT_STALL_MS):
+    """Activa las trazas y el vigilante de bloqueos. Debe llamarse desde el hilo de la GUI con la QApplication creada."""
+    global _tracer, _watchdog
+    if _tracer is None:
+        _tracer = Tracer(log_dir)
+        _tracer.metadata('thread_name', {'name': 'GUI'})
+        _watchdog = StallWatchdog(_tracer, stall_ms)
+        _watchdog.start()
+    return _tracer
+
+
+def start_from_environment(log_dir, argv=()):
+    """Activa las trazas si INVENTARIO_TRACE=1 o se pasó --trace. Devuelve el trazador o None."""
+    if os.environ.get('INVENTARIO_TRACE') or '--trace' in argv:
+        return start(log_dir, float(os.environ.get('INVENTARIO_STALL_MS', DEFAULT_STALL_MS)))
+    return None
+
+
+def stop():
+    global _tracer, _watchdog
+    if _watchdog is not None:
+        _watchdog.stop()
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = _watchdog = None
+
+
+def span(name, cat='ui'):
+    """Tramo con nombre alrededor de un bloque (no-op si las trazas están desactivadas)."""
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(name, cat)
+
+
+# --- Análisis de trazas recogidas ---
+def load_events(paths):
+    """Lee los eventos línea a línea (tolera el array sin cerrar y una última línea truncada)."""
+    events = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip().rstrip(',')
+                if line in ('', '[', ']'):
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass
+    return events
+
+
+def summarize(events, top=15):
+    """Devuelve (tramos, bloqueos): tramos agregados por nombre ordenados por tiempo
+    total y bloqueos agrupados por la línea de código más interna de su pila."""
+    spans = {}
+    stalls = {}
+    for event in events:
+        if event.get('ph') == 'X' and event.get('cat') != 'stall':
+            entry = spans.setdefault(event['name'], {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            ms = event['dur'] / 1000
+            entry['calls'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+        elif event.get('ph') == 'i' and event.get('cat') == 'stall':
+            lines = [l for l in event['args'].get('pila', '').splitlines() if l.strip().startswith('File ')]
+            where = lines[-1].strip() if lines else '(pila desconocida)'
+            entry = stalls.setdefault(where, {'count': 0, 'max_ms': 0})
+            entry['count'] += 1
+            entry['max_ms'] = max(entry['max_ms'], event['args'].get('ms', 0))
+    spans = sorted(spans.items(), key=lambda kv: kv[1]['total_ms'], reverse=True)[:top]
+    stalls = sorted(stalls.items(), key=lambda kv: (kv[1]['max_ms'], kv[1]['count']), reverse=True)[:top]
+    return spans, stalls
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    spans, stalls = summarize(load_events(sys.argv[1:]))
+    print(f"{'acción':<40} {'llamadas':>8} {'total ms':>10} {'máx. ms':>9}")
+    for name, s in spans:
+        print(f"{name:<40} {s['calls']:>8} {s['total_ms']:>10.0f} {s['max_ms']:>9.0f}")
+    print(f"\n{'bloqueos (punto más interno de la pila)':<80} {'veces':>5} {'máx. ms':>8}")
+    for where, s in stalls:
+        print(f"{where[:80]:<80} {s['count']:>5} {s['max_ms']:>8}")
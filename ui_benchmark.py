@@ -0,0 +1,235 @@
+# ui_benchmark.py
+"""Benchmark de latencia de la interfaz (QT_QPA_PLATFORM=offscreen) sobre una base de datos sintética.
+
+Reproduce los flujos reales: abrir el login, seleccionar un centro, guardar un PC,
+escribir una búsqueda, abrir el detalle de un equipo con 20 fotos y cambiar de centro.
+Para cada paso mide el tiempo total y el bloqueo máximo del bucle de eventos.
+
+Uso:
+    python ui_benchmark.py [--scales small,medium] [--repeat 3] [--only save_pc,switch_centro] [--save-baseline]
+"""
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from benchmark import BASE_DIR, SCALES, BenchmarkEnvironment, argument_parser, publish
+
+DEFAULT_BASELINE = os.path.join(BASE_DIR, 'bench_ui_baseline.json')
+
+# Tiempo que se deja correr el bucle de eventos tras cada paso (repintados, deleteLater...)
+SETTLE_MS = 50
+PHOTOS_PER_DEVICE = 20
+
+
+class StallMonitor:
+    """Latido de QTimer: el mayor hueco entre dos latidos es el bloqueo máximo del bucle de eventos."""
+
+    def __init__(self, interval_ms=1):
+        from PyQt6.QtCore import QTimer
+        self.timer = QTimer()
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self._tick)
+        self.last = self.max_gap = 0.0
+
+    def _tick(self):
+        now = time.perf_counter()
+        self.max_gap = max(self.max_gap, now - self.last)
+        self.last = now
+
+    def start(self):
+        self.last, self.max_gap = time.perf_counter(), 0.0
+        self.timer.start()
+
+    def stop(self):
+        self._tick()
+        self.timer.stop()
+        return self.max_gap * 1000
+
+
+def run_step(func, settle_ms=SETTLE_MS):
+    """Ejecuta `func` dentro del bucle de eventos. Devuelve (ms totales, ms de bloqueo máximo, resultado).
+
+    Si `func` devuelve un callable, se considera la condición de fin del paso (trabajo asíncrono)
+    y se espera a que devuelva True antes de dar el paso por terminado."""
+    from PyQt6.QtCore import QEventLoop, QTimer
+
+    loop = QEventLoop()
+    monitor = StallMonitor()
+    state = {}
+
+    def finish():
+        done = state.get('done')
+        if done is not None and not done():
+            QTimer.singleShot(1, finish)
+            return
+        state['wall_ms'] = (time.perf_counter() - state['start']) * 1000
+        QTimer.singleShot(settle_ms, loop.quit)
+
+    def go():
+        state['start'] = time.perf_counter()
+        result = func()
+        state['result'] = result
+        state['done'] = result if callable(result) else None
+        finish()
+
+    monitor.start()
+    QTimer.singleShot(0, go)
+    loop.exec()
+    return state['wall_ms'], monitor.stop(), state.get('result')
+
+
+def create_photos(env, db, item_type, item_id, count=PHOTOS_PER_DEVICE):
+    """Crea `count` fotos JPEG de tamaño real (1600x1200) asociadas al equipo."""
+    from PyQt6.QtGui import QImage, QColor, QPainter
+    image_dir = env.path('data', 'images')
+    os.makedirs(image_dir, exist_ok=True)
+    for n in range(count):
+        image = QImage(1600, 1200, QImage.Format.Format_RGB32)
+        image.fill(QColor.fromHsv((n * 37) % 360, 160, 220))
+        painter = QPainter(image)
+        painter.drawText(100, 100, f"Foto {n}")
+        painter.end()
+        name = f"{item_type}_{item_id}_bench_{n}.jpg"
+        image.save(os.path.join(image_dir, name), 'JPG', 85)
+        db.execute_query("INSERT INTO images (item_type, item_id, image_path) VALUES (?, ?, ?)",
+                         (item_type, item_id, f"data/images/{name}"))
+
+
+class UiFlow:
+    """Flujos de usuario reales sobre las ventanas de main.py."""
+
+    def __init__(self, env):
+        import main
+        self.main = main
+        self.env = env
+        self.db = main.DatabaseManager()
+        self.window = None
+        self.photo_item = self.db.fetch_one("SELECT id FROM pcs WHERE inventario_id=? ORDER BY id LIMIT 1",
+                                            (env.inventory_ids[0],))[0]
+        create_photos(env, self.db, 'pcs', self.photo_item)
+        self.pc_counter = 0
+
+    def open_login(self):
+        self.login = self.main.LoginDialog(self.db)
+        self.login.show()
+
+    def select_centro(self, inventory_id=None):
+        inventory_id = inventory_id or self.env.inventory_ids[0]
+        self.login.set_current_centro(inventory_id)
+        self.login.accept_selection()
+        self.window = self.main.MainWindow(self.login.selected_inventory_id)
+        self.window.show()
+        return self.results_delivered
+
+    def save_pc(self):
+        self.pc_counter += 1
+        self.window.input_pc_codigo.setText(f"BENCH-{self.pc_counter:05d}")
+        self.window.combo_pc_ram.setCurrentText("8GB")
+        self.window.combo_pc_so.setCurrentText("Windows 11 Pro")
+        self.window.input_pc_ubicacion.setText("Aula 1")
+        self.window.btn_save_pc.click()
+        return self.results_delivered
+
+    def search_typing(self, text="pc-00"):
+        from PyQt6.QtTest import QTest
+        self.search = self.main.SearchDialog(self.window.db, self.window.current_inventory_id, self.window)
+        self.search.show()
+        QTest.keyClicks(self.search.search_input, text)
+        return self.results_delivered
+
+    def close_search(self):
+        self.search.close()
+        self.search.deleteLater()
+
+    def open_detail_with_photos(self):
+        self.detail = self.main.DetailViewDialog('pcs', self.photo_item, self.window.db, self.window)
+        self.detail.show()
+        return self.results_delivered
+
+    def close_detail(self):
+        self.detail.close()
+        self.detail.deleteLater()
+
+    def switch_centro(self):
+        """Cambio de centro tal como lo hace MainWindow.switch_center: selector y carga en la misma ventana."""
+        target = self.env.inventory_ids[1 if self.window.current_inventory_id == self.env.inventory_ids[0] else 0]
+        login = self.main.LoginDialog(self.window.db, self.window)
+        login.set_current_centro(target)
+        login.accept_selection()
+        self.window.open_centro(login.selected_inventory_id)
+        return self.results_delivered
+
+    def results_delivered(self):
+        """Condición de fin de paso: el hilo de base de datos ha entregado todas las lecturas."""
+        return self.window is None or self.window.db_worker.idle()
+
+    def close(self):
+        if self.window:
+            self.window.close()
+            self.window.db.close()
+        self.db.close()
+
+
+# Pasos medidos: nombre -> (acción, limpieza sin medir o None)
+STEPS = [
+    ('open_login', 'open_login', None),
+    ('select_centro', 'select_centro', None),
+    ('save_pc', 'save_pc', None),
+    ('search_typing', 'search_typing', 'close_search'),
+    ('detail_view_20_photos', 'open_detail_with_photos', 'close_detail'),
+    ('detail_view_reopen', 'open_detail_with_photos', 'close_detail'),
+    ('switch_centro', 'switch_centro', None),
+    # Vuelta al centro anterior: su sesión sigue cargada
+    ('switch_centro_back', 'switch_centro', None),
+]
+
+
+def run_scale(scale, repeat, only=None):
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    app.setQuitOnLastWindowClosed(False)
+
+    centros, equipos = SCALES[scale]
+    env = BenchmarkEnvironment(centros, equipos)
+    samples = {name: [] for name, _, _ in STEPS}
+    try:
+        flow = UiFlow(env)
+        for _ in range(repeat):
+            for name, action, cleanup in STEPS:
+                # Los pasos no pedidos se ejecutan igual (preparan los siguientes), pero no se miden
+                if only and name not in only:
+                    run_step(getattr(flow, action))
+                    if cleanup:
+                        run_step(getattr(flow, cleanup))
+                    continue
+                wall_ms, blocked_ms, _ = run_step(getattr(flow, action))
+                samples[name].append((wall_ms, blocked_ms))
+                if cleanup:
+                    run_step(getattr(flow, cleanup))
+            # Cada repetición empieza de nuevo desde el login
+            flow.window.close()
+            flow.window.db.close()
+            flow.window = None
+        flow.close()
+    finally:
+        env.close()
+
+    return {name: {'median_ms': statistics.median(w for w, _ in values), 'min_ms': min(w for w, _ in values),
+                   'blocking_ms': statistics.median(b for _, b in values)}
+            for name, values in samples.items() if values}
+
+
+def main(argv=None):
+    args = argument_parser("Benchmark de latencia de la interfaz (offscreen).", DEFAULT_BASELINE).parse_args(argv)
+
+    sys.path.insert(0, BASE_DIR)
+    only = set(args.only.split(',')) if args.only else None
+    results = {scale: run_scale(scale, args.repeat, only) for scale in args.scales.split(',')}
+    return publish(args, results, label='paso', columns=(('total ms', 'median_ms'), ('bloqueo ms', 'blocking_ms')))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+# warehouse_export.py
+"""Exportación de todo el inventario para herramientas de BI.
+
+Cada tabla de equipos se vuelca, con los datos de su centro unidos, en ficheros
+particionados por tabla y centro:
+
+    <salida>/<tabla>/centro=<id>/part-0.csv   (o .parquet)
+
+Las filas se leen con `fetchmany` y se escriben según llegan, así que la memoria
+no crece con el tamaño de la base de datos. En modo incremental solo se
+reescriben las particiones con cambios desde la exportación anterior (según
+`change_log`); el estado se guarda en <salida>/_estado.json.
+
+Uso sin interfaz: python warehouse_export.py inventario.db SALIDA [--formato parquet] [--completa]
+"""
+import argparse
+import csv
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import time
+
+from database import DatabaseManager, EQUIPMENT_TABLES
+
+# Opcional: salida en Parquet. pyarrow tarda en cargar: se importa al exportar en ese formato
+pa = pq = None
+
+
+def _load_pyarrow():
+    global pa, pq
+    if pa is None:
+        import pyarrow
+        import pyarrow.parquet
+        pa, pq = pyarrow, pyarrow.parquet
+
+FORMATS = ('csv', 'parquet')
+# Filas leídas por llamada a fetchmany
+FETCH_SIZE = 5000
+STATE_FILE = '_estado.json'
+# Datos del centro añadidos a cada fila (con prefijo centro_); las notas largas no se repiten por fila
+CENTRO_COLUMNS = ['cliente', 'ubicacion', 'responsable', 'fecha']
+# Columnas enteras en Parquet; el resto se exporta como texto
+_INTEGER_COLUMNS = {'id', 'inventario_id'}
+
+
+def available_formats():
+    return [formato for formato in FORMATS if formato != 'parquet' or importlib.util.find_spec('pyarrow') is not None]
+
+
+def ensure_indexes(db):
+    """Índices por centro en las tablas de equipos: lectura ordenada sin ordenar en memoria
+    y particiones sueltas del modo incremental por búsqueda en el índice."""
+    for _ in db.each_centro():
+        for table in EQUIPMENT_TABLES:
+            db.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_inventario ON {table} (inventario_id)")
+        db.conn.commit()
+
+
+def _columns(db, table):
+    return [c[1] for c in db.fetch_all(f"PRAGMA table_info({table})")]
+
+
+def _select(db, table):
+    columns = ", ".join(f"t.{column}" for column in _columns(db, table))
+    centro = ", ".join(f"i.{column} AS centro_{column}" for column in CENTRO_COLUMNS)
+    return f"SELECT {columns}, {centro} FROM {table} t JOIN inventarios i ON i.id = t.inventario_id"
+
+
+def _signature(db, formato):
+    schema = {table: _columns(db, table) for table in EQUIPMENT_TABLES}
+    return hashlib.sha1(json.dumps([schema, CENTRO_COLUMNS, formato]).encode('utf-8')).hexdigest()
+
+
+# --- Escritura de particiones ---
+class _CsvPartition:
+    extension = 'csv'
+
+    def __init__(self, path, header):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(header)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetPartition:
+    extension = 'parquet'
+
+    def __init__(self, path, header):
+        _load_pyarrow()
+        self.header = header
+        self.schema = pa.schema([(name, pa.int64() if name in _INTEGER_COLUMNS else pa.string()) for name in header])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='snappy')
+
+    def write(self, rows):
+        # Un grupo de filas por lote leído; SQLite no garantiza el tipo, el texto se normaliza
+        columns = []
+        for index, name in enumerate(self.header):
+            values = [row[index] for row in rows]
+            if name not in _INTEGER_COLUMNS:
+                values = [None if value is None else str(value) for value in values]
+            columns.append(pa.array(values, type=self.schema.field(index).type))
+        self.writer.write_table(pa.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+_WRITERS = {'csv': _CsvPartition, 'parquet': _ParquetPartition}
+
+
+class _Partition:
+    """Una partición en escritura: se escribe en un temporal que sustituye al fichero al
+    confirmarla, de modo que una herramienta que lea a la vez nunca ve un fichero a medias."""
+
+    def __init__(self, output, directory, path, header):
+        self.output = output
+        self.path = path
+        os.makedirs(directory, exist_ok=True)
+        self.writer = output.writer_class(path + '.tmp', header)
+
+    def write(self, rows):
+        self.writer.write(rows)
+        self.output.result['filas'] += len(rows)
+
+    def commit(self):
+        self.writer.close()
+        os.replace(self.path + '.tmp', self.path)
+        self.output.result['particiones'] += 1
+
+    def abort(self):
+        self.writer.close()
+        os.remove(self.path + '.tmp')
+
+
+class _Output:
+    def __init__(self, output_dir, formato):
+        self.output_dir = output_dir
+        self.writer_class = _WRITERS[formato]
+        self.result = {'particiones': 0, 'filas': 0, 'eliminadas': 0}
+
+    def partition_dir(self, table, inventory_id):
+        return os.path.join(self.output_dir, table, f"centro={inventory_id}")
+
+    def open(self, table, inventory_id, header):
+        directory = self.partition_dir(table, inventory_id)
+        return _Partition(self, directory, os.path.join(directory, f"part-0.{self.writer_class.extension}"), header)
+
+    def remove(self, table, inventory_id):
+        directory = self.partition_dir(table, inventory_id)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+            self.result['eliminadas'] += 1
+
+    def existing(self, table):
+        directory = os.path.join(self.output_dir, table)
+        if not os.path.isdir(directory):
+            return set()
+        return {int(name.split('=', 1)[1]) for name in os.listdir(directory)
+                if name.startswith('centro=') and name.split('=', 1)[1].isdigit()}
+
+
+def _batches(cursor):
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            return
+        yield rows
+
+
+def _write_table(output, table, header, cursor):
+    """Vuelca un cursor ordenado por centro: cada cambio de centro cierra una partición y abre
+    la siguiente. Devuelve los centros escritos."""
+    key = header.index('inventario_id')
+    written = []
+    partition = None
+    try:
+        for rows in _batches(cursor):
+            start = 0
+            for end in range(1, len(rows) + 1):
+                if end < len(rows) and rows[end][key] == rows[start][key]:
+                    continue
+                if partition is None or written[-1] != rows[start][key]:
+                    if partition is not None:
+                        partition.commit()
+                        partition = None
+                    written.append(rows[start][key])
+                    partition = output.open(table, rows[start][key], header)
+                partition.write(rows[start:end])
+                start = end
+    except BaseException:
+        if partition is not None:
+            partition.abort()
+        raise
+    if partition is not None:
+        partition.commit()
+    return written
+
+
+def _read_state(output_dir):
+    try:
+        with open(os.path.join(output_dir, STATE_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_state(output_dir, state):
+    path = os.path.join(output_dir, STATE_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _current_seq(db):
+    if not db.fetch_one("SELECT 1 FROM sqlite_master WHERE type='table' AND name='change_log'"):
+        return None
+    return db.fetch_one("SELECT COALESCE(MAX(seq), 0) FROM change_log")[0]
+
+
+def _changed_partitions(db, since):
+    """{tabla: {centros}} con cambios en change_log posteriores a `since`. Un cambio en los
+    datos del centro afecta a todas sus tablas; un traslado queda registrado en ambos centros."""
+    changed = {table: set() for table in EQUIPMENT_TABLES}
+    for inventory_id, item_type in db.fetch_all(
+            "SELECT DISTINCT inventario_id, item_type FROM change_log WHERE seq > ? AND inventario_id IS NOT NULL", (since,)):
+        if item_type == 'inventarios':
+            for ids in changed.values():
+                ids.add(inventory_id)
+        elif item_type in changed:
+            changed[item_type].add(inventory_id)
+    return changed
+
+
+def _previous_seq(state, inventory_id):
+    """Marca de la exportación anterior para el fichero de `inventory_id` (None: base de datos única)."""
+    seq = state.get('seq') if state else None
+    if inventory_id is None:
+        return seq if isinstance(seq, int) else None
+    return seq.get(str(inventory_id)) if isinstance(seq, dict) else None
+
+
+def export_warehouse(db, output_dir, formato='csv', incremental=True, progress=None):
+    """Exporta las tablas de equipos a `output_dir`.
+
+    Con `incremental`, si hay una exportación anterior compatible (mismo formato y
+    columnas) solo se reescriben las particiones cambiadas desde entonces; si no, se
+    exporta todo. Con la base de datos dividida cada fichero de centro lleva su propia
+    marca de `change_log`. `progress(hechas, total)` se llama tras cada tabla. Devuelve un resumen."""
+    if formato not in available_formats():
+        raise ValueError(f"Formato no disponible: {formato}")
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    state = _read_state(output_dir)
+
+    output = _Output(output_dir, formato)
+    if state is not None and state.get('formato') != formato:
+        # Los ficheros del formato anterior no se sustituirían
+        for table in EQUIPMENT_TABLES:
+            shutil.rmtree(os.path.join(output_dir, table), ignore_errors=True)
+    tables = list(EQUIPMENT_TABLES)
+    sources = db.centro_ids() if db.sharded else [None]
+    seqs = {}
+    signature = None
+    all_full = True
+    done = 0
+    for source in db.each_centro():
+        signature = _signature(db, formato)
+        # La marca se toma antes de leer: lo que cambie durante la exportación se repite en la siguiente
+        seq = seqs[source] = _current_seq(db)
+        previous = _previous_seq(state, source)
+        full = (not incremental or seq is None or state is None or state.get('firma') != signature
+                or previous is None or previous > seq)
+        all_full = all_full and full
+        changed = None if full else _changed_partitions(db, previous)
+        for table in tables:
+            query = _select(db, table)
+            header = _columns(db, table) + [f"centro_{column}" for column in CENTRO_COLUMNS]
+            cursor = db.conn.cursor()
+            if full:
+                cursor.execute(f"{query} ORDER BY t.inventario_id, t.id")
+                # Un fichero de centro solo puede dejar vacía su propia partición
+                candidates = output.existing(table) if source is None else {source}
+                stale = candidates - set(_write_table(output, table, header, cursor))
+            else:
+                stale = set()
+                for inventory_id in sorted(changed[table]):
+                    cursor.execute(f"{query} WHERE t.inventario_id = ? ORDER BY t.id", (inventory_id,))
+                    if not _write_table(output, table, header, cursor):
+                        stale.add(inventory_id)
+            # Centros sin filas (borrados, vaciados o cuyos equipos se han trasladado)
+            for inventory_id in stale:
+                output.remove(table, inventory_id)
+            done += 1
+            if progress:
+                progress(done, len(sources) * len(tables))
+
+    if db.sharded:
+        # Centros cuyo fichero ya no está en el catálogo (archivados)
+        for table in tables:
+            for inventory_id in output.existing(table) - set(sources):
+                output.remove(table, inventory_id)
+        seq = {str(source): value for source, value in seqs.items()}
+    else:
+        seq = seqs[None]
+    _write_state(output_dir, {'seq': seq, 'firma': signature, 'formato': formato,
+                              'fecha': time.strftime('%Y-%m-%d %H:%M:%S')})
+    return dict(output.result, modo='completa' if all_full else 'incremental',
+                segundos=round(time.perf_counter() - started, 2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta todas las tablas de equipos para herramientas de BI.")
+    parser.add_argument('db', help="base de datos (inventario.db)")
+    parser.add_argument('salida', help="directorio de salida")
+    parser.add_argument('--formato', choices=FORMATS, default='csv')
+    parser.add_argument('--completa', action='store_true', help="reescribir todo aunque haya una exportación anterior")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No existe la base de datos {args.db}")
+        return 2
+    if args.formato not in available_formats():
+        print("La salida en Parquet necesita pyarrow (pip install pyarrow)")
+        return 2
+    db = DatabaseManager(args.db, create_tables=False)
+    try:
+        ensure_indexes(db)
+        result = export_warehouse(db, args.salida, args.formato, incremental=not args.completa)
+    finally:
+        db.close()
+    print(f"Exportación {result['modo']}: {result['particiones']} particiones, {result['filas']} filas, "
+          f"{result['eliminadas']} eliminadas en {result['segundos']} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())